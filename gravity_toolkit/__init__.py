@@ -20,11 +20,12 @@ import gravity_toolkit.utilities
 from gravity_toolkit.clenshaw_summation import clenshaw_summation
 from gravity_toolkit.degree_amplitude import degree_amplitude
 from gravity_toolkit.destripe_harmonics import destripe_harmonics
-from gravity_toolkit.gauss_weights import gauss_weights
-from gravity_toolkit.gen_disc_load import gen_disc_load
+from gravity_toolkit.gauss_weights import gauss_weights, han_weights
+from gravity_toolkit.gen_disc_load import gen_disc_load, gen_disc_loads
 from gravity_toolkit.gen_harmonics import gen_harmonics
 from gravity_toolkit.gen_point_load import gen_point_load
-from gravity_toolkit.gen_spherical_cap import gen_spherical_cap
+from gravity_toolkit.gen_spherical_cap import gen_spherical_cap, \
+    gen_spherical_caps
 from gravity_toolkit.gen_stokes import gen_stokes
 from gravity_toolkit.geocenter import geocenter
 from gravity_toolkit.grace_date import grace_date
@@ -33,18 +34,25 @@ from gravity_toolkit.grace_input_months import grace_input_months, read_ecmwf_co
 from gravity_toolkit.grace_months_index import grace_months_index
 from gravity_toolkit.harmonics import harmonics
 from gravity_toolkit.harmonic_summation import harmonic_summation
+from gravity_toolkit.harmonic_variance import variance_summation, \
+    covariance_summation
+from gravity_toolkit.harmonic_rotation import rotate_harmonics, rotate_zonal, \
+    wigner_d
 from gravity_toolkit.hdf5_read import hdf5_read
 from gravity_toolkit.hdf5_read_stokes import hdf5_read_stokes
 from gravity_toolkit.hdf5_stokes import hdf5_stokes
 from gravity_toolkit.hdf5_write import hdf5_write
 from gravity_toolkit.legendre_polynomials import legendre_polynomials
 from gravity_toolkit.legendre import legendre
+from gravity_toolkit.mascon_kernel import mascon_kernel, mascon_timeseries, \
+    harmonic_indices
+from gravity_toolkit.mascon_store import mascon_store, mascon_harmonics
 from gravity_toolkit.ncdf_read import ncdf_read
 from gravity_toolkit.ncdf_read_stokes import ncdf_read_stokes
 from gravity_toolkit.ncdf_stokes import ncdf_stokes
 from gravity_toolkit.ncdf_write import ncdf_write
 from gravity_toolkit.ocean_stokes import ocean_stokes
-from gravity_toolkit.piecewise_regress import piecewise_regress
+from gravity_toolkit.piecewise_regress import piecewise_regress, piecewise_scan
 from gravity_toolkit.plm_colombo import plm_colombo
 from gravity_toolkit.plm_holmes import plm_holmes
 from gravity_toolkit.plm_mohlenkamp import plm_mohlenkamp
@@ -52,12 +60,15 @@ from gravity_toolkit.read_CSR_monthly_6x1 import read_CSR_monthly_6x1
 from gravity_toolkit.read_GIA_model import read_GIA_model
 from gravity_toolkit.read_GRACE_harmonics import read_GRACE_harmonics
 from gravity_toolkit.read_ICGEM_harmonics import read_ICGEM_harmonics
-from gravity_toolkit.read_love_numbers import read_love_numbers
+from gravity_toolkit.read_love_numbers import read_love_numbers, \
+    load_love_numbers
 from gravity_toolkit.read_SLR_C20 import read_SLR_C20
 from gravity_toolkit.read_SLR_C30 import read_SLR_C30
 from gravity_toolkit.read_SLR_geocenter import read_SLR_geocenter
 from gravity_toolkit.read_tellus_geocenter import read_tellus_geocenter
+from gravity_toolkit.sparse_harmonics import sparse_harmonics
 from gravity_toolkit.spatial import spatial
+from gravity_toolkit.spatial_series import spatial_series
 from gravity_toolkit.tsamplitude import tsamplitude
 from gravity_toolkit.tsregress import tsregress
 from gravity_toolkit.tssmooth import tssmooth
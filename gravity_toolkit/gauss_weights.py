@@ -2,7 +2,7 @@
 u"""
 gauss_weights.py
 Original IDL code gauss_weights.pro written by Sean Swenson
-Adapted by Tyler Sutterley (07/2020)
+Adapted by Tyler Sutterley (03/2021)
 
 Computes the Gaussian weights as a function of degree
 A normalized version of Jekeli's Gaussian averaging function
@@ -11,17 +11,25 @@ Christopher Jekeli (1981)
 Alternative Methods to Smooth the Earth's Gravity Field
 http://www.geology.osu.edu/~jekeli.1/OSUReports/reports/report_327.pdf
 
+Weights for a list of smoothing radii are calculated with a single
+    recursion over degree and are kept in memory for reuse
+Computes the anisotropic Gaussian weights as a function of degree and order
+    following Han et al. (2005) for convolving with harmonics objects
+
 CALLING SEQUENCE:
     wl = gauss_weights(hw, LMAX)
+    wlm = han_weights(r0, r1, m1, LMAX)
 
 INPUTS:
     hw: Gaussian smoothing radius in kilometers
         Radius r corresponds to the distance at which the weight
         drops to half its peak value at the shortest wavelength
+        can be a list of radii
     LMAX: Maximum degree of spherical harmonic coefficients
 
 OUTPUTS:
     wl: degree dependent weighting function
+        (LMAX+1) for a single radius or (nradii,LMAX+1) for a list of radii
 
 PYTHON DEPENDENCIES:
     numpy: Scientific Computing Tools For Python (https://numpy.org)
@@ -34,7 +42,16 @@ NOTES:
         call recurs(alpha,bcoef) calculates bcoef up to LMAX 150 (=wt[0:150])
             alpha = alog(2.)/(1.-cos(rad/6371.))
 
+REFERENCES:
+    S.-C. Han, C. K. Shum, C. Jekeli, C.-Y. Kuo, C. Wilson and K.-W. Seo,
+        "Non-isotropic filtering of GRACE temporal gravity for geophysical
+        signal enhancement", Geophysical Journal International, 163(1),
+        18-25, (2005). https://doi.org/10.1111/j.1365-246X.2005.02756.x
+
 UPDATE HISTORY:
+    Updated 03/2021: calculate weights for a list of radii at once
+        keep calculated weights in memory for reuse
+        added anisotropic weights from Han et al. (2005)
     Updated 07/2020: added function docstrings
     Updated 06/2015: adjusted threshold from 1e-9 to 1e-10
     Updated 12/2014: updated comments and header text updating full reference
@@ -43,6 +60,9 @@ UPDATE HISTORY:
 """
 import numpy as np
 
+#-- gaussian weights for each smoothing radius and truncation
+_gauss_weights = {}
+
 def gauss_weights(hw, LMAX):
     """
     Computes the Gaussian weights as a function of degree
@@ -56,36 +76,87 @@ def gauss_weights(hw, LMAX):
     -------
     wl: degree dependent weighting function
     """
+    #-- calculate weights for each radius if not in memory
+    radii = np.atleast_1d(hw).astype(np.float)
+    key = (tuple(radii), np.int(LMAX))
+    if key not in _gauss_weights:
+        _gauss_weights[key] = gauss_recursion(radii, LMAX)
+    #-- copy weights so that values in memory are not modified
+    wl = _gauss_weights[key].copy()
+    #-- return the gaussian weights
+    return wl if np.ndim(hw) else wl[0,:]
+
+#-- PURPOSE: calculate gaussian weights for a list of smoothing radii
+def gauss_recursion(radii, LMAX):
+    """
+    Computes the Gaussian weights for a list of radii with a
+        single recursion over degree
+
+    Arguments
+    ---------
+    radii: Gaussian smoothing radii in kilometers
+    LMAX: Maximum degree of spherical harmonic coefficients
+
+    Returns
+    -------
+    wl: degree dependent weighting function for each radius
+    """
     #-- allocate for output weights
-    wl = np.zeros((LMAX+1))
+    nradii = len(radii)
+    wl = np.zeros((nradii,LMAX+1))
     #-- radius of the Earth in km
     rad_e = 6371.0
-    if (hw < 1.0e-10):
-        #-- distance is smaller than cutoff
-        wl[:]=1.0/(2.0*np.pi)
-    else:
-        #-- calculate gaussian weights using recursion
-        b = np.log(2.0)/(1.0 - np.cos(hw/rad_e))
-        #-- weight for degree 0
-        wl[0] = 1.0/(2.0*np.pi)
-        #-- weight for degree 1
-        wl[1] = wl[0]*((1.0 +np.exp(-2.0*b))/(1. -np.exp(-2.0*b))-1.0/b)
-        #-- valid flag
-        valid = True
-        #-- spherical harmonic degree
-        l = 2
-        #-- while valid (within cutoff)
-        #-- and spherical harmonic degree is less than LMAX
-        while (valid and (l <= LMAX)):
-            #-- calculate weight with recursion
-            wl[l] = (1.0-2.0*l)/b*wl[l-1]+wl[l-2]
-            #-- weight is less than cutoff
-            if (np.abs(wl[l]) < 1.0e-10):
-                #-- set all weights to cutoff
-                wl[l:LMAX+1] = 1.0e-10
-                #-- set valid flag
-                valid = False
-            #-- add 1 to l
-            l += 1
+    #-- weight for degree 0
+    wl[:,0] = 1.0/(2.0*np.pi)
+    #-- distance is smaller than cutoff
+    smooth = (radii >= 1.0e-10)
+    wl[~smooth,:] = 1.0/(2.0*np.pi)
+    if not np.any(smooth) or (LMAX < 1):
+        return wl
+    #-- calculate gaussian weights using recursion
+    b = np.log(2.0)/(1.0 - np.cos(radii[smooth]/rad_e))
+    w = wl[smooth,:]
+    #-- weight for degree 1
+    w[:,1] = w[:,0]*((1.0 + np.exp(-2.0*b))/(1.0 - np.exp(-2.0*b)) - 1.0/b)
+    #-- valid flags for each radius (within cutoff)
+    valid = np.ones((len(b)), dtype=bool)
+    for l in range(2, LMAX+1):
+        #-- calculate weight with recursion
+        w[valid,l] = (1.0-2.0*l)/b[valid]*w[valid,l-1] + w[valid,l-2]
+        #-- weights less than cutoff are set to cutoff for all higher degrees
+        valid &= (np.abs(w[:,l]) >= 1.0e-10)
+        w[~valid,l] = 1.0e-10
+    wl[smooth,:] = w
     #-- return the gaussian weights
     return wl
+
+#-- PURPOSE: calculate anisotropic gaussian weights
+def han_weights(r0, r1, m1, LMAX, MMAX=None):
+    """
+    Computes the anisotropic Gaussian weights as a function of degree
+        and order following Han et al. (2005)
+
+    Arguments
+    ---------
+    r0: Gaussian smoothing radius for order 0 in kilometers
+    r1: Gaussian smoothing radius for orders m1 and above in kilometers
+    m1: spherical harmonic order for the maximum smoothing radius
+    LMAX: Maximum degree of spherical harmonic coefficients
+
+    Keyword arguments
+    -----------------
+    MMAX: Maximum order of spherical harmonic coefficients
+
+    Returns
+    -------
+    wlm: degree and order dependent weighting function (LMAX+1,MMAX+1)
+    """
+    #-- upper bound of spherical harmonic orders (default == LMAX)
+    MMAX = np.copy(LMAX) if (MMAX is None) else MMAX
+    #-- smoothing radius for each order
+    m = np.arange(MMAX+1)
+    radii = np.where(m < m1, r0 + (r1 - r0)*m/np.float(m1), r1)
+    #-- gaussian weights for each order in a single recursion
+    wl = gauss_weights(radii, LMAX)
+    #-- return the weights for each degree and order
+    return np.transpose(wl)
@@ -1,10 +1,15 @@
 #!/usr/bin/env python
 u"""
-gen_disc_load.py (01/2021)
+gen_disc_load.py (03/2021)
 Calculates gravitational spherical harmonic coefficients for a uniform disc load
 
+Harmonics for a set of disc loads can be calculated in a single call
+    with gen_disc_loads, which calculates the Legendre polynomials for
+    all disc centers at once and shares the disc coefficients of equal areas
+
 CALLING SEQUENCE:
     Ylms = gen_disc_load(data, lon, lat, area, LMAX=60, MMAX=None)
+    Ylms,disc_area = gen_disc_loads(data, lon, lat, area, LMAX=60, MMAX=None)
 
 INPUTS:
     data: data magnitude (Gt)
@@ -17,6 +22,7 @@ OUTPUTS:
     slm: sine spherical harmonic coefficients (geodesy normalization)
     l: spherical harmonic degree to LMAX
     m: spherical harmonic order to MMAX
+    disc_area: area of each disc in cm^2 (gen_disc_loads)
 
 OPTIONS:
     LMAX: Upper bound of Spherical Harmonic Degrees
@@ -30,6 +36,7 @@ PYTHON DEPENDENCIES:
 PROGRAM DEPENDENCIES:
     plm_holmes.py: Computes fully normalized associated Legendre polynomials
     legendre_polynomials.py: Computes fully normalized Legendre polynomials
+    harmonic_rotation.py: rotates spherical harmonics using Wigner-d matrices
     units.py: class for converting spherical harmonic data to specific units
     harmonics.py: spherical harmonic data class for processing GRACE/GRACE-FO
         destripe_harmonics.py: calculates the decorrelation (destriping) filter
@@ -45,6 +52,9 @@ REFERENCE:
         Associated Legendre Functions", Journal of Geodesy (2002)
 
 UPDATE HISTORY:
+    Updated 03/2021: added gen_disc_loads for calculating harmonics of
+        a set of disc loads as a harmonics object with a disc dimension
+        return the areas of the disc loads separately from the harmonics
     Updated 01/2021: use harmonics class for spherical harmonic operations
     Updated 07/2020: added function docstrings
     Updated 05/2020: vectorize calculation over degrees to improve compute time
@@ -61,6 +71,7 @@ import gravity_toolkit.units
 import gravity_toolkit.harmonics
 from gravity_toolkit.plm_holmes import plm_holmes
 from gravity_toolkit.legendre_polynomials import legendre_polynomials
+from gravity_toolkit.harmonic_rotation import rotate_zonal
 
 def gen_disc_load(data,lon,lat,area,LMAX=60,MMAX=None,PLM=None,LOVE=None):
     """
@@ -189,3 +200,100 @@ def gen_disc_load(data,lon,lat,area,LMAX=60,MMAX=None,PLM=None,LOVE=None):
 
     #-- return the output spherical harmonics object
     return Ylms
+
+#-- PURPOSE: calculate the spherical harmonics of a set of disc loads
+def gen_disc_loads(data,lon,lat,area,LMAX=60,MMAX=None,PLM=None,LOVE=None):
+    """
+    Calculates spherical harmonic coefficients for a set of uniform disc loads
+
+    Arguments
+    ---------
+    data: data magnitude of each disc in gigatonnes
+    lon: longitude of each disc center
+    lat: latitude of each disc center
+    area: area of each disc in km^2
+
+    Keyword arguments
+    -----------------
+    LMAX: Upper bound of Spherical Harmonic Degrees
+    MMAX: Upper bound of Spherical Harmonic Orders
+    PLM: input Legendre polynomials of each disc center
+    LOVE: input load Love numbers up to degree LMAX (hl,kl,ll)
+
+    Returns
+    -------
+    Ylms: harmonics object with a disc dimension
+        clm: cosine spherical harmonic coefficients for each disc
+        slm: sine spherical harmonic coefficients for each disc
+        l: spherical harmonic degree to LMAX
+        m: spherical harmonic order to MMAX
+    disc_area: area of each disc in cm^2
+    """
+
+    #-- upper bound of spherical harmonic orders (default = LMAX)
+    if MMAX is None:
+        MMAX = np.copy(LMAX)
+
+    #-- Earth Parameters
+    factors = gravity_toolkit.units(lmax=LMAX)
+    rho_e = factors.rho_e#-- Average Density of the Earth [g/cm^3]
+    rad_e = factors.rad_e#-- Average Radius of the Earth [cm]
+
+    #-- broadcast disc magnitudes, centers and areas to the number of discs
+    data,lon,lat,area = np.broadcast_arrays(np.atleast_1d(data),
+        np.atleast_1d(lon),np.atleast_1d(lat),np.atleast_1d(area))
+
+    #-- convert input area into cm^2 and then divide by area of a half sphere
+    #-- alpha will be 1 - the ratio of the input area with the half sphere
+    alpha = (1.0 - 1e10*area/(2.0*np.pi*rad_e**2))
+
+    #-- Input data is in gigatonnes (Gt)
+    #-- 1e15 converts from Gt to grams, 1e10 converts from km^2 to cm^2
+    unit_conv = 1e15/(1e10*area)
+
+    #-- Coefficient for calculating Stokes coefficients for a disc load
+    #-- From Jacob et al (2012), Farrell (1972) and Longman (1962)
+    coeff = 3.0/(rad_e*rho_e)
+
+    #-- extract arrays of kl, hl, and ll Love Numbers
+    hl,kl,ll = LOVE
+
+    #-- calculate SH degree dependent factors to convert from coefficients
+    #-- of mass into normalized geoid coefficients
+    l = np.arange(LMAX+1)
+    dfactor = (1.0 + kl[l])/((1.0 + 2.0*l)**2)
+
+    #-- Calculating plms of the discs
+    #-- pl_alpha depends only on the size of the disc so is calculated
+    #-- once for each unique disc area
+    alpha_unique,alpha_index = np.unique(alpha, return_inverse=True)
+    pl_unique = np.zeros((LMAX+1,len(alpha_unique)))
+    #-- l=0 is a special case (P(-1) = 1, P(1) = cos(alpha))
+    pl_unique[0,:] = (1.0 - alpha_unique)/2.0
+    #-- for all other degrees: calculate the legendre polynomials up to LMAX+1
+    pl_matrix,_ = legendre_polynomials(LMAX+1,alpha_unique)
+    #-- unnormalizing Legendre polynomials of degrees l-1 and l+1
+    l = np.arange(1,LMAX+1)
+    pl_lower = pl_matrix[l-1,:]/np.sqrt(2.0*l[:,None]-1.0)
+    pl_upper = pl_matrix[l+1,:]/np.sqrt(2.0*l[:,None]+3.0)
+    pl_unique[l,:] = (pl_lower - pl_upper)/2.0
+    #-- expand to each disc
+    pl_alpha = pl_unique[:,alpha_index]
+
+    #-- zonal harmonics of each disc load centered at the north pole
+    #-- multiplied by coefficients to convert to geoid coefficients
+    l = np.arange(LMAX+1)
+    Cl0 = coeff*dfactor[:,None]*np.sqrt(2.0*l[:,None]+1.0)*pl_alpha
+    #-- rotate disc loads to be centered at lat/lon and
+    #-- multiply by the data converted to cmH2O
+    #-- using the Legendre polynomials for all centers
+    rot = rotate_zonal(unit_conv*data*Cl0, lon, lat, LMAX=LMAX, MMAX=MMAX,
+        PLM=PLM)
+
+    #-- Initializing output spherical harmonics with a disc dimension
+    Ylms = gravity_toolkit.harmonics(lmax=LMAX, mmax=MMAX)
+    Ylms.clm = rot['clm']
+    Ylms.slm = rot['slm']
+    Ylms.update_dimensions()
+    #-- return the output spherical harmonics object and area of each disc
+    return (Ylms, 1e10*area)
@@ -1,9 +1,14 @@
 #!/usr/bin/env python
 u"""
 gen_point_load.py
-Written by Tyler Sutterley (01/2021)
+Written by Tyler Sutterley (03/2021)
 Calculates gravitational spherical harmonic coefficients for point masses
 
+Fully-normalized Legendre polynomials of all points are calculated in a
+    single pass with the Holmes and Featherstone (2002) recursion relation
+    and are summed directly into the spherical harmonic coefficients
+Points can be split into blocks that are summed in a pool of threads
+
 CALLING SEQUENCE:
     Ylms = gen_point_load(data, lon, lat, LMAX=LMAX)
 
@@ -25,6 +30,8 @@ OPTIONS:
         1: grams of mass (default)
         2: gigatonnes of mass
     LOVE: input load Love numbers up to degree LMAX (hl,kl,ll)
+    CHUNKSIZE: number of points to sum in each block
+    THREADS: number of threads for summing blocks of points
 
 PYTHON DEPENDENCIES:
     numpy: Scientific Computing Tools For Python (https://numpy.org)
@@ -41,17 +48,27 @@ PROGRAM DEPENDENCIES:
         hdf5_read_stokes.py: reads spherical harmonic HDF5 files
         hdf5_stokes.py: writes output spherical harmonic data to HDF5
 
+REFERENCES:
+    S. A. Holmes and W. E. Featherstone, "A unified approach to the Clenshaw
+    summation and the recursive computation of very high degree and order
+    normalised associated Legendre functions" Journal of Geodesy,
+    76: 279-299, 2002. https://doi.org/10.1007/s00190-002-0216-2
+
 UPDATE HISTORY:
+    Updated 03/2021: sum Legendre polynomials of all points in a single
+        recursion over degree and order with optional blocks and threads
     Updated 01/2021: use harmonics class for spherical harmonic operations
     Updated 07/2020: added function docstrings
     Written 05/2020
 """
 import numpy as np
+import multiprocessing.pool
 import gravity_toolkit.units
 import gravity_toolkit.harmonics
 from gravity_toolkit.legendre import legendre
 
-def gen_point_load(data, lon, lat, LMAX=60, MMAX=None, UNITS=1, LOVE=None):
+def gen_point_load(data, lon, lat, LMAX=60, MMAX=None, UNITS=1, LOVE=None,
+    CHUNKSIZE=None, THREADS=0):
     """
     Calculates spherical harmonic coefficients for point masses
 
@@ -69,6 +86,8 @@ def gen_point_load(data, lon, lat, LMAX=60, MMAX=None, UNITS=1, LOVE=None):
         1: grams of mass (default)
         2: gigatonnes of mass
     LOVE: input load Love numbers up to degree LMAX (hl,kl,ll)
+    CHUNKSIZE: number of points to sum in each block
+    THREADS: number of threads for summing blocks of points
 
     Returns
     -------
@@ -108,16 +127,89 @@ def gen_point_load(data, lon, lat, LMAX=60, MMAX=None, UNITS=1, LOVE=None):
     Ylms = gravity_toolkit.harmonics(lmax=LMAX, mmax=MMAX)
     Ylms.clm = np.zeros((LMAX+1,MMAX+1))
     Ylms.slm = np.zeros((LMAX+1,MMAX+1))
-    #-- for each degree l
-    for l in range(LMAX+1):
-        m1 = np.min([l,MMAX]) + 1
-        SPH = spherical_harmonic_matrix(l,D,phi,theta,dfactor[l])
-        #-- truncate to spherical harmonic order and save to output
-        Ylms.clm[l,:m1] = SPH.real[:m1]
-        Ylms.slm[l,:m1] = SPH.imag[:m1]
+    #-- blocks of points to sum
+    CHUNKSIZE = npts if (CHUNKSIZE is None) else np.int(CHUNKSIZE)
+    blocks = [slice(i,i+CHUNKSIZE) for i in range(0,npts,CHUNKSIZE)]
+    #-- sum the spherical harmonics of each block of points
+    def block_harmonics(b):
+        return legendre_summation(D[b], phi[b], theta[b], dfactor,
+            LMAX=LMAX, MMAX=MMAX)
+    if THREADS:
+        #-- sum blocks of points in a pool of threads
+        pool = multiprocessing.pool.ThreadPool(processes=THREADS)
+        output = pool.map(block_harmonics, blocks)
+        pool.close()
+        pool.join()
+    else:
+        output = map(block_harmonics, blocks)
+    #-- add the harmonics of each block to the output
+    for clm,slm in output:
+        Ylms.clm += clm
+        Ylms.slm += slm
     #-- return the output spherical harmonics object
     return Ylms
 
+#-- PURPOSE: sum spherical harmonics of points with a single recursion
+def legendre_summation(data, phi, theta, coeff, LMAX=60, MMAX=None):
+    """
+    Calculates the sum of spherical harmonics evaluated at coordinates
+        with the Holmes and Featherstone (2002) recursion relation
+
+    Arguments
+    ---------
+    data: data magnitude in grams
+    phi: longitude of points in radians
+    theta: colatitude of points in radians
+    coeff: degree-dependent factors for converting units
+
+    Keyword arguments
+    -----------------
+    LMAX: Upper bound of Spherical Harmonic Degrees
+    MMAX: Upper bound of Spherical Harmonic Orders
+
+    Returns
+    -------
+    clm: cosine spherical harmonic coefficients
+    slm: sine spherical harmonic coefficients
+    """
+    #-- upper bound of spherical harmonic orders (default == LMAX)
+    MMAX = np.copy(LMAX) if (MMAX is None) else MMAX
+    #-- x is cosine of colatitude and u is sine of colatitude
+    x = np.cos(theta)
+    u = np.sin(theta)
+    #-- scaling factor for high degree and order
+    scalef = 1.0e-280
+    #-- output spherical harmonics
+    clm = np.zeros((LMAX+1,MMAX+1))
+    slm = np.zeros((LMAX+1,MMAX+1))
+    #-- Legendre polynomials for each degree of an order (scaled by u**m)
+    p = np.zeros((LMAX+1,len(x)))
+    for m in range(0,MMAX+1):
+        if (m == 0):
+            #-- P(0,0) and rescale factor are not scaled
+            pmm = 1.0
+            rescalem = np.ones_like(x)
+        else:
+            #-- scaled sectorial P(m,m) with rescale factor of u**m
+            pmm = np.sqrt(2.0)*scalef if (m == 1) else pmm
+            pmm *= np.sqrt(2.0*m+1.0)/np.sqrt(2.0*m)
+            rescalem = rescalem*u/scalef if (m == 1) else rescalem*u
+        #-- Calculate P(m,m), P(m+1,m), and P(l,m)
+        p[m,:] = pmm
+        if (m < LMAX):
+            p[m+1,:] = x*np.sqrt(2.0*m+3.0)*pmm
+        for l in range(m+2,LMAX+1):
+            f1 = np.sqrt((2.0*l+1.0)*(2.0*l-1.0)/((l+m)*(l-m)))
+            f2 = np.sqrt((2.0*l+1.0)*(l-m-1.0)*(l+m-1.0)/
+                ((2.0*l-3.0)*(l+m)*(l-m)))
+            p[l,:] = x*f1*p[l-1,:] - f2*p[l-2,:]
+        #-- rescale Legendre polynomials and sum over all points
+        #-- with the data multiplied by Euler's of order m
+        Ylm = np.dot(p[m:,:]*rescalem, data*np.exp(1j*m*phi))
+        clm[m:,m] = coeff[m:LMAX+1]*Ylm.real
+        slm[m:,m] = coeff[m:LMAX+1]*Ylm.imag
+    return (clm, slm)
+
 #-- calculate spherical harmonics of degree l evaluated at (theta,phi)
 def spherical_harmonic_matrix(l,data,phi,theta,coeff):
     """
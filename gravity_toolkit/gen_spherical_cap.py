@@ -1,7 +1,7 @@
 #!/usr/bin/env python
 u"""
 gen_spherical_cap.py
-Written by Tyler Sutterley (07/2020)
+Written by Tyler Sutterley (03/2021)
 Calculates gravitational spherical harmonic coefficients for a spherical cap
 
 Spherical cap derivation from Longman (1962), Farrell (1972), Pollack (1973)
@@ -11,8 +11,13 @@ Creating a spherical cap with generating angle alpha is a 2 step process:
     1) obtain harmonics when cap is located at the north pole
     2) rotate the cap to an arbitrary latitude and longitude
 
+Harmonics for a set of spherical caps can be calculated in a single call
+    with gen_spherical_caps, which calculates the Legendre polynomials for
+    all cap centers at once and shares the cap coefficients of equal radii
+
 CALLING SEQUENCE:
     Ylms = gen_spherical_cap(data, lon, lat, LMAX=LMAX, RAD_CAP=RAD_CAP)
+    Ylms,area = gen_spherical_caps(data, lon, lat, LMAX=LMAX, RAD_CAP=RAD_CAP)
 
 INPUTS:
     data: data magnitude
@@ -24,6 +29,7 @@ OUTPUTS:
     slm: sine spherical harmonic coefficients (geodesy normalization)
     l: spherical harmonic degree to LMAX
     m: spherical harmonic order to MMAX
+    area: area of each spherical cap in cm^2 (gen_spherical_caps)
 
 OPTIONS:
     LMAX: Upper bound of Spherical Harmonic Degrees
@@ -44,6 +50,7 @@ PYTHON DEPENDENCIES:
 PROGRAM DEPENDENCIES:
     plm_holmes.py: Computes fully-normalized associated Legendre polynomials
     legendre_polynomials.py: Computes fully normalized Legendre polynomials
+    harmonic_rotation.py: rotates spherical harmonics using Wigner-d matrices
     units.py: class for converting spherical harmonic data to specific units
     harmonics.py: spherical harmonic data class for processing GRACE/GRACE-FO
         destripe_harmonics.py: calculates the decorrelation (destriping) filter
@@ -60,6 +67,9 @@ REFERENCES:
     T. Jacob et al., Journal of Geodesy, Vol. 86, Pages 337-358 (Nov. 2012)
 
 UPDATE HISTORY:
+    Updated 03/2021: added gen_spherical_caps for calculating harmonics of
+        a set of spherical caps as a harmonics object with a cap dimension
+        return the areas of the spherical caps separately from the harmonics
     Updated 07/2020: added function docstrings
     Updated 05/2020: vectorize calculation over degrees to improve compute time
     Updated 04/2020: reading load love numbers outside of this function
@@ -88,6 +98,7 @@ import gravity_toolkit.units
 import gravity_toolkit.harmonics
 from gravity_toolkit.plm_holmes import plm_holmes
 from gravity_toolkit.legendre_polynomials import legendre_polynomials
+from gravity_toolkit.harmonic_rotation import rotate_zonal
 
 def gen_spherical_cap(data, lon, lat, LMAX=60, MMAX=None,
     AREA=0, RAD_CAP=0, RAD_KM=0, UNITS=1, PLM=None, LOVE=None):
@@ -258,3 +269,132 @@ def gen_spherical_cap(data, lon, lat, LMAX=60, MMAX=None,
 
     #-- return the output spherical harmonics object
     return Ylms
+
+#-- PURPOSE: calculate the spherical harmonics of a set of spherical caps
+def gen_spherical_caps(data, lon, lat, LMAX=60, MMAX=None,
+    AREA=0, RAD_CAP=0, RAD_KM=0, UNITS=1, PLM=None, LOVE=None):
+    """
+    Calculates spherical harmonic coefficients for a set of spherical caps
+
+    Arguments
+    ---------
+    data: data magnitude of each spherical cap
+    lon: longitude of each spherical cap center
+    lat: latitude of each spherical cap center
+
+    Keyword arguments
+    -----------------
+    LMAX: Upper bound of Spherical Harmonic Degrees
+    MMAX: Upper bound of Spherical Harmonic Orders
+    AREA: spherical cap area in cm^2
+    RAD_CAP: spherical cap radius in degrees
+    RAD_KM: spherical cap radius in kilometers
+    UNITS: input data units
+        1: cm of water thickness (default)
+        2: gigatonnes of mass
+        3: kg/m^2
+    PLM: input Legendre polynomials of each cap center
+    LOVE: input load Love numbers up to degree LMAX (hl,kl,ll)
+
+    Returns
+    -------
+    Ylms: harmonics object with a cap dimension
+        clm: cosine spherical harmonic coefficients for each cap
+        slm: sine spherical harmonic coefficients for each cap
+        l: spherical harmonic degree to LMAX
+        m: spherical harmonic order to MMAX
+    area: area of each spherical cap in cm^2
+    """
+
+    #-- upper bound of spherical harmonic orders (default = LMAX)
+    if MMAX is None:
+        MMAX = np.copy(LMAX)
+
+    #-- Earth Parameters
+    factors = gravity_toolkit.units(lmax=LMAX)
+    rho_e = factors.rho_e#-- Average Density of the Earth [g/cm^3]
+    rad_e = factors.rad_e#-- Average Radius of the Earth [cm]
+
+    #-- Converting input area into an equivalent spherical cap radius
+    #-- Following Jacob et al. (2012) Equation 4 and 5
+    #-- alpha is the vertical semi-angle subtending a cone at the
+    #-- center of the earth
+    if np.any(RAD_CAP != 0):
+        #-- if given spherical cap radius in degrees
+        alpha = np.atleast_1d(RAD_CAP)*np.pi/180.0
+    elif np.any(AREA != 0):
+        #-- if given spherical cap area in cm^2
+        alpha = np.sqrt(np.atleast_1d(AREA)/np.pi)/rad_e
+    elif np.any(RAD_KM != 0):
+        #-- if given spherical cap radius in kilometers
+        alpha = (1e5*np.atleast_1d(RAD_KM))/rad_e
+    else:
+        raise ValueError('Input RAD_CAP, AREA or RAD_KM of spherical cap')
+
+    #-- broadcast cap magnitudes, centers and radii to the number of caps
+    data,lon,lat,alpha = np.broadcast_arrays(np.atleast_1d(data),
+        np.atleast_1d(lon),np.atleast_1d(lat),alpha)
+    n_cap = len(alpha)
+    #-- area of each spherical cap in cm^2
+    area = np.pi*(alpha*rad_e)**2
+
+    #-- Calculate factor to convert from input units into cmH2O equivalent
+    if (UNITS == 1):
+        #-- Input data is in cm water equivalent (cmH2O)
+        unit_conv = np.ones((n_cap))
+    elif (UNITS == 2):
+        #-- Input data is in gigatonnes (Gt)
+        #-- 1 Gt = 1 Pg = 1.e15 g
+        unit_conv = 1.e15/area
+    elif (UNITS == 3):
+        #-- Input data is in kg/m^2
+        unit_conv = 0.1*np.ones((n_cap))
+    else:
+        raise ValueError('UNITS (1: cmH2O, 2: Gt, 3: kg/m^2)')
+
+    #-- Coefficient for calculating Stokes coefficients for a spherical cap
+    #-- From Jacob et al (2012), Farrell (1972) and Longman (1962)
+    coeff = 3.0/(rad_e*rho_e)
+
+    #-- extract arrays of kl, hl, and ll Love Numbers
+    hl,kl,ll = LOVE
+
+    #-- calculate SH degree dependent factors to convert from coefficients
+    #-- of mass into normalized geoid coefficients
+    l = np.arange(LMAX+1)
+    dfactor = (1.0 + kl[l])/((1.0 + 2.0*l)**2)
+
+    #-- Calculating plms of the spherical caps (F(alpha) from Jacob 2011)
+    #-- pl_alpha depends only on the size of the cap so is calculated
+    #-- once for each unique cap radius
+    alpha_unique,alpha_index = np.unique(alpha, return_inverse=True)
+    pl_unique = np.zeros((LMAX+1,len(alpha_unique)))
+    #-- l=0 is a special case (P(-1) = 1, P(1) = cos(alpha))
+    pl_unique[0,:] = (1.0 - np.cos(alpha_unique))/2.0
+    #-- for all other degrees: calculate the legendre polynomials up to LMAX+1
+    pl_matrix,_ = legendre_polynomials(LMAX+1,np.cos(alpha_unique))
+    #-- unnormalizing Legendre polynomials of degrees l-1 and l+1
+    l = np.arange(1,LMAX+1)
+    pl_lower = pl_matrix[l-1,:]/np.sqrt(2.0*l[:,None]-1.0)
+    pl_upper = pl_matrix[l+1,:]/np.sqrt(2.0*l[:,None]+3.0)
+    pl_unique[l,:] = (pl_lower - pl_upper)/2.0
+    #-- expand to each spherical cap
+    pl_alpha = pl_unique[:,alpha_index]
+
+    #-- zonal harmonics of each spherical cap centered at the north pole
+    #-- multiplied by coefficients to convert to geoid coefficients
+    l = np.arange(LMAX+1)
+    Cl0 = coeff*dfactor[:,None]*np.sqrt(2.0*l[:,None]+1.0)*pl_alpha
+    #-- rotate caps to be centered at lat/lon and
+    #-- multiply by the data converted to cmH2O
+    #-- using the Legendre polynomials for all centers
+    rot = rotate_zonal(unit_conv*data*Cl0, lon, lat, LMAX=LMAX, MMAX=MMAX,
+        PLM=PLM)
+
+    #-- Initializing output spherical harmonics with a cap dimension
+    Ylms = gravity_toolkit.harmonics(lmax=LMAX, mmax=MMAX)
+    Ylms.clm = rot['clm']
+    Ylms.slm = rot['slm']
+    Ylms.update_dimensions()
+    #-- return the output spherical harmonics object and area of each cap
+    return (Ylms, area)
@@ -1,7 +1,7 @@
 #!/usr/bin/env python
 u"""
 grace_date.py
-Written by Tyler Sutterley (12/2020)
+Written by Tyler Sutterley (03/2021)
 
 Reads index file from podaac_grace_sync.py or gfz_isdc_grace_ftp.py
 Parses dates of each GRACE/GRACE-FO file and assigns the month number
@@ -20,6 +20,7 @@ OPTIONS:
         GAD is the GRACE ocean bottom pressure product
         GSM is corrected monthly GRACE/GRACE-FO static field product
     OUTPUT: create index of dates for GRACE/GRACE-FO data
+    UPDATE: only calculate dates for files not in the month table
     MODE: permissions mode of output files
 
 OUTPUTS:
@@ -38,6 +39,9 @@ PROGRAM DEPENDENCIES:
     time.py: utilities for calculating time operations
 
 UPDATE HISTORY:
+    Updated 03/2021: calculate dates for all files as arrays
+        keep a month table of the files and dates from previous runs
+        added option to only calculate dates for files new to the index
     Updated 12/2020: using utilities from time module
     Updated 10/2020: use argparse to set command line parameters
     Updated 07/2020: added function docstrings
@@ -86,7 +90,8 @@ import argparse
 import numpy as np
 import gravity_toolkit.time
 
-def grace_date(base_dir, PROC='', DREL='', DSET='', OUTPUT=True, MODE=0o775):
+def grace_date(base_dir, PROC='', DREL='', DSET='', OUTPUT=True, UPDATE=False,
+    MODE=0o775):
     """
     Reads index file from podaac_grace_sync.py or gfz_isdc_grace_ftp.py
     Parses dates of each GRACE/GRACE-FO file and assigns the month number
@@ -111,6 +116,7 @@ def grace_date(base_dir, PROC='', DREL='', DSET='', OUTPUT=True, MODE=0o775):
         GAD: ocean bottom pressure product
         GSM: corrected monthly static gravity field product
     OUTPUT: create index file of dates for GRACE/GRACE-FO data
+    UPDATE: only calculate dates for new files using the month table
     MODE: Permission mode of directories and files
 
     Returns
@@ -123,19 +129,83 @@ def grace_date(base_dir, PROC='', DREL='', DSET='', OUTPUT=True, MODE=0o775):
     #-- input index file containing GRACE data filenames
     with open(os.path.join(grace_dir, 'index.txt'),'r') as f:
         input_files = f.read().splitlines()
+    #-- output GRACE date ascii file and month table
+    date_file = os.path.join(grace_dir,'{0}_{1}_DATES.txt'.format(PROC, DREL))
+    table_file = os.path.join(grace_dir,'{0}_{1}_MONTHS.txt'.format(PROC, DREL))
+
+    #-- read month table from a previous run if updating
+    if UPDATE and os.access(table_file, os.F_OK):
+        previous = read_month_table(table_file)
+    else:
+        previous = read_month_table(None)
+    #-- number of files in the month table
+    n_prev = len(previous['file'])
+    #-- the month table must match the start of the current index
+    #-- otherwise the dates for all files are recalculated
+    if (previous['file'] != input_files[:n_prev]):
+        previous = read_month_table(None)
+        n_prev = 0
+
+    #-- calculate dates for each file not in the month table
+    current = calculate_dates(input_files[n_prev:], PROC=PROC, DREL=DREL,
+        previous=previous)
+    #-- combine with the dates from the month table
+    dates = {}
+    for key,val in previous.items():
+        dates[key] = val + current[key] if (key == 'file') else \
+            np.concatenate((val, current[key]))
+
+    #-- Output GRACE date ascii file and month table
+    if OUTPUT:
+        #-- append new files if the previous dates are already in the files
+        #-- else rewrite the date file and month table for all files
+        if (n_prev > 0) and os.access(date_file, os.F_OK):
+            write_dates(date_file, current, mode='a')
+            write_month_table(table_file, current, mode='a')
+        else:
+            write_dates(date_file, dates, mode='w')
+            write_month_table(table_file, dates, mode='w')
+        #-- set permissions level of output date file and month table
+        os.chmod(date_file, MODE)
+        os.chmod(table_file, MODE)
 
-    #--  number of lines in input_files
-    n_files = len(input_files)
+    #-- create python dictionary mapping input file names with GRACE months
+    grace_files = {}
+    for m,infile in zip(dates['month'], dates['file']):
+        grace_files[m] = os.path.join(grace_dir,infile)
+    #-- return the python dictionary that maps GRACE months with GRACE files
+    return grace_files
 
-    #-- define date variables
-    start_yr = np.zeros((n_files))#-- year start date
-    end_yr = np.zeros((n_files))#-- year end date
-    start_day = np.zeros((n_files))#-- day number start date
-    end_day = np.zeros((n_files))#-- day number end date
-    mid_day = np.zeros((n_files))#-- mid-month day
-    tot_days = np.zeros((n_files))#-- number of days since Jan 2002
-    tdec = np.zeros((n_files))#-- tdec is the date in decimal form
-    mon = np.zeros((n_files,),dtype=np.int)#-- GRACE/GRACE-FO month number
+#-- PURPOSE: calculate the dates and months of GRACE/GRACE-FO files
+def calculate_dates(input_files, PROC='', DREL='', previous=None):
+    """
+    Calculates the dates and months of GRACE/GRACE-FO files
+
+    Arguments
+    ---------
+    input_files: list of GRACE/GRACE-FO filenames
+
+    Keyword arguments
+    -----------------
+    PROC: GRACE data processing center
+    DREL: GRACE/GRACE-FO data release
+    previous: dates of the files preceding the input files in the index
+
+    Returns
+    -------
+    file: GRACE/GRACE-FO filenames
+    time: mid-month date in year-decimal
+    month: GRACE/GRACE-FO month number
+    start_yr: year of start date
+    start_day: day number of start date
+    end_yr: year of end date
+    end_day: day number of end date
+    tot_days: number of days since Jan 2002
+    """
+    #-- dates of preceding files
+    previous = read_month_table(None) if (previous is None) else previous
+    #--  number of input files
+    n_files = len(input_files)
 
     #-- compile numerical expression operator for parameters from files
     #-- will work with previous releases and releases for GRACE-FO
@@ -148,95 +218,158 @@ def grace_date(base_dir, PROC='', DREL='', DSET='', OUTPUT=True, MODE=0o775):
        r'(\.gz|\.gfc)?$').format(r'UTCSR|EIGEN|GFZOP|JPLEM|JPLMSC')
     rx = re.compile(regex_pattern, re.VERBOSE)
 
-    #-- Output GRACE date ascii file
-    if OUTPUT:
-        date_file = '{0}_{1}_DATES.txt'.format(PROC, DREL)
-        fid = open(os.path.join(grace_dir,date_file), 'w')
-        #-- date file header information
-        args = ('Mid-date','Month','Start_Day','End_Day','Total_Days')
-        print('{0} {1:>10} {2:>11} {3:>10} {4:>13}'.format(*args),file=fid)
+    #-- extract start and end dates from each input filename
+    start_date = np.zeros((n_files),dtype='U7')
+    end_date = np.zeros((n_files),dtype='U7')
+    for t, infile in enumerate(input_files):
+        PFX,start_date[t],end_date[t],AUX,PRC,F1,DRL,F2,SFX = \
+            rx.findall(infile).pop()
+    #-- find start date, end date and number of days
+    start_yr = np.array([d[:4] for d in start_date],dtype=np.float)
+    end_yr = np.array([d[:4] for d in end_date],dtype=np.float)
+    start_day = np.array([d[4:] for d in start_date],dtype=np.float)
+    end_day = np.array([d[4:] for d in end_date],dtype=np.float)
+
+    #-- number of days in the starting year for leap and standard years
+    dpy = gravity_toolkit.time.calendar_days(start_yr).sum(axis=-1)
+    #-- end date taking into account measurements taken on different years
+    end_cyclic = (end_yr-start_yr)*dpy + end_day
+    #-- calculate mid-month value
+    mid_day = (start_day + end_cyclic)/2.0
+
+    #-- calculate Modified Julian Day from start_yr and mid_day
+    MJD = gravity_toolkit.time.convert_calendar_dates(start_yr,
+        1.0,mid_day,epoch=(1858,11,17,0,0,0))
+    #-- convert from Modified Julian Days to calendar dates
+    cal_date = gravity_toolkit.time.convert_julian(MJD+2400000.5)
+
+    #-- Calculating the mid-month date in decimal form
+    tdec = start_yr + mid_day/dpy
+
+    #-- Calculation of total days since start of campaign
+    #-- add all days from prior years to count
+    count = gravity_toolkit.time.convert_calendar_dates(
+        np.maximum(start_yr,2002.0),1.0,1.0,epoch=(2002,1,1,0,0,0))
+    #-- calculating the total number of days since 2002
+    tot_days = count + (start_day + end_cyclic)/2.0
+
+    #-- Calculates the month number (or 10-day number for CNES RL01,RL02)
+    if ((PROC == 'CNES') and (DREL in ('RL01','RL02'))):
+        #-- total days of the first file in the index
+        tot_days0 = np.concatenate((previous['tot_days'], tot_days))[0]
+        mon = np.round(1.0+(tot_days-tot_days0)/10.0).astype(np.int)
+    else:
+        #-- calculate the GRACE/GRACE-FO month (Apr02 == 004)
+        #-- https://grace.jpl.nasa.gov/data/grace-months/
+        #-- Notes on special months (e.g. 119, 120) below
+        mon = np.array(12*(cal_date['year']-2002) + cal_date['month'],
+            dtype=np.int)
+
+        #-- The 'Special Months' (Nov 2011, Dec 2011 and April 2012) with
+        #-- Accelerometer shutoffs make this relation between month number
+        #-- and date more complicated as days from other months are used
+        #-- For CSR and GFZ: Nov11 (month 119) is centered in Oct11 (118)
+        #-- For JPL: Dec 2011 (month 120) is centered in Jan12 (121)
+        #-- For all: May15 (month 161) is centered in Apr15 (160)
+        #-- month of the file preceding the first input file
+        prev = previous['month'][-1] if len(previous['month']) else 0
+        for t in range(n_files):
+            if PROC in ('CSR','GFZ') and (mon[t] == prev) and (prev == 118):
+                mon[t] = prev + 1
+            elif (mon[t] == prev) and (prev == 160):
+                mon[t] = prev + 1
+            elif PROC in ('JPL') and (prev == 119):
+                mon[t] = prev + 1
+            prev = mon[t]
+
+    #-- return the dates for each file
+    return {'file':list(input_files), 'time':tdec, 'month':mon,
+        'start_yr':start_yr, 'start_day':start_day, 'end_yr':end_yr,
+        'end_day':end_day, 'tot_days':tot_days}
+
+#-- PURPOSE: read the month table of GRACE/GRACE-FO files
+def read_month_table(table_file):
+    """
+    Reads the month table of GRACE/GRACE-FO files from a previous run
 
-    #-- create python dictionary mapping input file names with GRACE months
-    grace_files = {}
+    Arguments
+    ---------
+    table_file: month table file (None for an empty table)
 
-    #-- for each data file
-    for t, infile in enumerate(input_files):
-        #-- extract parameters from input filename
-        PFX,start_date,end_date,AUX,PRC,F1,DRL,F2,SFX = rx.findall(infile).pop()
-        #-- find start date, end date and number of days
-        start_yr[t] = np.float(start_date[:4])
-        end_yr[t] = np.float(end_date[:4])
-        start_day[t] = np.float(start_date[4:])
-        end_day[t] = np.float(end_date[4:])
-
-        #-- number of days in the starting year for leap and standard years
-        dpy = gravity_toolkit.time.calendar_days(start_yr[t]).sum()
-        #-- end date taking into account measurements taken on different years
-        end_cyclic = (end_yr[t]-start_yr[t])*dpy + end_day[t]
-        #-- calculate mid-month value
-        mid_day[t] = np.mean([start_day[t], end_cyclic])
-
-        #-- calculate Modified Julian Day from start_yr and mid_day
-        MJD = gravity_toolkit.time.convert_calendar_dates(start_yr[t],
-            1.0,mid_day[t],epoch=(1858,11,17,0,0,0))
-        #-- convert from Modified Julian Days to calendar dates
-        cal_date = gravity_toolkit.time.convert_julian(MJD+2400000.5)
-
-        #-- Calculating the mid-month date in decimal form
-        tdec[t] = start_yr[t] + mid_day[t]/dpy
-
-        #-- Calculation of total days since start of campaign
-        count = 0
-        n_yrs = np.int(start_yr[t]-2002)
-        #-- for each of the GRACE years up to the file year
-        for iyr in range(n_yrs):
-            #-- year
-            year = 2002 + iyr
-            #-- add all days from prior years to count
-            #-- number of days in year i (if leap year or standard year)
-            count += gravity_toolkit.time.calendar_days(year).sum()
-
-        #-- calculating the total number of days since 2002
-        tot_days[t] = np.mean([count+start_day[t], count+end_cyclic])
-
-        #-- Calculates the month number (or 10-day number for CNES RL01,RL02)
-        if ((PROC == 'CNES') and (DREL in ('RL01','RL02'))):
-            mon[t] = np.round(1.0+(tot_days[t]-tot_days[0])/10.0)
-        else:
-            #-- calculate the GRACE/GRACE-FO month (Apr02 == 004)
-            #-- https://grace.jpl.nasa.gov/data/grace-months/
-            #-- Notes on special months (e.g. 119, 120) below
-            mon[t] = 12*(cal_date['year']-2002) + cal_date['month']
-
-            #-- The 'Special Months' (Nov 2011, Dec 2011 and April 2012) with
-            #-- Accelerometer shutoffs make this relation between month number
-            #-- and date more complicated as days from other months are used
-            #-- For CSR and GFZ: Nov11 (month 119) is centered in Oct11 (118)
-            #-- For JPL: Dec 2011 (month 120) is centered in Jan12 (121)
-            #-- For all: May15 (month 161) is centered in Apr15 (160)
-            if PROC in ('CSR','GFZ') and (mon[t] == mon[t-1]) and (mon[t-1] == 118):
-                mon[t] = mon[t-1] + 1
-            elif (mon[t] == mon[t-1]) and (mon[t-1] == 160):
-                mon[t] = mon[t-1] + 1
-            elif PROC in ('JPL') and (mon[t-1] == 119):
-                mon[t] = mon[t-1] + 1
-
-        #-- add file to python dictionary mapped to GRACE/GRACE-FO month
-        grace_files[mon[t]] = os.path.join(grace_dir,infile)
-        #-- print to GRACE DATES ascii file (NOTE: tot_days will be rounded up)
-        if OUTPUT:
-            print(('{0:13.8f} {1:03d} {2:8.0f} {3:03.0f} {4:8.0f} {5:03.0f} '
-                '{6:8.0f}').format(tdec[t],mon[t],start_yr[t],start_day[t],
-                end_yr[t],end_day[t],tot_days[t]), file=fid)
+    Returns
+    -------
+    dictionary of filenames, dates and months
+    """
+    #-- columns of the month table following the filename
+    keys = ['time','month','start_yr','start_day','end_yr','end_day','tot_days']
+    table = {'file':[]}
+    table.update({key:np.array([]) for key in keys})
+    table['month'] = np.array([],dtype=np.int)
+    #-- return empty table if no file
+    if table_file is None:
+        return table
+    #-- read the month table skipping the header row
+    with open(table_file,'r') as f:
+        file_contents = f.read().splitlines()[1:]
+    #-- parse the filename and date columns
+    columns = [line.split() for line in file_contents if line.strip()]
+    table['file'] = [c[0] for c in columns]
+    data = np.array([c[1:] for c in columns],dtype=np.float).reshape(-1,7)
+    for i,key in enumerate(keys):
+        table[key] = data[:,i]
+    table['month'] = table['month'].astype(np.int)
+    return table
+
+#-- PURPOSE: write the month table of GRACE/GRACE-FO files
+def write_month_table(table_file, dates, mode='w'):
+    """
+    Writes the month table of GRACE/GRACE-FO files
 
-    #-- close date file
-    #-- set permissions level of output date file
-    if OUTPUT:
-        fid.close()
-        os.chmod(os.path.join(grace_dir, date_file), MODE)
+    Arguments
+    ---------
+    table_file: month table file
+    dates: dictionary of filenames, dates and months
 
-    #-- return the python dictionary that maps GRACE months with GRACE files
-    return grace_files
+    Keyword arguments
+    -----------------
+    mode: write (w) a new table or append (a) to an existing table
+    """
+    with open(table_file, mode) as fid:
+        #-- month table header information
+        if (mode == 'w'):
+            args = ('File','Mid-date','Month','Start_Day','End_Day','Total_Days')
+            print('{0} {1} {2} {3} {4} {5}'.format(*args),file=fid)
+        for t,infile in enumerate(dates['file']):
+            print(('{0} {1:.12f} {2:03d} {3:.0f} {4:03.0f} {5:.0f} {6:03.0f} '
+                '{7:.1f}').format(infile,dates['time'][t],dates['month'][t],
+                dates['start_yr'][t],dates['start_day'][t],dates['end_yr'][t],
+                dates['end_day'][t],dates['tot_days'][t]), file=fid)
+
+#-- PURPOSE: write the GRACE/GRACE-FO dates file
+def write_dates(date_file, dates, mode='w'):
+    """
+    Writes the index of dates for GRACE/GRACE-FO files
+
+    Arguments
+    ---------
+    date_file: GRACE/GRACE-FO dates file
+    dates: dictionary of filenames, dates and months
+
+    Keyword arguments
+    -----------------
+    mode: write (w) a new file or append (a) to an existing file
+    """
+    with open(date_file, mode) as fid:
+        #-- date file header information
+        if (mode == 'w'):
+            args = ('Mid-date','Month','Start_Day','End_Day','Total_Days')
+            print('{0} {1:>10} {2:>11} {3:>10} {4:>13}'.format(*args),file=fid)
+        #-- print to GRACE DATES ascii file (NOTE: tot_days will be rounded up)
+        for t in range(len(dates['file'])):
+            print(('{0:13.8f} {1:03d} {2:8.0f} {3:03.0f} {4:8.0f} {5:03.0f} '
+                '{6:8.0f}').format(dates['time'][t],dates['month'][t],
+                dates['start_yr'][t],dates['start_day'][t],dates['end_yr'][t],
+                dates['end_day'][t],dates['tot_days'][t]), file=fid)
 
 #-- PURPOSE: program that calls grace_date() with set parameters
 def main():
@@ -274,6 +407,10 @@ def main():
     parser.add_argument('--output','-O',
         default=False, action='store_true',
         help='Overwrite existing data')
+    #-- only calculate dates for new files in the index
+    parser.add_argument('--update','-U',
+        default=False, action='store_true',
+        help='Only calculate dates for new files in the index')
     #-- permissions mode of the local directories and files (number in octal)
     parser.add_argument('--mode','-M',
         type=lambda x: int(x,base=8), default=0o775,
@@ -285,7 +422,7 @@ def main():
         for rl in args.release:
             for ds in args.product:
                 grace_date(args.directory, PROC=pr, DREL=rl, DSET=ds,
-                    OUTPUT=args.output, MODE=args.mode)
+                    OUTPUT=args.output, UPDATE=args.update, MODE=args.mode)
 
 #-- run main program
 if __name__ == '__main__':
@@ -1,7 +1,7 @@
 #!/usr/bin/env python
 u"""
 grace_input_months.py
-Written by Tyler Sutterley (12/2020)
+Written by Tyler Sutterley (03/2021)
 
 Reads GRACE/GRACE-FO files for a specified spherical harmonic degree and order
     and for a specified date range
@@ -71,8 +71,14 @@ PROGRAM DEPENDENCIES:
     read_SLR_geocenter.py: reads degree 1 files from Satellite Laser Ranging
     read_GRACE_geocenter.py: reads degree 1 files from Sutterley et al. (2019)
     read_GRACE_harmonics.py: reads an input GRACE data file and calculates date
+    harmonics.py: spherical harmonic data class for processing GRACE/GRACE-FO
+    sparse_harmonics.py: sparse data class for low-degree spherical harmonics
 
 UPDATE HISTORY:
+    Updated 03/2021: replace low-degree coefficients using sparse harmonics
+        match months using lookup tables built once for each dataset
+        report all unmatched months of each dataset in a single error
+        gather atmospheric jump corrections using a month lookup table
     Updated 12/2020: updated SLR geocenter for new solutions from Minkang Cheng
     Updated 11/2020: set regress_model RELATIVE option to 2003.3 to match others
     Updated 08/2020: flake8 compatible regular expression strings
@@ -122,6 +128,8 @@ from gravity_toolkit.read_tellus_geocenter import read_tellus_geocenter
 from gravity_toolkit.read_SLR_geocenter import aod_corrected_SLR_geocenter
 from read_GRACE_geocenter.read_GRACE_geocenter import read_GRACE_geocenter
 from gravity_toolkit.read_GRACE_harmonics import read_GRACE_harmonics
+from gravity_toolkit.harmonics import harmonics
+from gravity_toolkit.sparse_harmonics import sparse_harmonics
 
 def grace_input_months(base_dir, PROC, DREL, DSET, LMAX,
     start_mon, end_mon, missing, SLR_C20, DEG1, MMAX=None, SLR_C30='',
@@ -283,6 +291,50 @@ def grace_input_months(base_dir, PROC, DREL, DSET, LMAX,
     months = sorted(set(np.arange(start_mon,end_mon+1)) - set(missing))
     #-- number of months to consider in analysis
     n_cons = len(months)
+    months = np.array(months, dtype=np.int)
+
+    #-- sparse low degree harmonics to replace GRACE/GRACE-FO coefficients
+    #-- months are matched using lookup tables built once for each dataset
+    replacement = sparse_harmonics()
+    #-- unmatched months for each replacement dataset
+    unmatched = {}
+
+    #-- Replace C20 with SLR coefficients
+    if SLR_C20 in ('CSR','GSFC'):
+        C20_Ylms = sparse_harmonics().add_series(2, 0,
+            C20_input['month'], C20_input['data'])
+        #-- verify that there are replacement C20 months for specified range
+        unmatched['C20'] = C20_Ylms.unmatched(months)
+        replacement.merge(C20_Ylms)
+
+    #-- Replace C30 with SLR coefficients for single-accelerometer months
+    if SLR_C30 in ('CSR','GSFC','LARES'):
+        ii, = np.nonzero(C30_input['month'] > 176)
+        C30_Ylms = sparse_harmonics().add_series(3, 0,
+            C30_input['month'][ii], C30_input['data'][ii])
+        #-- verify that there are replacement C30 months for specified range
+        unmatched['C30'] = C30_Ylms.unmatched(months[months > 176])
+        replacement.merge(C30_Ylms)
+
+    #-- Use Degree 1 coefficients
+    #-- Tellus: Tellus Degree 1 (PO.DAAC following Sun et al., 2016)
+    #-- SLR: CSR Satellite Laser Ranging (SLR) Degree 1 - GRACE AOD
+    #-- SLF: OMCT/MPIOM coefficients with Sea Level Fingerprint land-water mass
+    if DEG1 in ('Tellus','SLR','SLF'):
+        DEG1_Ylms = sparse_harmonics().from_geocenter(DEG1_input)
+        #-- check that all months are available for a given geocenter
+        #-- if not least-squares modeling the missing months
+        if not MODEL_DEG1:
+            unmatched['Geocenter'] = DEG1_Ylms.unmatched(months)
+
+    #-- raise a single error listing every unmatched month of each dataset
+    if any(unmatched.values()):
+        error_message = []
+        for key,val in unmatched.items():
+            if val:
+                gm = ','.join('{0:03d}'.format(gm) for gm in val)
+                error_message.append('No Matching {0} Months ({1})'.format(key,gm))
+        raise IOError('\n'.join(error_message))
 
     #-- Initializing input data matrices
     grace_clm = np.zeros((LMAX+1,MMAX+1,n_cons))
@@ -306,70 +358,32 @@ def grace_input_months(base_dir, PROC, DREL, DSET, LMAX,
         tdec[i] = Ylms['time']
         mon[i] = np.int(grace_month)
 
-    #-- Replace C20 with SLR coefficients
-    if SLR_C20 in ('CSR','GSFC'):
-        #-- verify that there are replacement C20 months for specified range
-        months_test = sorted(set(months) - set(C20_input['month']))
-        if months_test:
-            gm = ','.join('{0:03d}'.format(gm) for gm in months_test)
-            raise IOError('No Matching C20 Months ({0})'.format(gm))
-        #-- replace C20 with SLR coefficients
-        for i,grace_month in enumerate(months):
-            count = np.count_nonzero(C20_input['month'] == grace_month)
-            if (count != 0):
-                k, = np.nonzero(C20_input['month'] == grace_month)
-                grace_clm[2,0,i] = C20_input['data'][k]
-
-    #-- Replace C30 with SLR coefficients for single-accelerometer months
-    if SLR_C30 in ('CSR','GSFC','LARES'):
-        #-- verify that there are replacement C30 months for specified range
-        months_test = sorted(set(mon[mon > 176]) - set(C30_input['month']))
-        if months_test:
-            gm = ','.join('{0:03d}'.format(gm) for gm in months_test)
-            raise IOError('No Matching C30 Months ({0})'.format(gm))
-        #-- replace C30 with SLR coefficients
-        for i,grace_month in enumerate(months):
-            count = np.count_nonzero(C30_input['month'] == grace_month)
-            if (count != 0) and (grace_month > 176):
-                k, = np.nonzero(C30_input['month'] == grace_month)
-                grace_clm[3,0,i] = C30_input['data'][k]
-
-    #-- Use Degree 1 coefficients
-    #-- Tellus: Tellus Degree 1 (PO.DAAC following Sun et al., 2016)
-    #-- SLR: CSR Satellite Laser Ranging (SLR) Degree 1 - GRACE AOD
-    #-- SLF: OMCT/MPIOM coefficients with Sea Level Fingerprint land-water mass
+    #-- least-squares model the degree 1 coefficients for missing months
+    if DEG1 in ('Tellus','SLR','SLF') and MODEL_DEG1:
+        #-- fitting annual, semi-annual, linear and quadratic terms
+        C10_model = regress_model(DEG1_input['time'], DEG1_input['C10'],
+            tdec, ORDER=2, CYCLES=[0.5,1.0], RELATIVE=2003.3)
+        C11_model = regress_model(DEG1_input['time'], DEG1_input['C11'],
+            tdec, ORDER=2, CYCLES=[0.5,1.0], RELATIVE=2003.3)
+        S11_model = regress_model(DEG1_input['time'], DEG1_input['S11'],
+            tdec, ORDER=2, CYCLES=[0.5,1.0], RELATIVE=2003.3)
+        #-- using least-squares modeled coefficients for missing months
+        ii, = np.nonzero(np.isin(mon, DEG1_Ylms.unmatched(mon)))
+        DEG1_Ylms.from_geocenter(dict(
+            month=np.concatenate((DEG1_input['month'],mon[ii])),
+            C10=np.concatenate((DEG1_input['C10'],C10_model[ii])),
+            C11=np.concatenate((DEG1_input['C11'],C11_model[ii])),
+            S11=np.concatenate((DEG1_input['S11'],S11_model[ii]))))
+    #-- replace degree 1 with coefficients from data file
     if DEG1 in ('Tellus','SLR','SLF'):
-        #-- check if modeling degree 1 or if all months are available
-        if MODEL_DEG1:
-            #-- least-squares modeling the degree 1 coefficients
-            #-- fitting annual, semi-annual, linear and quadratic terms
-            C10_model = regress_model(DEG1_input['time'], DEG1_input['C10'],
-                tdec, ORDER=2, CYCLES=[0.5,1.0], RELATIVE=2003.3)
-            C11_model = regress_model(DEG1_input['time'], DEG1_input['C11'],
-                tdec, ORDER=2, CYCLES=[0.5,1.0], RELATIVE=2003.3)
-            S11_model = regress_model(DEG1_input['time'], DEG1_input['S11'],
-                tdec, ORDER=2, CYCLES=[0.5,1.0], RELATIVE=2003.3)
-        else:
-            #-- check that all months are available for a given geocenter
-            months_test = sorted(set(months) - set(DEG1_input['month']))
-            if months_test:
-                gm = ','.join('{0:03d}'.format(gm) for gm in months_test)
-                raise IOError('No Matching Geocenter Months ({0})'.format(gm))
-        #-- for each considered date
-        for i,grace_month in enumerate(months):
-            k, = np.nonzero(DEG1_input['month'] == grace_month)
-            count = np.count_nonzero(DEG1_input['month'] == grace_month)
-            #-- Degree 1 is missing for particular month
-            if (count == 0) and MODEL_DEG1:
-                #-- using least-squares modeled coefficients from
-                #-- lsq_model_degree_one.py
-                grace_clm[1,0,i] = C10_model[i]
-                grace_clm[1,1,i] = C11_model[i]
-                grace_slm[1,1,i] = S11_model[i]
-            else:#-- using coefficients from data file
-                grace_clm[1,0,i] = DEG1_input['C10'][k]
-                grace_clm[1,1,i] = DEG1_input['C11'][k]
-                grace_slm[1,1,i] = DEG1_input['S11'][k]
+        replacement.merge(DEG1_Ylms)
+
+    #-- replace low degree harmonics for matching months
+    #-- without expanding the replacement coefficients to full size
+    GRACE_Ylms = harmonics(lmax=LMAX, mmax=MMAX)
+    GRACE_Ylms.clm,GRACE_Ylms.slm = (grace_clm,grace_slm)
+    GRACE_Ylms.time,GRACE_Ylms.month = (tdec,mon)
+    replacement.replace(GRACE_Ylms.update_dimensions())
 
     #-- read and add/remove the GAE and GAF atmospheric correction coefficients
     if ATM:
@@ -377,16 +391,12 @@ def grace_input_months(base_dir, PROC, DREL, DSET, LMAX,
         atm_corr = read_ecmwf_corrections(base_dir,LMAX,months,MMAX=MMAX)
         #-- Removing GAE/GAF/GAG from RL05 GSM Products
         if (DSET == 'GSM'):
-            for m in range(0,MMAX+1):#-- MMAX+1 to include l
-                for l in range(m,LMAX+1):#-- LMAX+1 to include LMAX
-                    grace_clm[l,m,:] -= atm_corr['clm'][l,m,:]
-                    grace_slm[l,m,:] -= atm_corr['slm'][l,m,:]
+            grace_clm -= atm_corr['clm']
+            grace_slm -= atm_corr['slm']
         #-- Adding GAE/GAF/GAG to RL05 Atmospheric Products (GAA,GAC)
         elif DSET in ('GAC','GAA'):
-            for m in range(0,MMAX+1):#-- MMAX+1 to include l
-                for l in range(m,LMAX+1):#-- LMAX+1 to include LMAX
-                    grace_clm[l,m,:] += atm_corr['clm'][l,m,:]
-                    grace_slm[l,m,:] += atm_corr['slm'][l,m,:]
+            grace_clm += atm_corr['clm']
+            grace_slm += atm_corr['slm']
 
     return {'clm':grace_clm, 'slm':grace_slm, 'time':tdec, 'month':mon,
         'l':lout, 'm':mout, 'title':out_str, 'directory':grace_dir}
@@ -419,8 +429,6 @@ def read_ecmwf_corrections(base_dir, LMAX, months, MMAX=None):
     #-- atmospheric correction coefficients
     atm_corr_clm = {}
     atm_corr_slm = {}
-    #-- number of months to consider in analysis
-    n_cons = len(months)
     #-- set maximum order if not equal to maximum degree
     MMAX = LMAX if (MMAX is None) else MMAX
     #-- iterate through python dictionary keys (GAE, GAF, GAG)
@@ -446,21 +454,23 @@ def read_ecmwf_corrections(base_dir, LMAX, months, MMAX=None):
                     atm_corr_slm[key][l1,m1] = np.float(line_contents[4])
 
     #-- create output atmospheric corrections to be removed/added to data
+    #-- stack the corrections with zeros for months without a correction
+    stack_clm = np.zeros((LMAX+1,MMAX+1,4))
+    stack_slm = np.zeros((LMAX+1,MMAX+1,4))
+    for i,key in enumerate(['GAE','GAF','GAG']):
+        stack_clm[:,:,i+1] = atm_corr_clm[key][:,:]
+        stack_slm[:,:,i+1] = atm_corr_slm[key][:,:]
+    #-- lookup table of corrections for each month
+    #-- GAE: months 50 to 97, GAF: months 98 to 161, GAG: months 162+
+    months = np.array(months, dtype=np.int)
+    lookup = np.zeros((np.max(months, initial=161)+1), dtype=np.int)
+    lookup[50:98] = 1
+    lookup[98:162] = 2
+    lookup[162:] = 3
+    #-- gather corrections based on dates
     atm_corr = {}
-    atm_corr['clm'] = np.zeros((LMAX+1,LMAX+1,n_cons))
-    atm_corr['slm'] = np.zeros((LMAX+1,LMAX+1,n_cons))
-    #-- for each considered date
-    for i,grace_month in enumerate(months):
-        #-- remove correction based on dates
-        if (grace_month >= 50) & (grace_month <= 97):
-            atm_corr['clm'][:,:,i] = atm_corr_clm['GAE'][:,:]
-            atm_corr['slm'][:,:,i] = atm_corr_slm['GAE'][:,:]
-        elif (grace_month >= 98) & (grace_month <= 161):
-            atm_corr['clm'][:,:,i] = atm_corr_clm['GAF'][:,:]
-            atm_corr['slm'][:,:,i] = atm_corr_slm['GAF'][:,:]
-        elif (grace_month > 161):
-            atm_corr['clm'][:,:,i] = atm_corr_clm['GAG'][:,:]
-            atm_corr['slm'][:,:,i] = atm_corr_slm['GAG'][:,:]
+    atm_corr['clm'] = stack_clm[:,:,lookup[months]]
+    atm_corr['slm'] = stack_slm[:,:,lookup[months]]
 
     #-- return the atmospheric corrections
     return atm_corr
@@ -0,0 +1,216 @@
+#!/usr/bin/env python
+u"""
+harmonic_rotation.py
+Written by Tyler Sutterley (03/2021)
+Rotates spherical harmonic coefficients using Wigner-d matrices
+
+Wigner-d matrices are calculated for each degree from the eigenvectors of
+    the angular momentum operator Jy, which are computed once for each degree
+    and kept in a bounded cache of the most recently used degrees
+Rotations about the y-axis mix the orders of each degree, and rotated power
+    in orders above MMAX is not included in the output harmonics
+Zonal fields (such as spherical caps and disc loads centered at the north
+    pole) can be rotated to a set of centers using the m=0 column of the
+    Wigner-d matrices, which are the fully-normalized Legendre polynomials
+
+CALLING SEQUENCE:
+    Ylms = rotate_harmonics(clm, slm, ALPHA=lon, BETA=90.0-lat, LMAX=60)
+    Ylms = rotate_zonal(Cl0, lon, lat, LMAX=60)
+    dl = wigner_d(l, beta)
+
+INPUTS:
+    clm1: cosine spherical harmonic coefficients
+    slm1: sine spherical harmonic coefficients
+        clm1 and slm1 are matrices with the dimensions [l,m] or [l,m,n]
+
+OUTPUTS:
+    clm: rotated cosine spherical harmonic coefficients
+    slm: rotated sine spherical harmonic coefficients
+
+OPTIONS:
+    ALPHA: first Euler angle in degrees (rotation about the z-axis)
+    BETA: second Euler angle in degrees (rotation about the y-axis)
+    GAMMA: third Euler angle in degrees (rotation about the z-axis)
+    LMAX: Upper bound of Spherical Harmonic Degrees
+    MMAX: Upper bound of Spherical Harmonic Orders
+    PLM: input Legendre polynomials of each center for rotate_zonal
+
+PYTHON DEPENDENCIES:
+    numpy: Scientific Computing Tools For Python (https://numpy.org)
+    scipy: Scientific Tools for Python (https://docs.scipy.org/doc/)
+
+PROGRAM DEPENDENCIES:
+    plm_holmes.py: Computes fully-normalized associated Legendre polynomials
+
+REFERENCES:
+    D. M. Brink and G. R. Satchler, "Angular Momentum", 3rd edition,
+        Oxford University Press (1993)
+    X. M. Feng, P. Wang, W. Yang and G. R. Jin, "High-precision evaluation
+        of Wigner's d matrix by exact diagonalization", Physical Review E,
+        92(4), 043307 (2015). https://doi.org/10.1103/PhysRevE.92.043307
+
+UPDATE HISTORY:
+    Updated 03/2021: bounded cache of the eigendecompositions of Jy
+        warn if rotated power is truncated to orders below MMAX
+    Written 03/2021
+"""
+import warnings
+import functools
+import numpy as np
+import scipy.linalg
+from gravity_toolkit.plm_holmes import plm_holmes
+
+#-- PURPOSE: rotate spherical harmonics by a set of Euler angles
+def rotate_harmonics(clm1, slm1, ALPHA=0.0, BETA=0.0, GAMMA=0.0,
+    LMAX=60, MMAX=None):
+    """
+    Rotates spherical harmonic coefficients by zyz Euler angles
+
+    Arguments
+    ---------
+    clm1: cosine spherical harmonic coefficients
+    slm1: sine spherical harmonic coefficients
+
+    Keyword arguments
+    -----------------
+    ALPHA: first Euler angle in degrees (rotation about the z-axis)
+    BETA: second Euler angle in degrees (rotation about the y-axis)
+    GAMMA: third Euler angle in degrees (rotation about the z-axis)
+    LMAX: Upper bound of Spherical Harmonic Degrees
+    MMAX: Upper bound of Spherical Harmonic Orders
+        rotated power in orders above MMAX is not included in the output
+
+    Returns
+    -------
+    clm: rotated cosine spherical harmonic coefficients
+    slm: rotated sine spherical harmonic coefficients
+    """
+    #-- upper bound of spherical harmonic orders (default = LMAX)
+    MMAX = np.copy(LMAX) if (MMAX is None) else MMAX
+    #-- convert Euler angles to radians
+    alpha,beta,gamma = np.radians([ALPHA,BETA,GAMMA])
+    #-- rotations about the y-axis mix orders within each degree
+    if (MMAX < LMAX) and not np.isclose(np.sin(beta), 0.0):
+        warnings.warn(('Rotated power in orders above MMAX={0:d} is not '
+            'included in the output harmonics').format(np.int(MMAX)))
+    #-- output rotated spherical harmonics
+    clm1 = np.asarray(clm1)[:LMAX+1,:MMAX+1,...]
+    slm1 = np.asarray(slm1)[:LMAX+1,:MMAX+1,...]
+    clm = np.zeros_like(clm1, dtype=np.float)
+    slm = np.zeros_like(slm1, dtype=np.float)
+    for l in range(0,LMAX+1):
+        #-- orders of the complex harmonics for degree l
+        m = np.arange(-l,l+1)
+        #-- orders of the real harmonics for degree l
+        mm = np.arange(1,np.min([l,MMAX])+1)
+        #-- complex harmonics (Condon-Shortley phase) of degree l
+        sign = np.reshape((-1.0)**mm, (len(mm),) + (1,)*(clm1.ndim-2))
+        alm = np.zeros((2*l+1,) + clm1.shape[2:], dtype=np.complex128)
+        alm[l] = clm1[l,0]
+        alm[l+mm] = sign*(clm1[l,mm] - 1j*slm1[l,mm])/np.sqrt(2.0)
+        alm[l-mm] = (clm1[l,mm] + 1j*slm1[l,mm])/np.sqrt(2.0)
+        #-- Wigner-D matrix for degree l
+        dl = wigner_d(l, beta)[:,:,0]
+        Dl = np.exp(-1j*m[:,None]*alpha)*dl*np.exp(-1j*m[None,:]*gamma)
+        #-- rotated complex harmonics of degree l
+        blm = np.tensordot(Dl, alm, axes=1)
+        #-- convert back to real harmonics
+        clm[l,0] = blm[l].real
+        clm[l,mm] = np.sqrt(2.0)*sign*blm[l+mm].real
+        slm[l,mm] = -np.sqrt(2.0)*sign*blm[l+mm].imag
+    #-- return the rotated harmonics
+    return {'clm':clm, 'slm':slm}
+
+#-- PURPOSE: rotate zonal spherical harmonics to a set of centers
+def rotate_zonal(Cl0, lon, lat, LMAX=60, MMAX=None, PLM=None):
+    """
+    Rotates zonal spherical harmonics centered at the north pole
+        to a set of center coordinates
+
+    Arguments
+    ---------
+    Cl0: zonal spherical harmonic coefficients (LMAX+1) or (LMAX+1,n)
+    lon: longitude of each center in degrees
+    lat: latitude of each center in degrees
+
+    Keyword arguments
+    -----------------
+    LMAX: Upper bound of Spherical Harmonic Degrees
+    MMAX: Upper bound of Spherical Harmonic Orders
+    PLM: input Legendre polynomials of each center
+
+    Returns
+    -------
+    clm: rotated cosine spherical harmonic coefficients (LMAX+1,MMAX+1,n)
+    slm: rotated sine spherical harmonic coefficients (LMAX+1,MMAX+1,n)
+    """
+    #-- upper bound of spherical harmonic orders (default = LMAX)
+    MMAX = np.copy(LMAX) if (MMAX is None) else MMAX
+    #-- convert lon and lat to radians
+    phi = np.atleast_1d(lon)*np.pi/180.0
+    th = (90.0 - np.atleast_1d(lat))*np.pi/180.0
+    #-- m=0 column of the Wigner-d matrices for each center colatitude
+    #-- which are the fully-normalized Legendre polynomials scaled by degree
+    if PLM is None:
+        PLM,dPLM = plm_holmes(LMAX,np.cos(th))
+    l = np.arange(LMAX+1)
+    dlm = PLM[:LMAX+1,:MMAX+1,:]/np.sqrt(2.0*l[:,None,None] + 1.0)
+    #-- zonal harmonics for each center
+    Cl0 = np.asarray(Cl0)[:LMAX+1]
+    Cl0 = Cl0[:,None,None] if (Cl0.ndim == 1) else Cl0[:,None,:]
+    #-- rotate by the longitude of each center
+    m = np.arange(MMAX+1)
+    clm = dlm*Cl0*np.cos(m[:,None]*phi[None,:])
+    slm = dlm*Cl0*np.sin(m[:,None]*phi[None,:])
+    #-- return the rotated harmonics
+    return {'clm':clm, 'slm':slm}
+
+#-- PURPOSE: calculate the Wigner-d matrix of degree l
+def wigner_d(l, beta):
+    """
+    Calculates the Wigner-d matrix of degree l from the eigenvectors
+        of the angular momentum operator Jy
+
+    Arguments
+    ---------
+    l: spherical harmonic degree
+    beta: rotation angles about the y-axis in radians
+
+    Returns
+    -------
+    dl: Wigner-d matrix ordered from -l to l (2*l+1,2*l+1,n)
+    """
+    beta = np.atleast_1d(beta).flatten()
+    #-- eigenvalues and eigenvectors of Jy
+    w,v = _jy_eigen(l)
+    #-- d(beta) = exp(-i*beta*Jy) from the eigendecomposition
+    phase = np.exp(-1j*w[None,:,None]*beta[None,None,:])
+    dl = np.matmul(np.transpose(v[:,:,None]*phase,axes=(2,0,1)),
+        np.conj(np.transpose(v)))
+    return np.transpose(dl.real,axes=(1,2,0))
+
+#-- PURPOSE: calculate the eigendecomposition of Jy for degree l
+#-- keeping the most recently used degrees in memory
+@functools.lru_cache(maxsize=128)
+def _jy_eigen(l):
+    """
+    Calculates the eigenvalues and eigenvectors of the angular momentum
+        operator Jy for degree l
+
+    Arguments
+    ---------
+    l: spherical harmonic degree
+
+    Returns
+    -------
+    w: eigenvalues of Jy
+    v: eigenvectors of Jy (2*l+1,2*l+1)
+    """
+    #-- orders from -l to l
+    m = np.arange(-l,l)
+    #-- raising operator J+ for |l,m> to |l,m+1>
+    jp = np.sqrt(l*(l+1.0) - m*(m+1.0))
+    Jy = np.zeros((2*l+1,2*l+1), dtype=np.complex128)
+    Jy[m+l+1,m+l] = jp/2j
+    Jy[m+l,m+l+1] = -jp/2j
+    return scipy.linalg.eigh(Jy)
@@ -1,7 +1,7 @@
 #!/usr/bin/env python
 u"""
 harmonic_summation.py
-Written by Tyler Sutterley (07/2020)
+Written by Tyler Sutterley (03/2021)
 
 Returns the spatial field for a series of spherical harmonics
 
@@ -11,6 +11,7 @@ CALLING SEQUENCE:
 INPUTS:
     clm1: cosine spherical harmonic coefficients in output units
     slm1: sine spherical harmonic coefficients in output units
+        can be stacked along a third dimension to sum several fields at once
     lon: longitude array for output spatial field
     lat: latitude array for output spatial field
 
@@ -19,6 +20,10 @@ OPTIONS:
     LMAX: Upper bound of Spherical Harmonic Degrees
     MMAX: Upper bound of Spherical Harmonic Orders (default = LMAX)
     PLM: Fully-normalized associated Legendre polynomials
+    BANDS: number of latitude bands to sum separately (default = THREADS)
+    THREADS: number of threads for summing latitude bands in parallel
+    POOL: existing pool of threads for summing latitude bands in parallel
+        can be reused for several summations to avoid starting threads
 
 PYTHON DEPENDENCIES:
     numpy: Scientific Computing Tools For Python (https://numpy.org)
@@ -27,14 +32,19 @@ PROGRAM DEPENDENCIES:
     plm_holmes.py: Computes fully-normalized associated Legendre polynomials
 
 UPDATE HISTORY:
+    Updated 03/2021: sum several stacked fields with batched matrix products
+        can sum latitude bands in parallel with a pool of threads
+        can reuse an existing pool of threads for several summations
     Updated 07/2020: added function docstrings
     Updated 05/2015: added parameter MMAX for MMAX != LMAX.
     Written 05/2013
 """
 import numpy as np
+import multiprocessing.pool
 from gravity_toolkit.plm_holmes import plm_holmes
 
-def harmonic_summation(clm1,slm1,lon,lat,LMIN=0,LMAX=0,MMAX=None,PLM=None):
+def harmonic_summation(clm1,slm1,lon,lat,LMIN=0,LMAX=0,MMAX=None,PLM=None,
+    BANDS=None,THREADS=0,POOL=None):
     """
     Converts data from spherical harmonic coefficients to a spatial field
 
@@ -42,6 +52,7 @@ def harmonic_summation(clm1,slm1,lon,lat,LMIN=0,LMAX=0,MMAX=None,PLM=None):
     ---------
     clm1: cosine spherical harmonic coefficients in output units
     slm1: sine spherical harmonic coefficients in output units
+        can be stacked along a third dimension
     lon: longitude array
     lat: latitude array
 
@@ -51,10 +62,13 @@ def harmonic_summation(clm1,slm1,lon,lat,LMIN=0,LMAX=0,MMAX=None,PLM=None):
     LMAX: Upper bound of Spherical Harmonic Degrees
     MMAX: Upper bound of Spherical Harmonic Orders
     PLM: Fully-normalized associated Legendre polynomials
+    BANDS: number of latitude bands to sum separately (default = THREADS)
+    THREADS: number of threads for summing latitude bands in parallel
+    POOL: existing pool of threads for summing latitude bands in parallel
 
     Returns
     -------
-    spatial: spatial field
+    spatial: spatial field (lon,lat) or stacked fields (lon,lat,n)
     """
 
     #-- if LMAX is not specified, will use the size of the input harmonics
@@ -70,9 +84,12 @@ def harmonic_summation(clm1,slm1,lon,lat,LMIN=0,LMAX=0,MMAX=None,PLM=None):
     th = (90.0 - np.squeeze(lat))*np.pi/180.0
     thmax = len(th)
 
-    #--  Calculate fourier coefficients from legendre coefficients
-    d_cos = np.zeros((MMAX+1,thmax))#-- [m,th]
-    d_sin = np.zeros((MMAX+1,thmax))#-- [m,th]
+    #-- check if summing a single field or several stacked fields
+    SINGLE = (np.ndim(clm1) == 2)
+    clm1 = np.atleast_3d(clm1)
+    slm1 = np.atleast_3d(slm1)
+    nfield = clm1.shape[2]
+
     if PLM is None:
         #-- if plms are not pre-computed: calculate Legendre polynomials
         PLM,dPLM = plm_holmes(LMAX,np.cos(th))
@@ -80,22 +97,54 @@ def harmonic_summation(clm1,slm1,lon,lat,LMIN=0,LMAX=0,MMAX=None,PLM=None):
     #-- Truncating harmonics to degree and order LMAX
     #-- removing coefficients below LMIN and above MMAX
     mm = np.arange(0,MMAX+1)
-    clm = np.zeros((LMAX+1,MMAX+1))
-    slm = np.zeros((LMAX+1,MMAX+1))
-    clm[LMIN:LMAX+1,mm] = clm1[LMIN:LMAX+1,mm]
-    slm[LMIN:LMAX+1,mm] = slm1[LMIN:LMAX+1,mm]
-    for k in range(0,thmax):
-        #-- summation over all spherical harmonic degrees
-        d_cos[:,k] = np.sum(PLM[:,mm,k]*clm[:,mm],axis=0)
-        d_sin[:,k] = np.sum(PLM[:,mm,k]*slm[:,mm],axis=0)
+    clm = np.zeros((LMAX+1,MMAX+1,nfield))
+    slm = np.zeros((LMAX+1,MMAX+1,nfield))
+    clm[LMIN:LMAX+1,mm,:] = clm1[LMIN:LMAX+1,mm,:]
+    slm[LMIN:LMAX+1,mm,:] = slm1[LMIN:LMAX+1,mm,:]
+    #-- Legendre polynomials and harmonics ordered as [m,th,l] and [m,l,n]
+    PLMT = np.transpose(PLM[:,mm,:], axes=(1,2,0))
+    clmT = np.transpose(clm, axes=(1,0,2))
+    slmT = np.transpose(slm, axes=(1,0,2))
 
     #-- Final signal recovery from fourier coefficients
     m = np.arange(0,MMAX+1)[:,np.newaxis]
     #-- Calculating cos(m*phi) and sin(m*phi)
     ccos = np.cos(np.dot(m,phi))
     ssin = np.sin(np.dot(m,phi))
-    #-- summation of cosine and sine harmonics
-    s = np.dot(np.transpose(ccos),d_cos) + np.dot(np.transpose(ssin),d_sin)
+
+    #-- allocate for output spatial field
+    s = np.zeros((phi.shape[1],thmax,nfield))
+    #-- latitude bands to sum separately
+    BANDS = np.max([THREADS,1]) if (BANDS is None) else np.int(BANDS)
+    bands = [slice(b[0],b[-1]+1) for b in
+        np.array_split(np.arange(thmax),np.min([BANDS,thmax]))]
+    #-- sum the spatial field of each latitude band
+    def band_summation(b):
+        #--  Calculate fourier coefficients from legendre coefficients
+        #-- summation over all spherical harmonic degrees for each order
+        #-- as a batched matrix product [m,th,l] x [m,l,n] = [m,th,n]
+        d_cos = np.matmul(PLMT[:,b,:], clmT)
+        d_sin = np.matmul(PLMT[:,b,:], slmT)
+        #-- summation of cosine and sine harmonics
+        s[:,b,:] = np.tensordot(ccos, d_cos, axes=(0,0)) + \
+            np.tensordot(ssin, d_sin, axes=(0,0))
+    if POOL is not None:
+        #-- sum latitude bands in an existing pool of threads
+        #-- sharing the Legendre polynomials and output field
+        POOL.map(band_summation, bands)
+    elif THREADS:
+        #-- sum latitude bands in a new pool of threads
+        #-- sharing the Legendre polynomials and output field
+        pool = multiprocessing.pool.ThreadPool(processes=THREADS)
+        pool.map(band_summation, bands)
+        pool.close()
+        pool.join()
+    else:
+        for b in bands:
+            band_summation(b)
+    #-- remove singleton dimension for a single field
+    if SINGLE:
+        s = s[:,:,0]
 
     #-- return output data
     return s
@@ -0,0 +1,187 @@
+#!/usr/bin/env python
+u"""
+harmonic_variance.py
+Written by Tyler Sutterley (03/2021)
+
+Propagates the variances or the full covariance of a series of spherical
+    harmonics to the variance of a spatial field
+
+Variances of each harmonic are summed with the squares of the
+    fully-normalized Legendre polynomials without allocating the squared
+    polynomials, and the squares of the cosine and sine of each order
+A full covariance matrix is propagated using a square-root factor of the
+    covariance (such as the residual time series used to estimate the
+    covariance), with the columns of the factor summed as stacked fields
+
+CALLING SEQUENCE:
+    var = variance_summation(var_clm, var_slm, lon, lat, LMAX=60)
+    var = covariance_summation(COV, lon, lat, LMAX=60)
+
+INPUTS:
+    var_clm: variance of cosine spherical harmonic coefficients
+    var_slm: variance of sine spherical harmonic coefficients
+    COV: covariance matrix of the spherical harmonic coefficients
+        or square-root factor of the covariance matrix if SQRT
+        rows are ordered as [C00...CLMAXMMAX,S11...SLMAXMMAX]
+    lon: longitude array for output spatial field
+    lat: latitude array for output spatial field
+
+OPTIONS:
+    LMIN: Lower bound of Spherical Harmonic Degrees
+    LMAX: Upper bound of Spherical Harmonic Degrees
+        default is calculated from the size of the input harmonics
+    MMAX: Upper bound of Spherical Harmonic Orders (default = LMAX)
+    PLM: Fully-normalized associated Legendre polynomials
+    SQRT: input is a square-root factor of the covariance matrix
+    CHUNKSIZE: number of columns of the factor to sum in each block
+        default limits each block of spatial fields to 2^24 values
+
+PYTHON DEPENDENCIES:
+    numpy: Scientific Computing Tools For Python (https://numpy.org)
+    scipy: Scientific Tools for Python (https://docs.scipy.org/doc/)
+
+PROGRAM DEPENDENCIES:
+    plm_holmes.py: Computes fully-normalized associated Legendre polynomials
+    harmonic_summation.py: calculates a spatial field from spherical harmonics
+    mascon_kernel.py: calculates the order of harmonic column arrays
+
+UPDATE HISTORY:
+    Updated 03/2021: default LMAX from the size of the input covariance
+    Written 03/2021
+"""
+import numpy as np
+import scipy.linalg
+from gravity_toolkit.plm_holmes import plm_holmes
+from gravity_toolkit.harmonic_summation import harmonic_summation
+from gravity_toolkit.mascon_kernel import harmonic_indices
+
+#-- PURPOSE: sum the variances of spherical harmonics to a spatial field
+def variance_summation(var_clm, var_slm, lon, lat, LMIN=0, LMAX=0,
+    MMAX=None, PLM=None):
+    """
+    Calculates the variance of a spatial field from the variances
+        of independent spherical harmonic coefficients
+
+    Arguments
+    ---------
+    var_clm: variance of cosine spherical harmonic coefficients
+    var_slm: variance of sine spherical harmonic coefficients
+    lon: longitude array
+    lat: latitude array
+
+    Keyword arguments
+    -----------------
+    LMIN: Lower bound of Spherical Harmonic Degrees
+    LMAX: Upper bound of Spherical Harmonic Degrees
+    MMAX: Upper bound of Spherical Harmonic Orders
+    PLM: Fully-normalized associated Legendre polynomials
+
+    Returns
+    -------
+    var: variance of the spatial field (lon,lat)
+    """
+    #-- if LMAX is not specified, will use the size of the input harmonics
+    if (LMAX == 0):
+        LMAX = np.shape(var_clm)[0]-1
+    #-- upper bound of spherical harmonic orders (default = LMAX)
+    MMAX = np.copy(LMAX) if (MMAX is None) else MMAX
+    #-- Longitude in radians
+    phi = (np.squeeze(lon)*np.pi/180.0)[np.newaxis,:]
+    #-- Colatitude in radians
+    th = (90.0 - np.squeeze(lat))*np.pi/180.0
+    if PLM is None:
+        #-- if plms are not pre-computed: calculate Legendre polynomials
+        PLM,dPLM = plm_holmes(LMAX,np.cos(th))
+    #-- Truncating variances to degree and order LMAX
+    #-- removing coefficients below LMIN and above MMAX
+    mm = np.arange(0,MMAX+1)
+    var_c = np.zeros((LMAX+1,MMAX+1))
+    var_s = np.zeros((LMAX+1,MMAX+1))
+    var_c[LMIN:LMAX+1,mm] = var_clm[LMIN:LMAX+1,mm]
+    var_s[LMIN:LMAX+1,mm] = var_slm[LMIN:LMAX+1,mm]
+    #-- summation over all spherical harmonic degrees for each order
+    #-- with the squared Legendre polynomials evaluated within einsum
+    P = PLM[:LMAX+1,:MMAX+1,:]
+    d_cos = np.einsum('lmk,lmk,lm->mk', P, P, var_c)
+    d_sin = np.einsum('lmk,lmk,lm->mk', P, P, var_s)
+    #-- Calculating cos(m*phi)^2 and sin(m*phi)^2
+    m = mm[:,np.newaxis]
+    ccos = np.cos(np.dot(m,phi))**2
+    ssin = np.sin(np.dot(m,phi))**2
+    #-- summation of squared cosine and sine harmonics (lon,lat)
+    return np.dot(ccos.T,d_cos) + np.dot(ssin.T,d_sin)
+
+#-- PURPOSE: propagate a covariance of spherical harmonics to a spatial field
+def covariance_summation(COV, lon, lat, LMIN=0, LMAX=0, MMAX=None,
+    PLM=None, SQRT=False, CHUNKSIZE=None):
+    """
+    Calculates the variance of a spatial field from the full covariance
+        matrix of the spherical harmonic coefficients
+
+    Arguments
+    ---------
+    COV: covariance matrix of the spherical harmonic coefficients
+        or square-root factor of the covariance matrix if SQRT
+    lon: longitude array
+    lat: latitude array
+
+    Keyword arguments
+    -----------------
+    LMIN: Lower bound of Spherical Harmonic Degrees
+    LMAX: Upper bound of Spherical Harmonic Degrees
+    MMAX: Upper bound of Spherical Harmonic Orders
+    PLM: Fully-normalized associated Legendre polynomials
+    SQRT: input is a square-root factor of the covariance matrix
+    CHUNKSIZE: number of columns of the factor to sum in each block
+
+    Returns
+    -------
+    var: variance of the spatial field (lon,lat)
+    """
+    #-- if LMAX is not specified, will use the size of the covariance
+    if (LMAX == 0):
+        LMAX = np.int(LMIN)
+        while (len(harmonic_indices(LMIN, LMAX, MMAX=MMAX)[0]) <
+            np.shape(COV)[0]):
+            LMAX += 1
+    #-- upper bound of spherical harmonic orders (default = LMAX)
+    MMAX = np.copy(LMAX) if (MMAX is None) else MMAX
+    #-- degree and order of each row of the covariance
+    l,m,cs = harmonic_indices(LMIN, LMAX, MMAX=MMAX)
+    if (np.shape(COV)[0] != len(l)):
+        raise ValueError('Covariance does not match harmonic truncation')
+    #-- Colatitude in radians
+    th = (90.0 - np.squeeze(lat))*np.pi/180.0
+    if PLM is None:
+        #-- if plms are not pre-computed: calculate Legendre polynomials
+        PLM,dPLM = plm_holmes(LMAX,np.cos(th))
+    #-- square-root factor of the covariance matrix (COV = R*R')
+    if SQRT:
+        R = np.atleast_2d(np.transpose(COV)).T
+    else:
+        #-- eigendecomposition of the symmetric covariance matrix
+        #-- removing null and negative eigenvalues from round-off errors
+        w,v = scipy.linalg.eigh(COV)
+        valid, = np.nonzero(w > (np.finfo(np.float64).eps*np.max(w)))
+        R = v[:,valid]*np.sqrt(w[valid])[np.newaxis,:]
+    #-- number of columns of the factor to sum in each block
+    #-- default block size limits each stack of fields to 2^24 values
+    ncol = np.shape(R)[1]
+    npts = len(np.atleast_1d(lon))*len(th)
+    if CHUNKSIZE is None:
+        CHUNKSIZE = np.max([1,2**24//npts])
+    CHUNKSIZE = np.int(CHUNKSIZE)
+    #-- sum of squares of the spatial field of each column
+    var = np.zeros((len(np.atleast_1d(lon)),len(th)))
+    for c in range(0,ncol,CHUNKSIZE):
+        R1 = R[:,c:c+CHUNKSIZE]
+        #-- expand columns to stacked harmonics
+        clm = np.zeros((LMAX+1,MMAX+1,R1.shape[1]))
+        slm = np.zeros((LMAX+1,MMAX+1,R1.shape[1]))
+        clm[l[cs == 0],m[cs == 0],:] = R1[cs == 0,:]
+        slm[l[cs == 1],m[cs == 1],:] = R1[cs == 1,:]
+        #-- sum the stacked fields with batched matrix products
+        s = harmonic_summation(clm, slm, lon, lat, LMIN=LMIN, LMAX=LMAX,
+            MMAX=MMAX, PLM=PLM)
+        var += np.sum(s**2, axis=2)
+    return var
@@ -1,7 +1,7 @@
 #!/usr/bin/env python
 u"""
 harmonics.py
-Written by Tyler Sutterley (02/2021)
+Written by Tyler Sutterley (03/2021)
 
 Spherical harmonic data class for processing GRACE/GRACE-FO Level-2 data
 
@@ -19,8 +19,16 @@ PROGRAM DEPENDENCIES:
     hdf5_read_stokes.py: reads spherical harmonic data from HDF5
     read_ICGEM_harmonics.py: reads gravity model coefficients from GFZ ICGEM
     destripe_harmonics.py: filters spherical harmonics for correlated errors
+    harmonic_rotation.py: rotates spherical harmonics using Wigner-d matrices
 
 UPDATE HISTORY:
+    Updated 03/2021: index and truncate can return views of the harmonics
+        math functions can output to an existing harmonics object
+        broadcast single fields in math functions and vectorize convolve
+        added operator overloading for math functions
+        added lazily evaluated expressions to fuse math operations
+        added rotate function for rotating harmonics by Euler angles
+        convolve with degree and order dependent arrays
     Updated 02/2021: added degree amplitude function
     Updated 12/2020: added verbose option for gfc files
         can calculate spherical harmonic mean over a range of time indices
@@ -52,6 +60,7 @@ from gravity_toolkit.ncdf_read_stokes import ncdf_read_stokes
 from gravity_toolkit.hdf5_read_stokes import hdf5_read_stokes
 from gravity_toolkit.read_ICGEM_harmonics import read_ICGEM_harmonics
 from gravity_toolkit.destripe_harmonics import destripe_harmonics
+from gravity_toolkit.harmonic_rotation import rotate_harmonics
 
 class harmonics(object):
     """
@@ -432,103 +441,125 @@ class harmonics(object):
         self.shape = self.clm.shape
         return self
 
-    def add(self, temp):
+    def add(self, temp, out=None):
         """
         Add two harmonics objects
         Inputs: harmonic object to be added
+        Options: harmonics object for output (default is in-place)
         """
         #-- reassign shape and ndim attributes
         self.update_dimensions()
         temp.update_dimensions()
         l1 = self.lmax+1 if (temp.lmax > self.lmax) else temp.lmax+1
         m1 = self.mmax+1 if (temp.mmax > self.mmax) else temp.mmax+1
+        #-- output harmonics object
+        out = self if (out is None) else self.copy(out=out)
         if (self.ndim == 2):
-            self.clm[:l1,:m1] += temp.clm[:l1,:m1]
-            self.slm[:l1,:m1] += temp.slm[:l1,:m1]
+            out.clm[:l1,:m1] += temp.clm[:l1,:m1]
+            out.slm[:l1,:m1] += temp.slm[:l1,:m1]
         elif (self.ndim == 3) and (temp.ndim == 2):
-            for i,t in enumerate(self.time):
-                self.clm[:l1,:m1,i] += temp.clm[:l1,:m1]
-                self.slm[:l1,:m1,i] += temp.slm[:l1,:m1]
+            #-- broadcast the single field to each temporal field
+            out.clm[:l1,:m1,:] += temp.clm[:l1,:m1,None]
+            out.slm[:l1,:m1,:] += temp.slm[:l1,:m1,None]
         else:
-            self.clm[:l1,:m1,:] += temp.clm[:l1,:m1,:]
-            self.slm[:l1,:m1,:] += temp.slm[:l1,:m1,:]
-        return self
+            out.clm[:l1,:m1,:] += temp.clm[:l1,:m1,:]
+            out.slm[:l1,:m1,:] += temp.slm[:l1,:m1,:]
+        return out
 
-    def subtract(self, temp):
+    def subtract(self, temp, out=None):
         """
         Subtract one harmonics object from another
         Inputs: harmonic object to be subtracted
+        Options: harmonics object for output (default is in-place)
         """
         #-- reassign shape and ndim attributes
         self.update_dimensions()
         temp.update_dimensions()
         l1 = self.lmax+1 if (temp.lmax > self.lmax) else temp.lmax+1
         m1 = self.mmax+1 if (temp.mmax > self.mmax) else temp.mmax+1
+        #-- output harmonics object
+        out = self if (out is None) else self.copy(out=out)
         if (self.ndim == 2):
-            self.clm[:l1,:m1] -= temp.clm[:l1,:m1]
-            self.slm[:l1,:m1] -= temp.slm[:l1,:m1]
+            out.clm[:l1,:m1] -= temp.clm[:l1,:m1]
+            out.slm[:l1,:m1] -= temp.slm[:l1,:m1]
         elif (self.ndim == 3) and (temp.ndim == 2):
-            for i,t in enumerate(self.time):
-                self.clm[:l1,:m1,i] -= temp.clm[:l1,:m1]
-                self.slm[:l1,:m1,i] -= temp.slm[:l1,:m1]
+            #-- broadcast the single field to each temporal field
+            out.clm[:l1,:m1,:] -= temp.clm[:l1,:m1,None]
+            out.slm[:l1,:m1,:] -= temp.slm[:l1,:m1,None]
         else:
-            self.clm[:l1,:m1,:] -= temp.clm[:l1,:m1,:]
-            self.slm[:l1,:m1,:] -= temp.slm[:l1,:m1,:]
-        return self
+            out.clm[:l1,:m1,:] -= temp.clm[:l1,:m1,:]
+            out.slm[:l1,:m1,:] -= temp.slm[:l1,:m1,:]
+        return out
 
-    def multiply(self, temp):
+    def multiply(self, temp, out=None):
         """
         Multiply two harmonics objects
         Inputs: harmonic object to be multiplied
+        Options: harmonics object for output (default is in-place)
         """
         #-- reassign shape and ndim attributes
         self.update_dimensions()
         temp.update_dimensions()
         l1 = self.lmax+1 if (temp.lmax > self.lmax) else temp.lmax+1
         m1 = self.mmax+1 if (temp.mmax > self.mmax) else temp.mmax+1
+        #-- output harmonics object
+        out = self if (out is None) else self.copy(out=out)
         if (self.ndim == 2):
-            self.clm[:l1,:m1] *= temp.clm[:l1,:m1]
-            self.slm[:l1,:m1] *= temp.slm[:l1,:m1]
+            out.clm[:l1,:m1] *= temp.clm[:l1,:m1]
+            out.slm[:l1,:m1] *= temp.slm[:l1,:m1]
         elif (self.ndim == 3) and (temp.ndim == 2):
-            for i,t in enumerate(self.time):
-                self.clm[:l1,:m1,i] *= temp.clm[:l1,:m1]
-                self.slm[:l1,:m1,i] *= temp.slm[:l1,:m1]
+            #-- broadcast the single field to each temporal field
+            out.clm[:l1,:m1,:] *= temp.clm[:l1,:m1,None]
+            out.slm[:l1,:m1,:] *= temp.slm[:l1,:m1,None]
         else:
-            self.clm[:l1,:m1,:] *= temp.clm[:l1,:m1,:]
-            self.slm[:l1,:m1,:] *= temp.slm[:l1,:m1,:]
-        return self
+            out.clm[:l1,:m1,:] *= temp.clm[:l1,:m1,:]
+            out.slm[:l1,:m1,:] *= temp.slm[:l1,:m1,:]
+        return out
 
-    def divide(self, temp):
+    def divide(self, temp, out=None):
         """
         Divide one harmonics object from another
         Inputs: harmonic object to be divided
+        Options: harmonics object for output (default is in-place)
         """
         #-- reassign shape and ndim attributes
         self.update_dimensions()
         temp.update_dimensions()
         l1 = self.lmax+1 if (temp.lmax > self.lmax) else temp.lmax+1
         m1 = self.mmax+1 if (temp.mmax > self.mmax) else temp.mmax+1
+        #-- output harmonics object
+        out = self if (out is None) else self.copy(out=out)
         #-- indices for cosine spherical harmonics (including zonals)
         lc,mc = np.tril_indices(l1, m=m1)
         #-- indices for sine spherical harmonics (excluding zonals)
         m0 = np.nonzero(mc != 0)
         ls,ms = (lc[m0],mc[m0])
         if (self.ndim == 2):
-            self.clm[lc,mc] /= temp.clm[lc,mc]
-            self.slm[ls,ms] /= temp.slm[ls,ms]
+            out.clm[lc,mc] /= temp.clm[lc,mc]
+            out.slm[ls,ms] /= temp.slm[ls,ms]
         elif (self.ndim == 3) and (temp.ndim == 2):
-            for i,t in enumerate(self.time):
-                self.clm[lc,mc,i] /= temp.clm[lc,mc]
-                self.slm[ls,ms,i] /= temp.slm[ls,ms]
+            #-- broadcast the single field to each temporal field
+            out.clm[lc,mc,:] /= temp.clm[lc,mc,None]
+            out.slm[ls,ms,:] /= temp.slm[ls,ms,None]
         else:
-            self.clm[lc,mc,:] /= temp.clm[lc,mc,:]
-            self.slm[ls,ms,:] /= temp.slm[ls,ms,:]
-        return self
+            out.clm[lc,mc,:] /= temp.clm[lc,mc,:]
+            out.slm[ls,ms,:] /= temp.slm[ls,ms,:]
+        return out
 
-    def copy(self):
+    def copy(self, out=None):
         """
         Copy a harmonics object to a new harmonics object
-        """
+        Options: harmonics object to copy into without allocating
+        """
+        #-- copy into the existing arrays of an output harmonics object
+        if out is not None:
+            np.copyto(out.clm, self.clm)
+            np.copyto(out.slm, self.slm)
+            out.time = np.copy(self.time)
+            out.month = np.copy(self.month)
+            #-- assign ndim and shape attributes
+            out.update_dimensions()
+            return out
         temp = harmonics(lmax=self.lmax, mmax=self.mmax)
         #-- try to assign variables to self
         for key in ['clm','slm','time','month','shape','ndim','filename']:
@@ -663,21 +694,31 @@ class harmonics(object):
         #-- return the expanded harmonics object
         return temp
 
-    def index(self, indice, date=True):
+    def index(self, indice, date=True, copy=True):
         """
         Subset a harmonics object to specific index
         Inputs: indice in matrix to subset
-        Options: harmonics objects contain date information
+        Options:
+            harmonics objects contain date information
+            copy the harmonics or return views of the original arrays
         """
         #-- output harmonics object
         temp = harmonics(lmax=np.copy(self.lmax),mmax=np.copy(self.mmax))
         #-- subset output harmonics
-        temp.clm = self.clm[:,:,indice].copy()
-        temp.slm = self.slm[:,:,indice].copy()
+        #-- integer and slice indices will share memory with self if not copy
+        temp.clm = self.clm[:,:,indice]
+        temp.slm = self.slm[:,:,indice]
         #-- subset output dates
         if date:
-            temp.time = self.time[indice].copy()
-            temp.month = self.month[indice].copy()
+            temp.time = self.time[indice]
+            temp.month = self.month[indice]
+        #-- copy the harmonics and dates to new arrays
+        if copy:
+            temp.clm = temp.clm.copy()
+            temp.slm = temp.slm.copy()
+        if copy and date:
+            temp.time = temp.time.copy()
+            temp.month = temp.month.copy()
         #-- assign ndim and shape attributes
         temp.update_dimensions()
         #-- subset filenames
@@ -692,8 +733,6 @@ class harmonics(object):
         """
         #-- check if months is an array or a single value
         months = np.atleast_1d(months)
-        #-- number of months
-        n = len(months)
         #-- check that all months are available
         months_check = list(set(months) - set(self.month))
         if months_check:
@@ -703,34 +742,43 @@ class harmonics(object):
         months_list = [i for i,m in enumerate(self.month) if m in months]
         #-- output harmonics object
         temp = harmonics(lmax=np.copy(self.lmax),mmax=np.copy(self.mmax))
-        #-- create output harmonics
-        temp.clm = np.zeros((temp.lmax+1,temp.mmax+1,n))
-        temp.slm = np.zeros((temp.lmax+1,temp.mmax+1,n))
-        temp.time = np.zeros((n))
-        temp.month = np.zeros((n),dtype=np.int)
+        #-- create output harmonics with a single gather over time
+        temp.clm = self.clm[:,:,months_list]
+        temp.slm = self.slm[:,:,months_list]
+        temp.time = self.time[months_list]
+        temp.month = np.array(self.month[months_list],dtype=np.int)
         temp.filename = []
-        #-- for each indice
-        for t,i in enumerate(months_list):
-            temp.clm[:,:,t] = self.clm[:,:,i].copy()
-            temp.slm[:,:,t] = self.slm[:,:,i].copy()
-            temp.time[t] = self.time[i].copy()
-            temp.month[t] = self.month[i].copy()
-            if getattr(self, 'filename'):
-                temp.filename.append(self.filename[i])
+        #-- subset filenames
+        if getattr(self, 'filename'):
+            temp.filename = [self.filename[i] for i in months_list]
         #-- assign ndim and shape attributes
         temp.update_dimensions()
         #-- remove singleton dimensions if importing a single value
         return temp.squeeze()
 
-    def truncate(self, lmax, lmin=0, mmax=None):
+    def truncate(self, lmax, lmin=0, mmax=None, copy=True):
         """
         Truncate or expand a harmonics object to a new degree and order
         Inputs: lmax maximum degree of spherical harmonics
         Options: lmin minimum degree of spherical harmonics
             mmax maximum order of spherical harmonics
+            copy the truncated harmonics to new arrays
+                if False: truncated harmonics are views of the original arrays
+                when only reducing the degree and order
+        Returns: the harmonics object truncated in place
         """
         #-- output harmonics object
         mmax = np.copy(lmax) if (mmax is None) else mmax
+        #-- truncate to views of the harmonics if only reducing degree and order
+        if not copy and (lmin == 0) and (lmax <= self.lmax) and \
+            (mmax <= self.mmax):
+            self.lmax = np.copy(lmax)
+            self.mmax = np.copy(mmax)
+            self.clm = self.clm[:lmax+1,:mmax+1]
+            self.slm = self.slm[:lmax+1,:mmax+1]
+            #-- reassign ndim and shape attributes
+            self.update_dimensions()
+            return self
         #-- copy prior harmonics object
         temp = self.copy()
         #-- set new degree and order
@@ -791,13 +839,32 @@ class harmonics(object):
         #-- return the mean field
         return temp
 
-    def scale(self, var):
+    def scale(self, var, out=None):
         """
         Multiply a harmonics object by a constant
         Inputs: scalar value to which the harmonics object will be multiplied
+        Options: harmonics object for output (default is a new object)
         """
         #-- reassign shape and ndim attributes
         self.update_dimensions()
+        #-- multiply into an existing harmonics object without allocating
+        if out is not None:
+            var = np.asarray(var)
+            out.time = np.copy(self.time)
+            out.month = np.copy(self.month)
+            #-- multiply by a single constant or a time-variable scalar
+            if (np.ndim(var) == 0):
+                np.multiply(var, self.clm, out=out.clm)
+                np.multiply(var, self.slm, out=out.slm)
+            elif (np.ndim(var) == 1) and (self.ndim == 2):
+                np.multiply(var[None,None,:], self.clm[:,:,None], out=out.clm)
+                np.multiply(var[None,None,:], self.slm[:,:,None], out=out.slm)
+            elif (np.ndim(var) == 1) and (self.ndim == 3):
+                np.multiply(var[None,None,:], self.clm, out=out.clm)
+                np.multiply(var[None,None,:], self.slm, out=out.slm)
+            #-- assign ndim and shape attributes
+            out.update_dimensions()
+            return out
         temp = harmonics(lmax=self.lmax, mmax=self.mmax)
         temp.time = np.copy(self.time)
         temp.month = np.copy(self.month)
@@ -812,6 +879,8 @@ class harmonics(object):
                 temp.clm[:,:,i] = v*self.clm
                 temp.slm[:,:,i] = v*self.slm
         elif (np.ndim(var) == 1) and (self.ndim == 3):
+            temp.clm = np.zeros((temp.lmax+1,temp.mmax+1,len(var)))
+            temp.slm = np.zeros((temp.lmax+1,temp.mmax+1,len(var)))
             for i,v in enumerate(var):
                 temp.clm[:,:,i] = v*self.clm[:,:,i]
                 temp.slm[:,:,i] = v*self.slm[:,:,i]
@@ -819,42 +888,53 @@ class harmonics(object):
         temp.update_dimensions()
         return temp
 
-    def power(self, power):
+    def power(self, power, out=None):
         """
         Raise a harmonics object to a power
         Inputs: power to which the harmonics object will be raised
+        Options: harmonics object for output (default is a new object)
         """
         #-- reassign shape and ndim attributes
         self.update_dimensions()
-        temp = harmonics(lmax=self.lmax, mmax=self.mmax)
+        #-- output harmonics object
+        temp = harmonics(lmax=self.lmax, mmax=self.mmax) if (out is None) else out
         temp.time = np.copy(self.time)
         temp.month = np.copy(self.month)
         for key in ['clm','slm']:
             val = getattr(self, key)
-            setattr(temp, key, np.power(val,power))
+            if out is None:
+                setattr(temp, key, np.power(val,power))
+            else:
+                np.power(val, power, out=getattr(temp, key))
         #-- assign ndim and shape attributes
         temp.update_dimensions()
         return temp
 
-    def convolve(self, var):
+    def convolve(self, var, out=None):
         """
         Convolve spherical harmonics with a degree-dependent array
+            or with a degree and order dependent array
         Inputs: degree dependent array for convolution
+        Options: harmonics object for output (default is in-place)
         """
         #-- reassign shape and ndim attributes
         self.update_dimensions()
+        #-- output harmonics object
+        out = self if (out is None) else self.copy(out=out)
+        #-- degree dependent array truncated to LMAX
+        #-- LMAX+1 to include LMAX
+        var = np.asarray(var)[:self.lmax+1]
+        #-- degree and order dependent array truncated to MMAX
+        var = var[:,:self.mmax+1] if (var.ndim == 2) else var[:,None]
         #-- check if a single field or a temporal field
         if (self.ndim == 2):
-            for l in range(0,self.lmax+1):#-- LMAX+1 to include LMAX
-                self.clm[l,:] *= var[l]
-                self.slm[l,:] *= var[l]
+            out.clm *= var
+            out.slm *= var
         else:
-            for i,t in enumerate(self.time):
-                for l in range(0,self.lmax+1):#-- LMAX+1 to include LMAX
-                    self.clm[l,:,i] *= var[l]
-                    self.slm[l,:,i] *= var[l]
+            out.clm *= var[:,:,None]
+            out.slm *= var[:,:,None]
         #-- return the convolved field
-        return self
+        return out
 
     def destripe(self, **kwargs):
         """
@@ -886,6 +966,27 @@ class harmonics(object):
         #-- return the destriped field
         return temp
 
+    def rotate(self, alpha=0.0, beta=0.0, gamma=0.0):
+        """
+        Rotates spherical harmonic coefficients by zyz Euler angles
+        Options: Euler angles alpha, beta and gamma in degrees
+        Rotated power in orders above mmax is not included in the output
+        """
+        #-- reassign shape and ndim attributes
+        self.update_dimensions()
+        temp = harmonics(lmax=np.copy(self.lmax),mmax=np.copy(self.mmax))
+        temp.time = np.copy(self.time)
+        temp.month = np.copy(self.month)
+        #-- rotate all temporal fields at once
+        Ylms = rotate_harmonics(self.clm, self.slm, ALPHA=alpha, BETA=beta,
+            GAMMA=gamma, LMAX=self.lmax, MMAX=self.mmax)
+        temp.clm = Ylms['clm'].copy()
+        temp.slm = Ylms['slm'].copy()
+        #-- assign ndim and shape attributes
+        temp.update_dimensions()
+        #-- return the rotated field
+        return temp
+
     def amplitude(self, mmax=None):
         """
         Calculates the degree amplitude of a harmonics object
@@ -918,3 +1019,305 @@ class harmonics(object):
                 self.amp[l,:] = np.sqrt(np.sum(var,axis=0))
         #-- return the harmonics object with degree amplitudes
         return self
+
+    def lazy(self):
+        """
+        Create a lazily evaluated expression from a harmonics object
+        """
+        return harmonics_expression(self)
+
+    def __add__(self, temp):
+        """
+        Add two harmonics objects to a new harmonics object
+        """
+        if isinstance(temp, harmonics):
+            return self.copy().add(temp)
+        return NotImplemented
+
+    def __sub__(self, temp):
+        """
+        Subtract one harmonics object from another to a new harmonics object
+        """
+        if isinstance(temp, harmonics):
+            return self.copy().subtract(temp)
+        return NotImplemented
+
+    def __mul__(self, temp):
+        """
+        Multiply a harmonics object by another harmonics object
+            or by a constant to a new harmonics object
+        """
+        if isinstance(temp, harmonics):
+            return self.copy().multiply(temp)
+        elif np.isscalar(temp) or isinstance(temp, (list, np.ndarray)):
+            return self.scale(temp)
+        return NotImplemented
+
+    def __rmul__(self, var):
+        """
+        Multiply a constant by a harmonics object to a new harmonics object
+        """
+        return self.__mul__(var)
+
+    def __truediv__(self, temp):
+        """
+        Divide one harmonics object by another harmonics object
+            or by a constant to a new harmonics object
+        """
+        if isinstance(temp, harmonics):
+            return self.copy().divide(temp)
+        elif np.isscalar(temp) or isinstance(temp, (list, np.ndarray)):
+            return self.scale(1.0/np.asarray(temp))
+        return NotImplemented
+
+    def __neg__(self):
+        """
+        Negate a harmonics object to a new harmonics object
+        """
+        return self.scale(-1.0)
+
+    def __pow__(self, power):
+        """
+        Raise a harmonics object to a power to a new harmonics object
+        """
+        return self.power(power)
+
+    def __iadd__(self, temp):
+        """
+        Add a harmonics object in-place
+        """
+        if isinstance(temp, harmonics):
+            return self.add(temp)
+        return NotImplemented
+
+    def __isub__(self, temp):
+        """
+        Subtract a harmonics object in-place
+        """
+        if isinstance(temp, harmonics):
+            return self.subtract(temp)
+        return NotImplemented
+
+    def __imul__(self, temp):
+        """
+        Multiply by a harmonics object or by a constant in-place
+        """
+        if isinstance(temp, harmonics):
+            return self.multiply(temp)
+        elif (np.ndim(temp) == 0):
+            return self.scale(temp, out=self)
+        return NotImplemented
+
+    def __itruediv__(self, temp):
+        """
+        Divide by a harmonics object or by a constant in-place
+        """
+        if isinstance(temp, harmonics):
+            return self.divide(temp)
+        elif (np.ndim(temp) == 0):
+            return self.scale(1.0/temp, out=self)
+        return NotImplemented
+
+class harmonics_expression(object):
+    """
+    Lazily evaluated expression of harmonics objects
+
+    Math operations are stored and fused into a single pass over blocks
+        of the (l,m,t) harmonics when the expression is evaluated
+    """
+    def __init__(self, *args, operator=None):
+        self.operator=operator
+        self.args=args
+
+    def __add__(self, temp):
+        return harmonics_expression(self, temp, operator='add')
+
+    def __radd__(self, temp):
+        return harmonics_expression(temp, self, operator='add')
+
+    def __sub__(self, temp):
+        return harmonics_expression(self, temp, operator='subtract')
+
+    def __rsub__(self, temp):
+        return harmonics_expression(temp, self, operator='subtract')
+
+    def __mul__(self, temp):
+        if isinstance(temp, (harmonics, harmonics_expression)):
+            return harmonics_expression(self, temp, operator='multiply')
+        return self.scale(temp)
+
+    def __rmul__(self, temp):
+        return self.__mul__(temp)
+
+    def __truediv__(self, temp):
+        if isinstance(temp, (harmonics, harmonics_expression)):
+            return harmonics_expression(self, temp, operator='divide')
+        return self.scale(1.0/np.asarray(temp))
+
+    def __neg__(self):
+        return self.scale(-1.0)
+
+    def __pow__(self, power):
+        return harmonics_expression(self, power, operator='power')
+
+    def scale(self, var):
+        """
+        Multiply the expression by a constant or a time-variable scalar
+        Inputs: scalar value to which the expression will be multiplied
+        """
+        return harmonics_expression(self, var, operator='scale')
+
+    def convolve(self, var):
+        """
+        Convolve the expression with a degree-dependent array
+            or with a degree and order dependent array
+        Inputs: degree dependent array for convolution
+        """
+        return harmonics_expression(self, var, operator='convolve')
+
+    def leaves(self):
+        """
+        List the harmonics objects and time-variable scalars in the expression
+        """
+        #-- harmonics objects and time-variable scalars
+        h,v = ([],[])
+        for arg in self.args:
+            if isinstance(arg, harmonics_expression):
+                hh,vv = arg.leaves()
+                h.extend(hh)
+                v.extend(vv)
+            elif isinstance(arg, harmonics):
+                h.append(arg.update_dimensions())
+            elif (self.operator == 'scale') and (np.ndim(arg) == 1):
+                v.append(arg)
+        return (h,v)
+
+    def evaluate_block(self, key, l1, m1, indices):
+        """
+        Evaluate the expression for a block of harmonics
+        Inputs:
+            key: harmonics variable to evaluate (clm or slm)
+            l1: number of spherical harmonic degrees
+            m1: number of spherical harmonic orders
+            indices: time indices of the block
+        Returns: block of harmonics and if the block is a new array
+        """
+        #-- evaluate each argument for the block
+        blocks,owned = ([],[])
+        #-- expression of a single harmonics object
+        if (self.operator is None):
+            h, = self.args
+            if (h.ndim == 2):
+                return (getattr(h, key)[:l1,:m1,None], False)
+            return (getattr(h, key)[:l1,:m1,indices], True)
+        for arg in self.args:
+            if isinstance(arg, harmonics_expression):
+                b,o = arg.evaluate_block(key, l1, m1, indices)
+            elif isinstance(arg, harmonics) and (arg.ndim == 2):
+                b,o = (getattr(arg, key)[:l1,:m1,None], False)
+            elif isinstance(arg, harmonics):
+                b,o = (getattr(arg, key)[:l1,:m1,indices], True)
+            elif (self.operator == 'convolve') and (np.ndim(arg) == 2):
+                b,o = (np.asarray(arg)[:l1,:m1,None], False)
+            elif (self.operator == 'convolve'):
+                b,o = (np.asarray(arg)[:l1,None,None], False)
+            elif (np.ndim(arg) == 1):
+                b,o = (np.asarray(arg)[None,None,indices], False)
+            else:
+                b,o = (arg, False)
+            blocks.append(b)
+            owned.append(o)
+        a,b = blocks
+        #-- operate in-place if the first block is a new full-size array
+        shape = np.broadcast(a,b).shape
+        if owned[0] and (np.shape(a) == shape):
+            out = a
+        elif owned[1] and (np.shape(b) == shape) and \
+            self.operator in ('add','multiply','scale','convolve'):
+            a,b,out = (b,a,b)
+        else:
+            out = np.empty(shape)
+        #-- apply the operator to the block
+        if (self.operator == 'add'):
+            np.add(a, b, out=out)
+        elif (self.operator == 'subtract'):
+            np.subtract(a, b, out=out)
+        elif self.operator in ('multiply','scale','convolve'):
+            np.multiply(a, b, out=out)
+        elif (self.operator == 'divide'):
+            #-- only divide valid coefficients (excluding sine zonals)
+            valid = np.tri(l1, m1, dtype=bool)
+            valid[:,0] &= (key == 'clm')
+            if out is not a:
+                np.copyto(out, a)
+            np.divide(a, b, out=out, where=valid[:,:,None])
+        elif (self.operator == 'power'):
+            np.power(a, b, out=out)
+        return (out, True)
+
+    def evaluate(self, indices=None, out=None, chunksize=None):
+        """
+        Evaluate the expression to a harmonics object
+        Options:
+            indices: integer or slice of time indices to evaluate
+            out: harmonics object for output (default is a new object)
+            chunksize: number of time indices to evaluate in each block
+        """
+        #-- single harmonics objects are a copy or a subset of the object
+        if (self.operator is None):
+            h, = self.args
+            if (indices is not None):
+                h = h.index(indices, copy=False)
+            return h.copy(out=out)
+        #-- harmonics objects and time-variable scalars in the expression
+        h,v = self.leaves()
+        #-- truncate to common maximum degree and order
+        l1 = np.min([d.lmax for d in h]) + 1
+        m1 = np.min([d.mmax for d in h]) + 1
+        #-- number of time indices and temporal harmonics objects
+        temporal = [d for d in h if (d.ndim == 3)]
+        lengths = set([d.shape[-1] for d in temporal] + [len(d) for d in v])
+        if (len(lengths) > 1):
+            raise ValueError('Incompatible time dimensions in expression')
+        #-- time indices to evaluate
+        single = isinstance(indices, (int, np.integer))
+        if lengths and (indices is None):
+            t = np.arange(lengths.pop())
+        elif lengths:
+            t = np.atleast_1d(np.arange(lengths.pop())[indices])
+        else:
+            t = None
+        #-- output harmonics object
+        if out is None:
+            out = harmonics(lmax=l1-1, mmax=m1-1)
+            shape = (l1,m1) if (t is None) or single else (l1,m1,len(t))
+            out.clm = np.zeros(shape)
+            out.slm = np.zeros(shape)
+        #-- output dates from the temporal harmonics objects
+        if temporal and (temporal[0].time is not None):
+            out.time = temporal[0].time[t[0]] if single else temporal[0].time[t]
+            out.month = temporal[0].month[t[0]] if single else temporal[0].month[t]
+        elif h[0].time is not None:
+            out.time = np.copy(h[0].time)
+            out.month = np.copy(h[0].month)
+        #-- evaluate static expressions in a single block
+        if t is None:
+            for key in ['clm','slm']:
+                b,o = self.evaluate_block(key, l1, m1, Ellipsis)
+                getattr(out, key)[:l1,:m1] = b[:,:,0]
+            return out.update_dimensions()
+        #-- number of time indices for each block
+        #-- default is a block size of approximately 1 MB
+        if chunksize is None:
+            chunksize = np.max([1, 2**17//(l1*m1)])
+        #-- evaluate expression for each block
+        for i in range(0, len(t), chunksize):
+            tb = t[i:i+chunksize]
+            for key in ['clm','slm']:
+                b,o = self.evaluate_block(key, l1, m1, tb)
+                if single:
+                    getattr(out, key)[:l1,:m1] = b[:,:,0]
+                else:
+                    getattr(out, key)[:l1,:m1,i:i+chunksize] = b
+        #-- assign ndim and shape attributes
+        return out.update_dimensions()
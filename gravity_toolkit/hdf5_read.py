@@ -1,7 +1,7 @@
 #!/usr/bin/env python
 u"""
 hdf5_read.py
-Written by Tyler Sutterley (02/2021)
+Written by Tyler Sutterley (03/2021)
 
 Reads spatial data from HDF5 files
 
@@ -29,6 +29,7 @@ OPTIONS:
         gzip
         zip
         bytes
+    BAND: slice of latitude indices to read as a latitude band
 
 PYTHON DEPENDENCIES:
     numpy: Scientific Computing Tools For Python (https://numpy.org)
@@ -36,6 +37,7 @@ PYTHON DEPENDENCIES:
         (https://www.h5py.org)
 
 UPDATE HISTORY:
+    Updated 03/2021: added option to read a latitude band of the data
     Updated 02/2021: prevent warnings with python3 compatible regex strings
     Updated 12/2020: try/except for getting variable unit attributes
         attempt to get a standard set of attributes from each variable
@@ -75,7 +77,7 @@ import zipfile
 import numpy as np
 
 def hdf5_read(filename, DATE=False, VERBOSE=False, VARNAME='z', LONNAME='lon',
-    LATNAME='lat', TIMENAME='time', COMPRESSION=None):
+    LATNAME='lat', TIMENAME='time', COMPRESSION=None, BAND=None):
     """
     Reads spatial data from HDF5 files
 
@@ -95,6 +97,7 @@ def hdf5_read(filename, DATE=False, VERBOSE=False, VARNAME='z', LONNAME='lon',
         gzip
         zip
         bytes
+    BAND: slice of latitude indices to read as a latitude band
 
     Returns
     -------
@@ -162,7 +165,10 @@ def hdf5_read(filename, DATE=False, VERBOSE=False, VARNAME='z', LONNAME='lon',
     #-- for each variable
     for key,h5key in zip(keys,h5keys):
         #-- Getting the data from each HDF5 variable
-        dinput[key] = fileID[h5key][:].copy()
+        if (key == 'data') and (BAND is not None):
+            dinput[key] = read_band(fileID[h5key], len(fileID[LONNAME]), BAND)
+        else:
+            dinput[key] = fileID[h5key][:].copy()
         #-- Getting attributes of included variables
         dinput['attributes'][key] = {}
         for attr in attributes_list:
@@ -173,7 +179,10 @@ def hdf5_read(filename, DATE=False, VERBOSE=False, VARNAME='z', LONNAME='lon',
 
     #-- switching data array to lat/lon if lon/lat
     sz = dinput['data'].shape
-    if (dinput['data'].ndim == 2) and (len(dinput['lon']) == sz[0]):
+    if (BAND is not None):
+        #-- subset latitudes to band (data is already lat/lon)
+        dinput['lat'] = dinput['lat'][BAND]
+    elif (dinput['data'].ndim == 2) and (len(dinput['lon']) == sz[0]):
         dinput['data'] = dinput['data'].T
 
     #-- Global attribute description
@@ -185,3 +194,24 @@ def hdf5_read(filename, DATE=False, VERBOSE=False, VARNAME='z', LONNAME='lon',
     #-- Closing the HDF5 file
     fileID.close()
     return dinput
+
+#-- PURPOSE: read a latitude band from a HDF5 variable
+def read_band(variable, nlon, BAND):
+    """
+    Reads a latitude band from a HDF5 variable
+
+    Arguments
+    ---------
+    variable: HDF5 variable with latitude and longitude dimensions
+    nlon: number of longitudes
+    BAND: slice of latitude indices to read
+
+    Returns
+    -------
+    data: latitude band of the variable as lat/lon
+    """
+    #-- switching data array to lat/lon if lon/lat
+    if (len(variable.shape) == 2) and (variable.shape[0] == nlon):
+        return np.transpose(variable[:,BAND])
+    else:
+        return variable[BAND,...]
@@ -1,7 +1,7 @@
 #!/usr/bin/env python
 u"""
 hdf5_write.py
-Written by Tyler Sutterley (12/2020)
+Written by Tyler Sutterley (03/2021)
 
 Writes spatial data to HDF5 files
 
@@ -29,6 +29,7 @@ OPTIONS:
     CLOBBER: will overwrite an existing HDF5 file
     VERBOSE: will print to screen the HDF5 structure parameters
     DATE: data has date information
+    CHUNKSIZES: chunk sizes of the z variable
 
 PYTHON DEPENDENCIES:
     numpy: Scientific Computing Tools For Python (https://numpy.org)
@@ -36,6 +37,7 @@ PYTHON DEPENDENCIES:
         (https://www.h5py.org)
 
 UPDATE HISTORY:
+    Updated 03/2021: added CHUNKSIZES option to set chunking of the data
     Updated 12/2020: added REFERENCE option to set file attribute
     Updated 07/2020: added function docstrings
     Updated 04/2020: added option DATE if including time data
@@ -68,7 +70,7 @@ import numpy as np
 def hdf5_write(data, lon, lat, tim, FILENAME=None, VARNAME='z', LONNAME='lon',
     LATNAME='lat', TIMENAME='time', UNITS=None, LONGNAME=None, FILL_VALUE=None,
     TIME_UNITS=None, TIME_LONGNAME=None, TITLE=None, REFERENCE=None, DATE=True,
-    CLOBBER=True, VERBOSE=False):
+    CHUNKSIZES=None, CLOBBER=True, VERBOSE=False):
     """
     Writes spatial data to HDF5 files
 
@@ -95,6 +97,7 @@ def hdf5_write(data, lon, lat, tim, FILENAME=None, VARNAME='z', LONNAME='lon',
     CLOBBER: will overwrite an existing HDF5 file
     VERBOSE: will print to screen the HDF5 structure parameters
     DATE: data has date information
+    CHUNKSIZES: chunk sizes of the z variable
     """
 
     #-- setting HDF5 clobber attribute
@@ -112,7 +115,8 @@ def hdf5_write(data, lon, lat, tim, FILENAME=None, VARNAME='z', LONNAME='lon',
     h5[LATNAME] = fileID.create_dataset(LATNAME, lat.shape, data=lat,
         dtype=lat.dtype, compression='gzip')
     h5[VARNAME] = fileID.create_dataset(VARNAME, data.shape, data=data,
-        dtype=data.dtype, fillvalue=FILL_VALUE, compression='gzip')
+        dtype=data.dtype, fillvalue=FILL_VALUE, chunks=CHUNKSIZES,
+        compression='gzip')
     if DATE:
         h5[TIMENAME] = fileID.create_dataset(TIMENAME, (n_time,), data=tim,
             dtype=np.float, compression='gzip')
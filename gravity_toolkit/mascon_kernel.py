@@ -0,0 +1,230 @@
+#!/usr/bin/env python
+u"""
+mascon_kernel.py
+Written by Tyler Sutterley (03/2021)
+
+Calculates the sensitivity kernels of a least-squares mascon procedure
+    from the pseudo-inverse of the mascon spherical harmonics
+
+The pseudo-inverse is calculated once with a singular value decomposition
+    and replaces separate least-squares solutions for each harmonic
+Pseudo-inverses can be cached to disk for reuse between programs
+    with the same mascon index, truncation, smoothing radius,
+    load Love numbers and fit method
+Cache files are written to a temporary file and moved into place so that
+    programs running in parallel never read a partially written file
+
+Mascon time series for all mascons and dates are calculated with a
+    single matrix product of the sensitivity kernels and the harmonics
+
+CALLING SEQUENCE:
+    A_lm = mascon_kernel(MA_lm, fit_factor, AREA=total_area)
+    mascon = mascon_timeseries(A_lm, Y_lm, DELTA=delta_lm, AREA=total_area)
+    l,m,cs = harmonic_indices(LMIN, LMAX, MMAX=MMAX)
+
+INPUTS:
+    MA_lm: mascon spherical harmonics converted to the fit method
+        column arrays of harmonics for each mascon (n_harm,n_mas)
+    fit_factor: factors for converting harmonics to the fit method
+
+OUTPUTS:
+    A_lm: sensitivity kernel for each mascon (n_harm,n_mas)
+
+OPTIONS:
+    AREA: total area of each mascon
+    CACHE: file for caching the mascon pseudo-inverse
+
+PYTHON DEPENDENCIES:
+    numpy: Scientific Computing Tools For Python (https://numpy.org)
+    scipy: Scientific Tools for Python (https://docs.scipy.org/doc/)
+
+UPDATE HISTORY:
+    Updated 03/2021: added mascon_timeseries for evaluating all mascons
+        write cached pseudo-inverses to a temporary file and replace
+        added harmonic_indices for the order of mascon column arrays
+    Written 03/2021
+"""
+import os
+import hashlib
+import numpy as np
+import scipy.linalg
+from gravity_toolkit.utilities import write_cache
+
+#-- PURPOSE: calculate the sensitivity kernels of a set of mascons
+def mascon_kernel(MA_lm, fit_factor, AREA=None, CACHE=None):
+    """
+    Calculates the sensitivity kernels of a least-squares mascon procedure
+
+    Arguments
+    ---------
+    MA_lm: mascon spherical harmonics converted to the fit method
+    fit_factor: factors for converting harmonics to the fit method
+
+    Keyword arguments
+    -----------------
+    AREA: total area of each mascon
+    CACHE: file for caching the mascon pseudo-inverse
+
+    Returns
+    -------
+    A_lm: sensitivity kernel for each mascon
+    """
+    #-- pseudo-inverse of the mascon harmonics (n_mas,n_harm)
+    MA_inv = pseudo_inverse(MA_lm, CACHE=CACHE)
+    #-- least-squares solutions for unit harmonics scaled to the fit method
+    #-- are the columns of the pseudo-inverse multiplied by the fit factors
+    A_lm = np.transpose(MA_inv*fit_factor[None,:])
+    #-- multiply by the total area of each mascon
+    if AREA is not None:
+        A_lm *= AREA[None,:]
+    return A_lm
+
+#-- PURPOSE: calculate the degree and order of each mascon column
+def harmonic_indices(LMIN, LMAX, MMAX=None):
+    """
+    Calculates the spherical harmonic degree and order of each row
+        of the mascon column arrays [C00...CLMAXMMAX,S11...SLMAXMMAX]
+
+    Arguments
+    ---------
+    LMIN: minimum spherical harmonic degree
+    LMAX: maximum spherical harmonic degree
+
+    Keyword arguments
+    -----------------
+    MMAX: maximum spherical harmonic order
+
+    Returns
+    -------
+    l: spherical harmonic degree of each row
+    m: spherical harmonic order of each row
+    cs: cosine (0) or sine (1) spherical harmonic of each row
+    """
+    #-- upper bound of spherical harmonic orders (default = LMAX)
+    MMAX = np.copy(LMAX) if (MMAX is None) else MMAX
+    #-- lower triangular indices ordered by degree then order
+    l,m = np.tril_indices(LMAX+1, m=MMAX+1)
+    #-- cosine harmonics from LMIN and sine harmonics for orders above 0
+    ic, = np.nonzero(l >= LMIN)
+    i_s, = np.nonzero((l >= LMIN) & (m > 0))
+    cs = np.concatenate((np.zeros(len(ic),dtype=np.int),
+        np.ones(len(i_s),dtype=np.int)))
+    return (np.concatenate((l[ic],l[i_s])), np.concatenate((m[ic],m[i_s])), cs)
+
+#-- PURPOSE: calculate the time series of a set of mascons
+def mascon_timeseries(A_lm, Y_lm, DELTA=None, AREA=None, DATA_ERROR=False):
+    """
+    Calculates the mass time series of a set of mascons from the
+        sensitivity kernels and column arrays of spherical harmonics
+
+    Arguments
+    ---------
+    A_lm: sensitivity kernel for each mascon (n_harm,n_mas)
+    Y_lm: spherical harmonics for each date (n_harm,nt)
+
+    Keyword arguments
+    -----------------
+    DELTA: satellite error harmonics (n_harm)
+    AREA: total area of each mascon in cm^2
+    DATA_ERROR: input harmonics are errors to be summed in quadrature
+
+    Returns
+    -------
+    mass: mascon mass time series in gigatonnes (n_mas,nt)
+    error: satellite error of each mascon in gigatonnes
+    area: total area of each mascon in km^2
+    """
+    output = {}
+    #-- sum over all spherical harmonics for each mascon and date
+    #-- converting mascon mass time series from g to gigatonnes
+    if DATA_ERROR:
+        #-- if input data are errors (i.e. estimated dealiasing errors)
+        output['mass'] = np.sqrt(np.dot(np.transpose(A_lm**2),Y_lm**2))/1e15
+    else:
+        output['mass'] = np.dot(np.transpose(A_lm),Y_lm)/1e15
+    #-- multiply the satellite error by the sensitivity kernel
+    if DELTA is not None:
+        output['error'] = np.sqrt(np.dot(DELTA**2,A_lm**2))/1e15
+    #-- convert the total area of each mascon from cm^2 to km^2
+    if AREA is not None:
+        output['area'] = AREA/1e10
+    return output
+
+#-- PURPOSE: calculate or read the pseudo-inverse of the mascon harmonics
+def pseudo_inverse(MA_lm, CACHE=None):
+    """
+    Calculates the pseudo-inverse of the mascon spherical harmonics
+        using a singular value decomposition
+
+    Arguments
+    ---------
+    MA_lm: mascon spherical harmonics converted to the fit method
+
+    Keyword arguments
+    -----------------
+    CACHE: file for caching the mascon pseudo-inverse
+
+    Returns
+    -------
+    MA_inv: pseudo-inverse of the mascon harmonics
+    """
+    #-- checksum of the mascon harmonics to validate cached files
+    checksum = hashlib.md5(np.ascontiguousarray(MA_lm).tobytes()).hexdigest()
+    #-- read the pseudo-inverse if previously calculated
+    if CACHE is not None and os.access(os.path.expanduser(CACHE), os.F_OK):
+        with np.load(os.path.expanduser(CACHE)) as fileID:
+            if (str(fileID['checksum']) == checksum):
+                return fileID['pinv']
+    #-- singular value decomposition of the mascon harmonics
+    U,s,Vh = scipy.linalg.svd(MA_lm, full_matrices=False)
+    #-- singular values below machine precision are treated as zero
+    #-- matching least-squares solutions with rcond=-1
+    cutoff = np.finfo(np.float64).eps*np.max(s)
+    s_inv = np.zeros_like(s)
+    s_inv[s > cutoff] = 1.0/s[s > cutoff]
+    #-- pseudo-inverse: V.Inv(S).U'
+    MA_inv = np.dot(np.transpose(Vh)*s_inv[None,:], np.transpose(U))
+    #-- save the pseudo-inverse to the cache file
+    if CACHE is not None:
+        write_cache(os.path.expanduser(CACHE), pinv=MA_inv, checksum=checksum)
+    return MA_inv
+
+#-- PURPOSE: create a cache file name for a mascon pseudo-inverse
+def kernel_cache_file(directory, MASCON_INDEX, LMIN=0, LMAX=60, MMAX=None,
+    RAD=0, LOVE_NUMBERS=0, REFERENCE='CF', FIT_METHOD=1, MASCON_OCEAN=False):
+    """
+    Creates a file name for caching the pseudo-inverse of a set of mascons
+
+    Arguments
+    ---------
+    directory: directory for cached pseudo-inverse files
+    MASCON_INDEX: index file of mascon spherical harmonics
+
+    Keyword arguments
+    -----------------
+    LMIN: minimum spherical harmonic degree
+    LMAX: maximum spherical harmonic degree
+    MMAX: maximum spherical harmonic order
+    RAD: Gaussian smoothing radius in kilometers
+    LOVE_NUMBERS: Load Love numbers dataset
+    REFERENCE: Reference frame for degree 1 load Love numbers
+    FIT_METHOD: method for fitting the sensitivity kernel
+        1: mass coefficients
+        2: geoid coefficients
+    MASCON_OCEAN: mascon mass is redistributed over the ocean
+
+    Returns
+    -------
+    cache_file: full path to the cached pseudo-inverse file
+    """
+    #-- mascon index is the file without directory or suffix
+    index_base = os.path.splitext(os.path.basename(MASCON_INDEX))[0]
+    #-- output strings for truncation, smoothing and redistribution
+    order_str = 'M{0:d}'.format(MMAX) if MMAX and (MMAX != LMAX) else ''
+    gw_str = '_r{0:0.0f}km'.format(RAD) if (RAD != 0) else ''
+    ocean_str = '_OCN' if MASCON_OCEAN else ''
+    args = (index_base,ocean_str,LMIN,LMAX,order_str,gw_str,LOVE_NUMBERS,
+        REFERENCE,FIT_METHOD)
+    cache_format = '{0}_PINV{1}_L{2:d}-{3:d}{4}{5}_LOVE{6:d}{7}_FIT{8:d}.npz'
+    return os.path.join(os.path.expanduser(directory),
+        cache_format.format(*args))
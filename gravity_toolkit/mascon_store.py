@@ -0,0 +1,371 @@
+#!/usr/bin/env python
+u"""
+mascon_store.py
+Written by Tyler Sutterley (03/2021)
+
+Reads and writes a consolidated store of mascon spherical harmonics
+
+The harmonics of each mascon in an index are read once, corrected for a
+    uniform redistribution over the ocean, truncated and stacked as column
+    arrays of harmonics (n_harm,n_mas) with the name and total area of
+    each mascon in a single HDF5 file
+Stores are read directly by later programs in place of the mascon index
+    and can be truncated to a lower degree and order when read
+Stores are verified against checksums of the contents of the mascon index
+    and of each mascon file, the data format of the mascon files and the
+    parameters of the ocean redistribution
+
+CALLING SEQUENCE:
+    mascons = mascon_store(MASCON_INDEX, LMAX=LMAX, MMAX=MMAX,
+        DATAFORM='netCDF4', STORE=MASCON_STORE)
+    Ylms = mascon_harmonics(mascons)
+
+INPUTS:
+    MASCON_INDEX: index file of mascon spherical harmonics
+
+OPTIONS:
+    LMAX: maximum spherical harmonic degree
+    MMAX: maximum spherical harmonic order
+    DATAFORM: input data format of the mascon files (ascii, netCDF4, HDF5)
+    OCEAN: ocean spherical harmonics for redistributing mascon mass
+    LOVE_NUMBERS: Load Love numbers dataset of the ocean harmonics
+    REFERENCE: Reference frame for degree 1 load Love numbers
+    LANDMASK: land-sea mask used to calculate the ocean harmonics
+    STORE: consolidated mascon store file
+    MODE: permissions mode of the output store file
+
+OUTPUTS:
+    harmonics: column arrays of harmonics for each mascon (n_harm,n_mas)
+        ordered as [C00...CLMAXMMAX,S11...SLMAXMMAX]
+    l: spherical harmonic degree of each row
+    m: spherical harmonic order of each row
+    cs: cosine (0) or sine (1) spherical harmonic of each row
+    name: name of each mascon
+    area: total area of each mascon in cm^2
+    files: input file of each mascon
+    attributes: metadata of the mascon store
+
+PYTHON DEPENDENCIES:
+    numpy: Scientific Computing Tools For Python (https://numpy.org)
+    h5py: Python interface for Hierarchal Data Format 5 (HDF5)
+        (https://www.h5py.org)
+
+PROGRAM DEPENDENCIES:
+    harmonics.py: spherical harmonic data class for processing GRACE/GRACE-FO
+    mascon_kernel.py: calculates the order of mascon column arrays
+    units.py: class for converting GRACE/GRACE-FO Level-2 data to specific units
+    utilities: download and management utilities for syncing files
+
+UPDATE HISTORY:
+    Updated 03/2021: expand reconstructed column arrays to harmonics
+        verify stores against a checksum of the mascon index
+        mascon areas are not output as the dates of expanded harmonics
+        verify stores against the mascon files, data format and land mask
+    Written 03/2021
+"""
+import os
+import time
+import h5py
+import hashlib
+import numpy as np
+from gravity_toolkit.harmonics import harmonics
+from gravity_toolkit.mascon_kernel import harmonic_indices
+from gravity_toolkit.units import units
+from gravity_toolkit.utilities import get_hash
+
+#-- PURPOSE: read a consolidated mascon store or create from a mascon index
+def mascon_store(MASCON_INDEX, LMAX=60, MMAX=None, DATAFORM='ascii',
+    OCEAN=None, LOVE_NUMBERS=0, REFERENCE='CF', LANDMASK=None, STORE=None,
+    MODE=0o775):
+    """
+    Reads the spherical harmonics of a set of mascons from a consolidated
+        store or from the individual files of a mascon index
+
+    Arguments
+    ---------
+    MASCON_INDEX: index file of mascon spherical harmonics
+
+    Keyword arguments
+    -----------------
+    LMAX: maximum spherical harmonic degree
+    MMAX: maximum spherical harmonic order
+    DATAFORM: input data format of the mascon files (ascii, netCDF4, HDF5)
+    OCEAN: ocean spherical harmonics for redistributing mascon mass
+    LOVE_NUMBERS: Load Love numbers dataset of the ocean harmonics
+    REFERENCE: Reference frame for degree 1 load Love numbers
+    LANDMASK: land-sea mask used to calculate the ocean harmonics
+    STORE: consolidated mascon store file
+    MODE: permissions mode of the output store file
+
+    Returns
+    -------
+    harmonics: column arrays of harmonics for each mascon (n_harm,n_mas)
+    l: spherical harmonic degree of each row
+    m: spherical harmonic order of each row
+    cs: cosine (0) or sine (1) spherical harmonic of each row
+    name: name of each mascon
+    area: total area of each mascon in cm^2
+    files: input file of each mascon
+    attributes: metadata of the mascon store
+    """
+    #-- upper bound of spherical harmonic orders (default = LMAX)
+    MMAX = np.copy(LMAX) if (MMAX is None) else MMAX
+    #-- metadata describing the mascon index and redistribution
+    #-- checksum of the mascon index to validate stores
+    with open(os.path.expanduser(MASCON_INDEX),'rb') as f:
+        file_contents = f.read()
+    checksum = hashlib.md5(file_contents).hexdigest()
+    #-- checksum of the contents of each mascon file in the index
+    file_hashes = [get_hash(os.path.expanduser(fi))
+        for fi in file_contents.decode('utf-8').splitlines()]
+    files_checksum = hashlib.md5(''.join(file_hashes).encode('utf8'))
+    attributes = dict(mascon_index=os.path.expanduser(MASCON_INDEX),
+        mascon_index_checksum=checksum, dataform=DATAFORM,
+        mascon_files_checksum=files_checksum.hexdigest(),
+        mascon_ocean=(OCEAN is not None))
+    if OCEAN is not None:
+        attributes['love_numbers'] = LOVE_NUMBERS
+        attributes['reference'] = REFERENCE
+        attributes['landmask'] = os.path.abspath(os.path.expanduser(LANDMASK)) \
+            if LANDMASK else ''
+    #-- read consolidated mascon store if previously created
+    if STORE is not None and os.access(os.path.expanduser(STORE), os.F_OK):
+        mascons = from_mascon_store(STORE, LMAX=LMAX, MMAX=MMAX)
+        #-- verify that the store matches the mascon index and redistribution
+        for key,val in attributes.items():
+            if (key != 'mascon_index') and \
+                (mascons['attributes'].get(key) != val):
+                raise ValueError('Mascon store {0} does not match {1}'.format(
+                    os.path.expanduser(STORE),key))
+    else:
+        #-- read the individual files of the mascon index
+        mascons = read_mascon_index(MASCON_INDEX, LMAX=LMAX, MMAX=MMAX,
+            DATAFORM=DATAFORM, OCEAN=OCEAN)
+        mascons['attributes'].update(attributes)
+        #-- write the consolidated mascon store for later programs
+        if STORE is not None:
+            to_mascon_store(mascons, STORE)
+            os.chmod(os.path.expanduser(STORE), MODE)
+    #-- if mascon name contains degree and order info, remove
+    mascons['name'] = [n.replace('_L{0:d}'.format(LMAX),'')
+        for n in mascons['name']]
+    return mascons
+
+#-- PURPOSE: read the individual spherical harmonic files of a mascon index
+def read_mascon_index(MASCON_INDEX, LMAX=60, MMAX=None, DATAFORM='ascii',
+    OCEAN=None):
+    """
+    Reads the spherical harmonics of each mascon in a mascon index
+
+    Arguments
+    ---------
+    MASCON_INDEX: index file of mascon spherical harmonics
+
+    Keyword arguments
+    -----------------
+    LMAX: maximum spherical harmonic degree
+    MMAX: maximum spherical harmonic order
+    DATAFORM: input data format of the mascon files (ascii, netCDF4, HDF5)
+    OCEAN: ocean spherical harmonics for redistributing mascon mass
+
+    Returns
+    -------
+    harmonics: column arrays of harmonics for each mascon (n_harm,n_mas)
+    l: spherical harmonic degree of each row
+    m: spherical harmonic order of each row
+    cs: cosine (0) or sine (1) spherical harmonic of each row
+    name: name of each mascon
+    area: total area of each mascon in cm^2
+    files: input file of each mascon
+    attributes: metadata of the mascon store
+    """
+    #-- upper bound of spherical harmonic orders (default = LMAX)
+    MMAX = np.copy(LMAX) if (MMAX is None) else MMAX
+    #-- Earth Parameters
+    factors = units(lmax=LMAX)
+    #-- degree, order and cosine/sine index of each harmonic
+    l,m,cs = harmonic_indices(0, LMAX, MMAX=MMAX)
+    ic, = np.nonzero(cs == 0)
+    i_s, = np.nonzero(cs == 1)
+    #-- input mascon spherical harmonic datafiles
+    with open(os.path.expanduser(MASCON_INDEX),'r') as f:
+        mascon_files = f.read().splitlines()
+    #-- number of mascons
+    n_mas = len(mascon_files)
+    #-- output dictionary with column arrays of mascon harmonics
+    mascons = {}
+    mascons['harmonics'] = np.zeros((len(l),n_mas))
+    mascons['l'],mascons['m'],mascons['cs'] = (l,m,cs)
+    mascons['area'] = np.zeros((n_mas))
+    mascons['name'] = []
+    mascons['files'] = []
+    mascons['attributes'] = dict(lmax=LMAX, mmax=MMAX)
+    #-- for each valid file in the index (iterate over mascons)
+    for k,fi in enumerate(mascon_files):
+        #-- read mascon spherical harmonics
+        if (DATAFORM == 'ascii'):
+            #-- ascii (.txt)
+            Ylms = harmonics().from_ascii(os.path.expanduser(fi),date=False)
+        elif (DATAFORM == 'netCDF4'):
+            #-- netcdf (.nc)
+            Ylms = harmonics().from_netCDF4(os.path.expanduser(fi),date=False)
+        elif (DATAFORM == 'HDF5'):
+            #-- HDF5 (.H5)
+            Ylms = harmonics().from_HDF5(os.path.expanduser(fi),date=False)
+        #-- truncate mascon spherical harmonics to d/o LMAX/MMAX
+        Ylms = Ylms.truncate(lmax=LMAX, mmax=MMAX)
+        #-- Calculating the total mass of each mascon (1 cmwe uniform)
+        mascons['area'][k] = 4.0*np.pi*(factors.rad_e**3)*factors.rho_e*\
+            Ylms.clm[0,0]/3.0
+        #-- distribute MASCON mass uniformly over the ocean
+        if OCEAN is not None:
+            #-- calculate ratio between total mascon mass and
+            #-- a uniformly distributed cm of water over the ocean
+            ratio = Ylms.clm[0,0]/OCEAN.clm[0,0]
+            #-- remove ratio*ocean Ylms from mascon Ylms
+            Ylms.clm -= ratio*OCEAN.clm[:LMAX+1,:MMAX+1]
+            Ylms.slm -= ratio*OCEAN.slm[:LMAX+1,:MMAX+1]
+        #-- add to column arrays of mascon harmonics
+        mascons['harmonics'][ic,k] = Ylms.clm[l[ic],m[ic]]
+        mascons['harmonics'][i_s,k] = Ylms.slm[l[i_s],m[i_s]]
+        #-- mascon base is the file without directory or suffix
+        mascon_base = os.path.splitext(os.path.basename(fi))[0]
+        #-- if lower case, will capitalize
+        mascons['name'].append(mascon_base.upper())
+        mascons['files'].append(fi)
+    return mascons
+
+#-- PURPOSE: write a consolidated mascon store to HDF5
+def to_mascon_store(mascons, FILENAME):
+    """
+    Writes a consolidated store of mascon spherical harmonics to HDF5
+
+    Arguments
+    ---------
+    mascons: dictionary of mascon column arrays from read_mascon_index
+    FILENAME: output mascon store file
+    """
+    #-- opening HDF5 file for writing
+    with h5py.File(os.path.expanduser(FILENAME), 'w') as fileID:
+        #-- Defining the HDF5 dataset variables
+        n_harm,n_mas = np.shape(mascons['harmonics'])
+        h5 = {}
+        h5['harmonics'] = fileID.create_dataset('harmonics', (n_harm,n_mas),
+            data=mascons['harmonics'], dtype=np.float, compression='gzip')
+        for key in ('l','m','cs'):
+            h5[key] = fileID.create_dataset(key, (n_harm,),
+                data=mascons[key], dtype=np.int, compression='gzip')
+        h5['area'] = fileID.create_dataset('area', (n_mas,),
+            data=mascons['area'], dtype=np.float, compression='gzip')
+        #-- mascon names and input files as variable length strings
+        dt = h5py.special_dtype(vlen=str)
+        for key in ('name','files'):
+            h5[key] = fileID.create_dataset(key, (n_mas,),
+                data=mascons[key], dtype=dt)
+        #-- filling HDF5 dataset attributes
+        h5['harmonics'].attrs['long_name'] = 'mascon_spherical_harmonics'
+        h5['harmonics'].attrs['units'] = 'Geodesy_Normalization'
+        h5['l'].attrs['long_name'] = 'spherical_harmonic_degree'
+        h5['m'].attrs['long_name'] = 'spherical_harmonic_order'
+        h5['cs'].attrs['long_name'] = 'cosine_or_sine_harmonic'
+        h5['area'].attrs['long_name'] = 'Mascon_Total_Area'
+        h5['area'].attrs['units'] = 'cm^2'
+        #-- metadata of the mascon store
+        for key,val in mascons['attributes'].items():
+            fileID.attrs[key] = val
+        #-- date created
+        fileID.attrs['date_created'] = time.strftime('%Y-%m-%d',time.localtime())
+
+#-- PURPOSE: read a consolidated mascon store from HDF5
+def from_mascon_store(FILENAME, LMAX=None, MMAX=None):
+    """
+    Reads a consolidated store of mascon spherical harmonics from HDF5
+
+    Arguments
+    ---------
+    FILENAME: input mascon store file
+
+    Keyword arguments
+    -----------------
+    LMAX: maximum spherical harmonic degree to read
+    MMAX: maximum spherical harmonic order to read
+
+    Returns
+    -------
+    harmonics: column arrays of harmonics for each mascon (n_harm,n_mas)
+    l: spherical harmonic degree of each row
+    m: spherical harmonic order of each row
+    cs: cosine (0) or sine (1) spherical harmonic of each row
+    name: name of each mascon
+    area: total area of each mascon in cm^2
+    files: input file of each mascon
+    attributes: metadata of the mascon store
+    """
+    mascons = {}
+    with h5py.File(os.path.expanduser(FILENAME), 'r') as fileID:
+        #-- metadata of the mascon store
+        mascons['attributes'] = {}
+        for key,val in fileID.attrs.items():
+            mascons['attributes'][key] = val.item() \
+                if isinstance(val,np.generic) else val
+        #-- truncation of the stored harmonics
+        lmax = mascons['attributes']['lmax']
+        mmax = mascons['attributes']['mmax']
+        LMAX = np.copy(lmax) if (LMAX is None) else LMAX
+        MMAX = np.copy(LMAX) if (MMAX is None) else MMAX
+        #-- verify that the store extends to the requested degree and order
+        if (LMAX > lmax) or (MMAX > mmax):
+            raise ValueError('Mascon store {0} truncated at {1:d}/{2:d}'.format(
+                os.path.expanduser(FILENAME),lmax,mmax))
+        #-- reduce to the rows within the requested degree and order
+        l,m = (fileID['l'][:],fileID['m'][:])
+        ii, = np.nonzero((l <= LMAX) & (m <= MMAX))
+        mascons['harmonics'] = fileID['harmonics'][:][ii,:]
+        for key in ('l','m','cs'):
+            mascons[key] = fileID[key][:][ii]
+        mascons['area'] = fileID['area'][:]
+        for key in ('name','files'):
+            mascons[key] = [v.decode('utf-8') if isinstance(v,bytes) else v
+                for v in fileID[key][:]]
+    #-- update truncation of the reduced harmonics
+    mascons['attributes']['lmax'] = np.int(LMAX)
+    mascons['attributes']['mmax'] = np.int(MMAX)
+    return mascons
+
+#-- PURPOSE: expand the column arrays of a mascon store to harmonics
+def mascon_harmonics(mascons, COLUMNS=None):
+    """
+    Expands the column arrays of mascon spherical harmonics to a
+        harmonics object with a mascon dimension
+
+    Arguments
+    ---------
+    mascons: dictionary of mascon column arrays
+
+    Keyword arguments
+    -----------------
+    COLUMNS: column arrays ordered as the rows of the mascon store (n_harm,n)
+        default is the harmonics of each mascon
+
+    Returns
+    -------
+    Ylms: harmonics object of each mascon (LMAX+1,MMAX+1,n_mas)
+        or of each column (LMAX+1,MMAX+1,n) without dates
+        the total area of each mascon is in the mascon dictionary
+    """
+    l,m,cs = (mascons['l'],mascons['m'],mascons['cs'])
+    LMAX = mascons['attributes']['lmax']
+    MMAX = mascons['attributes']['mmax']
+    #-- column arrays to expand
+    if COLUMNS is None:
+        COLUMNS = mascons['harmonics']
+    n_harm,n = np.shape(COLUMNS)
+    ic, = np.nonzero(cs == 0)
+    i_s, = np.nonzero(cs == 1)
+    Ylms = harmonics(lmax=LMAX, mmax=MMAX)
+    Ylms.clm = np.zeros((LMAX+1,MMAX+1,n))
+    Ylms.slm = np.zeros((LMAX+1,MMAX+1,n))
+    Ylms.clm[l[ic],m[ic],:] = COLUMNS[ic,:]
+    Ylms.slm[l[i_s],m[i_s],:] = COLUMNS[i_s,:]
+    Ylms.update_dimensions()
+    return Ylms
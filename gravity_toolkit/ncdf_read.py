@@ -1,7 +1,7 @@
 #!/usr/bin/env python
 u"""
 ncdf_read.py
-Written by Tyler Sutterley (02/2021)
+Written by Tyler Sutterley (03/2021)
 
 Reads spatial data from COARDS-compliant netCDF4 files
 
@@ -29,6 +29,7 @@ OPTIONS:
         gzip
         zip
         bytes
+    BAND: slice of latitude indices to read as a latitude band
 
 PYTHON DEPENDENCIES:
     numpy: Scientific Computing Tools For Python (https://numpy.org)
@@ -36,6 +37,7 @@ PYTHON DEPENDENCIES:
          (https://unidata.github.io/netcdf4-python/netCDF4/index.html)
 
 UPDATE HISTORY:
+    Updated 03/2021: added option to read a latitude band of the data
     Updated 02/2021: prevent warnings with python3 compatible regex strings
     Updated 12/2020: try/except for getting variable unit attributes
         attempt to get a standard set of attributes from each variable
@@ -80,7 +82,7 @@ import zipfile
 import numpy as np
 
 def ncdf_read(filename, DATE=False, VERBOSE=False, VARNAME='z', LONNAME='lon',
-    LATNAME='lat', TIMENAME='time', COMPRESSION=None):
+    LATNAME='lat', TIMENAME='time', COMPRESSION=None, BAND=None):
     """
     Reads spatial data from COARDS-compliant netCDF4 files
 
@@ -100,6 +102,7 @@ def ncdf_read(filename, DATE=False, VERBOSE=False, VARNAME='z', LONNAME='lon',
         gzip
         zip
         bytes
+    BAND: slice of latitude indices to read as a latitude band
 
     Returns
     -------
@@ -154,7 +157,11 @@ def ncdf_read(filename, DATE=False, VERBOSE=False, VARNAME='z', LONNAME='lon',
     #-- for each variable
     for key,nckey in zip(keys,nckeys):
         #-- Getting the data from each NetCDF variable
-        dinput[key] = fileID.variables[nckey][:].data
+        if (key == 'data') and (BAND is not None):
+            dinput[key] = read_band(fileID.variables[nckey],
+                len(fileID.variables[LONNAME]), BAND)
+        else:
+            dinput[key] = fileID.variables[nckey][:].data
         #-- Getting attributes of included variables
         dinput['attributes'][key] = {}
         for attr in attributes_list:
@@ -167,7 +174,10 @@ def ncdf_read(filename, DATE=False, VERBOSE=False, VARNAME='z', LONNAME='lon',
 
     #-- switching data array to lat/lon if lon/lat
     sz = dinput['data'].shape
-    if (dinput['data'].ndim == 2) and (len(dinput['lon']) == sz[0]):
+    if (BAND is not None):
+        #-- subset latitudes to band (data is already lat/lon)
+        dinput['lat'] = dinput['lat'][BAND]
+    elif (dinput['data'].ndim == 2) and (len(dinput['lon']) == sz[0]):
         dinput['data'] = dinput['data'].T
 
     #-- Global attribute (title of dataset)
@@ -180,3 +190,24 @@ def ncdf_read(filename, DATE=False, VERBOSE=False, VARNAME='z', LONNAME='lon',
     fileID.close()
     #-- return the output variable
     return dinput
+
+#-- PURPOSE: read a latitude band from a netCDF4 variable
+def read_band(variable, nlon, BAND):
+    """
+    Reads a latitude band from a netCDF4 variable
+
+    Arguments
+    ---------
+    variable: netCDF4 variable with latitude and longitude dimensions
+    nlon: number of longitudes
+    BAND: slice of latitude indices to read
+
+    Returns
+    -------
+    data: latitude band of the variable as lat/lon
+    """
+    #-- switching data array to lat/lon if lon/lat
+    if (len(variable.shape) == 2) and (variable.shape[0] == nlon):
+        return np.transpose(variable[:,BAND].data)
+    else:
+        return variable[BAND,...].data
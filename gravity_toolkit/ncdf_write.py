@@ -1,7 +1,7 @@
 #!/usr/bin/env python
 u"""
 ncdf_write.py
-Written by Tyler Sutterley (12/2020)
+Written by Tyler Sutterley (03/2021)
 
 Writes spatial data to COARDS-compliant netCDF4 files
 
@@ -29,6 +29,7 @@ OPTIONS:
     CLOBBER: will overwrite an existing netCDF4 file
     VERBOSE: will print to screen the netCDF4 structure parameters
     DATE: data has date information
+    CHUNKSIZES: chunk sizes of the z variable
 
 PYTHON DEPENDENCIES:
     numpy: Scientific Computing Tools For Python (https://numpy.org)
@@ -36,6 +37,7 @@ PYTHON DEPENDENCIES:
          (https://unidata.github.io/netcdf4-python/netCDF4/index.html)
 
 UPDATE HISTORY:
+    Updated 03/2021: added CHUNKSIZES option to set chunking of the data
     Updated 12/2020: added REFERENCE option to set file attribute
     Updated 07/2020: added function docstrings
     Updated 04/2020: added option DATE if including time data
@@ -68,7 +70,7 @@ import numpy as np
 def ncdf_write(data, lon, lat, tim, FILENAME=None, VARNAME='z', LONNAME='lon',
     LATNAME='lat', TIMENAME='time', UNITS=None, LONGNAME=None, FILL_VALUE=None,
     TIME_UNITS=None, TIME_LONGNAME=None, TITLE=None, REFERENCE=None,
-    DATE=True, CLOBBER=True, VERBOSE=False):
+    DATE=True, CHUNKSIZES=None, CLOBBER=True, VERBOSE=False):
     """
     Writes spatial data to COARDS-compliant netCDF4 files
 
@@ -95,6 +97,7 @@ def ncdf_write(data, lon, lat, tim, FILENAME=None, VARNAME='z', LONNAME='lon',
     CLOBBER: will overwrite an existing netCDF4 file
     VERBOSE: will print to screen the netCDF4 structure parameters
     DATE: data has date information
+    CHUNKSIZES: chunk sizes of the z variable
     """
 
     #-- setting NetCDF clobber attribute
@@ -117,10 +120,12 @@ def ncdf_write(data, lon, lat, tim, FILENAME=None, VARNAME='z', LONNAME='lon',
     #-- spatial data
     if (n_time > 1):
         nc[VARNAME] = fileID.createVariable(VARNAME, data.dtype,
-            (LATNAME,LONNAME,TIMENAME,), fill_value=FILL_VALUE, zlib=True)
+            (LATNAME,LONNAME,TIMENAME,), fill_value=FILL_VALUE, zlib=True,
+            chunksizes=CHUNKSIZES)
     else:
         nc[VARNAME] = fileID.createVariable(VARNAME, data.dtype,
-            (LATNAME,LONNAME,), fill_value=FILL_VALUE, zlib=True)
+            (LATNAME,LONNAME,), fill_value=FILL_VALUE, zlib=True,
+            chunksizes=CHUNKSIZES)
     #-- time
     if DATE:
         nc[TIMENAME] = fileID.createVariable(TIMENAME, 'f8', (TIMENAME,))
@@ -1,7 +1,7 @@
 #!/usr/bin/env python
 u"""
 piecewise_regress.py
-Written by Tyler Sutterley (01/2021)
+Written by Tyler Sutterley (03/2021)
 
 Fits a synthetic signal to data over a time period by ordinary or weighted
     least-squares for breakpoint analysis
@@ -16,6 +16,7 @@ Fit significance derivations are based on Burnham and Anderson (2002)
 
 CALLING SEQUENCE:
     pcwbeta = piecewise_regress(tdec,data,CYCLES=[0.5,1.0],BREAKPOINT=ind)
+    pcwscan = piecewise_scan(tdec,data,CYCLES=[0.5,1.0],BREAK_TIME=times)
 
 INPUTS:
     t_in: input time array
@@ -59,6 +60,8 @@ PYTHON DEPENDENCIES:
     scipy: Scientific Tools for Python (https://docs.scipy.org/doc/)
 
 UPDATE HISTORY:
+    Updated 03/2021: added piecewise_scan for evaluating candidate breakpoints
+        for multiple time series with a single shared factorization
     Updated 01/2021: added function docstrings
     Updated 10/2019: changing Y/N flags to True/False
     Updated 01/2019: added option S2 to include 161-day tidal aliasing terms
@@ -88,6 +91,7 @@ UPDATE HISTORY:
 """
 import numpy as np
 import scipy.stats
+import scipy.linalg
 import scipy.special
 
 def piecewise_regress(t_in, d_in, BREAK_TIME=None, BREAKPOINT=None,
@@ -331,3 +335,164 @@ def piecewise_regress(t_in, d_in, BREAK_TIME=None, BREAKPOINT=None,
             'R2Adj':rsq_adj, 'MSE':MSE, 'NRMSE':NRMSE, 'AIC':AIC, 'BIC':BIC,
             'LOGLIK':log_lik, 'model':mod, 'simple': simple, 'residual':res,
             'N':n_terms, 'DOF': nu, 'cov_mat':Hinv}
+
+def piecewise_scan(t_in, d_in, BREAK_TIME=None, BREAKPOINT=None,
+    CYCLES=[0.5,1.0], DATA_ERR=0, WEIGHT=False, AICc=False):
+    """
+    Evaluates candidate breakpoints of a sharp breakpoint piecewise regression
+        for multiple time series by ordinary or weighted least-squares
+
+    The terms common to every candidate (constant, linear and cyclical) are
+        factored once and the breakpoint term is projected out of that fit
+        (Frisch-Waugh-Lovell) to calculate the sum of squares error for every
+        candidate breakpoint and time series simultaneously
+
+    Arguments
+    ---------
+    t_in: input time array
+    d_in: input data array (ntime) or multiple time series (nseries, ntime)
+
+    Keyword arguments
+    -----------------
+    BREAK_TIME: candidate breakpoint times for piecewise regression
+    BREAKPOINT: candidate breakpoint indices of piecewise regression
+    DATA_ERR: data precision
+        single value if equal
+        array if unequal for weighted least squares
+    WEIGHT: Set if measurement errors for use in weighted least squares
+    CYCLES: list of cyclical terms (0.5=semi-annual, 1=annual)
+    AICc: use second order AIC
+
+    Returns
+    -------
+    break_time: breakpoint time with the minimum information criteria
+    breakpoint: breakpoint indice with the minimum information criteria
+    beta: regressed coefficients array at the selected breakpoint
+    AIC: Akaike information criterion at the selected breakpoint
+    BIC: Bayesian information criterion at the selected breakpoint
+    LOGLIK: log-likelihood at the selected breakpoint
+    candidates: candidate breakpoint times
+    AIC_scan: Akaike information criterion for each candidate breakpoint
+    BIC_scan: Bayesian information criterion for each candidate breakpoint
+    N: number of terms used in fit
+    DOF: degrees of freedom
+    """
+
+    #-- remove singleton dimensions
+    t_in = np.squeeze(t_in)
+    d_in = np.squeeze(d_in)
+    nmax = len(t_in)
+    #-- check if fitting a single time series or multiple series
+    SINGLE = (np.ndim(d_in) == 1)
+    #-- data with a column for each time series (ntime, nseries)
+    d_in = np.transpose(np.atleast_2d(d_in))[0:nmax,:]
+
+    #-- If indices of cutoff times entered: will calculate cutoff times
+    #-- If cutoff times entered: will find the cutoff indices
+    if BREAKPOINT is not None:
+        nco = np.atleast_1d(BREAKPOINT).astype(np.int)
+        tco = t_in[nco]
+    elif BREAK_TIME is not None:
+        tco = np.atleast_1d(BREAK_TIME).astype(np.float64)
+        nco = np.argmin(np.abs(t_in[None,:] - tco[:,None]), axis=1)
+    else:
+        raise ValueError('Input BREAK_TIME or BREAKPOINT for scan')
+
+    #-- create design matrix of the terms shared by all breakpoints
+    #-- y = beta_0 + beta_1*t + e (for x <= alpha)
+    DMAT = []
+    #-- add polynomial orders (0=constant, 1=linear)
+    for o in range(2):
+        DMAT.append(t_in**o)
+    #-- add cyclical terms (0.5=semi-annual, 1=annual)
+    for c in CYCLES:
+        DMAT.append(np.sin(2.0*np.pi*t_in/np.float(c)))
+        DMAT.append(np.cos(2.0*np.pi*t_in/np.float(c)))
+    #-- take the transpose of the design matrix
+    DMAT = np.transpose(DMAT)
+    #-- Linear Term 2 for each candidate breakpoint (ntime, nbreak)
+    #-- y = beta_0 + beta_1*t + beta_2*(t-alpha) + e (for x > alpha)
+    indices = np.arange(nmax)[:,None]
+    P_x1 = np.where(indices >= nco[None,:], t_in[:,None] - tco[None,:], 0.0)
+
+    #-- Calculating Least-Squares Coefficients
+    if WEIGHT:
+        #-- Weighted Least-Squares fitting
+        if (np.ndim(DATA_ERR) == 0):
+            raise ValueError('Input DATA_ERR for Weighted Least-Squares')
+        #-- check if any error values are 0 (prevent infinite weights)
+        if np.count_nonzero(DATA_ERR == 0.0):
+            #-- change to minimum floating point value
+            DATA_ERR[DATA_ERR == 0.0] = np.finfo(np.float).eps
+        #--- Weight Precision
+        wi = np.squeeze(DATA_ERR**(-2))
+    else:
+        #-- Weights are equal
+        wi = np.ones((nmax))
+    #-- scale the rows of the design matrices and data by sqrt(weights)
+    sw = np.sqrt(wi)
+    WDMAT = sw[:,None]*DMAT
+    WP_x1 = sw[:,None]*P_x1
+    Wd_in = sw[:,None]*d_in
+    #-- single QR factorization of the shared design matrix: sqrt(W).X = Q.R
+    Q,R = np.linalg.qr(WDMAT)
+    #-- coefficients and residuals of the fit without a breakpoint
+    beta_0 = scipy.linalg.solve_triangular(R, np.dot(np.transpose(Q),Wd_in))
+    res_0 = Wd_in - np.dot(WDMAT,beta_0)
+    #-- breakpoint terms orthogonal to the shared terms
+    QtP = np.dot(np.transpose(Q),WP_x1)
+    P_perp = WP_x1 - np.dot(Q,QtP)
+    P_norm = np.sum(P_perp**2, axis=0)
+    #-- flag candidates where the breakpoint term is degenerate
+    valid = (P_norm > np.finfo(np.float).eps*np.sum(WP_x1**2, axis=0))
+    if not np.any(valid):
+        raise ValueError('No valid candidate breakpoints within time series')
+    P_norm[~valid] = np.inf
+    #-- coefficient of the breakpoint term for each candidate (nbreak, nseries)
+    beta_2 = np.dot(np.transpose(P_perp),res_0)/P_norm[:,None]
+    #-- weighted sum of squares error for each candidate (nbreak, nseries)
+    SSerror = np.sum(res_0**2, axis=0)[None,:] - P_norm[:,None]*beta_2**2
+    SSerror[~valid,:] = np.nan
+
+    #-- number of terms in least-squares solution
+    n_terms = DMAT.shape[1] + 1
+    #-- nu = Degrees of Freedom = number of measurements-number of parameters
+    nu = nmax - n_terms
+    #-- Fit Criterion
+    #-- number of parameters including the intercept and the variance
+    K = np.float(n_terms + 1)
+    #-- Log-Likelihood with weights (if unweighted, weight portions == 0)
+    log_lik = 0.5*(np.sum(np.log(wi)) - nmax*(np.log(2.0 * np.pi) + 1.0 -
+        np.log(nmax) + np.log(SSerror)))
+    #-- Aikaike's Information Criterion
+    AIC = -2.0*log_lik + 2.0*K
+    if AICc:
+        #-- Second-Order AIC correcting for small sample sizes (restricted)
+        AIC += (2.0*K*(K+1.0))/(nmax - K - 1.0)
+    #-- Bayesian Information Criterion (Schwarz Criterion)
+    BIC = -2.0*log_lik + np.log(nmax)*K
+
+    #-- number of terms is the same for all candidates so the minimum
+    #-- AIC and BIC are both at the minimum sum of squares error
+    imin = np.nanargmin(SSerror, axis=0)
+    iseries = np.arange(d_in.shape[1])
+    #-- recover the coefficients at the selected breakpoints
+    b2 = beta_2[imin,iseries]
+    Rinv = scipy.linalg.solve_triangular(R, np.eye(len(R)))
+    b0 = beta_0 - np.dot(Rinv,QtP[:,imin])*b2[None,:]
+    #-- coefficients ordered as in piecewise_regress
+    #-- calculating trend2 = beta1 + beta2
+    beta_out = np.concatenate((b0[0:2,:], (b0[1,:] + b2)[None,:], b0[2:,:]))
+
+    #-- output dictionary with candidates as the last dimension of scans
+    output = {'break_time':tco[imin], 'breakpoint':nco[imin],
+        'beta':np.transpose(beta_out), 'AIC':AIC[imin,iseries],
+        'BIC':BIC[imin,iseries], 'LOGLIK':log_lik[imin,iseries],
+        'candidates':tco, 'AIC_scan':np.transpose(AIC),
+        'BIC_scan':np.transpose(BIC), 'N':n_terms, 'DOF':nu}
+    #-- remove series dimension for a single time series
+    if SINGLE:
+        for key in ('break_time','breakpoint','beta','AIC','BIC','LOGLIK',
+            'AIC_scan','BIC_scan'):
+            output[key] = output[key][0]
+    return output
@@ -1,11 +1,21 @@
 #!/usr/bin/env python
 u"""
 read_love_numbers.py
-Written by Tyler Sutterley (12/2020)
+Written by Tyler Sutterley (03/2021)
 
 Reads sets of load Love numbers from PREM and applies isomorphic parameters
 Can linearly extrapolate load love numbers beyond maximum degree of dataset
 
+Parsed load Love number tables are kept in memory and can be stored in a
+    binary numpy file that is validated against the checksum of the dataset
+    and the header lines and columns used to parse the table
+Load Love numbers for each dataset, truncation and reference frame are
+    kept in memory by load_love_numbers for reuse within programs
+
+CALLING SEQUENCE:
+    hl,kl,ll = read_love_numbers(love_numbers_file, REFERENCE='CF')
+    hl,kl,ll = load_love_numbers(LMAX, LOVE_NUMBERS=0, REFERENCE='CF')
+
 INPUTS:
     love_numbers_file: Elastic load Love numbers file
         computed using Preliminary Reference Earth Model (PREM) outputs
@@ -33,11 +43,20 @@ OPTIONS:
         'dict': dictionary with variable keys as listed above
         'tuple': tuple with variable order hl,kl,ll
         'zip': aggregated variable sets
+    CACHE: binary file for caching the parsed load Love number table
 
 PYTHON DEPENDENCIES:
     numpy: Scientific Computing Tools For Python (https://numpy.org)
 
+PROGRAM DEPENDENCIES:
+    utilities: download and management utilities for syncing files
+
 UPDATE HISTORY:
+    Updated 03/2021: parse load Love number tables once and keep in memory
+        added option to cache parsed tables in a binary numpy file
+        added load_love_numbers for reading Love numbers of each dataset
+        validate cached tables with the header and column names
+        atomically write cache files and create the cache directory
     Updated 12/2020: generalized ascii read for outputs from Gegout and Wang
         added linear interpolation of love numbers to a specified LMAX
     Updated 08/2020: flake8 compatible regular expression strings
@@ -55,11 +74,20 @@ UPDATE HISTORY:
 """
 import os
 import re
+import copy
+import hashlib
 import numpy as np
+from gravity_toolkit.utilities import get_data_path, get_hash, write_cache
+
+#-- parsed load love number tables for each file
+_love_tables = {}
+#-- load love numbers for each truncation, dataset and reference frame
+_love_numbers = {}
 
 #-- PURPOSE: read load love numbers from PREM
-def read_love_numbers(love_numbers_file, LMAX=None, HEADER=2, 
-    COLUMNS=['l','hl','kl','ll'], REFERENCE='CE', FORMAT='tuple'):
+def read_love_numbers(love_numbers_file, LMAX=None, HEADER=2,
+    COLUMNS=['l','hl','kl','ll'], REFERENCE='CE', FORMAT='tuple',
+    CACHE=None):
     """
     Reads PREM load Love numbers file and applies isomorphic parameters
 
@@ -86,6 +114,7 @@ def read_love_numbers(love_numbers_file, LMAX=None, HEADER=2,
         'dict': dictionary with variable keys as listed above
         'tuple': tuple with variable order hl,kl,ll
         'zip': aggregated variable sets
+    CACHE: binary file for caching the parsed load Love number table
 
     Returns
     -------
@@ -94,49 +123,24 @@ def read_love_numbers(love_numbers_file, LMAX=None, HEADER=2,
     ll: Love number of Horizontal Displacement
     """
 
-    #-- check that load love number data file is present in file system
-    if not os.access(os.path.expanduser(love_numbers_file), os.F_OK):
-        #-- raise error if love_numbers file is not found in path
-        raise IOError('{0} not found'.format(love_numbers_file))
-
-    #-- Input load love number data file and read contents
-    with open(os.path.expanduser(love_numbers_file),'r') as f:
-        file_contents = f.read().splitlines()
-
-    #-- compile regular expression operator to find numerical instances
-    regex_pattern = r'[-+]?(?:(?:\d*\.\d+)|(?:\d+\.?))(?:[Ee][+-]?\d+)?'
-    rx = re.compile(regex_pattern, re.VERBOSE)
-
+    #-- read the parsed load love number table
+    table = love_number_table(love_numbers_file, HEADER=HEADER,
+        COLUMNS=COLUMNS, CACHE=CACHE)
+    #-- final spherical harmonic degree in the table
+    l = np.int(table['l'][-1])
     #-- extract maximum spherical harmonic degree from final line in file
     if LMAX is None:
-        LMAX = np.int(rx.findall(file_contents[-1])[COLUMNS.index('l')])
+        LMAX = np.copy(l)
 
     #-- output love numbers
     love = {}
     #-- spherical harmonic degree
     love['l'] = np.arange(LMAX+1)
-    #-- vertical displacement hl
-    love['hl'] = np.zeros((LMAX+1))
-    #-- gravitational potential kl
-    love['kl'] = np.zeros((LMAX+1))
-    #-- horizontal displacement ll
-    love['ll'] = np.zeros((LMAX+1))
-    #-- for each line in the file (skipping the 2 header lines)
-    for file_line in file_contents[HEADER:]:
-        #-- find numerical instances in line
-        #-- replacing fortran double precision exponential
-        love_numbers = rx.findall(file_line.replace('D','E'))            
-        #-- spherical harmonic degree
-        l = np.int(love_numbers[COLUMNS.index('l')])
-        #-- truncate to spherical harmonic degree LMAX
-        if (l <= LMAX):
-            #-- convert love numbers to float
-            #-- vertical displacement hl
-            love['hl'][l] = np.float(love_numbers[COLUMNS.index('hl')])
-            #-- gravitational potential kl
-            love['kl'][l] = np.float(love_numbers[COLUMNS.index('kl')])
-            #-- horizontal displacement ll
-            love['ll'][l] = np.float(love_numbers[COLUMNS.index('ll')])
+    #-- truncate to spherical harmonic degree LMAX
+    ind, = np.nonzero(table['l'] <= LMAX)
+    for var in ['hl','kl','ll']:
+        love[var] = np.zeros((LMAX+1))
+        love[var][table['l'][ind]] = table[var][ind]
 
     #-- LMAX of load love numbers from Han and Wahr (1995) is 696
     #-- From Wahr (2007), can linearly extrapolate the load numbers
@@ -179,3 +183,158 @@ def read_love_numbers(love_numbers_file, LMAX=None, HEADER=2,
         return (love['hl'], love['kl'], love['ll'])
     elif (FORMAT == 'zip'):
         return zip(love['hl'], love['kl'], love['ll'])
+
+#-- PURPOSE: parse a load love number table or read from memory or cache
+def love_number_table(love_numbers_file, HEADER=2,
+    COLUMNS=['l','hl','kl','ll'], CACHE=None):
+    """
+    Reads the degrees and load Love numbers of a PREM load Love numbers file
+
+    Arguments
+    ---------
+    love_numbers_file: Elastic load Love numbers file
+
+    Keyword arguments
+    -----------------
+    HEADER: number of header lines to be skipped
+    COLUMNS: column names of ascii file
+    CACHE: binary file for caching the parsed load Love number table
+
+    Returns
+    -------
+    l: spherical harmonic degree of each line
+    hl: Love number of Vertical Displacement
+    kl: Love number of Gravitational Potential
+    ll: Love number of Horizontal Displacement
+    """
+
+    #-- check that load love number data file is present in file system
+    if not os.access(os.path.expanduser(love_numbers_file), os.F_OK):
+        #-- raise error if love_numbers file is not found in path
+        raise IOError('{0} not found'.format(love_numbers_file))
+
+    #-- read the table if previously parsed
+    key = (os.path.abspath(os.path.expanduser(love_numbers_file)),
+        HEADER, tuple(COLUMNS))
+    table = _love_tables.get(key)
+    #-- checksum of the load love number file and parsing parameters
+    #-- to validate cached tables
+    if CACHE is not None:
+        CACHE = os.path.expanduser(CACHE)
+        file_hash = get_hash(os.path.expanduser(love_numbers_file))
+        parameters = '{0} {1:d} {2}'.format(file_hash,HEADER,','.join(COLUMNS))
+        checksum = hashlib.md5(parameters.encode('utf8')).hexdigest()
+    #-- read the parsed table from the binary cache file
+    valid_cache = False
+    if CACHE is not None and os.access(CACHE, os.F_OK):
+        with np.load(CACHE) as fileID:
+            valid_cache = (str(fileID['checksum']) == checksum)
+            if valid_cache and (table is None):
+                table = {var:fileID[var] for var in ['l','hl','kl','ll']}
+                _love_tables[key] = table
+
+    #-- parse the load love number data file
+    if table is None:
+        #-- Input load love number data file and read contents
+        with open(os.path.expanduser(love_numbers_file),'r') as f:
+            file_contents = f.read().splitlines()
+        #-- compile regular expression operator to find numerical instances
+        regex_pattern = r'[-+]?(?:(?:\d*\.\d+)|(?:\d+\.?))(?:[Ee][+-]?\d+)?'
+        rx = re.compile(regex_pattern, re.VERBOSE)
+        #-- find numerical instances in each line (skipping the header lines)
+        #-- replacing fortran double precision exponential
+        love_numbers = np.array([rx.findall(file_line.replace('D','E'))
+            for file_line in file_contents[HEADER:]], dtype=np.float)
+        #-- extract spherical harmonic degree and love numbers from columns
+        #-- vertical displacement hl, gravitational potential kl
+        #-- and horizontal displacement ll
+        table = {}
+        table['l'] = love_numbers[:,COLUMNS.index('l')].astype(np.int)
+        for var in ['hl','kl','ll']:
+            table[var] = love_numbers[:,COLUMNS.index(var)].copy()
+        #-- keep the parsed table in memory
+        _love_tables[key] = table
+    #-- save the parsed table to the binary cache file
+    if CACHE is not None and not valid_cache:
+        write_cache(CACHE, checksum=checksum, **table)
+    return table
+
+#-- PURPOSE: read load love numbers for a range of spherical harmonic degrees
+def load_love_numbers(LMAX, LOVE_NUMBERS=0, REFERENCE='CF', FORMAT='tuple',
+    CACHE=None):
+    """
+    Reads PREM load Love numbers for the range of spherical harmonic degrees
+    and applies isomorphic parameters
+
+    Arguments
+    ---------
+    LMAX: maximum spherical harmonic degree
+
+    Keyword arguments
+    -----------------
+    LOVE_NUMBERS: Load Love numbers dataset
+        0: Han and Wahr (1995) values from PREM
+        1: Gegout (2005) values from PREM
+        2: Wang et al. (2012) values from PREM
+    REFERENCE: Reference frame for calculating degree 1 love numbers
+        CF: Center of Surface Figure (default)
+        CM: Center of Mass of Earth System
+        CE: Center of Mass of Solid Earth
+    FORMAT: format of output variables
+        'dict': dictionary with variable keys
+        'tuple': tuple with variable order hl,kl,ll
+        'zip': aggregated variable sets
+    CACHE: directory for caching parsed load Love number tables
+
+    Returns
+    -------
+    kl: Love number of Gravitational Potential
+    hl: Love number of Vertical Displacement
+    ll: Love number of Horizontal Displacement
+    """
+    #-- load love numbers file
+    if (LOVE_NUMBERS == 0):
+        #-- PREM outputs from Han and Wahr (1995)
+        #-- https://doi.org/10.1111/j.1365-246X.1995.tb01819.x
+        love_numbers_file = get_data_path(['data','love_numbers'])
+        header = 2
+        columns = ['l','hl','kl','ll']
+    elif (LOVE_NUMBERS == 1):
+        #-- PREM outputs from Gegout (2005)
+        #-- http://gemini.gsfc.nasa.gov/aplo/
+        love_numbers_file = get_data_path(['data','Load_Love2_CE.dat'])
+        header = 3
+        columns = ['l','hl','ll','kl']
+    elif (LOVE_NUMBERS == 2):
+        #-- PREM outputs from Wang et al. (2012)
+        #-- https://doi.org/10.1016/j.cageo.2012.06.022
+        love_numbers_file = get_data_path(['data','PREM-LLNs-truncated.dat'])
+        header = 1
+        columns = ['l','hl','ll','kl','nl','nk']
+    else:
+        raise ValueError('Invalid Load Love numbers {0}'.format(LOVE_NUMBERS))
+    #-- read arrays of kl, hl, and ll Love Numbers if not in memory
+    key = (LMAX, LOVE_NUMBERS, REFERENCE.upper())
+    if key not in _love_numbers:
+        #-- binary file for caching the parsed table
+        if CACHE is not None:
+            cache_file = os.path.join(os.path.expanduser(CACHE),
+                '{0}.npz'.format(os.path.basename(love_numbers_file)))
+        else:
+            cache_file = None
+        #-- LMAX of load love numbers from Han and Wahr (1995) is 696.
+        #-- from Wahr (2007) linearly interpolating kl works
+        #-- however, as we are linearly extrapolating out, do not make
+        #-- LMAX too much larger than 696
+        _love_numbers[key] = read_love_numbers(love_numbers_file, LMAX=LMAX,
+            HEADER=header, COLUMNS=columns, REFERENCE=REFERENCE,
+            FORMAT='dict', CACHE=cache_file)
+    #-- copy love numbers so that values in memory are not modified
+    love = copy.deepcopy(_love_numbers[key])
+    #-- return love numbers in output format
+    if (FORMAT == 'dict'):
+        return love
+    elif (FORMAT == 'tuple'):
+        return (love['hl'], love['kl'], love['ll'])
+    elif (FORMAT == 'zip'):
+        return zip(love['hl'], love['kl'], love['ll'])
@@ -0,0 +1,244 @@
+#!/usr/bin/env python
+u"""
+sparse_harmonics.py
+Written by Tyler Sutterley (03/2021)
+
+Sparse spherical harmonic data class for low-degree time series such as
+    C20 and C30 from satellite laser ranging and degree 1 coefficients
+
+Each coefficient is stored as a separate series of GRACE/GRACE-FO months
+    and is combined with dense harmonics objects at the matching months
+    without expanding to the full (LMAX+1,MMAX+1,nt) dimensions
+Months are matched with a lookup table built once for each series
+
+PYTHON DEPENDENCIES:
+    numpy: Scientific Computing Tools For Python (https://numpy.org)
+
+PROGRAM DEPENDENCIES:
+    harmonics.py: spherical harmonic data class for processing GRACE/GRACE-FO
+
+UPDATE HISTORY:
+    Updated 03/2021: match months using lookup tables for each series
+        merge series from separate sparse harmonics objects
+    Written 03/2021
+"""
+import numpy as np
+from gravity_toolkit.harmonics import harmonics
+
+class sparse_harmonics(object):
+    """
+    Data class for low-degree spherical harmonic time series
+    """
+    np.seterr(invalid='ignore')
+    def __init__(self):
+        self.series={}
+        self.lmax=0
+        self.mmax=0
+
+    def add_series(self, l, m, month, data, time=None, sine=False):
+        """
+        Add a time series of a single spherical harmonic coefficient
+        Inputs:
+            l: spherical harmonic degree
+            m: spherical harmonic order
+            month: GRACE/GRACE-FO months of the series
+            data: spherical harmonic coefficients of the series
+        Options:
+            time: dates of the series
+            sine: series is a sine spherical harmonic coefficient
+        """
+        key = (np.int(l), np.int(m), 'slm' if sine else 'clm')
+        self.series[key] = dict(month=np.array(month, dtype=np.int),
+            data=np.array(data, dtype=np.float64))
+        #-- build month-indexed lookup table for the series
+        self.series[key]['index'] = self.lookup(self.series[key]['month'])
+        if time is not None:
+            self.series[key]['time'] = np.array(time, dtype=np.float64)
+        #-- update maximum degree and order
+        self.lmax = np.max([self.lmax, key[0]])
+        self.mmax = np.max([self.mmax, key[1]])
+        return self
+
+    def lookup(self, month):
+        """
+        Create a lookup table of indices for each GRACE/GRACE-FO month
+        Inputs: GRACE/GRACE-FO months of a series
+        Returns: array indexed by month with -1 for months not in the series
+        """
+        month = np.atleast_1d(month)
+        index = -np.ones((np.max(month, initial=0)+1), dtype=np.int)
+        #-- use the first occurrence of duplicate months
+        index[month[::-1]] = np.arange(len(month))[::-1]
+        return index
+
+    def gather(self, key, month):
+        """
+        Find the indices of a series for GRACE/GRACE-FO months
+        Inputs:
+            key: degree, order and variable of the series
+            month: GRACE/GRACE-FO months to find
+        Returns: series indices with -1 for unmatched months
+        """
+        index = self.series[key]['index']
+        month = np.atleast_1d(month)
+        k = -np.ones(month.shape, dtype=np.int)
+        valid, = np.nonzero((month >= 0) & (month < len(index)))
+        k[valid] = index[month[valid]]
+        return k
+
+    def unmatched(self, month):
+        """
+        Find the GRACE/GRACE-FO months not available in each series
+        Inputs: GRACE/GRACE-FO months to find
+        Returns: sorted list of months that are not in every series
+        """
+        month = np.atleast_1d(month)
+        missing = set()
+        for key in self.series.keys():
+            missing |= set(month[self.gather(key, month) < 0])
+        return sorted(missing)
+
+    def merge(self, temp):
+        """
+        Merge the series of another sparse harmonics object
+        Inputs: sparse harmonics object to be merged
+        """
+        self.series.update(temp.series)
+        #-- update maximum degree and order
+        self.lmax = np.max([self.lmax, temp.lmax])
+        self.mmax = np.max([self.mmax, temp.mmax])
+        return self
+
+    def from_geocenter(self, d):
+        """
+        Add degree 1 series from a geocenter dictionary
+        Inputs: dictionary with C10, C11, S11 and month variables
+        """
+        time = d.get('time')
+        self.add_series(1, 0, d['month'], d['C10'], time=time)
+        self.add_series(1, 1, d['month'], d['C11'], time=time)
+        self.add_series(1, 1, d['month'], d['S11'], time=time, sine=True)
+        return self
+
+    def from_dict(self, d, lmax=None):
+        """
+        Add series from a low-degree spherical harmonic dictionary
+            such as from read_CSR_monthly_6x1
+        Inputs: dictionary with clm, slm and time or month variables
+        Options: lmax maximum degree of spherical harmonics to add
+        """
+        #-- calculate GRACE/GRACE-FO months if not in dictionary
+        if 'month' in d.keys():
+            month = d['month']
+        else:
+            month = np.array(12.0*(d['time'] - 2002.0) + 1, dtype=np.int)
+        l1,m1,nt = np.shape(d['clm'])
+        lmax = (l1-1) if (lmax is None) else lmax
+        #-- for each valid spherical harmonic degree and order
+        for l in range(lmax+1):
+            for m in range(np.min([l,m1-1])+1):
+                self.add_series(l, m, month, d['clm'][l,m,:],
+                    time=d.get('time'))
+                if (m > 0):
+                    self.add_series(l, m, month, d['slm'][l,m,:],
+                        time=d.get('time'), sine=True)
+        return self
+
+    def subset(self, months):
+        """
+        Subset each series to specific GRACE/GRACE-FO months
+        Inputs: GRACE/GRACE-FO months
+        """
+        temp = sparse_harmonics()
+        for (l,m,key),s in self.series.items():
+            ii = np.nonzero(np.isin(s['month'], months))
+            temp.add_series(l, m, s['month'][ii], s['data'][ii],
+                time=s['time'][ii] if ('time' in s.keys()) else None,
+                sine=(key == 'slm'))
+        return temp
+
+    def months(self):
+        """
+        Returns the GRACE/GRACE-FO months common to all series
+        """
+        months = [s['month'] for s in self.series.values()]
+        return np.array(sorted(set.intersection(*map(set, months))))
+
+    def combine(self, temp, operator='replace', out=None):
+        """
+        Combine the sparse series with a dense harmonics object
+            at matching GRACE/GRACE-FO months
+        Inputs: harmonics object to combine
+        Options:
+            operator: replace, add or subtract coefficients
+            out: harmonics object for output (default is in-place)
+        """
+        #-- output harmonics object
+        out = temp if (out is None) else temp.copy(out=out)
+        #-- months of the dense harmonics object
+        month = np.atleast_1d(out.month)
+        for (l,m,key),s in self.series.items():
+            #-- skip coefficients outside of the dense truncation
+            if (l > out.lmax) or (m > out.mmax):
+                continue
+            #-- indices of matching months from lookup table
+            k = self.gather((l,m,key), month)
+            i1, = np.nonzero(k >= 0)
+            i2 = k[i1]
+            #-- coefficients to combine
+            Ylms = getattr(out, key)
+            #-- single harmonic fields are combined as a singleton time
+            if (Ylms.ndim == 2):
+                Ylms = Ylms[:,:,None]
+            if (operator == 'replace'):
+                Ylms[l,m,i1] = s['data'][i2]
+            elif (operator == 'add'):
+                Ylms[l,m,i1] += s['data'][i2]
+            elif (operator == 'subtract'):
+                Ylms[l,m,i1] -= s['data'][i2]
+        return out
+
+    def replace(self, temp, out=None):
+        """
+        Replace coefficients of a dense harmonics object
+        Inputs: harmonics object with coefficients to replace
+        Options: harmonics object for output (default is in-place)
+        """
+        return self.combine(temp, operator='replace', out=out)
+
+    def to_harmonics(self, lmax=None, mmax=None, months=None):
+        """
+        Expand the sparse series to a dense harmonics object
+        Options:
+            lmax maximum degree of spherical harmonics
+            mmax maximum order of spherical harmonics
+            GRACE/GRACE-FO months (default is months common to all series)
+        """
+        lmax = self.lmax if (lmax is None) else lmax
+        mmax = lmax if (mmax is None) else mmax
+        months = self.months() if (months is None) else np.array(months)
+        temp = harmonics(lmax=lmax, mmax=mmax)
+        temp.clm = np.zeros((lmax+1,mmax+1,len(months)))
+        temp.slm = np.zeros((lmax+1,mmax+1,len(months)))
+        temp.month = np.copy(months)
+        temp.time = np.zeros((len(months)))
+        temp.update_dimensions()
+        #-- fill dates from any series with time information
+        for key,s in self.series.items():
+            if 'time' in s.keys():
+                k = self.gather(key, months)
+                i1, = np.nonzero(k >= 0)
+                temp.time[i1] = s['time'][k[i1]]
+        return self.combine(temp, operator='replace')
+
+    def __radd__(self, temp):
+        """
+        Add the sparse series to a copy of a dense harmonics object
+        """
+        return self.combine(temp.copy(), operator='add')
+
+    def __rsub__(self, temp):
+        """
+        Subtract the sparse series from a copy of a dense harmonics object
+        """
+        return self.combine(temp.copy(), operator='subtract')
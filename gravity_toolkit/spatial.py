@@ -1,7 +1,7 @@
 #!/usr/bin/env python
 u"""
 spatial.py
-Written by Tyler Sutterley (01/2021)
+Written by Tyler Sutterley (03/2021)
 
 Data class for reading, writing and processing spatial data
 
@@ -19,6 +19,14 @@ PROGRAM DEPENDENCIES:
     hdf5_read.py: reads spatial data from HDF5
 
 UPDATE HISTORY:
+    Updated 03/2021: can read a latitude band from netCDF4 and HDF5 files
+        vectorized reading of ascii files with a single parse of all lines
+        check the number of values in each line of ascii files
+        raise errors when reading dates of ascii files without a time column
+        read lists of files into a preallocated grid with multiprocessing
+        cache stacked spatial data as a chunked netCDF4 or HDF5 file
+        validate cache files against the list of input files
+        terminate the pool of processes if a file in the list cannot be read
     Updated 01/2021: added scaling factor and scaling factor error function
         from Lander and Swenson (2012) https://doi.org/10.1029/2011WR011453
     Updated 12/2020: added transpose function, can calculate mean over indices
@@ -37,6 +45,10 @@ import io
 import copy
 import gzip
 import zipfile
+import h5py
+import netCDF4
+import itertools
+import multiprocessing
 import numpy as np
 from gravity_toolkit.ncdf_write import ncdf_write
 from gravity_toolkit.hdf5_write import hdf5_write
@@ -117,6 +129,9 @@ class spatial(object):
             #-- read input ascii file (.txt, .asc) and split lines
             with open(self.filename,'r') as f:
                 file_contents = f.read().splitlines()
+        #-- decode file contents if streamed from memory as bytes
+        if file_contents and isinstance(file_contents[0], bytes):
+            file_contents = [l.decode('ISO-8859-1') for l in file_contents]
         #-- compile regular expression operator for extracting numerical values
         #-- from input ascii files of spatial data
         regex_pattern = r'[-+]?(?:(?:\d*\.\d+)|(?:\d+\.?))(?:[EeD][+-]?\d+)?'
@@ -131,25 +146,31 @@ class spatial(object):
         #-- output spatial data
         self.data = np.zeros((self.shape[0],self.shape[1]))
         self.mask = np.zeros((self.shape[0],self.shape[1]),dtype=np.bool)
+        #-- extract the numerical values of all lines in the file
+        #-- converting fortran exponentials if applicable
+        file_contents = [l for l in file_contents[header:] if l.strip()]
+        #-- raise error if the file does not contain a time column
+        if date and file_contents and \
+            (len(rx.findall(file_contents[0])) < len(columns)):
+            raise ValueError(('{0} does not contain a time column '
+                '(read with date=False)').format(self.filename))
         #-- remove time from list of column names if not date
-        columns = [c for c in columns if (c != 'time')]
-        #-- extract spatial data array and convert to matrix
-        #-- for each line in the file
-        for line in file_contents[header:]:
-            #-- extract columns of interest and assign to dict
-            #-- convert fortran exponentials if applicable
-            d = {c:r.replace('D','E') for c,r in zip(columns,rx.findall(line))}
-            #-- convert line coordinates to integers
-            ilon = np.int(np.float(d['lon'])/self.spacing[0])
-            ilat = np.int((90.0-np.float(d['lat']))//self.spacing[1])
-            self.data[ilat,ilon] = np.float(d['data'])
-            self.mask[ilat,ilon] = False
-            self.lon[ilon] = np.float(d['lon'])
-            self.lat[ilat] = np.float(d['lat'])
-            #-- if the ascii file contains date variables
-            if date:
-                self.time = np.array(d['time'],dtype='f')
-                self.month = np.array(12.0*(self.time-2002.0)+1,dtype='i')
+        if not date:
+            columns = [c for c in columns if (c != 'time')]
+        d = self.parse_ascii_columns(file_contents, rx, len(columns))
+        d = {c:d[:,i] for i,c in enumerate(columns)}
+        #-- convert line coordinates to grid indices
+        ilon = (d['lon']/self.spacing[0]).astype(np.int)
+        ilat = ((90.0-d['lat'])//self.spacing[1]).astype(np.int)
+        #-- fill spatial data array and coordinates
+        self.data[ilat,ilon] = d['data']
+        self.mask[ilat,ilon] = False
+        self.lon[ilon] = d['lon']
+        self.lat[ilat] = d['lat']
+        #-- if the ascii file contains date variables
+        if date and (len(d['time']) > 0):
+            self.time = np.array(d['time'][-1],dtype='f')
+            self.month = np.array(12.0*(self.time-2002.0)+1,dtype='i')
         #-- get spacing and dimensions
         self.update_spacing()
         self.update_extents()
@@ -157,8 +178,43 @@ class spatial(object):
         self.update_mask()
         return self
 
+    @staticmethod
+    def parse_ascii_columns(file_contents, rx, ncols):
+        """
+        Extract numerical columns from the lines of an ascii file
+        Inputs:
+            lines of the ascii file
+            compiled regular expression for numerical values
+            number of columns to extract
+        """
+        #-- number of lines in the file
+        nlines = len(file_contents)
+        if (nlines == 0):
+            return np.zeros((0,ncols))
+        #-- find all numerical values and line breaks in a single pass
+        text = '\n'.join(file_contents).replace('D','E') + '\n'
+        rx_lines = re.compile(r'(?:{0})|\n'.format(rx.pattern), rx.flags)
+        values = np.array(rx_lines.findall(text))
+        #-- number of values in each line of the file
+        line_breaks = (values == '\n')
+        nvalues = np.diff(np.flatnonzero(np.r_[True,line_breaks])) - 1
+        if np.all(nvalues == nvalues[0]) and (nvalues[0] >= ncols):
+            #-- lines have a consistent number of values
+            values = values[~line_breaks].astype(np.float)
+            return values.reshape(nlines,nvalues[0])[:,:ncols]
+        #-- extract the values of each line separately
+        values = np.zeros((nlines,ncols))
+        for i,line in enumerate(file_contents):
+            v = rx.findall(line.replace('D','E'))[:ncols]
+            #-- raise error if the line is missing columns
+            if (len(v) < ncols):
+                raise ValueError('Line {0:d} contains {1:d} of {2:d} columns'.format(
+                    i+1,len(v),ncols))
+            values[i,:] = np.array(v,dtype=np.float)
+        return values
+
     def from_netCDF4(self, filename, date=True, compression=None, verbose=False,
-        varname='z', lonname='lon', latname='lat', timename='time'):
+        varname='z', lonname='lon', latname='lat', timename='time', band=None):
         """
         Read a spatial object from a netCDF4 file
         Inputs: full path of input netCDF4 file
@@ -167,13 +223,14 @@ class spatial(object):
             netCDF4 file is compressed or streamed from memory
             verbose output of file information
             netCDF4 variable names of data, longitude, latitude and time
+            slice of latitude indices to read as a latitude band
         """
         #-- set filename
         self.case_insensitive_filename(filename)
         #-- read data from netCDF4 file
         data = ncdf_read(self.filename, COMPRESSION=compression,
             VERBOSE=verbose, DATE=date, VARNAME=varname,
-            LONNAME=lonname, LATNAME=latname, TIMENAME=timename)
+            LONNAME=lonname, LATNAME=latname, TIMENAME=timename, BAND=band)
         self.data = data['data'].copy()
         if '_FillValue' in data['attributes']['data'].keys():
             self.fill_value = data['attributes']['data']['_FillValue']
@@ -193,7 +250,7 @@ class spatial(object):
         return self
 
     def from_HDF5(self, filename, date=True, compression=None, verbose=False,
-        varname='z', lonname='lon', latname='lat', timename='time'):
+        varname='z', lonname='lon', latname='lat', timename='time', band=None):
         """
         Read a spatial object from a HDF5 file
         Inputs: full path of input HDF5 file
@@ -202,16 +259,17 @@ class spatial(object):
             HDF5 file is compressed or streamed from memory
             verbose output of file information
             HDF5 variable names of data, longitude, latitude and time
+            slice of latitude indices to read as a latitude band
         """
         #-- set filename
         self.case_insensitive_filename(filename)
         #-- read data from HDF5 file
         data = hdf5_read(self.filename, COMPRESSION=compression,
             VERBOSE=verbose, DATE=date, VARNAME=varname,
-            LONNAME=lonname, LATNAME=latname, TIMENAME=timename)
+            LONNAME=lonname, LATNAME=latname, TIMENAME=timename, BAND=band)
         self.data = data['data'].copy()
         if '_FillValue' in data['attributes']['data'].keys():
-            self.fill_value = data['attributes']['_FillValue']
+            self.fill_value = data['attributes']['data']['_FillValue']
         self.mask = np.zeros(self.data.shape, dtype=np.bool)
         self.lon = data['lon'].copy()
         self.lat = data['lat'].copy()
@@ -227,35 +285,199 @@ class spatial(object):
         self.update_mask()
         return self
 
-    def from_index(self, filename, format=None, date=True, sort=True):
+    def from_index(self, filename, format=None, date=True, sort=True,
+        processes=0, cache=None):
         """
-        Read a spatial object from an index of netCDF4 or HDF5 files
+        Read a spatial object from an index of ascii, netCDF4 or HDF5 files
         Inputs: full path of index file to be read into a spatial object
         Options:
-            format of files in index ( netCDF4 or HDF5)
-            netCDF4, or HDF5 contains date information
+            format of files in index (ascii, netCDF4 or HDF5)
+            ascii, netCDF4, or HDF5 contains date information
             sort spatial objects by date information
+            number of processes for reading files in parallel
+            netCDF4 or HDF5 file for caching the stacked spatial data
         """
         #-- set filename
         self.case_insensitive_filename(filename)
         #-- Read index file of input spatial data
         with open(self.filename,'r') as f:
-            file_list = f.read().splitlines()
-        #-- create a list of spatial objects
-        h = []
-        #-- for each file in the index
-        for i,f in enumerate(file_list):
-            if (format == 'ascii'):
-                #-- netcdf (.nc)
-                h.append(spatial().from_ascii(os.path.expanduser(f),date=date))
-            elif (format == 'netCDF4'):
-                #-- netcdf (.nc)
-                h.append(spatial().from_netCDF4(os.path.expanduser(f),date=date))
-            elif (format == 'HDF5'):
-                #-- HDF5 (.H5)
-                h.append(spatial().from_HDF5(os.path.expanduser(f),date=date))
-        #-- create a single spatial object from the list
-        return self.from_list(h,date=date,sort=sort)
+            file_list = [os.path.expanduser(f) for f in f.read().splitlines()]
+        #-- create a single spatial object from the files in the index
+        return self.from_file_list(file_list, format=format, date=date,
+            sort=sort, processes=processes, cache=cache)
+
+    def from_file_list(self, file_list, format=None, date=True, sort=True,
+        processes=0, cache=None):
+        """
+        Read a spatial object from a list of ascii, netCDF4 or HDF5 files
+        Inputs: list of files to be read into a spatial object
+        Options:
+            format of files in list (ascii, netCDF4 or HDF5)
+            ascii, netCDF4, or HDF5 contains date information
+            sort spatial objects by date information
+            number of processes for reading files in parallel
+            netCDF4 or HDF5 file for caching the stacked spatial data
+        """
+        #-- number of files in list
+        n = len(file_list)
+        #-- read the stacked spatial data from a valid cache file
+        if cache is not None and self.valid_cache(cache, file_list):
+            return self.read_cache(cache, n, date=date)
+        #-- spatial dimensions for ascii files
+        kwargs = dict(spacing=self.spacing, nlat=self.shape[0],
+            nlon=self.shape[1], extent=self.extent)
+        #-- read the first file for the output grid
+        temp = read_spatial_file(file_list[0], format=format, date=date,
+            **kwargs)
+        #-- extract dimensions and grid spacing
+        self.spacing = temp.spacing
+        self.extent = temp.extent
+        self.shape = temp.shape
+        self.fill_value = temp.fill_value
+        self.lon = temp.lon.copy()
+        self.lat = temp.lat.copy()
+        #-- allocate for the output spatial grid and mask
+        self.data = np.zeros((self.shape[0],self.shape[1],n))
+        self.mask = np.zeros((self.shape[0],self.shape[1],n),dtype=np.bool)
+        #-- create list of files and attributes
+        self.filename = [None]*n
+        self.attributes = [None]*n
+        #-- output dates
+        if date:
+            self.time = np.zeros((n))
+            self.month = np.zeros((n),dtype=np.int)
+        #-- read each file in the list into the preallocated grid
+        args = [(f,format,date,kwargs) for f in file_list[1:]]
+        if processes:
+            #-- read files in parallel with multiprocessing Pool
+            pool = multiprocessing.Pool(processes=processes)
+            objects = pool.imap(read_spatial_args, args)
+        else:
+            objects = map(read_spatial_args, args)
+        try:
+            for t,temp in enumerate(itertools.chain([temp],objects)):
+                self.data[:,:,t] = temp.data[:,:]
+                self.mask[:,:,t] |= temp.mask[:,:]
+                if date:
+                    self.time[t] = np.atleast_1d(temp.time)
+                    self.month[t] = np.atleast_1d(temp.month)
+                self.filename[t] = temp.filename
+                self.attributes[t] = temp.attributes
+        except:
+            #-- stop the workers if a file could not be read
+            if processes:
+                pool.terminate()
+            raise
+        finally:
+            #-- close the pool
+            if processes:
+                pool.close()
+                pool.join()
+        #-- sort spatial data if not in date order
+        if date and sort and np.any(np.diff(self.time) < 0):
+            list_sort = np.argsort(self.time)
+            self.data = self.data[:,:,list_sort]
+            self.mask = self.mask[:,:,list_sort]
+            self.time = self.time[list_sort]
+            self.month = self.month[list_sort]
+            self.filename = [self.filename[i] for i in list_sort]
+            self.attributes = [self.attributes[i] for i in list_sort]
+        #-- update the dimensions
+        self.update_dimensions()
+        self.update_mask()
+        #-- save the stacked spatial data to the cache file
+        if cache is not None:
+            self.write_cache(cache, file_list=file_list, date=date)
+        return self
+
+    def valid_cache(self, cache, file_list):
+        """
+        Check if a cache file of stacked spatial data is valid
+        Inputs:
+            netCDF4 or HDF5 file for caching the stacked spatial data
+            list of files in the stacked spatial data
+        """
+        #-- cache file is valid if newer than each file in the list
+        cache = os.path.expanduser(cache)
+        if not os.access(cache, os.F_OK):
+            return False
+        mtime = os.stat(cache).st_mtime
+        if not all([(os.stat(f).st_mtime <= mtime) for f in file_list]):
+            return False
+        #-- and if created from the same list of files
+        if re.search(r'\.(h5|hdf5)$', cache, re.I):
+            with h5py.File(cache, 'r') as fileID:
+                cache_list = fileID.attrs.get('file_list', '')
+        else:
+            with netCDF4.Dataset(cache, 'r') as fileID:
+                cache_list = getattr(fileID, 'file_list', '')
+        if isinstance(cache_list, bytes):
+            cache_list = cache_list.decode('utf-8')
+        return (cache_list.splitlines() == list(file_list))
+
+    def read_cache(self, cache, n, date=True):
+        """
+        Read stacked spatial data from a cache file
+        Inputs:
+            netCDF4 or HDF5 file for caching the stacked spatial data
+            number of files in the stacked spatial data
+        Options: spatial objects contain date information
+        """
+        #-- read the stacked spatial data using the format of the cache
+        cache = os.path.expanduser(cache)
+        if re.search(r'\.(h5|hdf5)$', cache, re.I):
+            self.from_HDF5(cache, date=date)
+        else:
+            self.from_netCDF4(cache, date=date)
+        #-- verify that the cache file contains each date
+        self.expand_dims()
+        if (self.shape[2] != n):
+            raise ValueError('Cache file {0} does not contain {1:d} dates'.format(
+                cache, n))
+        return self
+
+    def write_cache(self, cache, file_list=None, date=True):
+        """
+        Write stacked spatial data to a chunked cache file
+        Inputs: netCDF4 or HDF5 file for caching the stacked spatial data
+        Options:
+            list of files in the stacked spatial data
+            spatial objects contain date information
+        """
+        #-- chunk the stacked data as latitude bands of the full time series
+        nlat,nlon,nt = np.shape(self.data)
+        nband = np.int(np.clip(2**20//(8*nlon*nt), 1, nlat))
+        kwargs = dict(units='', longname='', chunksizes=(nband,nlon,nt))
+        #-- netCDF4 variables of a single date are two-dimensional
+        HDF5 = re.search(r'\.(h5|hdf5)$', cache, re.I)
+        if not HDF5 and (nt == 1):
+            self.data,self.mask = (self.data[:,:,0],self.mask[:,:,0])
+            kwargs['chunksizes'] = (nband,nlon)
+        #-- units and description of the stacked spatial data
+        try:
+            kwargs['units'] = self.attributes[0]['data']['units']
+            kwargs['longname'] = self.attributes[0]['data']['long_name']
+        except (IndexError, KeyError, TypeError):
+            pass
+        #-- write the stacked spatial data using the format of the cache
+        #-- keeping the list of filenames of the stacked spatial data
+        filename = copy.copy(self.filename)
+        if HDF5:
+            self.to_HDF5(cache, date=date, **kwargs)
+        else:
+            self.to_netCDF4(cache, date=date, **kwargs)
+        self.filename = filename
+        #-- restore the date dimension of single dates
+        if (self.ndim == 3) and (np.ndim(self.data) == 2):
+            self.data,self.mask = (self.data[:,:,None],self.mask[:,:,None])
+        #-- add the list of input files for validating the cache
+        file_list = '\n'.join(file_list if file_list else [])
+        if HDF5:
+            with h5py.File(os.path.expanduser(cache), 'a') as fileID:
+                fileID.attrs['file_list'] = file_list
+        else:
+            with netCDF4.Dataset(os.path.expanduser(cache), 'a') as fileID:
+                fileID.file_list = file_list
 
     def from_list(self, object_list, date=True, sort=True, clear=False):
         """
@@ -880,3 +1102,34 @@ class spatial(object):
         #-- replace invalid values with new fill value
         self.data[self.mask] = self.fill_value
         return self
+
+#-- PURPOSE: read a spatial object from an ascii, netCDF4 or HDF5 file
+def read_spatial_file(filename, format=None, date=True, **kwargs):
+    """
+    Read a spatial object from an ascii, netCDF4 or HDF5 file
+    Inputs: full path of input file
+    Options:
+        format of input file (ascii, netCDF4 or HDF5)
+        ascii, netCDF4, or HDF5 contains date information
+        **kwargs: keyword arguments for creating the spatial object
+    """
+    if (format == 'ascii'):
+        #-- ascii (.txt)
+        return spatial(**kwargs).from_ascii(filename, date=date)
+    elif (format == 'netCDF4'):
+        #-- netcdf (.nc)
+        return spatial().from_netCDF4(filename, date=date)
+    elif (format == 'HDF5'):
+        #-- HDF5 (.H5)
+        return spatial().from_HDF5(filename, date=date)
+    else:
+        raise ValueError('Unknown spatial format {0}'.format(format))
+
+#-- PURPOSE: read a spatial object from a tuple of arguments
+def read_spatial_args(args):
+    """
+    Read a spatial object from a tuple of arguments for multiprocessing
+    Inputs: tuple of filename, format, date and spatial keyword arguments
+    """
+    filename,format,date,kwargs = args
+    return read_spatial_file(filename, format=format, date=date, **kwargs)
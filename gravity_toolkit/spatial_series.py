@@ -0,0 +1,193 @@
+#!/usr/bin/env python
+u"""
+spatial_series.py
+Written by Tyler Sutterley (03/2021)
+
+Writes a time series of spatial fields to a single netCDF4 or HDF5 file
+
+The spatial data variable is created with an unlimited time dimension and is
+    chunked and compressed, with each spatial field streamed to the file
+    as it is appended
+Files are read with ncdf_read.py, hdf5_read.py or the spatial class
+    as a single stacked spatial object
+
+CALLING SEQUENCE:
+    with spatial_series(FILENAME, lon, lat, format='netCDF4') as fid:
+        for grid in grids:
+            fid.append(grid.data, grid.time)
+
+INPUTS:
+    filename: output netCDF4 or HDF5 file
+    lon: longitude array
+    lat: latitude array
+
+OPTIONS:
+    format: output data format (netCDF4 or HDF5)
+    varname: z variable name in output file
+    lonname: longitude variable name in output file
+    latname: latitude variable name in output file
+    timename: time variable name in output file
+    units: z variable units
+    longname: z variable description
+    fill_value: missing value for z variable
+    time_units: time variable units
+    time_longname: time variable description
+    title: description attribute of dataset
+    reference: reference attribute of dataset
+    chunks: chunk sizes of the z variable (default: one field per chunk)
+    verbose: print the output filename
+
+PYTHON DEPENDENCIES:
+    numpy: Scientific Computing Tools For Python (https://numpy.org)
+    netCDF4: Python interface to the netCDF C library
+        (https://unidata.github.io/netcdf4-python/netCDF4/index.html)
+    h5py: Python interface for Hierarchal Data Format 5 (HDF5)
+        (https://www.h5py.org)
+
+UPDATE HISTORY:
+    Written 03/2021
+"""
+from __future__ import print_function
+
+import os
+import time
+import h5py
+import netCDF4
+import numpy as np
+
+class spatial_series(object):
+    """
+    Data class for streaming a time series of spatial fields
+        to a single netCDF4 or HDF5 file
+    """
+    def __init__(self, filename, lon, lat, format='netCDF4', varname='z',
+        lonname='lon', latname='lat', timename='time', units='',
+        longname='', fill_value=None, time_units='years',
+        time_longname='Date_in_Decimal_Years', title=None, reference=None,
+        chunks=None, verbose=False):
+        self.filename = os.path.expanduser(filename)
+        self.format = format
+        self.varname = varname
+        self.timename = timename
+        self.fill_value = fill_value
+        #-- spatial dimensions
+        nlat,nlon = (len(lat),len(lon))
+        self.shape = [nlat,nlon,0]
+        #-- chunk sizes of the output spatial data
+        chunks = (nlat,nlon,1) if (chunks is None) else tuple(chunks)
+        print(self.filename) if verbose else None
+        #-- create output file with an unlimited time dimension
+        if (self.format == 'netCDF4'):
+            self.fileID = netCDF4.Dataset(self.filename, 'w', format="NETCDF4")
+            self.fileID.createDimension(lonname, nlon)
+            self.fileID.createDimension(latname, nlat)
+            self.fileID.createDimension(timename, None)
+            #-- defining the netCDF4 variables
+            nc = {}
+            nc[lonname] = self.fileID.createVariable(lonname,
+                np.asarray(lon).dtype, (lonname,))
+            nc[latname] = self.fileID.createVariable(latname,
+                np.asarray(lat).dtype, (latname,))
+            nc[varname] = self.fileID.createVariable(varname, 'f8',
+                (latname,lonname,timename,), fill_value=fill_value,
+                zlib=True, chunksizes=chunks)
+            nc[timename] = self.fileID.createVariable(timename, 'f8',
+                (timename,))
+            #-- filling netCDF4 coordinate variables
+            nc[lonname][:] = lon
+            nc[latname][:] = lat
+            #-- Defining attributes for longitude and latitude
+            nc[lonname].long_name = 'longitude'
+            nc[lonname].units = 'degrees_east'
+            nc[latname].long_name = 'latitude'
+            nc[latname].units = 'degrees_north'
+            #-- Defining attributes for dataset and date
+            nc[varname].long_name = longname
+            nc[varname].units = units
+            nc[timename].long_name = time_longname
+            nc[timename].units = time_units
+            #-- global variables of netCDF4 file
+            if title:
+                self.fileID.title = title
+            if reference:
+                self.fileID.reference = reference
+            self.fileID.date_created = time.strftime('%Y-%m-%d',time.localtime())
+        elif (self.format == 'HDF5'):
+            self.fileID = h5py.File(self.filename, 'w')
+            #-- Defining the HDF5 dataset variables
+            h5 = {}
+            h5[lonname] = self.fileID.create_dataset(lonname, (nlon,),
+                data=lon, dtype=np.asarray(lon).dtype, compression='gzip')
+            h5[latname] = self.fileID.create_dataset(latname, (nlat,),
+                data=lat, dtype=np.asarray(lat).dtype, compression='gzip')
+            h5[varname] = self.fileID.create_dataset(varname, (nlat,nlon,0),
+                maxshape=(nlat,nlon,None), dtype=np.float, chunks=chunks,
+                fillvalue=fill_value, compression='gzip')
+            h5[timename] = self.fileID.create_dataset(timename, (0,),
+                maxshape=(None,), dtype=np.float, chunks=(chunks[2],))
+            #-- add dimensions
+            h5[varname].dims[0].label = latname
+            h5[varname].dims[0].attach_scale(h5[latname])
+            h5[varname].dims[1].label = lonname
+            h5[varname].dims[2].label = timename
+            h5[varname].dims[2].attach_scale(h5[timename])
+            #-- Defining attributes for longitude and latitude
+            h5[lonname].attrs['long_name'] = 'longitude'
+            h5[lonname].attrs['units'] = 'degrees_east'
+            h5[latname].attrs['long_name'] = 'latitude'
+            h5[latname].attrs['units'] = 'degrees_north'
+            #-- Defining attributes for dataset and date
+            h5[varname].attrs['long_name'] = longname
+            h5[varname].attrs['units'] = units
+            if (fill_value is not None):
+                h5[varname].attrs['_FillValue'] = fill_value
+            h5[timename].attrs['long_name'] = time_longname
+            h5[timename].attrs['units'] = time_units
+            #-- description and reference of file
+            if title:
+                self.fileID.attrs['description'] = title
+            if reference:
+                self.fileID.attrs['reference'] = reference
+            self.fileID.attrs['date_created'] = \
+                time.strftime('%Y-%m-%d',time.localtime())
+        else:
+            raise ValueError('Unknown spatial series format {0}'.format(format))
+
+    def append(self, data, tim):
+        """
+        Append a spatial field to the end of the time series
+        Inputs:
+            spatial field (lat,lon) or stacked spatial fields (lat,lon,n)
+            time of each spatial field
+        """
+        data = np.atleast_3d(data)
+        tim = np.atleast_1d(tim)
+        #-- indices of the appended spatial fields
+        t0 = self.shape[2]
+        t1 = t0 + data.shape[2]
+        if (self.format == 'netCDF4'):
+            #-- netCDF4 variables are extended when written
+            self.fileID.variables[self.varname][:,:,t0:t1] = data
+            self.fileID.variables[self.timename][t0:t1] = tim
+        elif (self.format == 'HDF5'):
+            #-- resize HDF5 datasets and write the spatial fields
+            self.fileID[self.varname].resize(t1, axis=2)
+            self.fileID[self.varname][:,:,t0:t1] = data
+            self.fileID[self.timename].resize(t1, axis=0)
+            self.fileID[self.timename][t0:t1] = tim
+        self.shape[2] = t1
+        return self
+
+    def close(self):
+        """
+        Close the output spatial series file
+        """
+        if self.fileID is not None:
+            self.fileID.close()
+            self.fileID = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -1,7 +1,7 @@
 #!/usr/bin/env python
 u"""
 time.py
-Written by Tyler Sutterley (01/2021)
+Written by Tyler Sutterley (03/2021)
 Utilities for calculating time operations
 
 PYTHON DEPENDENCIES:
@@ -11,6 +11,7 @@ PYTHON DEPENDENCIES:
         https://dateutil.readthedocs.io/en/stable/
 
 UPDATE HISTORY:
+    Updated 03/2021: calendar_days can calculate for arrays of years
     Updated 01/2021: add date parser for cases when only a date and no units
     Updated 12/2020: merged with convert_julian and convert_calendar_decimal
         added calendar_days routine to get number of days per month
@@ -94,11 +95,11 @@ def calendar_days(year):
 
     Arguments
     ---------
-    year: calendar year
+    year: calendar year (can be an array of years)
 
     Returns
     -------
-    dpm: number of days for each month
+    dpm: number of days for each month (for each year)
     """
     #-- days per month in a leap and a standard year
     #-- only difference is February (29 vs. 28)
@@ -111,15 +112,15 @@ def calendar_days(year):
     #-- Subtracting a leap year every 100 years ==> average 365.24
     #-- Adding a leap year back every 400 years ==> average 365.2425
     #-- Subtracting a leap year every 4000 years ==> average 365.24225
+    year = np.array(year)
     m4 = (year % 4)
     m100 = (year % 100)
     m400 = (year % 400)
     m4000 = (year % 4000)
     #-- find indices for standard years and leap years using criteria
-    if ((m4 == 0) & (m100 != 0) | (m400 == 0) & (m4000 != 0)):
-        return dpm_leap
-    elif ((m4 != 0) | (m100 == 0) & (m400 != 0) | (m4000 == 0)):
-        return dpm_stnd
+    leap = ((m4 == 0) & (m100 != 0) | (m400 == 0) & (m4000 != 0))
+    #-- days per month for each year (with months as the last dimension)
+    return np.where(leap[...,None], dpm_leap, dpm_stnd)
 
 #-- PURPOSE: convert times from seconds since epoch1 to time since epoch2
 def convert_delta_time(delta_time, epoch1=None, epoch2=None, scale=1.0):
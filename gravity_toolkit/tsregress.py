@@ -1,7 +1,7 @@
 #!/usr/bin/env python
 u"""
 tsregress.py
-Written by Tyler Sutterley (07/2020)
+Written by Tyler Sutterley (03/2021)
 
 Fits a synthetic signal to data over a time period by ordinary or weighted
     least-squares
@@ -15,6 +15,8 @@ CALLING SEQUENCE:
 INPUTS:
     t_in: input time array
     d_in: input data array
+        can be a 2-dimensional array of multiple time series (nseries, ntime)
+        fitted with a single factorization of the design matrix
 
 OUTPUTS:
     beta: regressed coefficients array
@@ -54,6 +56,9 @@ PYTHON DEPENDENCIES:
     scipy: Scientific Tools for Python (https://docs.scipy.org/doc/)
 
 UPDATE HISTORY:
+    Updated 03/2021: fit multiple time series with a single factorization
+        outputs for multiple time series have series as the first dimension
+        weighted least-squares with row-scaling and a QR factorization
     Updated 07/2020: added function docstrings
     Updated 10/2019: changing Y/N flags to True/False
     Updated 12/2018: put transpose of design matrix within FIT_TYPE if statement
@@ -96,6 +101,7 @@ UPDATE HISTORY:
 """
 import numpy as np
 import scipy.stats
+import scipy.linalg
 import scipy.special
 
 def tsregress(t_in, d_in, ORDER=1, CYCLES=[0.5,1.0], DATA_ERR=0,
@@ -107,7 +113,7 @@ def tsregress(t_in, d_in, ORDER=1, CYCLES=[0.5,1.0], DATA_ERR=0,
     Arguments
     ---------
     t_in: input time array
-    d_in: input data array
+    d_in: input data array (ntime) or multiple time series (nseries, ntime)
 
     Keyword arguments
     -----------------
@@ -149,6 +155,11 @@ def tsregress(t_in, d_in, ORDER=1, CYCLES=[0.5,1.0], DATA_ERR=0,
     d_in = np.squeeze(d_in)
     nmax = len(t_in)
     t_rel = t_in[0:nmax].mean() if (RELATIVE == -1) else RELATIVE
+    #-- check if fitting a single time series or multiple series
+    SINGLE = (np.ndim(d_in) == 1)
+    #-- data with a column for each time series (ntime, nseries)
+    d_in = np.transpose(np.atleast_2d(d_in))[0:nmax,:]
+    nseries = d_in.shape[1]
 
     #-- create design matrix based on polynomial order and harmonics
     DMAT = []
@@ -163,6 +174,7 @@ def tsregress(t_in, d_in, ORDER=1, CYCLES=[0.5,1.0], DATA_ERR=0,
     DMAT = np.transpose(DMAT)
 
     #-- Calculating Least-Squares Coefficients
+    #-- design matrix is factored once for all time series
     if WEIGHT:
         #-- Weighted Least-Squares fitting
         if (np.ndim(DATA_ERR) == 0):
@@ -174,14 +186,18 @@ def tsregress(t_in, d_in, ORDER=1, CYCLES=[0.5,1.0], DATA_ERR=0,
         #--- Weight Precision
         wi = np.squeeze(DATA_ERR**(-2))
         #-- If uncorrelated weights are the diagonal
-        W = np.diag(wi)
-        #-- Least-Squares fitting
-        #-- Temporary Matrix: Inv(X'.W.X)
-        TM1 = np.linalg.inv(np.dot(np.transpose(DMAT),np.dot(W,DMAT)))
-        #-- Temporary Matrix: (X'.W.Y)
-        TM2 = np.dot(np.transpose(DMAT),np.dot(W,d_in))
-        #-- Least Squares Solutions: Inv(X'.W.X).(X'.W.Y)
-        beta_mat = np.dot(TM1,TM2)
+        #-- scale the rows of the design matrix and data by sqrt(weights)
+        #-- rather than building the full diagonal weight matrix
+        WDMAT = np.sqrt(wi)[:,None]*DMAT
+        #-- Least-Squares fitting with a single QR factorization
+        #-- of the weighted design matrix: sqrt(W).X = Q.R
+        Q,R = np.linalg.qr(WDMAT)
+        #-- Inverse of the upper triangular matrix: Inv(R)
+        Rinv = scipy.linalg.solve_triangular(R, np.eye(len(R)))
+        #-- Least Squares Solutions: Inv(R).Q'.sqrt(W).Y
+        beta_mat = np.dot(Rinv,np.dot(np.transpose(Q),np.sqrt(wi)[:,None]*d_in))
+        #-- weights as a column for each time series
+        wi = wi[:,None]
     else:#-- Standard Least-Squares fitting (the [0] denotes coefficients output)
         beta_mat = np.linalg.lstsq(DMAT,d_in,rcond=-1)[0]
         #-- Weights are equal
@@ -192,7 +208,7 @@ def tsregress(t_in, d_in, ORDER=1, CYCLES=[0.5,1.0], DATA_ERR=0,
     #-- modelled time-series
     mod = np.dot(DMAT,beta_mat)
     #-- residual
-    res = d_in[0:nmax] - np.dot(DMAT,beta_mat)
+    res = d_in - mod
     #-- Fitted Values without (and with) climate oscillations
     simple = np.dot(DMAT[:,0:(ORDER+1)],beta_mat[0:(ORDER+1)])
     season = mod - simple
@@ -202,11 +218,9 @@ def tsregress(t_in, d_in, ORDER=1, CYCLES=[0.5,1.0], DATA_ERR=0,
 
     #-- calculating R^2 values
     #-- SStotal = sum((Y-mean(Y))**2)
-    SStotal = np.dot(np.transpose(d_in[0:nmax] - np.mean(d_in[0:nmax])),
-        (d_in[0:nmax] - np.mean(d_in[0:nmax])))
+    SStotal = np.sum((d_in - np.mean(d_in,axis=0))**2,axis=0)
     #-- SSerror = sum((Y-X*B)**2)
-    SSerror = np.dot(np.transpose(d_in[0:nmax] - np.dot(DMAT,beta_mat)),
-        (d_in[0:nmax] - np.dot(DMAT,beta_mat)))
+    SSerror = np.sum(res**2,axis=0)
     #-- R**2 term = 1- SSerror/SStotal
     rsquare = 1.0 - (SSerror/SStotal)
     #-- Adjusted R**2 term: weighted by degrees of freedom
@@ -218,7 +232,7 @@ def tsregress(t_in, d_in, ORDER=1, CYCLES=[0.5,1.0], DATA_ERR=0,
     #-- log(L) = -0.5*n*log(sigma^2) - 0.5*n*log(2*pi) - 0.5*n
     #log_lik = -0.5*nmax*(np.log(2.0 * np.pi) + 1.0 + np.log(np.sum((res**2)/nmax)))
     log_lik = 0.5*(np.sum(np.log(wi)) - nmax*(np.log(2.0 * np.pi) + 1.0 -
-        np.log(nmax) + np.log(np.sum(wi * (res**2)))))
+        np.log(nmax) + np.log(np.sum(wi * (res**2),axis=0))))
 
     #-- Aikaike's Information Criterion
     AIC = -2.0*log_lik + 2.0*K
@@ -235,22 +249,22 @@ def tsregress(t_in, d_in, ORDER=1, CYCLES=[0.5,1.0], DATA_ERR=0,
     #--- Error Analysis
     if WEIGHT:
         #-- WEIGHTED LEAST-SQUARES CASE (unequal error)
-        #-- Covariance Matrix
-        Hinv = np.linalg.inv(np.dot(np.transpose(DMAT),np.dot(W,DMAT)))
-        #-- Normal Equations
-        NORMEQ = np.dot(Hinv,np.transpose(np.dot(W,DMAT)))
-        beta_err = np.zeros((n_terms))
+        #-- Covariance Matrix: Inv(X'.W.X) = Inv(R).Inv(R)'
+        Hinv = np.dot(Rinv, np.transpose(Rinv))
         #-- Propagating RMS errors
-        for i in range(0,n_terms):
-            beta_err[i] = np.sqrt(np.sum((NORMEQ[i,:]*DATA_ERR)**2))
+        #-- Normal Equations (Inv(X'.W.X).X'.W) scaled by the data errors
+        #-- are equal to Inv(R).Q' with row norms of sqrt(diag(Hinv))
+        beta_err = np.sqrt(np.diag(Hinv))
+        #-- errors are equal for each time series
+        beta_err = beta_err[:,None]*np.ones((1,nseries))
         #-- Weighted sum of squares Error
-        WSSE = np.dot(np.transpose(wi*(d_in[0:nmax] - np.dot(DMAT,beta_mat))),
-            wi*(d_in[0:nmax] - np.dot(DMAT,beta_mat)))/np.float(nu)
+        WSSE = np.sum((wi*res)**2,axis=0)/np.float(nu)
 
-        return {'beta':beta_mat, 'error':beta_err, 'R2':rsquare,
-            'R2Adj':rsq_adj, 'WSSE':WSSE, 'AIC':AIC, 'BIC':BIC,
-            'LOGLIK':log_lik, 'model':mod, 'residual':res, 'simple':simple,
-            'season':season, 'N':n_terms, 'DOF':nu, 'cov_mat':Hinv}
+        return regress_output({'beta':beta_mat, 'error':beta_err,
+            'R2':rsquare, 'R2Adj':rsq_adj, 'WSSE':WSSE, 'AIC':AIC,
+            'BIC':BIC, 'LOGLIK':log_lik, 'model':mod, 'residual':res,
+            'simple':simple, 'season':season, 'N':n_terms, 'DOF':nu,
+            'cov_mat':Hinv}, SINGLE=SINGLE)
 
     elif ((not WEIGHT) and (DATA_ERR != 0)):
         #-- LEAST-SQUARES CASE WITH KNOWN AND EQUAL ERROR
@@ -261,25 +275,26 @@ def tsregress(t_in, d_in, ORDER=1, CYCLES=[0.5,1.0], DATA_ERR=0,
         beta_err = np.zeros((n_terms))
         for i in range(0,n_terms):
             beta_err[i] = np.sqrt(np.sum((NORMEQ[i,:]*P_err)**2))
+        #-- errors are equal for each time series
+        beta_err = beta_err[:,None]*np.ones((1,nseries))
         #-- Mean square error
-        MSE = np.dot(np.transpose(d_in[0:nmax] - np.dot(DMAT,beta_mat)),
-            (d_in[0:nmax] - np.dot(DMAT,beta_mat)))/np.float(nu)
+        MSE = SSerror/np.float(nu)
 
-        return {'beta':beta_mat, 'error':beta_err, 'R2':rsquare,
-            'R2Adj':rsq_adj, 'MSE':MSE, 'AIC':AIC, 'BIC':BIC,
+        return regress_output({'beta':beta_mat, 'error':beta_err,
+            'R2':rsquare, 'R2Adj':rsq_adj, 'MSE':MSE, 'AIC':AIC, 'BIC':BIC,
             'LOGLIK':log_lik, 'model':mod, 'residual':res, 'simple':simple,
-            'season':season,'N':n_terms, 'DOF':nu, 'cov_mat':Hinv}
+            'season':season,'N':n_terms, 'DOF':nu, 'cov_mat':Hinv},
+            SINGLE=SINGLE)
     else:
         #-- STANDARD LEAST-SQUARES CASE
         #-- Regression with Errors with Unknown Standard Deviations
         #-- MSE = (1/nu)*sum((Y-X*B)**2)
         #-- Mean square error
-        MSE = np.dot(np.transpose(d_in[0:nmax] - np.dot(DMAT,beta_mat)),
-            (d_in[0:nmax] - np.dot(DMAT,beta_mat)))/np.float(nu)
+        MSE = SSerror/np.float(nu)
         #-- Root mean square error
         RMSE = np.sqrt(MSE)
         #-- Normalized root mean square error
-        NRMSE = RMSE/(np.max(d_in[0:nmax])-np.min(d_in[0:nmax]))
+        NRMSE = RMSE/(np.max(d_in,axis=0)-np.min(d_in,axis=0))
         #-- Covariance Matrix
         #-- Multiplying the design matrix by itself
         Hinv = np.linalg.inv(np.dot(np.transpose(DMAT),DMAT))
@@ -300,10 +315,39 @@ def tsregress(t_in, d_in, ORDER=1, CYCLES=[0.5,1.0], DATA_ERR=0,
         tstar = scipy.stats.t.ppf(1.0-(alpha/2.0),nu)
         #-- beta_err is the error for each coefficient
         #-- beta_err = t(nu,1-alpha/2)*standard error
-        st_err = np.sqrt(MSE*hdiag)
+        st_err = np.sqrt(hdiag[:,None]*MSE[None,:])
         beta_err = tstar*st_err
 
-        return {'beta':beta_mat, 'error':beta_err, 'std_err':st_err, 'R2':rsquare,
-            'R2Adj':rsq_adj, 'MSE':MSE, 'NRMSE':NRMSE, 'AIC':AIC, 'BIC':BIC,
-            'LOGLIK':log_lik, 'model':mod, 'residual':res, 'simple':simple,
-            'season':season, 'N':n_terms, 'DOF':nu, 'cov_mat':Hinv}
+        return regress_output({'beta':beta_mat, 'error':beta_err,
+            'std_err':st_err, 'R2':rsquare, 'R2Adj':rsq_adj, 'MSE':MSE,
+            'NRMSE':NRMSE, 'AIC':AIC, 'BIC':BIC, 'LOGLIK':log_lik,
+            'model':mod, 'residual':res, 'simple':simple, 'season':season,
+            'N':n_terms, 'DOF':nu, 'cov_mat':Hinv}, SINGLE=SINGLE)
+
+#-- PURPOSE: reshape regression outputs for single or multiple time series
+def regress_output(output, SINGLE=True):
+    """
+    Reshapes the regression outputs to the dimensions of the input data
+
+    Arguments
+    ---------
+    output: dictionary of regression outputs with series as the last dimension
+
+    Keyword arguments
+    -----------------
+    SINGLE: input data was a single time series
+
+    Returns
+    -------
+    output: dictionary of regression outputs with series as the first dimension
+        or without a series dimension for a single time series
+    """
+    for key,val in output.items():
+        #-- terms that are the same for every time series
+        if key in ('N','DOF','cov_mat'):
+            continue
+        elif SINGLE:
+            output[key] = np.take(val, 0, axis=-1)
+        else:
+            output[key] = np.transpose(val)
+    return output
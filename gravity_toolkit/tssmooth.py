@@ -1,7 +1,7 @@
 #!/usr/bin/env python
 u"""
 tssmooth.py
-Written by Tyler Sutterley (07/2020)
+Written by Tyler Sutterley (03/2021)
 
 Computes a moving average of a time-series using three possible routines:
     1) centered moving average
@@ -18,6 +18,7 @@ CALLING SEQUENCE:
 INPUTS:
     t_in: input time array
     d_in: input data array
+        can be a 2-dimensional array of multiple time series (nseries, ntime)
 
 OUTPUTS:
     time: time after removing start and end half-windows
@@ -48,6 +49,9 @@ PYTHON DEPENDENCIES:
     scipy: Scientific Tools for Python (https://docs.scipy.org/doc/)
 
 UPDATE HISTORY:
+    Updated 03/2021: calculate all windows at once using stride tricks
+        fit the Loess filter for all windows with a stacked solve
+        can smooth multiple time series (nseries, ntime) at once
     Updated 07/2020: added function docstrings
     Updated 10/2019: changing Y/N flags to True/False. output amplitudes
     Updated 09/2019: calculate and output annual and semi-annual phase
@@ -86,7 +90,7 @@ def tssmooth(t_in, d_in, HFWTH=6, MOVING=False, DATA_ERR=0, WEIGHT=0,
     Arguments
     ---------
     t_in: input time array
-    d_in: input data array
+    d_in: input data array (ntime) or multiple time series (nseries, ntime)
 
     Keyword arguments
     -----------------
@@ -118,6 +122,13 @@ def tssmooth(t_in, d_in, HFWTH=6, MOVING=False, DATA_ERR=0, WEIGHT=0,
     t_in = np.squeeze(t_in)
     d_in = np.squeeze(d_in)
     nmax = len(t_in)
+    #-- check if smoothing a single time series or multiple series
+    SINGLE = (np.ndim(d_in) == 1)
+    #-- data with a row for each time series (nseries, ntime)
+    d_in = np.atleast_2d(d_in)[:,0:nmax]
+    #-- width of each window and number of windows
+    nwidth = 2*HFWTH + 1
+    nwin = nmax - 2*HFWTH
 
     #-- Indice with start of seasonal terms:
     SEAS = 2
@@ -140,13 +151,50 @@ def tssmooth(t_in, d_in, HFWTH=6, MOVING=False, DATA_ERR=0, WEIGHT=0,
         #-- problematic with GRACE due to missing months within time-series
         #-- output time
         tout = t_in[HFWTH:nmax-HFWTH]
-        smth = np.zeros((nmax-2*HFWTH))
-        for k in range(0, (nmax-(2*HFWTH))):
-            #-- centered moving average sum[2:i-1] + 0.5[1] + 0.5[i]
-            smth[k] = np.sum(d_in[k+1:k+2*HFWTH]) + 0.5*(d_in[k]+d_in[k+2*HFWTH])
+        #-- windows of the data for each output time (nseries, nwin, nwidth)
+        DWIN = sliding_windows(d_in, nwidth)
+        #-- centered moving average sum[2:i-1] + 0.5[1] + 0.5[i]
+        smth = np.sum(DWIN[:,:,1:-1],axis=2) + 0.5*(DWIN[:,:,0]+DWIN[:,:,-1])
         dsmth = smth/(2*HFWTH)
-        return {'data':dsmth, 'time':tout}
-    elif WEIGHT in (1,2):
+        return smooth_output({'data':dsmth, 'time':tout}, SINGLE=SINGLE)
+
+    #-- design matrix for each window (nwin, nwidth, nterms)
+    TWIN = sliding_windows(t_in, nwidth)
+    P_x0 = np.ones((nwin,nwidth))#-- Constant Term
+    P_x1 = np.copy(TWIN)#-- Linear Term
+    #-- Annual term = 2*pi*t*harmonic
+    P_asin = np.sin(2*np.pi*TWIN)
+    P_acos = np.cos(2*np.pi*TWIN)
+    #--Semi-Annual = 4*pi*t*harmonic
+    P_ssin = np.sin(4*np.pi*TWIN)
+    P_scos = np.cos(4*np.pi*TWIN)
+    #-- x0,x1,AS,AC,SS,SC
+    TMAT = np.stack([P_x0, P_x1, P_asin, P_acos, P_ssin, P_scos], axis=2)
+    n_terms = TMAT.shape[2]
+    #-- windows of the data for each time series (nseries, nwin, nwidth)
+    DWIN = sliding_windows(d_in, nwidth)
+    #--- Least-Squares fitting for all windows with a stacked solve
+    #--- using the pseudo-inverse of each design matrix (nwin, nterms, nwidth)
+    PINV = np.linalg.pinv(TMAT, rcond=np.finfo(np.float64).eps)
+    #-- coefficients for each series and window (nseries, nwin, nterms)
+    beta_mat = np.einsum('wij,swj->swi', PINV, DWIN)
+
+    #-- Calculating the output components for each window position
+    #-- smoothed, seasonal, annual and semi-annual time series
+    smth = np.einsum('wjk,swk->swj', TMAT[:,:,0:SEAS], beta_mat[:,:,0:SEAS])
+    season = np.einsum('wjk,swk->swj', TMAT[:,:,SEAS:], beta_mat[:,:,SEAS:])
+    annual = np.einsum('wjk,swk->swj', TMAT[:,:,SEAS:SEAS+2],
+        beta_mat[:,:,SEAS:SEAS+2])
+    semian = np.einsum('wjk,swk->swj', TMAT[:,:,SEAS+2:SEAS+4],
+        beta_mat[:,:,SEAS+2:SEAS+4])
+    #-- annual and semi-annual amplitudes and phases
+    AS,AC,SS,SC = np.moveaxis(beta_mat[:,:,SEAS:SEAS+4],2,0)
+    annamp = np.sqrt(AS**2 + AC**2)
+    annphase = np.arctan2(AC,AS)*180.0/np.pi
+    semiamp = np.sqrt(SS**2 + SC**2)
+    semiphase = np.arctan2(SC,SS)*180.0/np.pi
+
+    if WEIGHT in (1,2):
         #-- weighted moving average calculated from the least-squares of window
         #-- and removing An/SAn signal.  models entire range of dates
         #-- for a HFWTH of 6 (remove annual)
@@ -170,154 +218,130 @@ def tssmooth(t_in, d_in, HFWTH=6, MOVING=False, DATA_ERR=0, WEIGHT=0,
             xi=np.arange(0, 2*HFWTH+1)
             wi=np.exp(-(xi-HFWTH)**2/(2.0*stdev**2))/(stdev*np.sqrt(2.0*np.pi))
 
-        dsmth = np.zeros((nmax))
-        dseason = np.zeros((nmax))
-        dannual = np.zeros((nmax))
-        annamp = np.zeros((nmax))
-        annphase = np.zeros((nmax))
-        dsemian = np.zeros((nmax))
-        semiamp = np.zeros((nmax))
-        semiphase = np.zeros((nmax))
+        #-- add weighted components of each window to the dates in the window
         weight = np.zeros((nmax))
-        for i in range(0, (nmax-(2*HFWTH))):
-            ran = i + np.arange(0, 2*HFWTH+1)
-            P_x0 = np.ones((2*HFWTH+1))#-- Constant Term
-            P_x1 = t_in[ran]#-- Linear Term
-            #-- Annual term = 2*pi*t*harmonic
-            P_asin = np.sin(2*np.pi*t_in[ran])
-            P_acos = np.cos(2*np.pi*t_in[ran])
-            #--Semi-Annual = 4*pi*t*harmonic
-            P_ssin = np.sin(4*np.pi*t_in[ran])
-            P_scos = np.cos(4*np.pi*t_in[ran])
-            #-- x0,x1,AS,AC,SS,SC
-            TMAT = np.array([P_x0, P_x1, P_asin, P_acos, P_ssin, P_scos])
-            TMAT = np.transpose(TMAT)
-            #--- Least-Squares fitting
-            #--- (the [0] denotes coefficients output)standard
-            beta_mat = np.linalg.lstsq(TMAT,d_in[ran],rcond=-1)[0]
-            #-- Calculating the output components
-            #-- add weighted smoothed time series
-            dsmth[ran] += wi*np.dot(TMAT[:,0:SEAS],beta_mat[0:SEAS])
-            #-- seasonal component
-            dseason[ran] += wi*np.dot(TMAT[:,SEAS:],beta_mat[SEAS:])
-            #-- annual component
-            AS,AC = beta_mat[SEAS:SEAS+2]
-            dannual[ran] += wi*np.dot(TMAT[:,SEAS:SEAS+2],[AS,AC])
-            annamp[ran] += wi*np.sqrt(AS**2 + AC**2)
-            annphase[ran] += wi*np.arctan2(AC,AS)*180.0/np.pi
-            #-- semi-annual component
-            SS,SC = beta_mat[SEAS+2:SEAS+4]
-            dsemian[ran] += wi*np.dot(TMAT[:,SEAS+2:SEAS+4],[SS,SC])
-            semiamp[ran] += wi*np.sqrt(SS**2 + SC**2)
-            semiphase[ran] += wi*np.arctan2(SC,SS)*180.0/np.pi
+        output = {}
+        for key in ['data','seasonal','annual','annamp','annphase','semiann',
+            'semiamp','semiphase']:
+            output[key] = np.zeros((len(d_in),nmax))
+        #-- for each date within the windows
+        for j in range(nwidth):
+            #-- dates for each window at position j
+            ran = slice(j, j+nwin)
+            output['data'][:,ran] += wi[j]*smth[:,:,j]
+            output['seasonal'][:,ran] += wi[j]*season[:,:,j]
+            output['annual'][:,ran] += wi[j]*annual[:,:,j]
+            output['annamp'][:,ran] += wi[j]*annamp
+            output['annphase'][:,ran] += wi[j]*annphase
+            output['semiann'][:,ran] += wi[j]*semian[:,:,j]
+            output['semiamp'][:,ran] += wi[j]*semiamp
+            output['semiphase'][:,ran] += wi[j]*semiphase
             #-- add weights
-            weight[ran] += wi
+            weight[ran] += wi[j]
         #-- divide weighted smoothed time-series by weights
         #-- to get output smoothed time-series
-        dsmth /= weight
-        dseason /= weight
-        dannual /= weight
-        annamp /= weight
-        annphase /= weight
-        dsemian /= weight
-        semiamp /= weight
-        semiphase /= weight
+        for key,val in output.items():
+            val /= weight
         #-- noise = data - smoothed - seasonal
-        dnoise = d_in - dsmth - dseason
-        return {'data':dsmth, 'seasonal':dseason, 'annual':dannual,
-            'annamp':annamp, 'annphase':annphase, 'semiann':dsemian,
-            'semiamp':semiamp, 'semiphase':semiphase, 'noise':dnoise,
-            'time':tout, 'weight':weight}
+        output['noise'] = d_in - output['data'] - output['seasonal']
+        output['time'] = tout
+        output['weight'] = weight
+        return smooth_output(output, SINGLE=SINGLE)
     else:
         #-- Moving average calculated from least-squares of window
         #-- and removing An/SAn signal
         #-- output time
         tout = t_in[HFWTH:nmax-HFWTH]
-        dsmth = np.zeros((nmax-2*HFWTH))
-        dtrend = np.zeros((nmax-2*HFWTH))
-        derror = np.zeros((nmax-2*HFWTH))
-        dseason = np.zeros((nmax-2*HFWTH))
-        dannual = np.zeros((nmax-2*HFWTH))
-        annamp = np.zeros((nmax-2*HFWTH))
-        annphase = np.zeros((nmax-2*HFWTH))
-        dsemian = np.zeros((nmax-2*HFWTH))
-        semiamp = np.zeros((nmax-2*HFWTH))
-        semiphase = np.zeros((nmax-2*HFWTH))
-        dnoise = np.zeros((nmax-2*HFWTH))
-        dreduce = np.zeros((nmax-2*HFWTH))
-        for i in range(0, (nmax-(2*HFWTH))):
-            ran = i + np.arange(0, 2*HFWTH+1)
-            P_x0 = np.ones((2*HFWTH+1))#-- Constant Term
-            P_x1 = t_in[ran]#-- Linear Term
-            #-- Annual term = 2*pi*t*harmonic
-            P_asin = np.sin(2*np.pi*t_in[ran])
-            P_acos = np.cos(2*np.pi*t_in[ran])
-            #--Semi-Annual = 4*pi*t*harmonic
-            P_ssin = np.sin(4*np.pi*t_in[ran])
-            P_scos = np.cos(4*np.pi*t_in[ran])
-            #-- x0,x1,AS,AC,SS,SC
-            TMAT = np.array([P_x0, P_x1, P_asin, P_acos, P_ssin, P_scos])
-            TMAT = np.transpose(TMAT)
-            #--- Least-Squares fitting
-            #--- (the [0] denotes coefficients output)
-            beta_mat = np.linalg.lstsq(TMAT,d_in[ran],rcond=-1)[0]
-            n_terms = len(beta_mat)
+        #-- Covariance Matrix for each window
+        #-- Multiplying the design matrix by itself
+        Hinv = np.linalg.inv(np.einsum('wji,wjk->wik', TMAT, TMAT))
+        if (DATA_ERR != 0):
+            #-- LEAST-SQUARES CASE WITH KNOWN AND EQUAL ERROR
+            #-- Normal Equations
+            NORMEQ = np.einsum('wij,wkj->wik', Hinv, TMAT)
+            #-- errors are equal for each time series
+            beta_err = DATA_ERR*np.sqrt(np.sum(NORMEQ**2,axis=2))
+            beta_err = np.broadcast_to(beta_err, beta_mat.shape)
+        else:
+            #-- Error Analysis
+            #-- Degrees of Freedom
+            nu = nwidth - n_terms
+            #-- Mean square error for each series and window
+            residual = DWIN - np.einsum('wjk,swk->swj', TMAT, beta_mat)
+            MSE = np.sum(residual**2,axis=2)/nu
+            #-- Taking the diagonal components of the cov matrix
+            hdiag = np.diagonal(Hinv, axis1=1, axis2=2)
+
+            #-- STANDARD LEAST-SQUARES CASE
+            #-- Regression with Errors with Unknown Standard Deviations
+            #-- Student T-Distribution with D.O.F. nu
+            #--    t.ppf parallels tinv in matlab
+            tstar = scipy.stats.t.ppf(1.0-(alpha/2.0),nu)
+            #-- beta_err is the error for each coefficient
+            #-- beta_err = t(nu,1-alpha/2)*standard error
+            st_err = np.sqrt(MSE[:,:,None]*hdiag[None,:,:])
+            beta_err = tstar*st_err
+
+        #-- Calculating the output components at the center of each window
+        dsmth = smth[:,:,HFWTH]
+        dseason = season[:,:,HFWTH]
+        #-- reduced time-series
+        dreduce = d_in[:,HFWTH:nmax-HFWTH]
+        #-- noise component
+        dnoise = dreduce - dsmth - dseason
+
+        return smooth_output({'data':dsmth, 'trend':beta_mat[:,:,1],
+            'error':beta_err[:,:,1], 'seasonal':dseason,
+            'annual':annual[:,:,HFWTH], 'annphase':annphase, 'annamp':annamp,
+            'semiann':semian[:,:,HFWTH], 'semiamp':semiamp,
+            'semiphase':semiphase, 'noise':dnoise, 'time':tout,
+            'reduce':dreduce}, SINGLE=SINGLE)
+
+#-- PURPOSE: create a view of sliding windows along the last axis
+def sliding_windows(x, width):
+    """
+    Creates a read-only view of sliding windows along the last axis
+
+    Arguments
+    ---------
+    x: input array
+    width: width of each window
 
-            if (DATA_ERR != 0):
-                #-- LEAST-SQUARES CASE WITH KNOWN AND EQUAL ERROR
-                P_err = DATA_ERR*np.ones((2*HFWTH+1))
-                Hinv = np.linalg.inv(np.dot(np.transpose(TMAT),TMAT))
-                #--    Normal Equations
-                NORMEQ = np.dot(Hinv,np.transpose(TMAT))
-                beta_err = np.zeros((n_terms))
-                for n in range(0,n_terms):
-                    beta_err[n] = np.sqrt(np.sum((NORMEQ[n,:]*P_err)**2))
-            else:
-                #-- Error Analysis
-                #-- Degrees of Freedom
-                nu = (2*HFWTH+1) - n_terms
-                #-- Mean square error
-                MSE = np.dot(np.transpose(d_in[ran] - np.dot(TMAT,beta_mat)),
-                    (d_in[ran] - np.dot(TMAT,beta_mat)))/nu
-                #-- Covariance Matrix
-                #-- Multiplying the design matrix by itself
-                Hinv = np.linalg.inv(np.dot(np.transpose(TMAT),TMAT))
-                #-- Taking the diagonal components of the cov matrix
-                hdiag = np.diag(Hinv)
+    Returns
+    -------
+    windows: array view with dimensions (..., nwindows, width)
+    """
+    x = np.asarray(x)
+    nwin = x.shape[-1] - width + 1
+    shape = x.shape[:-1] + (nwin, width)
+    strides = x.strides + (x.strides[-1],)
+    return np.lib.stride_tricks.as_strided(x, shape=shape, strides=strides,
+        writeable=False)
 
-                #-- STANDARD LEAST-SQUARES CASE
-                #-- Regression with Errors with Unknown Standard Deviations
-                #-- Student T-Distribution with D.O.F. nu
-                #--    t.ppf parallels tinv in matlab
-                tstar = scipy.stats.t.ppf(1.0-(alpha/2.0),nu)
-                #-- beta_err is the error for each coefficient
-                #-- beta_err = t(nu,1-alpha/2)*standard error
-                st_err = np.sqrt(MSE*hdiag)
-                beta_err = tstar*st_err
+#-- PURPOSE: reshape smoothing outputs for single or multiple time series
+def smooth_output(output, SINGLE=True):
+    """
+    Reshapes the smoothing outputs to the dimensions of the input data
+
+    Arguments
+    ---------
+    output: dictionary of smoothing outputs with series as the first dimension
 
-            #-- Calculating the output components
-            #-- smoothed time series
-            dsmth[i] = np.dot(TMAT[HFWTH,0:SEAS],beta_mat[0:SEAS])
-            dtrend[i] = np.copy(beta_mat[1])#-- Instantaneous data trend
-            derror[i] = np.copy(beta_err[1])#-- Error in trend
-            #-- seasonal component
-            dseason[i] = np.dot(TMAT[HFWTH,SEAS:],beta_mat[SEAS:])
-            #-- annual component
-            AS,AC = beta_mat[SEAS:SEAS+2]
-            dannual[i] = np.dot(TMAT[HFWTH,SEAS:SEAS+2],[AS,AC])
-            annphase[i] = np.arctan2(AC,AS)*180.0/np.pi
-            annamp[i] = np.sqrt(AS**2 + AC**2)
-            #-- semi-annual component
-            SS,SC = beta_mat[SEAS+2:SEAS+4]
-            dsemian[i] = np.dot(TMAT[HFWTH,SEAS+2:SEAS+4],[SS,SC])
-            semiamp[i] = np.sqrt(SS**2 + SC**2)
-            semiphase[i] = np.arctan2(SC,SS)*180.0/np.pi
-            #-- noise component
-            dnoise[i] = d_in[i+HFWTH] - dsmth[i] - dseason[i]
-            #-- reduced time-series
-            dreduce[i] = d_in[i+HFWTH]
+    Keyword arguments
+    -----------------
+    SINGLE: input data was a single time series
 
-        return {'data':dsmth, 'trend':dtrend, 'error':derror,
-            'seasonal':dseason, 'annual':dannual, 'annphase':annphase,
-            'annamp':annamp, 'semiann':dsemian, 'semiamp':semiamp,
-            'semiphase':semiphase, 'noise':dnoise, 'time':tout, 'reduce':dreduce}
+    Returns
+    -------
+    output: dictionary of smoothing outputs without a series dimension
+        for a single time series
+    """
+    for key,val in output.items():
+        #-- variables that are the same for every time series
+        if key in ('time','weight'):
+            continue
+        elif SINGLE:
+            output[key] = np.array(val[0,...])
+        else:
+            output[key] = np.array(val)
+    return output
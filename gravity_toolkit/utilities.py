@@ -1,12 +1,14 @@
 """
 utilities.py
-Written by Tyler Sutterley (12/2020)
+Written by Tyler Sutterley (03/2021)
 Download and management utilities for syncing time and auxiliary files
 
 PYTHON DEPENDENCIES:
+    numpy: Scientific Computing Tools For Python (https://numpy.org)
     lxml: processing XML and HTML in Python (https://pypi.python.org/pypi/lxml)
 
 UPDATE HISTORY:
+    Updated 03/2021: added function for atomically writing binary cache files
     Updated 12/2020: added ICGEM list for static models
         added figshare geocenter download for Sutterley and Velicogna files
         added download for satellite laser ranging (SLR) files from UTCSR
@@ -34,8 +36,10 @@ import base64
 import socket
 import inspect
 import hashlib
+import tempfile
 import posixpath
 import lxml.etree
+import numpy as np
 import calendar,time
 if sys.version_info[0] == 2:
     from cookielib import CookieJar
@@ -83,6 +87,33 @@ def get_hash(local):
     else:
         return ''
 
+#-- PURPOSE: write arrays to a binary numpy cache file
+def write_cache(cache_file, **kwargs):
+    """
+    Writes arrays to a cache file through a temporary file in the same
+        directory so that concurrent programs never read a partial file
+
+    Arguments
+    ---------
+    cache_file: full path to the binary numpy cache file
+
+    Keyword arguments
+    -----------------
+    arrays to save in the cache file
+    """
+    #-- create the cache directory if not currently existing
+    directory = os.path.dirname(os.path.abspath(cache_file))
+    os.makedirs(directory, exist_ok=True)
+    #-- write to a temporary file and replace the cache file
+    fd,temp_file = tempfile.mkstemp(dir=directory, suffix='.npz')
+    try:
+        with os.fdopen(fd, 'wb') as fileID:
+            np.savez(fileID, **kwargs)
+        os.replace(temp_file, cache_file)
+    except:
+        os.remove(temp_file)
+        raise
+
 #-- PURPOSE: recursively split a url path
 def url_split(s):
     """
@@ -1,7 +1,7 @@
 #!/usr/bin/env python
 u"""
 calc_mascon.py
-Written by Tyler Sutterley (01/2021)
+Written by Tyler Sutterley (03/2021)
 
 Calculates a time-series of regional mass anomalies through a least-squares
     mascon procedure from GRACE/GRACE-FO time-variable gravity data
@@ -79,6 +79,10 @@ PROGRAM DEPENDENCIES:
     read_GIA_model.py: reads spherical harmonics for glacial isostatic adjustment
     read_love_numbers.py: reads Load Love Numbers from Han and Wahr (1995)
     gauss_weights.py: Computes the Gaussian weights as a function of degree
+    mascon_kernel.py: calculates mascon sensitivity kernels from the
+        pseudo-inverse of the mascon spherical harmonics
+        and the time series of all mascons with a single matrix product
+    mascon_store.py: reads and writes consolidated mascon harmonic stores
     ocean_stokes.py: reads a land-sea mask and converts to spherical harmonics
     gen_stokes.py: converts a spatial field into spherical harmonic coefficients
     tssmooth.py: smoothes a time-series using a 13-month Loess-type algorithm
@@ -113,6 +117,14 @@ REFERENCES:
         https://doi.org/10.1029/2005GL025305
 
 UPDATE HISTORY:
+    Updated 03/2021: calculate sensitivity kernels with a single
+        pseudo-inverse of the mascon harmonics that can be cached to disk
+        calculate all mascon time series with a single matrix product
+        write each output mascon time series in a separate stage
+        read mascon harmonics from a consolidated mascon store
+        smooth the time series of all harmonics at once
+        use load_love_numbers from read_love_numbers
+        added option to cache parsed load Love number tables
     Updated 01/2021: harmonics object output from gen_stokes.py/ocean_stokes.py
     Updated 12/2020: added more love number options and from gfc for mean files
     Updated 10/2020: use argparse to set command line parameters
@@ -186,11 +198,13 @@ from gravity_toolkit.grace_input_months import grace_input_months
 from gravity_toolkit.harmonics import harmonics
 from gravity_toolkit.units import units
 from gravity_toolkit.read_GIA_model import read_GIA_model
-from gravity_toolkit.read_love_numbers import read_love_numbers
+from gravity_toolkit.read_love_numbers import load_love_numbers
 from gravity_toolkit.gauss_weights import gauss_weights
+from gravity_toolkit.mascon_kernel import mascon_kernel, mascon_timeseries, \
+    kernel_cache_file
+from gravity_toolkit.mascon_store import mascon_store
 from gravity_toolkit.ocean_stokes import ocean_stokes
 from gravity_toolkit.tssmooth import tssmooth
-from gravity_toolkit.utilities import get_data_path
 
 #-- PURPOSE: keep track of multiprocessing threads
 def info(title):
@@ -201,62 +215,6 @@ def info(title):
         print('parent process: {0:d}'.format(os.getppid()))
     print('process id: {0:d}'.format(os.getpid()))
 
-#-- PURPOSE: read load love numbers for the range of spherical harmonic degrees
-def load_love_numbers(LMAX, LOVE_NUMBERS=0, REFERENCE='CF'):
-    """
-    Reads PREM load Love numbers for the range of spherical harmonic degrees
-    and applies isomorphic parameters
-
-    Arguments
-    ---------
-    LMAX: maximum spherical harmonic degree
-
-    Keyword arguments
-    -----------------
-    LOVE_NUMBERS: Load Love numbers dataset
-        0: Han and Wahr (1995) values from PREM
-        1: Gegout (2005) values from PREM
-        2: Wang et al. (2012) values from PREM
-    REFERENCE: Reference frame for calculating degree 1 love numbers
-        CF: Center of Surface Figure (default)
-        CM: Center of Mass of Earth System
-        CE: Center of Mass of Solid Earth
-
-    Returns
-    -------
-    kl: Love number of Gravitational Potential
-    hl: Love number of Vertical Displacement
-    ll: Love number of Horizontal Displacement
-    """
-    #-- load love numbers file
-    if (LOVE_NUMBERS == 0):
-        #-- PREM outputs from Han and Wahr (1995)
-        #-- https://doi.org/10.1111/j.1365-246X.1995.tb01819.x
-        love_numbers_file = get_data_path(['data','love_numbers'])
-        header = 2
-        columns = ['l','hl','kl','ll']
-    elif (LOVE_NUMBERS == 1):
-        #-- PREM outputs from Gegout (2005)
-        #-- http://gemini.gsfc.nasa.gov/aplo/
-        love_numbers_file = get_data_path(['data','Load_Love2_CE.dat'])
-        header = 3
-        columns = ['l','hl','ll','kl']
-    elif (LOVE_NUMBERS == 2):
-        #-- PREM outputs from Wang et al. (2012)
-        #-- https://doi.org/10.1016/j.cageo.2012.06.022
-        love_numbers_file = get_data_path(['data','PREM-LLNs-truncated.dat'])
-        header = 1
-        columns = ['l','hl','ll','kl','nl','nk']
-    #-- LMAX of load love numbers from Han and Wahr (1995) is 696.
-    #-- from Wahr (2007) linearly interpolating kl works
-    #-- however, as we are linearly extrapolating out, do not make
-    #-- LMAX too much larger than 696
-    #-- read arrays of kl, hl, and ll Love Numbers
-    hl,kl,ll = read_love_numbers(love_numbers_file, LMAX=LMAX, HEADER=header,
-        COLUMNS=columns, REFERENCE=REFERENCE, FORMAT='tuple')
-    #-- return a tuple of load love numbers
-    return (hl,kl,ll)
-
 #-- PURPOSE: calculate a regional time-series through a least
 #-- squares mascon process
 def calc_mascon(base_dir, parameters, LOVE_NUMBERS=0, REFERENCE=None,
@@ -317,6 +275,12 @@ def calc_mascon(base_dir, parameters, LOVE_NUMBERS=0, REFERENCE=None,
     DIRECTORY = os.path.expanduser(parameters['DIRECTORY'])
     #-- 1: fit mass, 2: fit geoid
     FIT_METHOD = np.int(parameters['FIT_METHOD'])
+    #-- directory for caching the pseudo-inverse of the mascon harmonics
+    KERNEL_CACHE = parameters.get('KERNEL_CACHE','None')
+    #-- consolidated store of the mascon spherical harmonics
+    MASCON_STORE = parameters.get('MASCON_STORE','None')
+    MASCON_STORE = None if (MASCON_STORE.title() == 'None') else \
+        os.path.expanduser(MASCON_STORE)
     #-- mascon redistribution
     MASCON_OCEAN = parameters['MASCON_OCEAN'] in ('Y','y')
 
@@ -330,9 +294,13 @@ def calc_mascon(base_dir, parameters, LOVE_NUMBERS=0, REFERENCE=None,
     #-- file information
     suffix = dict(ascii='txt', netCDF4='nc', HDF5='H5')
 
+    #-- directory for caching parsed load Love number tables
+    LOVE_CACHE = parameters.get('LOVE_CACHE','None')
+    LOVE_CACHE = None if (LOVE_CACHE.title() == 'None') else \
+        os.path.expanduser(LOVE_CACHE)
     #-- read arrays of kl, hl, and ll Love Numbers
     hl,kl,ll = load_love_numbers(LMAX, LOVE_NUMBERS=LOVE_NUMBERS,
-        REFERENCE=REFERENCE)
+        REFERENCE=REFERENCE, CACHE=LOVE_CACHE)
 
     #-- Earth Parameters
     factors = units(lmax=LMAX).harmonic(hl,kl,ll)
@@ -484,53 +452,18 @@ def calc_mascon(base_dir, parameters, LOVE_NUMBERS=0, REFERENCE=None,
         #-- set flag for not removing the reconstructed coefficients
         construct_str = ''
 
-    #-- input mascon spherical harmonic datafiles
-    with open(MASCON_INDEX,'r') as f:
-        mascon_files = f.read().splitlines()
+    #-- read mascon spherical harmonics from the consolidated mascon store
+    #-- or from the individual files of the mascon index
+    mascons = mascon_store(MASCON_INDEX, LMAX=LMAX, MMAX=MMAX,
+        DATAFORM=DATAFORM, OCEAN=ocean_Ylms if MASCON_OCEAN else None,
+        LOVE_NUMBERS=LOVE_NUMBERS, REFERENCE=REFERENCE,
+        LANDMASK=parameters.get('LANDMASK'), STORE=MASCON_STORE, MODE=MODE)
     #-- number of mascons
-    n_mas = len(mascon_files)
+    n_mas = len(mascons['name'])
     #-- spatial area of the mascon
-    total_area = np.zeros((n_mas))
+    total_area = mascons['area']
     #-- name of each mascon
-    mascon_name = []
-    #-- for each valid file in the index (iterate over mascons)
-    mascon_list = []
-    for k,fi in enumerate(mascon_files):
-        #-- read mascon spherical harmonics
-        if (DATAFORM == 'ascii'):
-            #-- ascii (.txt)
-            Ylms = harmonics().from_ascii(os.path.expanduser(fi),date=False)
-        elif (DATAFORM == 'netCDF4'):
-            #-- netcdf (.nc)
-            Ylms = harmonics().from_netCDF4(os.path.expanduser(fi),date=False)
-        elif (DATAFORM == 'HDF5'):
-            #-- HDF5 (.H5)
-            Ylms = harmonics().from_HDF5(os.path.expanduser(fi),date=False)
-        #-- Calculating the total mass of each mascon (1 cmwe uniform)
-        total_area[k] = 4.0*np.pi*(rad_e**3)*rho_e*Ylms.clm[0,0]/3.0
-        #-- distribute MASCON mass uniformly over the ocean
-        if MASCON_OCEAN:
-            #-- calculate ratio between total mascon mass and
-            #-- a uniformly distributed cm of water over the ocean
-            ratio = Ylms.clm[0,0]/ocean_Ylms.clm[0,0]
-            #-- for each spherical harmonic
-            for m in range(0,MMAX+1):#-- MMAX+1 to include MMAX
-                for l in range(m,LMAX+1):#-- LMAX+1 to include LMAX
-                    #-- remove ratio*ocean Ylms from mascon Ylms
-                    #-- note: x -= y is equivalent to x = x - y
-                    Ylms.clm[l,m] -= ratio*ocean_Ylms.clm[l,m]
-                    Ylms.slm[l,m] -= ratio*ocean_Ylms.slm[l,m]
-        #-- truncate mascon spherical harmonics to d/o LMAX/MMAX and add to list
-        mascon_list.append(Ylms.truncate(lmax=LMAX, mmax=MMAX))
-        #-- mascon base is the file without directory or suffix
-        mascon_base = os.path.basename(mascon_files[k])
-        mascon_base = os.path.splitext(mascon_base)[0]
-        #-- if lower case, will capitalize
-        mascon_base = mascon_base.upper()
-        #-- if mascon name contains degree and order info, remove
-        mascon_name.append(mascon_base.replace('_L{0:d}'.format(LMAX),''))
-    #-- create single harmonics object from list
-    mascon_Ylms = harmonics().from_list(mascon_list, date=False)
+    mascon_name = mascons['name']
 
     #-- calculating GRACE/GRACE-FO error (Wahr et al. 2006)
     #-- output GRACE error file (for both LMAX==MMAX and LMAX != MMAX cases)
@@ -556,23 +489,22 @@ def calc_mascon(base_dir, parameters, LOVE_NUMBERS=0, REFERENCE=None,
         else:
             HFWTH = 6
         #-- Equal to the noise of the smoothed time-series
-        #-- for each spherical harmonic order
-        for m in range(0,MMAX+1):#-- MMAX+1 to include MMAX
-            #-- for each spherical harmonic degree
-            for l in range(m,LMAX+1):#-- LMAX+1 to include LMAX
-                #-- Delta coefficients of GRACE time series
-                for cs,csharm in enumerate(['clm','slm']):
-                    #-- calculate GRACE Error (Noise of smoothed time-series)
-                    #-- With Annual and Semi-Annual Terms
-                    val1 = getattr(GRACE_Ylms, csharm)
-                    smth = tssmooth(GRACE_Ylms.time, val1[l,m,:], HFWTH=HFWTH)
-                    #-- number of smoothed points
-                    nsmth = len(smth['data'])
-                    tsmth = np.mean(smth['time'])
-                    #-- GRACE delta Ylms
-                    #-- variance of data-(smoothed+annual+semi)
-                    val2 = getattr(delta_Ylms, csharm)
-                    val2[l,m] = np.sqrt(np.sum(smth['noise']**2)/nsmth)
+        #-- for each spherical harmonic degree and order
+        #-- smoothing the time series of all harmonics at once
+        l,m = np.tril_indices(LMAX+1, m=MMAX+1)
+        #-- Delta coefficients of GRACE time series
+        for cs,csharm in enumerate(['clm','slm']):
+            #-- calculate GRACE Error (Noise of smoothed time-series)
+            #-- With Annual and Semi-Annual Terms
+            val1 = getattr(GRACE_Ylms, csharm)
+            smth = tssmooth(GRACE_Ylms.time, val1[l,m,:], HFWTH=HFWTH)
+            #-- number of smoothed points
+            nsmth = len(smth['time'])
+            tsmth = np.mean(smth['time'])
+            #-- GRACE delta Ylms
+            #-- variance of data-(smoothed+annual+semi)
+            val2 = getattr(delta_Ylms, csharm)
+            val2[l,m] = np.sqrt(np.sum(smth['noise']**2,axis=1)/nsmth)
 
         #-- save GRACE/GRACE-FO delta harmonics to file
         delta_Ylms.time = np.copy(tsmth)
@@ -607,20 +539,12 @@ def calc_mascon(base_dir, parameters, LOVE_NUMBERS=0, REFERENCE=None,
     n_harm=np.int(LMAX**2 - LMIN**2 + 2*LMAX + 1 - (LMAX-MMAX)**2 - (LMAX-MMAX))
 
     #-- Initialing harmonics for least squares fitting
-    #-- mascon kernel
-    M_lm = np.zeros((n_harm,n_mas))
-    #-- mascon kernel converted to output unit
-    MA_lm = np.zeros((n_harm,n_mas))
+    #-- mascon kernel from the rows of the mascon store between LMIN and LMAX
+    M_lm = mascons['harmonics'][mascons['l'] >= LMIN,:]
     #-- corrected clm and slm
     Y_lm = np.zeros((n_harm,n_files))
-    #-- sensitivity kernel
-    A_lm = np.zeros((n_harm,n_mas))
     #-- Satellite error harmonics
     delta_lm = np.zeros((n_harm))
-    #-- Initializing output Mascon time-series
-    mascon = np.zeros((n_mas,n_files))
-    #-- Mascon satellite error component
-    M_delta = np.zeros((n_mas))
     #-- Initializing conversion factors
     #-- factor for converting to coefficients of mass
     fact = np.zeros((n_harm))
@@ -637,7 +561,6 @@ def calc_mascon(base_dir, parameters, LOVE_NUMBERS=0, REFERENCE=None,
     #-- Switching between Cosine and Sine Stokes
     for cs,csharm in enumerate(['clm','slm']):
         #-- copy cosine and sin harmonics
-        mascon_harm = getattr(mascon_Ylms, csharm)
         grace_harm = getattr(GRACE_Ylms, csharm)
         GIA_harm = getattr(GIA_Ylms, csharm)
         remove_harm = getattr(remove_Ylms, csharm)
@@ -651,8 +574,6 @@ def calc_mascon(base_dir, parameters, LOVE_NUMBERS=0, REFERENCE=None,
             mm = np.min([MMAX,l])
             #-- +1 to include l or MMAX (whichever is smaller)
             for m in range(cs,mm+1):
-                #-- Mascon Spherical Harmonics
-                M_lm[ii,:] = np.copy(mascon_harm[l,m,:])
                 #-- GRACE Spherical Harmonics
                 #-- Correcting GRACE Harmonics for GIA and Removed Terms
                 Y_lm[ii,:] = grace_harm[l,m,:] - GIA_harm[l,m,:] - \
@@ -670,35 +591,35 @@ def calc_mascon(base_dir, parameters, LOVE_NUMBERS=0, REFERENCE=None,
     if (FIT_METHOD == 1):
         #-- Fitting Sensitivity Kernel as mass coefficients
         #-- converting M_lm to mass coefficients of the kernel
-        for i in range(n_harm):
-            MA_lm[i,:] = M_lm[i,:]*wt_lm[i]*fact[i]
         fit_factor = wt_lm*fact
     else:
         #-- Fitting Sensitivity Kernel as geoid coefficients
-        for i in range(n_harm):
-            MA_lm[:,:] = M_lm[i,:]*wt_lm[i]
         fit_factor = wt_lm*np.ones((n_harm))
-
+    #-- mascon kernel converted to output unit
+    MA_lm = M_lm*fit_factor[:,None]
+
+    #-- cache file for the pseudo-inverse of the mascon harmonics
+    if (KERNEL_CACHE.title() != 'None'):
+        CACHE = kernel_cache_file(KERNEL_CACHE, MASCON_INDEX, LMIN=LMIN,
+            LMAX=LMAX, MMAX=MMAX, RAD=RAD, LOVE_NUMBERS=LOVE_NUMBERS,
+            REFERENCE=REFERENCE, FIT_METHOD=FIT_METHOD,
+            MASCON_OCEAN=MASCON_OCEAN)
+    else:
+        CACHE = None
     #-- Fitting the sensitivity kernel from the input kernel
-    for i in range(n_harm):
-        #-- setting kern_i equal to 1 for d/o
-        kern_i = np.zeros((n_harm))
-        #-- converting to mass coefficients if specified
-        kern_i[i] = 1.0*fit_factor[i]
-        #-- spherical harmonics solution for the
-        #-- mascon sensitivity kernels
-        #-- Least Squares Solutions: Inv(X'.X).(X'.Y)
-        kern_lm = np.linalg.lstsq(MA_lm,kern_i,rcond=-1)[0]
-        for k in range(n_mas):
-            A_lm[i,k] = kern_lm[k]*total_area[k]
+    #-- using a single pseudo-inverse of the mascon kernel
+    #-- spherical harmonics solution for the mascon sensitivity kernels
+    A_lm = mascon_kernel(MA_lm, fit_factor, AREA=total_area, CACHE=CACHE)
+
+    #-- calculate the time series of all mascons with a single product of
+    #-- the sensitivity kernels and the corrected GRACE/GRACE-FO harmonics
+    #-- Multiply the Satellite error (noise of a smoothed time-series
+    #-- with annual and semi-annual components) by the sensitivity kernel
+    #-- Converting to Gigatonnes
+    mascon = mascon_timeseries(A_lm, Y_lm, DELTA=delta_lm, AREA=total_area)
 
     #-- for each mascon
     for k in range(n_mas):
-        #-- Multiply the Satellite error (noise of a smoothed time-series
-        #-- with annual and semi-annual components) by the sensitivity kernel
-        #-- Converting to Gigatonnes
-        M_delta[k] = np.sqrt(np.sum((delta_lm*A_lm[:,k])**2))/1e15
-
         #-- output filename format (for both LMAX==MMAX and LMAX != MMAX cases):
         #-- mascon name, GRACE dataset, GIA model, LMAX, (MMAX,)
         #-- Gaussian smoothing, filter flag, remove reconstructed fields flag
@@ -706,33 +627,50 @@ def calc_mascon(base_dir, parameters, LOVE_NUMBERS=0, REFERENCE=None,
         file_out='{0}{1}{2}{3}{4}_L{5:d}{6}{7}{8}{9}.txt'.format(mascon_name[k],
             dset_str, gia_str.upper(), atm_str, ocean_str, LMAX, order_str,
             gw_str, ds_str, construct_str)
-
         #-- Output mascon datafiles
         #-- Will output each mascon time series
         #-- month, date, mascon mass [Gt], satellite error [Gt], mascon area [km^2]
-        #-- open output mascon time-series file
-        fid = open(os.path.join(DIRECTORY,file_out),'w')
-        #-- for each date
-        formatting_string = '{0:03d} {1:12.4f} {2:16.10f} {3:16.10f} {4:16.5f}'
-        for t,mon in enumerate(GRACE_Ylms.month):
-            #-- Summing over all spherical harmonics for mascon k, and time t
-            #-- multiplies by the degree dependent factor to convert
-            #-- the harmonics into mass coefficients
-            #-- Converting mascon mass time-series from g to gigatonnes
-            mascon[k,t] = np.sum(A_lm[:,k]*Y_lm[:,t])/1e15
-            #-- output to file
-            args=(mon,GRACE_Ylms.time[t],mascon[k,t],M_delta[k],total_area[k]/1e10)
-            print(formatting_string.format(*args), file=fid)
-        #-- close the output file
-        fid.close()
-        #-- change the permissions mode
-        os.chmod(os.path.join(DIRECTORY,file_out),MODE)
+        output_mascon_file(os.path.join(DIRECTORY,file_out),
+            GRACE_Ylms.month, GRACE_Ylms.time, mascon['mass'][k,:],
+            mascon['error'][k], mascon['area'][k], MODE=MODE)
         #-- add output files to list object
         output_files.append(os.path.join(DIRECTORY,file_out))
 
     #-- return the list of output files
     return output_files
 
+#-- PURPOSE: write the time series of a mascon to file
+def output_mascon_file(output_file, month, tdec, mass, error, area,
+    MODE=0o775):
+    """
+    Writes the time series of a mascon to an ascii file
+
+    Arguments
+    ---------
+    output_file: output mascon time series file
+    month: GRACE/GRACE-FO months
+    tdec: dates in year-decimal
+    mass: mascon mass time series in gigatonnes
+    error: satellite error of the mascon in gigatonnes
+    area: total area of the mascon in km^2
+
+    Keyword arguments
+    -----------------
+    MODE: permissions mode of the output file
+    """
+    #-- open output mascon time-series file
+    fid = open(output_file,'w')
+    #-- for each date
+    formatting_string = '{0:03d} {1:12.4f} {2:16.10f} {3:16.10f} {4:16.5f}'
+    for t,mon in enumerate(month):
+        #-- output to file
+        args = (mon, tdec[t], mass[t], error, area)
+        print(formatting_string.format(*args), file=fid)
+    #-- close the output file
+    fid.close()
+    #-- change the permissions mode
+    os.chmod(output_file, MODE)
+
 #-- PURPOSE: print a file log for the GRACE mascon analysis
 #-- lists: the parameter file, the parameters and the output files
 def output_log_file(parameters,output_files):
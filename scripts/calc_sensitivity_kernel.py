@@ -1,7 +1,7 @@
 #!/usr/bin/env python
 u"""
 calc_sensitivity_kernel.py
-Written by Tyler Sutterley (01/2021)
+Written by Tyler Sutterley (03/2021)
 
 Calculates spatial sensitivity kernels through a least-squares mascon procedure
 
@@ -53,6 +53,10 @@ COMMAND LINE OPTIONS:
         CF: Center of Surface Figure (default)
         CM: Center of Mass of Earth System
         CE: Center of Mass of Solid Earth
+    -S, --stacked: Output sensitivity kernels to a single file
+        with a mascon dimension (netCDF4 and HDF5 only)
+    -C X, --chunksize X: Number of mascons to synthesize in each block
+        default limits each block of spatial fields to 2^24 values
     -l, --log: Output log of files created for each job
     -M X, --mode X: Permissions mode of the files created
 
@@ -71,6 +75,9 @@ PROGRAM DEPENDENCIES:
     read_love_numbers.py: reads Load Love Numbers from Han and Wahr (1995)
     plm_holmes.py: Computes fully normalized associated Legendre polynomials
     gauss_weights.py: Computes the Gaussian weights as a function of degree
+    mascon_kernel.py: calculates mascon sensitivity kernels from the
+        pseudo-inverse of the mascon spherical harmonics
+    mascon_store.py: reads and writes consolidated mascon harmonic stores
     ocean_stokes.py: reads a land-sea mask and converts to spherical harmonics
     gen_stokes.py: converts a spatial field into spherical harmonic coefficients
     harmonic_summation.py: calculates a spatial field from spherical harmonics
@@ -86,6 +93,7 @@ PROGRAM DEPENDENCIES:
         hdf5_read.py: reads input spatial data from HDF5 files
         ncdf_write.py: writes output spatial data to netCDF4
         hdf5_write.py: writes output spatial data to HDF5
+    spatial_series.py: writes a time series of spatial fields to a single file
     units.py: class for converting GRACE/GRACE-FO Level-2 data to specific units
     utilities.py: download and management utilities for files
 
@@ -105,6 +113,14 @@ REFERENCES:
         https://doi.org/10.1029/2009GL039401
 
 UPDATE HISTORY:
+    Updated 03/2021: calculate sensitivity kernels with a single
+        pseudo-inverse of the mascon harmonics that can be cached to disk
+        expand and synthesize sensitivity kernels in blocks of mascons
+        added option to output all kernels to a single stacked file
+        read mascon harmonics from a consolidated mascon store
+        use load_love_numbers from read_love_numbers
+        added option to cache parsed load Love number tables
+        expand sensitivity kernels with mascon_harmonics from mascon_store
     Updated 01/2021: harmonics object output from gen_stokes.py/ocean_stokes.py
     Updated 12/2020: added more love number options
     Updated 10/2020: use argparse to set command line parameters
@@ -151,15 +167,17 @@ import numpy as np
 import multiprocessing
 import traceback
 
-from gravity_toolkit.harmonics import harmonics
 from gravity_toolkit.spatial import spatial
+from gravity_toolkit.spatial_series import spatial_series
 from gravity_toolkit.units import units
-from gravity_toolkit.read_love_numbers import read_love_numbers
+from gravity_toolkit.read_love_numbers import load_love_numbers
 from gravity_toolkit.plm_holmes import plm_holmes
 from gravity_toolkit.gauss_weights import gauss_weights
+from gravity_toolkit.mascon_kernel import mascon_kernel, kernel_cache_file, \
+    harmonic_indices
+from gravity_toolkit.mascon_store import mascon_store, mascon_harmonics
 from gravity_toolkit.ocean_stokes import ocean_stokes
 from gravity_toolkit.harmonic_summation import harmonic_summation
-from gravity_toolkit.utilities import get_data_path
 
 #-- PURPOSE: keep track of multiprocessing threads
 def info(title):
@@ -170,66 +188,10 @@ def info(title):
         print('parent process: {0:d}'.format(os.getppid()))
     print('process id: {0:d}'.format(os.getpid()))
 
-#-- PURPOSE: read load love numbers for the range of spherical harmonic degrees
-def load_love_numbers(LMAX, LOVE_NUMBERS=0, REFERENCE='CF'):
-    """
-    Reads PREM load Love numbers for the range of spherical harmonic degrees
-    and applies isomorphic parameters
-
-    Arguments
-    ---------
-    LMAX: maximum spherical harmonic degree
-
-    Keyword arguments
-    -----------------
-    LOVE_NUMBERS: Load Love numbers dataset
-        0: Han and Wahr (1995) values from PREM
-        1: Gegout (2005) values from PREM
-        2: Wang et al. (2012) values from PREM
-    REFERENCE: Reference frame for calculating degree 1 love numbers
-        CF: Center of Surface Figure (default)
-        CM: Center of Mass of Earth System
-        CE: Center of Mass of Solid Earth
-
-    Returns
-    -------
-    kl: Love number of Gravitational Potential
-    hl: Love number of Vertical Displacement
-    ll: Love number of Horizontal Displacement
-    """
-    #-- load love numbers file
-    if (LOVE_NUMBERS == 0):
-        #-- PREM outputs from Han and Wahr (1995)
-        #-- https://doi.org/10.1111/j.1365-246X.1995.tb01819.x
-        love_numbers_file = get_data_path(['data','love_numbers'])
-        header = 2
-        columns = ['l','hl','kl','ll']
-    elif (LOVE_NUMBERS == 1):
-        #-- PREM outputs from Gegout (2005)
-        #-- http://gemini.gsfc.nasa.gov/aplo/
-        love_numbers_file = get_data_path(['data','Load_Love2_CE.dat'])
-        header = 3
-        columns = ['l','hl','ll','kl']
-    elif (LOVE_NUMBERS == 2):
-        #-- PREM outputs from Wang et al. (2012)
-        #-- https://doi.org/10.1016/j.cageo.2012.06.022
-        love_numbers_file = get_data_path(['data','PREM-LLNs-truncated.dat'])
-        header = 1
-        columns = ['l','hl','ll','kl','nl','nk']
-    #-- LMAX of load love numbers from Han and Wahr (1995) is 696.
-    #-- from Wahr (2007) linearly interpolating kl works
-    #-- however, as we are linearly extrapolating out, do not make
-    #-- LMAX too much larger than 696
-    #-- read arrays of kl, hl, and ll Love Numbers
-    hl,kl,ll = read_love_numbers(love_numbers_file, LMAX=LMAX, HEADER=header,
-        COLUMNS=columns, REFERENCE=REFERENCE, FORMAT='tuple')
-    #-- return a tuple of load love numbers
-    return (hl,kl,ll)
-
 #-- PURPOSE: calculate a regional time-series through a least
 #-- squares mascon process
 def calc_sensitivity_kernel(parameters, LOVE_NUMBERS=0, REFERENCE=None,
-    MODE=0o775):
+    STACKED=False, CHUNKSIZE=None, MODE=0o775):
     #-- convert parameters to variables
     #-- spherical harmonic degree range
     LMIN = np.int(parameters['LMIN'])
@@ -250,6 +212,12 @@ def calc_sensitivity_kernel(parameters, LOVE_NUMBERS=0, REFERENCE=None,
     DIRECTORY = os.path.expanduser(parameters['DIRECTORY'])
     #-- 1: fit mass, 2: fit geoid
     FIT_METHOD = np.int(parameters['FIT_METHOD'])
+    #-- directory for caching the pseudo-inverse of the mascon harmonics
+    KERNEL_CACHE = parameters.get('KERNEL_CACHE','None')
+    #-- consolidated store of the mascon spherical harmonics
+    MASCON_STORE = parameters.get('MASCON_STORE','None')
+    MASCON_STORE = None if (MASCON_STORE.title() == 'None') else \
+        os.path.expanduser(MASCON_STORE)
     #-- mascon distribution
     MASCON_OCEAN = parameters['MASCON_OCEAN'] in ('Y','y')
     #-- spatial output parameters
@@ -259,6 +227,9 @@ def calc_sensitivity_kernel(parameters, LOVE_NUMBERS=0, REFERENCE=None,
 
     #-- file information
     suffix = dict(ascii='txt', netCDF4='nc', HDF5='H5')
+    #-- stacked sensitivity kernels require a mascon dimension
+    if STACKED and (DATAFORM == 'ascii'):
+        raise ValueError('Stacked output requires netCDF4 or HDF5 format')
 
     #-- Create output Directory if not currently existing
     if (not os.access(DIRECTORY,os.F_OK)):
@@ -267,9 +238,13 @@ def calc_sensitivity_kernel(parameters, LOVE_NUMBERS=0, REFERENCE=None,
     #-- list object of output files for file logs (full path)
     output_files = []
 
+    #-- directory for caching parsed load Love number tables
+    LOVE_CACHE = parameters.get('LOVE_CACHE','None')
+    LOVE_CACHE = None if (LOVE_CACHE.title() == 'None') else \
+        os.path.expanduser(LOVE_CACHE)
     #-- read arrays of kl, hl, and ll Love Numbers
     hl,kl,ll = load_love_numbers(LMAX, LOVE_NUMBERS=LOVE_NUMBERS,
-        REFERENCE=REFERENCE)
+        REFERENCE=REFERENCE, CACHE=LOVE_CACHE)
 
     #-- Earth Parameters
     factors = units(lmax=LMAX).harmonic(hl,kl,ll)
@@ -300,53 +275,18 @@ def calc_sensitivity_kernel(parameters, LOVE_NUMBERS=0, REFERENCE=None,
         #-- not distributing uniformly over ocean
         ocean_str = ''
 
-    #-- input mascon spherical harmonic datafiles
-    with open(MASCON_INDEX,'r') as f:
-        mascon_files = f.read().splitlines()
+    #-- read mascon spherical harmonics from the consolidated mascon store
+    #-- or from the individual files of the mascon index
+    mascons = mascon_store(MASCON_INDEX, LMAX=LMAX, MMAX=MMAX,
+        DATAFORM=DATAFORM, OCEAN=ocean_Ylms if MASCON_OCEAN else None,
+        LOVE_NUMBERS=LOVE_NUMBERS, REFERENCE=REFERENCE,
+        LANDMASK=parameters.get('LANDMASK'), STORE=MASCON_STORE, MODE=MODE)
     #-- number of mascons
-    n_mas = len(mascon_files)
+    n_mas = len(mascons['name'])
     #-- spatial area of the mascon
-    total_area = np.zeros((n_mas))
+    total_area = mascons['area']
     #-- name of each mascon
-    mascon_name = []
-    #-- for each valid file in the index (iterate over mascons)
-    mascon_list = []
-    for k,fi in enumerate(mascon_files):
-        #-- read mascon spherical harmonics
-        if (DATAFORM == 'ascii'):
-            #-- ascii (.txt)
-            Ylms = harmonics().from_ascii(os.path.expanduser(fi),date=False)
-        elif (DATAFORM == 'netCDF4'):
-            #-- netcdf (.nc)
-            Ylms = harmonics().from_netCDF4(os.path.expanduser(fi),date=False)
-        elif (DATAFORM == 'HDF5'):
-            #-- HDF5 (.H5)
-            Ylms = harmonics().from_HDF5(os.path.expanduser(fi),date=False)
-        #-- Calculating the total mass of each mascon (1 cmwe uniform)
-        total_area[k] = 4.0*np.pi*(rad_e**3)*rho_e*Ylms.clm[0,0]/3.0
-        #-- distribute MASCON mass uniformly over the ocean
-        if MASCON_OCEAN:
-            #-- calculate ratio between total mascon mass and
-            #-- a uniformly distributed cm of water over the ocean
-            ratio = Ylms.clm[0,0]/ocean_Ylms.clm[0,0]
-            #-- for each spherical harmonic
-            for m in range(0,MMAX+1):#-- MMAX+1 to include MMAX
-                for l in range(m,LMAX+1):#-- LMAX+1 to include LMAX
-                    #-- remove ratio*ocean Ylms from mascon Ylms
-                    #-- note: x -= y is equivalent to x = x - y
-                    Ylms.clm[l,m] -= ratio*ocean_Ylms.clm[l,m]
-                    Ylms.slm[l,m] -= ratio*ocean_Ylms.slm[l,m]
-        #-- truncate mascon spherical harmonics to d/o LMAX/MMAX and add to list
-        mascon_list.append(Ylms.truncate(lmax=LMAX, mmax=MMAX))
-        #-- mascon base is the file without directory or suffix
-        mascon_base = os.path.basename(mascon_files[k])
-        mascon_base = os.path.splitext(mascon_base)[0]
-        #-- if lower case, will capitalize
-        mascon_base = mascon_base.upper()
-        #-- if mascon name contains degree and order info, remove
-        mascon_name.append(mascon_base.replace('_L{0:d}'.format(LMAX),''))
-    #-- create single harmonics object from list
-    mascon_Ylms = harmonics().from_list(mascon_list, date=False)
+    mascon_name = mascons['name']
 
     #-- Output spatial data object
     grid = spatial()
@@ -370,144 +310,155 @@ def calc_sensitivity_kernel(parameters, LOVE_NUMBERS=0, REFERENCE=None,
     theta = (90.0-grid.lat)*np.pi/180.0
     PLM,dPLM = plm_holmes(LMAX,np.cos(theta))
 
-    #-- Calculating the number of cos and sin harmonics between LMIN and LMAX
-    #-- taking into account MMAX (if MMAX == LMAX then LMAX-MMAX=0)
-    n_harm=np.int(LMAX**2 - LMIN**2 + 2*LMAX + 1 - (LMAX-MMAX)**2 - (LMAX-MMAX))
-
-    #-- Initialing harmonics for least squares fitting
-    #-- mascon kernel
-    M_lm = np.zeros((n_harm,n_mas))
-    #-- mascon kernel converted to output unit
-    MA_lm = np.zeros((n_harm,n_mas))
-    #-- sensitivity kernel
-    A_lm = np.zeros((n_harm,n_mas))
-    #-- Initializing conversion factors
-    #-- factor for converting to smoothed coefficients of mass
-    fact = np.zeros((n_harm))
-    #-- factor for converting back into geoid coefficients
-    fact_inv = np.zeros((n_harm))
-    #-- smoothing factor
-    wt_lm = np.zeros((n_harm))
-
-    #-- ii is a counter variable for building the mascon column array
-    ii = 0
-    #-- Creating column array of clm/slm coefficients
+    #-- degree, order and cosine/sine index of each harmonic between
+    #-- LMIN and LMAX taking into account MMAX
     #-- Order is [C00...C6060,S11...S6060]
+    l,m,cs = harmonic_indices(LMIN, LMAX, MMAX=MMAX)
+    #-- rows of the mascon column arrays between LMIN and LMAX
+    lm, = np.nonzero(mascons['l'] >= LMIN)
+    #-- rows of the sensitivity kernel column arrays
+    kernels = dict(l=l, m=m, cs=cs, attributes=mascons['attributes'])
+    #-- number of cos and sin harmonics
+    n_harm = len(l)
+
+    #-- Creating column array of clm/slm coefficients for least squares
+    #-- mascon kernel
+    M_lm = mascons['harmonics'][lm,:]
     #-- Calculating factor to convert geoid spherical harmonic coefficients
     #-- to coefficients of mass (Wahr, 1998)
-    coeff = rho_e*rad_e/3.0
     coeff_inv = 0.75/(np.pi*rho_e*rad_e**3)
-    #-- Switching between Cosine and Sine Stokes
-    for cs,csharm in enumerate(['clm','slm']):
-        #-- copy cosine and sin harmonics
-        mascon_harm = getattr(mascon_Ylms, csharm)
-        #-- for each spherical harmonic degree
-        #-- +1 to include LMAX
-        for l in range(LMIN,LMAX+1):
-            #-- for each spherical harmonic order
-            #-- Sine Stokes for (m=0) = 0
-            mm = np.min([MMAX,l])
-            #-- +1 to include l or MMAX (whichever is smaller)
-            for m in range(cs,mm+1):
-                #-- Mascon Spherical Harmonics
-                M_lm[ii,:] = np.copy(mascon_harm[l,m,:])
-                #-- degree dependent factor to convert to mass
-                fact[ii] = (2.0*l + 1.0)/(1.0 + kl[l])
-                #-- degree dependent factor to convert from mass
-                fact_inv[ii] = coeff_inv*(1.0 + kl[l])/(2.0*l+1.0)
-                #-- degree dependent smoothing
-                wt_lm[ii] = np.copy(wt[l])
-                #-- add 1 to counter
-                ii += 1
+    #-- degree dependent factor to convert to mass
+    fact = (2.0*l + 1.0)/(1.0 + kl[l])
+    #-- degree dependent factor to convert from mass
+    fact_inv = coeff_inv*(1.0 + kl[l])/(2.0*l + 1.0)
+    #-- degree dependent smoothing
+    wt_lm = wt[l]
 
     #-- Converting mascon coefficients to fit method
     if (FIT_METHOD == 1):
         #-- Fitting Sensitivity Kernel as mass coefficients
         #-- converting M_lm to mass coefficients of the kernel
-        for i in range(n_harm):
-            MA_lm[i,:] = M_lm[i,:]*wt_lm[i]*fact[i]
         fit_factor = wt_lm*fact
         inv_fit_factor = np.copy(fact_inv)
     else:
         #-- Fitting Sensitivity Kernel as geoid coefficients
-        for i in range(n_harm):
-            MA_lm[:,:] = M_lm[i,:]*wt_lm[i]
         fit_factor = wt_lm*np.ones((n_harm))
         inv_fit_factor = np.ones((n_harm))
-
+    #-- mascon kernel converted to output unit
+    MA_lm = M_lm*fit_factor[:,None]
+
+    #-- cache file for the pseudo-inverse of the mascon harmonics
+    if (KERNEL_CACHE.title() != 'None'):
+        CACHE = kernel_cache_file(KERNEL_CACHE, MASCON_INDEX, LMIN=LMIN,
+            LMAX=LMAX, MMAX=MMAX, RAD=RAD, LOVE_NUMBERS=LOVE_NUMBERS,
+            REFERENCE=REFERENCE, FIT_METHOD=FIT_METHOD,
+            MASCON_OCEAN=MASCON_OCEAN)
+    else:
+        CACHE = None
     #-- Fitting the sensitivity kernel from the input kernel
-    for i in range(n_harm):
-        #-- setting kern_i equal to 1 for d/o
-        kern_i = np.zeros((n_harm))
-        #-- converting to mass coefficients if specified
-        kern_i[i] = 1.0*fit_factor[i]
-        #-- spherical harmonics solution for the
-        #-- mascon sensitivity kernels
-        #-- Least Squares Solutions: Inv(X'.X).(X'.Y)
-        kern_lm = np.linalg.lstsq(MA_lm,kern_i,rcond=-1)[0]
-        for k in range(n_mas):
-            A_lm[i,k] = kern_lm[k]*total_area[k]
-
-    #-- for each mascon
-    for k in range(n_mas):
-        #-- reshaping harmonics of sensitivity kernel to LMAX+1,MMAX+1
-        #-- calculating the spatial sensitivity kernel of each mascon
-        #-- kernel calculated as outlined in Tiwari (2009) and Jacobs (2012)
-        #-- Initializing output sensitivity kernel (both spatial and Ylms)
-        kern_Ylms = harmonics(lmax=LMAX, mmax=MMAX)
-        kern_Ylms.clm = np.zeros((LMAX+1,MMAX+1))
-        kern_Ylms.slm = np.zeros((LMAX+1,MMAX+1))
-        kern_Ylms.time = total_area[k]
-        #-- counter variable for deconstructing the mascon column arrays
-        ii = 0
-        #-- Switching between Cosine and Sine Stokes
-        for cs,csharm in enumerate(['clm','slm']):
-            #-- for each spherical harmonic degree
-            #-- +1 to include LMAX
-            for l in range(LMIN,LMAX+1):
-                #-- for each spherical harmonic order
-                #-- Sine Stokes for (m=0) = 0
-                mm = np.min([MMAX,l])
-                #-- +1 to include l or MMAX (whichever is smaller)
-                for m in range(cs,mm+1):
-                    #-- inv_fit_factor: normalize from mass harmonics
-                    temp = getattr(kern_Ylms, csharm)
-                    temp[l,m] = inv_fit_factor[ii]*A_lm[ii,k]
-                    #-- add 1 to counter
-                    ii += 1
-
-        #-- convert spherical harmonics to output spatial grid
-        grid.data = harmonic_summation(kern_Ylms.clm, kern_Ylms.slm,
-            grid.lon, grid.lat, LMAX=LMAX, MMAX=MMAX, PLM=PLM).T
-        grid.time = total_area[k]
-
+    #-- using a single pseudo-inverse of the mascon kernel
+    #-- spherical harmonics solution for the mascon sensitivity kernels
+    A_lm = mascon_kernel(MA_lm, fit_factor, AREA=total_area, CACHE=CACHE)
+
+    #-- sensitivity kernels normalized from the fit method
+    #-- kernels calculated as outlined in Tiwari (2009) and Jacobs (2012)
+    #-- inv_fit_factor: normalize from mass harmonics
+    A_lm *= inv_fit_factor[:,None]
+    #-- number of mascons to synthesize in each block
+    #-- default block size limits each stack of spatial fields to 2^24 values
+    if CHUNKSIZE is None:
+        CHUNKSIZE = np.max([1,2**24//(n_lon*n_lat)])
+    CHUNKSIZE = np.int(CHUNKSIZE)
+
+    #-- output all sensitivity kernels to a single stacked file
+    if STACKED:
         #-- output names for sensitivity kernel Ylm and spatial files
-        #-- for both LMAX==MMAX and LMAX != MMAX cases
-        args = (mascon_name[k],ocean_str,LMAX,order_str,gw_str,suffix[DATAFORM])
+        #-- index base is the file without directory or suffix
+        index_base = os.path.splitext(os.path.basename(MASCON_INDEX))[0]
+        args = (index_base.upper(),ocean_str,LMAX,order_str,gw_str,
+            suffix[DATAFORM])
         FILE1 = '{0}_SKERNEL_CLM{1}_L{2:d}{3}{4}.{5}'.format(*args)
         FILE2 = '{0}_SKERNEL{1}_L{2:d}{3}{4}.{5}'.format(*args)
-        #-- output sensitivity kernel to file
-        if (DATAFORM == 'ascii'):
-            #-- ascii (.txt)
-            kern_Ylms.to_ascii(os.path.join(DIRECTORY,FILE1),date=False)
-            grid.to_ascii(os.path.join(DIRECTORY,FILE2),date=False,
-                units='unitless',longname='Sensitivity_Kernel')
-        elif (DATAFORM == 'netCDF4'):
+        #-- reshaping harmonics of all sensitivity kernels to LMAX+1,MMAX+1
+        kern_Ylms = mascon_harmonics(kernels, COLUMNS=A_lm)
+        kern_Ylms.time = np.copy(total_area)
+        kern_Ylms.month = np.arange(1,n_mas+1)
+        #-- mascon dimension variables are the total area and index
+        kwargs = dict(TIME_UNITS='cm^2', TIME_LONGNAME='Mascon_Total_Area',
+            MONTHS_LONGNAME='Mascon_Index')
+        #-- output sensitivity kernel harmonics to file
+        if (DATAFORM == 'netCDF4'):
             #-- netCDF4 (.nc)
-            kern_Ylms.to_netCDF4(os.path.join(DIRECTORY,FILE1),date=False)
-            grid.to_netCDF4(os.path.join(DIRECTORY,FILE2),date=False,
-                units='unitless',longname='Sensitivity_Kernel')
+            kern_Ylms.to_netCDF4(os.path.join(DIRECTORY,FILE1), **kwargs)
         elif (DATAFORM == 'HDF5'):
-            #-- netcdf (.H5)
-            kern_Ylms.to_HDF5(os.path.join(DIRECTORY,FILE1),date=False)
-            grid.to_HDF5(os.path.join(DIRECTORY,FILE2),date=False,
-                units='unitless',longname='Sensitivity_Kernel')
+            #-- HDF5 (.H5)
+            kern_Ylms.to_HDF5(os.path.join(DIRECTORY,FILE1), **kwargs)
+        #-- convert spherical harmonics of each block of mascons to spatial
+        #-- grids and append the spatial fields to the stacked file
+        with spatial_series(os.path.join(DIRECTORY,FILE2), grid.lon,
+            grid.lat, format=DATAFORM, varname='z', units='unitless',
+            longname='Sensitivity_Kernel', timename='mascon',
+            time_units='cm^2', time_longname='Mascon_Total_Area') as fid:
+            for k in range(0,n_mas,CHUNKSIZE):
+                block = slice(k,k+CHUNKSIZE)
+                data = harmonic_summation(kern_Ylms.clm[:,:,block],
+                    kern_Ylms.slm[:,:,block], grid.lon, grid.lat,
+                    LMAX=LMAX, MMAX=MMAX, PLM=PLM)
+                fid.append(np.transpose(data,axes=(1,0,2)), total_area[block])
         #-- change the permissions mode
         os.chmod(os.path.join(DIRECTORY,FILE1),MODE)
         os.chmod(os.path.join(DIRECTORY,FILE2),MODE)
         #-- add output files to list object
         output_files.append(os.path.join(DIRECTORY,FILE1))
         output_files.append(os.path.join(DIRECTORY,FILE2))
+        #-- return the list of output files
+        return output_files
+
+    #-- for each block of mascons
+    for k0 in range(0,n_mas,CHUNKSIZE):
+        block = np.arange(k0,np.min([k0+CHUNKSIZE,n_mas]))
+        #-- reshaping harmonics of sensitivity kernels to LMAX+1,MMAX+1
+        kern_Ylms = mascon_harmonics(kernels, COLUMNS=A_lm[:,block])
+        #-- convert spherical harmonics of the block to output spatial grids
+        grid.data = np.transpose(harmonic_summation(kern_Ylms.clm,
+            kern_Ylms.slm, grid.lon, grid.lat, LMAX=LMAX, MMAX=MMAX,
+            PLM=PLM), axes=(1,0,2))
+        grid.mask = np.zeros_like(grid.data, dtype=np.bool)
+        #-- for each mascon in the block
+        for i,k in enumerate(block):
+            #-- sensitivity kernel harmonics and spatial field of the mascon
+            kern_k = kern_Ylms.index(i, date=False)
+            kern_k.time = total_area[k]
+            grid_k = grid.index(i, date=False)
+            grid_k.time = total_area[k]
+
+            #-- output names for sensitivity kernel Ylm and spatial files
+            #-- for both LMAX==MMAX and LMAX != MMAX cases
+            args = (mascon_name[k],ocean_str,LMAX,order_str,gw_str,
+                suffix[DATAFORM])
+            FILE1 = '{0}_SKERNEL_CLM{1}_L{2:d}{3}{4}.{5}'.format(*args)
+            FILE2 = '{0}_SKERNEL{1}_L{2:d}{3}{4}.{5}'.format(*args)
+            #-- output sensitivity kernel to file
+            if (DATAFORM == 'ascii'):
+                #-- ascii (.txt)
+                kern_k.to_ascii(os.path.join(DIRECTORY,FILE1),date=False)
+                grid_k.to_ascii(os.path.join(DIRECTORY,FILE2),date=False)
+            elif (DATAFORM == 'netCDF4'):
+                #-- netCDF4 (.nc)
+                kern_k.to_netCDF4(os.path.join(DIRECTORY,FILE1),date=False)
+                grid_k.to_netCDF4(os.path.join(DIRECTORY,FILE2),date=False,
+                    units='unitless',longname='Sensitivity_Kernel')
+            elif (DATAFORM == 'HDF5'):
+                #-- netcdf (.H5)
+                kern_k.to_HDF5(os.path.join(DIRECTORY,FILE1),date=False)
+                grid_k.to_HDF5(os.path.join(DIRECTORY,FILE2),date=False,
+                    units='unitless',longname='Sensitivity_Kernel')
+            #-- change the permissions mode
+            os.chmod(os.path.join(DIRECTORY,FILE1),MODE)
+            os.chmod(os.path.join(DIRECTORY,FILE2),MODE)
+            #-- add output files to list object
+            output_files.append(os.path.join(DIRECTORY,FILE1))
+            output_files.append(os.path.join(DIRECTORY,FILE2))
 
     #-- return the list of output files
     return output_files
@@ -582,7 +533,8 @@ def create_unique_logfile(filename):
         counter += 1
 
 #-- PURPOSE: define the analysis for multiprocessing
-def define_analysis(f,LOVE_NUMBERS=0,REFERENCE=None,LOG=False,MODE=0o775):
+def define_analysis(f,LOVE_NUMBERS=0,REFERENCE=None,STACKED=False,
+    CHUNKSIZE=None,LOG=False,MODE=0o775):
     #-- keep track of multiprocessing threads
     info(os.path.basename(f))
 
@@ -604,7 +556,8 @@ def define_analysis(f,LOVE_NUMBERS=0,REFERENCE=None,LOG=False,MODE=0o775):
     try:
         #-- run calc sensitivity kernel algorithm with parameters
         output_files = calc_sensitivity_kernel(parameters,
-            LOVE_NUMBERS=LOVE_NUMBERS, REFERENCE=REFERENCE, MODE=MODE)
+            LOVE_NUMBERS=LOVE_NUMBERS, REFERENCE=REFERENCE, STACKED=STACKED,
+            CHUNKSIZE=CHUNKSIZE, MODE=MODE)
     except:
         #-- if there has been an error exception
         #-- print the type, value, and stack trace of the
@@ -645,6 +598,14 @@ def main():
     parser.add_argument('--reference','-r',
         type=str.upper, default='CF', choices=['CF','CM','CE'],
         help='Reference frame for load Love numbers')
+    #-- output all sensitivity kernels to a single file with a mascon dimension
+    parser.add_argument('--stacked','-S',
+        default=False, action='store_true',
+        help='Output sensitivity kernels to a single stacked file')
+    #-- number of mascons to synthesize in each block
+    parser.add_argument('--chunksize','-C',
+        type=int, default=None,
+        help='Number of mascons to synthesize in each block')
     #-- Output log file for each job in forms
     #-- calc_skernel_run_2002-04-01_PID-00000.log
     #-- calc_skernel_failed_run_2002-04-01_PID-00000.log
@@ -663,14 +624,15 @@ def main():
         #-- for each entered parameter file
         for f in args.parameters:
             define_analysis(f, LOVE_NUMBERS=args.love,
-                REFERENCE=args.reference, LOG=args.log,
-                MODE=args.mode)
+                REFERENCE=args.reference, STACKED=args.stacked,
+                CHUNKSIZE=args.chunksize, LOG=args.log, MODE=args.mode)
     else:
         #-- run in parallel with multiprocessing Pool
         pool = multiprocessing.Pool(processes=args.np)
         #-- for each entered parameter file
         for f in args.parameters:
             kwds=dict(LOVE_NUMBERS=args.love, REFERENCE=args.reference,
+                STACKED=args.stacked, CHUNKSIZE=args.chunksize,
                 LOG=args.log, MODE=args.mode)
             pool.apply_async(define_analysis,args=(f,),kwds=kwds)
         #-- start multiprocessing jobs
@@ -1,7 +1,7 @@
 #!/usr/bin/env python
 u"""
 combine_harmonics.py
-Written by Tyler Sutterley (01/2021)
+Written by Tyler Sutterley (03/2021)
 Converts a file from the spherical harmonic domain into the spatial domain
 
 CALLING SEQUENCE:
@@ -19,6 +19,7 @@ COMMAND LINE OPTIONS:
         CF: Center of Surface Figure (default)
         CM: Center of Mass of Earth System
         CE: Center of Mass of Solid Earth
+    --love-cache X: directory for caching parsed load Love number tables
     -R X, --radius X: Gaussian smoothing radius (km)
     -d, --destripe: use a decorrelation filter (destriping filter)
     -U X, --units X: output units
@@ -76,6 +77,9 @@ PROGRAM DEPENDENCIES:
     utilities.py: download and management utilities for files
 
 UPDATE HISTORY:
+    Updated 03/2021: use harmonics views and output objects for each time
+        use load_love_numbers from read_love_numbers
+        added option to cache parsed load Love number tables
     Updated 01/2021: harmonics object output from gen_stokes.py/ocean_stokes.py
     Updated 12/2020: added more love number options
     Updated 10/2020: use argparse to set command line parameters
@@ -97,7 +101,7 @@ import re
 import argparse
 import numpy as np
 
-from gravity_toolkit.read_love_numbers import read_love_numbers
+from gravity_toolkit.read_love_numbers import load_love_numbers
 from gravity_toolkit.plm_holmes import plm_holmes
 from gravity_toolkit.gauss_weights import gauss_weights
 from gravity_toolkit.ocean_stokes import ocean_stokes
@@ -105,69 +109,12 @@ from gravity_toolkit.harmonic_summation import harmonic_summation
 from gravity_toolkit.harmonics import harmonics
 from gravity_toolkit.spatial import spatial
 from gravity_toolkit.units import units
-from gravity_toolkit.utilities import get_data_path
-
-#-- PURPOSE: read load love numbers for the range of spherical harmonic degrees
-def load_love_numbers(LMAX, LOVE_NUMBERS=0, REFERENCE='CF'):
-    """
-    Reads PREM load Love numbers for the range of spherical harmonic degrees
-    and applies isomorphic parameters
-
-    Arguments
-    ---------
-    LMAX: maximum spherical harmonic degree
-
-    Keyword arguments
-    -----------------
-    LOVE_NUMBERS: Load Love numbers dataset
-        0: Han and Wahr (1995) values from PREM
-        1: Gegout (2005) values from PREM
-        2: Wang et al. (2012) values from PREM
-    REFERENCE: Reference frame for calculating degree 1 love numbers
-        CF: Center of Surface Figure (default)
-        CM: Center of Mass of Earth System
-        CE: Center of Mass of Solid Earth
-
-    Returns
-    -------
-    kl: Love number of Gravitational Potential
-    hl: Love number of Vertical Displacement
-    ll: Love number of Horizontal Displacement
-    """
-    #-- load love numbers file
-    if (LOVE_NUMBERS == 0):
-        #-- PREM outputs from Han and Wahr (1995)
-        #-- https://doi.org/10.1111/j.1365-246X.1995.tb01819.x
-        love_numbers_file = get_data_path(['data','love_numbers'])
-        header = 2
-        columns = ['l','hl','kl','ll']
-    elif (LOVE_NUMBERS == 1):
-        #-- PREM outputs from Gegout (2005)
-        #-- http://gemini.gsfc.nasa.gov/aplo/
-        love_numbers_file = get_data_path(['data','Load_Love2_CE.dat'])
-        header = 3
-        columns = ['l','hl','ll','kl']
-    elif (LOVE_NUMBERS == 2):
-        #-- PREM outputs from Wang et al. (2012)
-        #-- https://doi.org/10.1016/j.cageo.2012.06.022
-        love_numbers_file = get_data_path(['data','PREM-LLNs-truncated.dat'])
-        header = 1
-        columns = ['l','hl','ll','kl','nl','nk']
-    #-- LMAX of load love numbers from Han and Wahr (1995) is 696.
-    #-- from Wahr (2007) linearly interpolating kl works
-    #-- however, as we are linearly extrapolating out, do not make
-    #-- LMAX too much larger than 696
-    #-- read arrays of kl, hl, and ll Love Numbers
-    hl,kl,ll = read_love_numbers(love_numbers_file, LMAX=LMAX, HEADER=header,
-        COLUMNS=columns, REFERENCE=REFERENCE, FORMAT='tuple')
-    #-- return a tuple of load love numbers
-    return (hl,kl,ll)
 
 #-- PURPOSE: converts from the spherical harmonic domain into the spatial domain
 def combine_harmonics(INPUT_FILE, OUTPUT_FILE, LMAX=None, MMAX=None,
-    LOVE_NUMBERS=0, REFERENCE=None, RAD=None, DESTRIPE=False, UNITS=None,
-    DDEG=None, INTERVAL=None, BOUNDS=None, REDISTRIBUTE=False, LSMASK=None,
-    MEAN_FILE=None, DATAFORM=None, VERBOSE=False, MODE=0o775):
+    LOVE_NUMBERS=0, REFERENCE=None, LOVE_CACHE=None, RAD=None, DESTRIPE=False,
+    UNITS=None, DDEG=None, INTERVAL=None, BOUNDS=None, REDISTRIBUTE=False,
+    LSMASK=None, MEAN_FILE=None, DATAFORM=None, VERBOSE=False, MODE=0o775):
 
     #-- verify that output directory exists
     DIRECTORY = os.path.abspath(os.path.dirname(OUTPUT_FILE))
@@ -201,7 +148,7 @@ def combine_harmonics(INPUT_FILE, OUTPUT_FILE, LMAX=None, MMAX=None,
 
     #-- read arrays of kl, hl, and ll Love Numbers
     hl,kl,ll = load_love_numbers(LMAX, LOVE_NUMBERS=LOVE_NUMBERS,
-        REFERENCE=REFERENCE)
+        REFERENCE=REFERENCE, CACHE=LOVE_CACHE)
 
     #-- distribute total mass uniformly over the ocean
     if REDISTRIBUTE:
@@ -291,11 +238,12 @@ def combine_harmonics(INPUT_FILE, OUTPUT_FILE, LMAX=None, MMAX=None,
     #-- output spatial grid
     nt = len(input_Ylms.time)
     grid.data = np.zeros((nlat,nlon,nt))
+    #-- allocate harmonics object for each time
+    Ylms = input_Ylms.index(0)
     #-- converting harmonics to truncated, smoothed coefficients in output units
     for t in range(nt):
         #-- spherical harmonics for time t
-        Ylms = input_Ylms.index(t)
-        Ylms.convolve(dfactor*wt)
+        input_Ylms.index(t,copy=False).convolve(dfactor*wt,out=Ylms)
         #-- convert spherical harmonics to output spatial grid
         grid.data[:,:,t] = harmonic_summation(Ylms.clm, Ylms.slm,
             grid.lon, grid.lat, LMAX=LMAX, PLM=PLM).T
@@ -364,6 +312,10 @@ def main():
     parser.add_argument('--reference','-r',
         type=str.upper, default='CF', choices=['CF','CM','CE'],
         help='Reference frame for load Love numbers')
+    #-- directory for caching parsed load Love number tables
+    parser.add_argument('--love-cache',
+        type=lambda p: os.path.abspath(os.path.expanduser(p)),
+        help='Directory for caching parsed load Love number tables')
     #-- Gaussian smoothing radius (km)
     parser.add_argument('--radius','-R',
         type=float, default=0,
@@ -416,6 +368,7 @@ def main():
     #-- run program with parameters
     combine_harmonics(args.infile, args.outfile, LMAX=args.lmax, MMAX=args.mmax,
         LOVE_NUMBERS=args.love, REFERENCE=args.reference,
+        LOVE_CACHE=args.love_cache,
         RAD=args.radius, DESTRIPE=args.destripe, UNITS=args.units,
         DDEG=args.spacing, INTERVAL=args.interval, BOUNDS=args.bounds,
         REDISTRIBUTE=args.ocean, LSMASK=args.mask, MEAN_FILE=args.mean,
@@ -1,7 +1,7 @@
 #!/usr/bin/env python
 u"""
 grace_spatial_error.py
-Written by Tyler Sutterley (12/2020)
+Written by Tyler Sutterley (03/2021)
 
 Calculates the GRACE/GRACE-FO errors following Wahr et al. (2006)
 
@@ -42,6 +42,7 @@ COMMAND LINE OPTIONS:
         CF: Center of Surface Figure (default)
         CM: Center of Mass of Earth System
         CE: Center of Mass of Solid Earth
+    -C, --covariance: Propagate the full covariance of the harmonic residuals
     -l, --log: Output log of files created for each job
     -V, --verbose: Verbose output of processing run
     -M X, --mode X: Permissions mode of the files created
@@ -64,6 +65,8 @@ PROGRAM DEPENDENCIES:
     gauss_weights.py: Computes the Gaussian weights as a function of degree
     plm_holmes.py: Computes fully normalized associated Legendre polynomials
     units.py: class for converting spherical harmonic data to specific units
+    harmonic_variance.py: propagates harmonic variances to a spatial field
+    mascon_kernel.py: calculates the order of harmonic column arrays
     tssmooth.py: smoothes a time-series for seasonal effects
     harmonics.py: spherical harmonic data class for processing GRACE/GRACE-FO
     destripe_harmonics.py: calculates the decorrelation (destriping) filter
@@ -85,6 +88,12 @@ REFERENCES:
         http://dx.doi.org/10.1029/2005GL025305
 
 UPDATE HISTORY:
+    Updated 03/2021: smooth the time series of all harmonics at once
+        use load_love_numbers from read_love_numbers
+        calculate degree dependent unit factors once
+        sum variances without allocating squared Legendre polynomials
+        can propagate the full covariance of the harmonic residuals
+        added option to cache parsed load Love number tables
     Updated 12/2020: added more love number options and from gfc for mean files
     Updated 10/2020: use argparse to set command line parameters
     Updated 08/2020: use utilities to define path to load love numbers file
@@ -117,14 +126,16 @@ import multiprocessing
 import traceback
 
 from gravity_toolkit.grace_input_months import grace_input_months
-from gravity_toolkit.read_love_numbers import read_love_numbers
+from gravity_toolkit.read_love_numbers import load_love_numbers
 from gravity_toolkit.plm_holmes import plm_holmes
 from gravity_toolkit.gauss_weights import gauss_weights
 from gravity_toolkit.harmonics import harmonics
+from gravity_toolkit.harmonic_variance import variance_summation, \
+    covariance_summation
+from gravity_toolkit.mascon_kernel import harmonic_indices
 from gravity_toolkit.spatial import spatial
 from gravity_toolkit.tssmooth import tssmooth
 from gravity_toolkit.units import units
-from gravity_toolkit.utilities import get_data_path
 
 #-- PURPOSE: keep track of multiprocessing threads
 def info(title):
@@ -135,66 +146,10 @@ def info(title):
         print('parent process: {0:d}'.format(os.getppid()))
     print('process id: {0:d}'.format(os.getpid()))
 
-#-- PURPOSE: read load love numbers for the range of spherical harmonic degrees
-def load_love_numbers(LMAX, LOVE_NUMBERS=0, REFERENCE='CF'):
-    """
-    Reads PREM load Love numbers for the range of spherical harmonic degrees
-    and applies isomorphic parameters
-
-    Arguments
-    ---------
-    LMAX: maximum spherical harmonic degree
-
-    Keyword arguments
-    -----------------
-    LOVE_NUMBERS: Load Love numbers dataset
-        0: Han and Wahr (1995) values from PREM
-        1: Gegout (2005) values from PREM
-        2: Wang et al. (2012) values from PREM
-    REFERENCE: Reference frame for calculating degree 1 love numbers
-        CF: Center of Surface Figure (default)
-        CM: Center of Mass of Earth System
-        CE: Center of Mass of Solid Earth
-
-    Returns
-    -------
-    kl: Love number of Gravitational Potential
-    hl: Love number of Vertical Displacement
-    ll: Love number of Horizontal Displacement
-    """
-    #-- load love numbers file
-    if (LOVE_NUMBERS == 0):
-        #-- PREM outputs from Han and Wahr (1995)
-        #-- https://doi.org/10.1111/j.1365-246X.1995.tb01819.x
-        love_numbers_file = get_data_path(['data','love_numbers'])
-        header = 2
-        columns = ['l','hl','kl','ll']
-    elif (LOVE_NUMBERS == 1):
-        #-- PREM outputs from Gegout (2005)
-        #-- http://gemini.gsfc.nasa.gov/aplo/
-        love_numbers_file = get_data_path(['data','Load_Love2_CE.dat'])
-        header = 3
-        columns = ['l','hl','ll','kl']
-    elif (LOVE_NUMBERS == 2):
-        #-- PREM outputs from Wang et al. (2012)
-        #-- https://doi.org/10.1016/j.cageo.2012.06.022
-        love_numbers_file = get_data_path(['data','PREM-LLNs-truncated.dat'])
-        header = 1
-        columns = ['l','hl','ll','kl','nl','nk']    
-    #-- LMAX of load love numbers from Han and Wahr (1995) is 696.
-    #-- from Wahr (2007) linearly interpolating kl works
-    #-- however, as we are linearly extrapolating out, do not make
-    #-- LMAX too much larger than 696
-    #-- read arrays of kl, hl, and ll Love Numbers
-    hl,kl,ll = read_love_numbers(love_numbers_file, LMAX=LMAX, HEADER=header,
-        COLUMNS=columns, REFERENCE=REFERENCE, FORMAT='tuple')
-    #-- return a tuple of load love numbers
-    return (hl,kl,ll)
-
 #-- PURPOSE: import GRACE files for a given months range
 #-- Estimates the GRACE/GRACE-FO errors applying the specified procedures
 def grace_spatial_error(base_dir, parameters, LOVE_NUMBERS=0,
-    REFERENCE=None, VERBOSE=False, MODE=0o775):
+    REFERENCE=None, COVARIANCE=False, VERBOSE=False, MODE=0o775):
     #-- Data processing center
     PROC = parameters['PROC']
     #-- Data Release
@@ -250,9 +205,13 @@ def grace_spatial_error(base_dir, parameters, LOVE_NUMBERS=0,
     #-- file information
     suffix = dict(ascii='txt', netCDF4='nc', HDF5='H5')
 
+    #-- directory for caching parsed load Love number tables
+    LOVE_CACHE = parameters.get('LOVE_CACHE','None')
+    LOVE_CACHE = None if (LOVE_CACHE.title() == 'None') else \
+        os.path.expanduser(LOVE_CACHE)
     #-- read arrays of kl, hl, and ll Love Numbers
     hl,kl,ll = load_love_numbers(LMAX, LOVE_NUMBERS=LOVE_NUMBERS,
-        REFERENCE=REFERENCE)
+        REFERENCE=REFERENCE, CACHE=LOVE_CACHE)
 
     #-- Calculating the Gaussian smoothing for radius RAD
     if (RAD != 0):
@@ -307,6 +266,14 @@ def grace_spatial_error(base_dir, parameters, LOVE_NUMBERS=0,
         #-- using standard GRACE/GRACE-FO harmonics
         ds_str = ''
 
+    #-- Smoothing Half-Width (CNES is a 10-day solution)
+    #-- 365/10/2 = 18.25 (next highest is 19)
+    #-- All other solutions are monthly solutions (HFWTH for annual = 6)
+    if ((PROC == 'CNES') and (DREL in ('RL01','RL02'))):
+        HFWTH = 19
+    else:
+        HFWTH = 6
+
     #-- calculating GRACE error (Wahr et al 2006)
     #-- output GRACE error file (for both LMAX==MMAX and LMAX != MMAX cases)
     args = (PROC,DREL,DSET,LMAX,order_str,ds_str,atm_str,GRACE_Ylms.month[0],
@@ -324,30 +291,22 @@ def grace_spatial_error(base_dir, parameters, LOVE_NUMBERS=0,
         delta_Ylms = harmonics(lmax=LMAX,mmax=MMAX)
         delta_Ylms.clm = np.zeros((LMAX+1,MMAX+1))
         delta_Ylms.slm = np.zeros((LMAX+1,MMAX+1))
-        #-- Smoothing Half-Width (CNES is a 10-day solution)
-        #-- 365/10/2 = 18.25 (next highest is 19)
-        #-- All other solutions are monthly solutions (HFWTH for annual = 6)
-        if ((PROC == 'CNES') and (DREL in ('RL01','RL02'))):
-            HFWTH = 19
-        else:
-            HFWTH = 6
         #-- Equal to the noise of the smoothed time-series
-        #-- for each spherical harmonic order
-        for m in range(0,MMAX+1):#-- MMAX+1 to include MMAX
-            #-- for each spherical harmonic degree
-            for l in range(m,LMAX+1):#-- LMAX+1 to include LMAX
-                #-- Delta coefficients of GRACE time series
-                for cs,csharm in enumerate(['clm','slm']):
-                    #-- Constrained GRACE Error (Noise of smoothed time-series)
-                    #-- With Annual and Semi-Annual Terms
-                    val1 = getattr(GRACE_Ylms, csharm)
-                    smth = tssmooth(GRACE_Ylms.time, val1[l,m,:], HFWTH=HFWTH)
-                    #-- number of smoothed points
-                    nsmth = len(smth['data'])
-                    #-- GRACE delta Ylms
-                    #-- variance of data-(smoothed+annual+semi)
-                    val2 = getattr(delta_Ylms, csharm)
-                    val2[l,m] = np.sqrt(np.sum(smth['noise']**2)/nsmth)
+        #-- for each spherical harmonic degree and order
+        #-- smoothing the time series of all harmonics at once
+        l,m = np.tril_indices(LMAX+1, m=MMAX+1)
+        #-- Delta coefficients of GRACE time series
+        for cs,csharm in enumerate(['clm','slm']):
+            #-- Constrained GRACE Error (Noise of smoothed time-series)
+            #-- With Annual and Semi-Annual Terms
+            val1 = getattr(GRACE_Ylms, csharm)
+            smth = tssmooth(GRACE_Ylms.time, val1[l,m,:], HFWTH=HFWTH)
+            #-- number of smoothed points
+            nsmth = len(smth['time'])
+            #-- GRACE delta Ylms
+            #-- variance of data-(smoothed+annual+semi)
+            val2 = getattr(delta_Ylms, csharm)
+            val2[l,m] = np.sqrt(np.sum(smth['noise']**2,axis=1)/nsmth)
 
         #-- save GRACE DELTA to file
         delta_Ylms.time = np.copy(nsmth)
@@ -409,54 +368,61 @@ def grace_spatial_error(base_dir, parameters, LOVE_NUMBERS=0,
     #-- for specific spherical harmonic output units
     if (UNITS == 1):
         #-- 1: cmwe, centimeters water equivalent
-        dfactor = units(lmax=LMAX).harmonic(hl,kl,ll).cmwe
+        dfactor = factors.cmwe
     elif (UNITS == 2):
         #-- 2: mmGH, millimeters geoid height
-        dfactor = units(lmax=LMAX).harmonic(hl,kl,ll).mmGH
+        dfactor = factors.mmGH
     elif (UNITS == 3):
         #-- 3: mmCU, millimeters elastic crustal deformation
-        dfactor = units(lmax=LMAX).harmonic(hl,kl,ll).mmCU
+        dfactor = factors.mmCU
     elif (UNITS == 4):
         #-- 4: micGal, microGal gravity perturbations
-        dfactor = units(lmax=LMAX).harmonic(hl,kl,ll).microGal
+        dfactor = factors.microGal
     elif (UNITS == 5):
         #-- 5: mbar, millibar equivalent surface pressure
-        dfactor = units(lmax=LMAX).harmonic(hl,kl,ll).mbar
+        dfactor = factors.mbar
 
     #-- Computing plms for converting to spatial domain
-    phi = delta.lon[np.newaxis,:]*np.pi/180.0
     theta = (90.0-delta.lat)*np.pi/180.0
     PLM,dPLM = plm_holmes(LMAX,np.cos(theta))
-    #-- square of legendre polynomials truncated to order MMAX
-    mm = np.arange(0,MMAX+1)
-    PLM2 = PLM[:,mm,:]**2
-
-    #-- Calculating cos(m*phi)^2 and sin(m*phi)^2
-    m = delta_Ylms.m[:,np.newaxis]
-    ccos = np.cos(np.dot(m,phi))**2
-    ssin = np.sin(np.dot(m,phi))**2
-
-    #-- truncate delta harmonics to spherical harmonic range
-    Ylms = delta_Ylms.truncate(LMAX,lmin=LMIN,mmax=MMAX)
-    #-- convolve delta harmonics with degree dependent factors
-    #-- smooth harmonics and convert to output units
-    Ylms = Ylms.convolve(dfactor*wt).power(2.0).scale(1.0/nsmth)
-    #-- Calculate fourier coefficients
-    d_cos = np.zeros((MMAX+1,nlat))#-- [m,th]
-    d_sin = np.zeros((MMAX+1,nlat))#-- [m,th]
-    #-- Calculating delta spatial values
-    for k in range(0,nlat):
-        #-- summation over all spherical harmonic degrees
-        d_cos[:,k] = np.sum(PLM2[:,:,k]*Ylms.clm, axis=0)
-        d_sin[:,k] = np.sum(PLM2[:,:,k]*Ylms.slm, axis=0)
-
-    #-- Multiplying by c/s(phi#m) to get spatial maps (lon,lat)
-    delta.data=np.sqrt(np.dot(ccos.T,d_cos) + np.dot(ssin.T,d_sin)).T
+
+    if COVARIANCE:
+        #-- degree and order of each row of the residual harmonics
+        l,m,cs = harmonic_indices(LMIN, LMAX, MMAX=MMAX)
+        #-- residuals of the smoothed time series of each harmonic
+        #-- are a square-root factor of the full harmonic covariance
+        noise = []
+        for i,csharm in enumerate(['clm','slm']):
+            val1 = getattr(GRACE_Ylms, csharm)
+            smth = tssmooth(GRACE_Ylms.time, val1[l[cs==i],m[cs==i],:],
+                HFWTH=HFWTH)
+            noise.append(smth['noise'])
+        #-- number of smoothed points
+        nsmth = len(smth['time'])
+        #-- smooth residuals and convert to output units
+        #-- scaling to the covariance of the delta harmonics
+        R = (dfactor*wt)[l,None]*np.concatenate(noise,axis=0)/nsmth
+        #-- propagate the full covariance to spatial maps (lon,lat)
+        variance = covariance_summation(R, delta.lon, delta.lat, LMIN=LMIN,
+            LMAX=LMAX, MMAX=MMAX, PLM=PLM, SQRT=True)
+        cov_str = '_COV'
+    else:
+        #-- truncate delta harmonics to spherical harmonic range
+        Ylms = delta_Ylms.truncate(LMAX,lmin=LMIN,mmax=MMAX)
+        #-- convolve delta harmonics with degree dependent factors
+        #-- smooth harmonics and convert to output units
+        Ylms = Ylms.convolve(dfactor*wt).power(2.0).scale(1.0/nsmth)
+        #-- sum variances of the delta harmonics to spatial maps (lon,lat)
+        variance = variance_summation(Ylms.clm, Ylms.slm, delta.lon,
+            delta.lat, LMIN=LMIN, LMAX=LMAX, MMAX=MMAX, PLM=PLM)
+        cov_str = ''
+    #-- spatial error maps (lat,lon)
+    delta.data = np.sqrt(variance).T
 
     #-- output file format
-    file_format = '{0}{1}_L{2:d}{3}{4}{5}_ERR_{6:03d}-{7:03d}.{8}'
+    file_format = '{0}{1}_L{2:d}{3}{4}{5}_ERR{6}_{7:03d}-{8:03d}.{9}'
     #-- output error file to ascii, netCDF4 or HDF5
-    args = (FILENAME,unit_list[UNITS-1],LMAX,order_str,gw_str,ds_str,
+    args = (FILENAME,unit_list[UNITS-1],LMAX,order_str,gw_str,ds_str,cov_str,
         GRACE_Ylms.month[0],GRACE_Ylms.month[-1],suffix[DATAFORM])
     FILE = os.path.join(DIRECTORY,file_format.format(*args))
     if (DATAFORM == 'ascii'):
@@ -551,7 +517,7 @@ def create_unique_logfile(filename):
 
 #-- PURPOSE: define the analysis for multiprocessing
 def define_analysis(f,base_dir,LOVE_NUMBERS=0,REFERENCE=None,
-    LOG=False,VERBOSE=False,MODE=0o775):
+    COVARIANCE=False,LOG=False,VERBOSE=False,MODE=0o775):
     #-- keep track of multiprocessing threads
     info(os.path.basename(f))
 
@@ -574,7 +540,7 @@ def define_analysis(f,base_dir,LOVE_NUMBERS=0,REFERENCE=None,
         #-- run GRACE/GRACE-FO spatial error algorithm with parameters
         output_files = grace_spatial_error(base_dir, parameters,
             LOVE_NUMBERS=LOVE_NUMBERS, REFERENCE=REFERENCE,
-            VERBOSE=VERBOSE, MODE=MODE)
+            COVARIANCE=COVARIANCE, VERBOSE=VERBOSE, MODE=MODE)
     except:
         #-- if there has been an error exception
         #-- print the type, value, and stack trace of the
@@ -620,6 +586,10 @@ def main():
     parser.add_argument('--reference','-r',
         type=str.upper, default='CF', choices=['CF','CM','CE'],
         help='Reference frame for load Love numbers')
+    #-- propagate the full covariance of the harmonic residuals
+    parser.add_argument('--covariance','-C',
+        default=False, action='store_true',
+        help='Propagate the full covariance of the harmonic residuals')
     #-- Output log file for each job in forms
     #-- GRACE_error_run_2002-04-01_PID-00000.log
     #-- GRACE_error_failed_run_2002-04-01_PID-00000.log
@@ -641,15 +611,16 @@ def main():
         #-- run directly as series if PROCESSES = 0
         for f in args.parameters:
             define_analysis(f, args.directory, LOVE_NUMBERS=args.love,
-                REFERENCE=args.reference, LOG=args.log,
-                VERBOSE=args.verbose, MODE=args.mode)
+                REFERENCE=args.reference, COVARIANCE=args.covariance,
+                LOG=args.log, VERBOSE=args.verbose, MODE=args.mode)
     else:
         #-- run in parallel with multiprocessing Pool
         pool = multiprocessing.Pool(processes=args.np)
         #-- for each parameter file
         for f in args.parameters:
             kwds = dict(LOVE_NUMBERS=args.love, REFERENCE=args.reference,
-                LOG=args.log, VERBOSE=args.verbose, MODE=args.mode)
+                COVARIANCE=args.covariance, LOG=args.log,
+                VERBOSE=args.verbose, MODE=args.mode)
             pool.apply_async(define_analysis,args=(f,args.directory),kwds=kwds)
         #-- start multiprocessing jobs
         #-- close the pool
@@ -1,7 +1,7 @@
 #!/usr/bin/env python
 u"""
 grace_spatial_maps.py
-Written by Tyler Sutterley (01/2021)
+Written by Tyler Sutterley (03/2021)
 
 Reads in GRACE/GRACE-FO spherical harmonic coefficients and exports
     monthly spatial fields
@@ -47,6 +47,9 @@ COMMAND LINE OPTIONS:
         CF: Center of Surface Figure (default)
         CM: Center of Mass of Earth System
         CE: Center of Mass of Solid Earth
+    -T X, --threads X: Number of threads for summing latitude bands
+        of each spatial field in parallel
+    -S, --series: Output all months to a single netCDF4 or HDF5 file
     -l, --log: Output log of files created for each job
     -V, --verbose: Verbose output of processing run
     -M X, --mode X: Permissions mode of the files created
@@ -88,9 +91,19 @@ PROGRAM DEPENDENCIES:
     hdf5_read.py: reads input spatial data from HDF5 files
     ncdf_write.py: writes output spatial data to netCDF4
     hdf5_write.py: writes output spatial data to HDF5
+    spatial_series.py: writes a time series of spatial data to a single file
     utilities.py: download and management utilities for files
 
 UPDATE HISTORY:
+    Updated 03/2021: use harmonics views and output objects for each month
+        use lazy harmonics expressions to fuse corrections for each month
+        use load_love_numbers from read_love_numbers
+        calculate degree dependent unit factors once
+        sum latitude bands of each spatial field in parallel with threads
+        can stream all months to a single netCDF4 or HDF5 time series file
+        open the time series file within a context manager
+        added option to cache parsed load Love number tables
+        reuse a single pool of threads for the spatial fields of each month
     Updated 01/2021: harmonics object output from gen_stokes.py/ocean_stokes.py
     Updated 12/2020: added more love number options and from gfc for mean files
     Updated 10/2020: use argparse to set command line parameters
@@ -107,19 +120,20 @@ import time
 import numpy as np
 import argparse
 import multiprocessing
+import multiprocessing.pool
 import traceback
 
 from gravity_toolkit.grace_input_months import grace_input_months
 from gravity_toolkit.read_GIA_model import read_GIA_model
-from gravity_toolkit.read_love_numbers import read_love_numbers
+from gravity_toolkit.read_love_numbers import load_love_numbers
 from gravity_toolkit.plm_holmes import plm_holmes
 from gravity_toolkit.gauss_weights import gauss_weights
 from gravity_toolkit.ocean_stokes import ocean_stokes
 from gravity_toolkit.harmonic_summation import harmonic_summation
 from gravity_toolkit.harmonics import harmonics
 from gravity_toolkit.spatial import spatial
+from gravity_toolkit.spatial_series import spatial_series
 from gravity_toolkit.units import units
-from gravity_toolkit.utilities import get_data_path
 
 #-- PURPOSE: keep track of multiprocessing threads
 def info(title):
@@ -130,66 +144,10 @@ def info(title):
         print('parent process: {0:d}'.format(os.getppid()))
     print('process id: {0:d}'.format(os.getpid()))
 
-#-- PURPOSE: read load love numbers for the range of spherical harmonic degrees
-def load_love_numbers(LMAX, LOVE_NUMBERS=0, REFERENCE='CF'):
-    """
-    Reads PREM load Love numbers for the range of spherical harmonic degrees
-    and applies isomorphic parameters
-
-    Arguments
-    ---------
-    LMAX: maximum spherical harmonic degree
-
-    Keyword arguments
-    -----------------
-    LOVE_NUMBERS: Load Love numbers dataset
-        0: Han and Wahr (1995) values from PREM
-        1: Gegout (2005) values from PREM
-        2: Wang et al. (2012) values from PREM
-    REFERENCE: Reference frame for calculating degree 1 love numbers
-        CF: Center of Surface Figure (default)
-        CM: Center of Mass of Earth System
-        CE: Center of Mass of Solid Earth
-
-    Returns
-    -------
-    kl: Love number of Gravitational Potential
-    hl: Love number of Vertical Displacement
-    ll: Love number of Horizontal Displacement
-    """
-    #-- load love numbers file
-    if (LOVE_NUMBERS == 0):
-        #-- PREM outputs from Han and Wahr (1995)
-        #-- https://doi.org/10.1111/j.1365-246X.1995.tb01819.x
-        love_numbers_file = get_data_path(['data','love_numbers'])
-        header = 2
-        columns = ['l','hl','kl','ll']
-    elif (LOVE_NUMBERS == 1):
-        #-- PREM outputs from Gegout (2005)
-        #-- http://gemini.gsfc.nasa.gov/aplo/
-        love_numbers_file = get_data_path(['data','Load_Love2_CE.dat'])
-        header = 3
-        columns = ['l','hl','ll','kl']
-    elif (LOVE_NUMBERS == 2):
-        #-- PREM outputs from Wang et al. (2012)
-        #-- https://doi.org/10.1016/j.cageo.2012.06.022
-        love_numbers_file = get_data_path(['data','PREM-LLNs-truncated.dat'])
-        header = 1
-        columns = ['l','hl','ll','kl','nl','nk']
-    #-- LMAX of load love numbers from Han and Wahr (1995) is 696.
-    #-- from Wahr (2007) linearly interpolating kl works
-    #-- however, as we are linearly extrapolating out, do not make
-    #-- LMAX too much larger than 696
-    #-- read arrays of kl, hl, and ll Love Numbers
-    hl,kl,ll = read_love_numbers(love_numbers_file, LMAX=LMAX, HEADER=header,
-        COLUMNS=columns, REFERENCE=REFERENCE, FORMAT='tuple')
-    #-- return a tuple of load love numbers
-    return (hl,kl,ll)
-
 #-- PURPOSE: import GRACE files for a given months range
 #-- Converts the GRACE/GRACE-FO harmonics applying the specified procedures
 def grace_spatial_maps(base_dir, parameters, LOVE_NUMBERS=0, REFERENCE=None,
-    VERBOSE=False, MODE=0o775):
+    THREADS=0, SERIES=False, VERBOSE=False, MODE=0o775):
     #-- Data processing center
     PROC = parameters['PROC']
     #-- Data Release
@@ -251,9 +209,13 @@ def grace_spatial_maps(base_dir, parameters, LOVE_NUMBERS=0, REFERENCE=None,
     #-- file information
     suffix = dict(ascii='txt', netCDF4='nc', HDF5='H5')
 
+    #-- directory for caching parsed load Love number tables
+    LOVE_CACHE = parameters.get('LOVE_CACHE','None')
+    LOVE_CACHE = None if (LOVE_CACHE.title() == 'None') else \
+        os.path.expanduser(LOVE_CACHE)
     #-- read arrays of kl, hl, and ll Love Numbers
     hl,kl,ll = load_love_numbers(LMAX, LOVE_NUMBERS=LOVE_NUMBERS,
-        REFERENCE=REFERENCE)
+        REFERENCE=REFERENCE, CACHE=LOVE_CACHE)
 
     #-- Calculating the Gaussian smoothing for radius RAD
     if (RAD != 0):
@@ -310,14 +272,10 @@ def grace_spatial_maps(base_dir, parameters, LOVE_NUMBERS=0, REFERENCE=None,
     #-- input GIA spherical harmonic datafiles
     GIA_Ylms_rate = read_GIA_model(GIA_FILE,GIA=GIA,LMAX=LMAX,MMAX=MMAX)
     #-- calculate the monthly mass change from GIA
-    GIA_Ylms = GRACE_Ylms.zeros_like()
-    GIA_Ylms.time[:] = np.copy(GRACE_Ylms.time)
-    GIA_Ylms.month[:] = np.copy(GRACE_Ylms.month)
     #-- monthly GIA calculated by gia_rate*time elapsed
-    #-- finding change in GIA each month
-    for t in range(nfiles):
-        GIA_Ylms.clm[:,:,t] = GIA_Ylms_rate['clm']*(GIA_Ylms.time[t]-2003.3)
-        GIA_Ylms.slm[:,:,t] = GIA_Ylms_rate['slm']*(GIA_Ylms.time[t]-2003.3)
+    #-- finding change in GIA each month (evaluated lazily)
+    GIA_Ylms = harmonics().from_dict(GIA_Ylms_rate).lazy()
+    GIA_Ylms = GIA_Ylms.scale(GRACE_Ylms.time-2003.3)
 
     #-- Read Ocean function and convert to Ylms for redistribution
     if REDISTRIBUTE_REMOVED:
@@ -392,41 +350,78 @@ def grace_spatial_maps(base_dir, parameters, LOVE_NUMBERS=0, REFERENCE=None,
     #-- for specific spherical harmonic output units
     if (UNITS == 1):
         #-- 1: cmwe, centimeters water equivalent
-        dfactor = units(lmax=LMAX).harmonic(hl,kl,ll).cmwe
+        dfactor = factors.cmwe
     elif (UNITS == 2):
         #-- 2: mmGH, millimeters geoid height
-        dfactor = units(lmax=LMAX).harmonic(hl,kl,ll).mmGH
+        dfactor = factors.mmGH
     elif (UNITS == 3):
         #-- 3: mmCU, millimeters elastic crustal deformation
-        dfactor = units(lmax=LMAX).harmonic(hl,kl,ll).mmCU
+        dfactor = factors.mmCU
     elif (UNITS == 4):
         #-- 4: micGal, microGal gravity perturbations
-        dfactor = units(lmax=LMAX).harmonic(hl,kl,ll).microGal
+        dfactor = factors.microGal
     elif (UNITS == 5):
         #-- 5: mbar, millibar equivalent surface pressure
-        dfactor = units(lmax=LMAX).harmonic(hl,kl,ll).mbar
+        dfactor = factors.mbar
+
+    #-- Remove GIA rate for time and remove monthly files to be removed
+    #-- smooth harmonics and convert to output units
+    #-- operations are fused and evaluated for each month
+    expr = (GRACE_Ylms.lazy() - GIA_Ylms - remove_Ylms).convolve(dfactor*wt)
+    #-- allocate harmonics object for each month
+    Ylms = GRACE_Ylms.index(0)
+    #-- PURPOSE: generate the output spatial field for each month
+    def spatial_fields():
+        #-- pool of threads reused for summing the latitude bands of each month
+        pool = multiprocessing.pool.ThreadPool(processes=THREADS) \
+            if THREADS else None
+        try:
+            #-- converting harmonics to truncated, smoothed coefficients
+            #-- combining harmonics to calculate output spatial fields
+            for i,grace_month in enumerate(GRACE_Ylms.month):
+                #-- GRACE/GRACE-FO harmonics for time t
+                expr.evaluate(i, out=Ylms)
+                #-- convert spherical harmonics to output spatial grid
+                #-- summing latitude bands in parallel if specified
+                grid.data = harmonic_summation(Ylms.clm, Ylms.slm,
+                    grid.lon, grid.lat, LMAX=LMAX, MMAX=MMAX, PLM=PLM,
+                    THREADS=THREADS, POOL=pool).T
+                #-- copy time variables for month
+                grid.time = np.copy(Ylms.time)
+                grid.month = np.copy(Ylms.month)
+                yield (grace_month, grid)
+        finally:
+            #-- close the pool of threads
+            if pool is not None:
+                pool.close()
+                pool.join()
+
+    #-- output all months to a single time series file
+    if SERIES:
+        #-- time series files can only be netCDF4 or HDF5
+        if (DATAFORM not in ('netCDF4','HDF5')):
+            raise ValueError('Time series output requires netCDF4 or HDF5')
+        series_format = '{0}{1}_L{2:d}{3}{4}{5}_{6:03d}-{7:03d}.{8}'
+        args=(FILENAME,unit_list[UNITS-1],LMAX,order_str,gw_str,ds_str,
+            GRACE_Ylms.month[0],GRACE_Ylms.month[-1],suffix[DATAFORM])
+        SERIES_FILE = os.path.join(DIRECTORY,series_format.format(*args))
+        #-- stream each month to the time series file
+        with spatial_series(SERIES_FILE, grid.lon, grid.lat,
+            format=DATAFORM, units=unit_list[UNITS-1],
+            longname=unit_name[UNITS-1], title='GRACE/GRACE-FO Spatial Data',
+            verbose=VERBOSE) as fid:
+            for grace_month,grid in spatial_fields():
+                fid.append(grid.data, grid.time)
+        #-- set the permissions mode of the time series file and add to list
+        os.chmod(SERIES_FILE, MODE)
+        output_files.append(SERIES_FILE)
+        #-- return the list of output files
+        return output_files
 
     #-- output file format
     file_format = '{0}{1}_L{2:d}{3}{4}{5}_{6:03d}.{7}'
-    #-- converting harmonics to truncated, smoothed coefficients in units
-    #-- combining harmonics to calculate output spatial fields
-    for i,grace_month in enumerate(GRACE_Ylms.month):
-        #-- GRACE/GRACE-FO harmonics for time t
-        Ylms = GRACE_Ylms.index(i)
-        #-- Remove GIA rate for time
-        Ylms.subtract(GIA_Ylms.index(i))
-        #-- Remove monthly files to be removed
-        Ylms.subtract(remove_Ylms.index(i))
-        #-- smooth harmonics and convert to output units
-        Ylms.convolve(dfactor*wt)
-        #-- convert spherical harmonics to output spatial grid
-        grid.data = harmonic_summation(Ylms.clm, Ylms.slm,
-            grid.lon, grid.lat, LMAX=LMAX, MMAX=MMAX, PLM=PLM).T
-        #-- copy time variables for month
-        grid.time = np.copy(Ylms.time)
-        grid.month = np.copy(Ylms.month)
-
-        #-- output monthly files to ascii, netCDF4 or HDF5
+    #-- output monthly files to ascii, netCDF4 or HDF5
+    for grace_month,grid in spatial_fields():
         args=(FILENAME,unit_list[UNITS-1],LMAX,order_str,gw_str,
             ds_str,grace_month,suffix[DATAFORM])
         FILE=os.path.join(DIRECTORY,file_format.format(*args))
@@ -522,7 +517,7 @@ def create_unique_logfile(filename):
 
 #-- PURPOSE: define the analysis for multiprocessing
 def define_analysis(parameter_file, base_dir, LOVE_NUMBERS=0, REFERENCE=None,
-    LOG=False, VERBOSE=False, MODE=0o775):
+    THREADS=0, SERIES=False, LOG=False, VERBOSE=False, MODE=0o775):
     #-- keep track of multiprocessing threads
     info(os.path.basename(parameter_file))
 
@@ -545,7 +540,7 @@ def define_analysis(parameter_file, base_dir, LOVE_NUMBERS=0, REFERENCE=None,
         #-- run GRACE/GRACE-FO spatial algorithm with parameters
         output_files = grace_spatial_maps(base_dir, parameters,
             LOVE_NUMBERS=LOVE_NUMBERS, REFERENCE=REFERENCE,
-            VERBOSE=VERBOSE, MODE=MODE)
+            THREADS=THREADS, SERIES=SERIES, VERBOSE=VERBOSE, MODE=MODE)
     except:
         #-- if there has been an error exception
         #-- print the type, value, and stack trace of the
@@ -591,6 +586,14 @@ def main():
     parser.add_argument('--reference','-r',
         type=str.upper, default='CF', choices=['CF','CM','CE'],
         help='Reference frame for load Love numbers')
+    #-- number of threads for summing latitude bands in parallel
+    parser.add_argument('--threads','-T',
+        type=int, default=0,
+        help='Number of threads for summing latitude bands in parallel')
+    #-- output all months to a single netCDF4 or HDF5 file
+    parser.add_argument('--series','-S',
+        default=False, action='store_true',
+        help='Output all months to a single netCDF4 or HDF5 file')
     #-- Output log file for each job in forms
     #-- GRACE_processing_run_2002-04-01_PID-00000.log
     #-- GRACE_processing_failed_run_2002-04-01_PID-00000.log
@@ -612,7 +615,8 @@ def main():
         #-- run directly as series if PROCESSES = 0
         for f in args.parameters:
             define_analysis(f, args.directory, LOVE_NUMBERS=args.love,
-                REFERENCE=args.reference, LOG=args.log, VERBOSE=args.verbose,
+                REFERENCE=args.reference, THREADS=args.threads,
+                SERIES=args.series, LOG=args.log, VERBOSE=args.verbose,
                 MODE=args.mode)
     else:
         #-- run in parallel with multiprocessing Pool
@@ -620,7 +624,8 @@ def main():
         #-- for each parameter file
         for f in args.parameters:
             kwds = dict(LOVE_NUMBERS=args.love, REFERENCE=args.reference,
-                LOG=args.log, VERBOSE=args.verbose, MODE=args.mode)
+                THREADS=args.threads, SERIES=args.series, LOG=args.log,
+                VERBOSE=args.verbose, MODE=args.mode)
             pool.apply_async(define_analysis,args=(f,args.directory),kwds=kwds)
         #-- start multiprocessing jobs
         #-- close the pool
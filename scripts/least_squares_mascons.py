@@ -1,7 +1,7 @@
 #!/usr/bin/env python
 u"""
 least_squares_mascons.py
-Written by Tyler Sutterley (01/2021)
+Written by Tyler Sutterley (03/2021)
 
 Calculates regional mass anomalies through a least-squares mascon procedure
     from an index of spherical harmonic coefficient files
@@ -77,6 +77,10 @@ PROGRAM DEPENDENCIES:
     read_love_numbers.py: reads Load Love Numbers from Han and Wahr (1995)
     gen_stokes.py: converts a spatial field into spherical harmonic coefficients
     gauss_weights.py: Computes the Gaussian weights as a function of degree
+    mascon_kernel.py: calculates mascon sensitivity kernels from the
+        pseudo-inverse of the mascon spherical harmonics
+        and the time series of all mascons with a single matrix product
+    mascon_store.py: reads and writes consolidated mascon harmonic stores
     ocean_stokes.py: reads a land-sea mask and converts to spherical harmonics
     harmonics.py: spherical harmonic data class for processing GRACE/GRACE-FO
         destripe_harmonics.py: calculates the decorrelation (destriping) filter
@@ -104,6 +108,13 @@ REFERENCES:
         https://doi.org/10.1029/2009GL039401
 
 UPDATE HISTORY:
+    Updated 03/2021: calculate sensitivity kernels with a single
+        pseudo-inverse of the mascon harmonics that can be cached to disk
+        calculate all mascon time series with a single matrix product
+        write each output mascon time series in a separate stage
+        read mascon harmonics from a consolidated mascon store
+        use load_love_numbers from read_love_numbers
+        added option to cache parsed load Love number tables
     Updated 01/2021: harmonics object output from gen_stokes.py/ocean_stokes.py
     Updated 12/2020: added more love number options
     Updated 10/2020: use argparse to set command line parameters
@@ -160,11 +171,13 @@ import traceback
 
 from gravity_toolkit.harmonics import harmonics
 from gravity_toolkit.units import units
-from gravity_toolkit.read_love_numbers import read_love_numbers
+from gravity_toolkit.read_love_numbers import load_love_numbers
 from gravity_toolkit.gen_stokes import gen_stokes
 from gravity_toolkit.gauss_weights import gauss_weights
+from gravity_toolkit.mascon_kernel import mascon_kernel, mascon_timeseries, \
+    kernel_cache_file
+from gravity_toolkit.mascon_store import mascon_store
 from gravity_toolkit.ocean_stokes import ocean_stokes
-from gravity_toolkit.utilities import get_data_path
 
 #-- PURPOSE: keep track of multiprocessing threads
 def info(title):
@@ -175,62 +188,6 @@ def info(title):
         print('parent process: {0:d}'.format(os.getppid()))
     print('process id: {0:d}'.format(os.getpid()))
 
-#-- PURPOSE: read load love numbers for the range of spherical harmonic degrees
-def load_love_numbers(LMAX, LOVE_NUMBERS=0, REFERENCE='CF'):
-    """
-    Reads PREM load Love numbers for the range of spherical harmonic degrees
-    and applies isomorphic parameters
-
-    Arguments
-    ---------
-    LMAX: maximum spherical harmonic degree
-
-    Keyword arguments
-    -----------------
-    LOVE_NUMBERS: Load Love numbers dataset
-        0: Han and Wahr (1995) values from PREM
-        1: Gegout (2005) values from PREM
-        2: Wang et al. (2012) values from PREM
-    REFERENCE: Reference frame for calculating degree 1 love numbers
-        CF: Center of Surface Figure (default)
-        CM: Center of Mass of Earth System
-        CE: Center of Mass of Solid Earth
-
-    Returns
-    -------
-    kl: Love number of Gravitational Potential
-    hl: Love number of Vertical Displacement
-    ll: Love number of Horizontal Displacement
-    """
-    #-- load love numbers file
-    if (LOVE_NUMBERS == 0):
-        #-- PREM outputs from Han and Wahr (1995)
-        #-- https://doi.org/10.1111/j.1365-246X.1995.tb01819.x
-        love_numbers_file = get_data_path(['data','love_numbers'])
-        header = 2
-        columns = ['l','hl','kl','ll']
-    elif (LOVE_NUMBERS == 1):
-        #-- PREM outputs from Gegout (2005)
-        #-- http://gemini.gsfc.nasa.gov/aplo/
-        love_numbers_file = get_data_path(['data','Load_Love2_CE.dat'])
-        header = 3
-        columns = ['l','hl','ll','kl']
-    elif (LOVE_NUMBERS == 2):
-        #-- PREM outputs from Wang et al. (2012)
-        #-- https://doi.org/10.1016/j.cageo.2012.06.022
-        love_numbers_file = get_data_path(['data','PREM-LLNs-truncated.dat'])
-        header = 1
-        columns = ['l','hl','ll','kl','nl','nk']
-    #-- LMAX of load love numbers from Han and Wahr (1995) is 696.
-    #-- from Wahr (2007) linearly interpolating kl works
-    #-- however, as we are linearly extrapolating out, do not make
-    #-- LMAX too much larger than 696
-    #-- read arrays of kl, hl, and ll Love Numbers
-    hl,kl,ll = read_love_numbers(love_numbers_file, LMAX=LMAX, HEADER=header,
-        COLUMNS=columns, REFERENCE=REFERENCE, FORMAT='tuple')
-    #-- return a tuple of load love numbers
-    return (hl,kl,ll)
-
 #-- PURPOSE: calculate a regional time-series through a least
 #-- squares mascon process
 def least_squares_mascons(parameters, LOVE_NUMBERS=0, REFERENCE=None,
@@ -266,6 +223,12 @@ def least_squares_mascons(parameters, LOVE_NUMBERS=0, REFERENCE=None,
     DIRECTORY = os.path.expanduser(parameters['DIRECTORY'])
     #-- 1: fit mass, 2: fit geoid
     FIT_METHOD = np.int(parameters['FIT_METHOD'])
+    #-- directory for caching the pseudo-inverse of the mascon harmonics
+    KERNEL_CACHE = parameters.get('KERNEL_CACHE','None')
+    #-- consolidated store of the mascon spherical harmonics
+    MASCON_STORE = parameters.get('MASCON_STORE','None')
+    MASCON_STORE = None if (MASCON_STORE.title() == 'None') else \
+        os.path.expanduser(MASCON_STORE)
 
     #-- Recursively create output directory if not currently existing
     if (not os.access(DIRECTORY,os.F_OK)):
@@ -274,9 +237,13 @@ def least_squares_mascons(parameters, LOVE_NUMBERS=0, REFERENCE=None,
     #-- list object of output files for file logs (full path)
     output_files = []
 
+    #-- directory for caching parsed load Love number tables
+    LOVE_CACHE = parameters.get('LOVE_CACHE','None')
+    LOVE_CACHE = None if (LOVE_CACHE.title() == 'None') else \
+        os.path.expanduser(LOVE_CACHE)
     #-- read arrays of kl, hl, and ll Love Numbers
     hl,kl,ll = load_love_numbers(LMAX, LOVE_NUMBERS=LOVE_NUMBERS,
-        REFERENCE='CF')
+        REFERENCE='CF', CACHE=LOVE_CACHE)
 
     #-- Earth Parameters
     factors = units(lmax=LMAX).harmonic(hl,kl,ll)
@@ -335,69 +302,28 @@ def least_squares_mascons(parameters, LOVE_NUMBERS=0, REFERENCE=None,
     if DESTRIPE:
         data_Ylms = data_Ylms.destripe()
 
-    #-- input mascon spherical harmonic datafiles
-    with open(MASCON_INDEX,'r') as f:
-        mascon_files = f.read().splitlines()
+    #-- read mascon spherical harmonics from the consolidated mascon store
+    #-- or from the individual files of the mascon index
+    mascons = mascon_store(MASCON_INDEX, LMAX=LMAX, MMAX=MMAX,
+        DATAFORM=DATAFORM, OCEAN=ocean_Ylms if MASCON_OCEAN else None,
+        LOVE_NUMBERS=LOVE_NUMBERS, REFERENCE='CF',
+        LANDMASK=parameters.get('LANDMASK'), STORE=MASCON_STORE, MODE=MODE)
     #-- number of mascons
-    n_mas = len(mascon_files)
+    n_mas = len(mascons['name'])
     #-- spatial area of the mascon
-    area_tot = np.zeros((n_mas))
+    area_tot = mascons['area']
     #-- name of each mascon
-    mascon_name = []
-    #-- for each valid file in the index (iterate over mascons)
-    mascon_list = []
-    for k in range(n_mas):
-        #-- read mascon spherical harmonics
-        if (DATAFORM == 'ascii'):
-            #-- ascii (.txt)
-            Ylms = harmonics().from_ascii(mascon_files[k],date=False)
-        elif (DATAFORM == 'netCDF4'):
-            #-- netcdf (.nc)
-            Ylms = harmonics().from_netCDF4(mascon_files[k],date=False)
-        elif (DATAFORM == 'HDF5'):
-            #-- HDF5 (.H5)
-            Ylms = harmonics().from_HDF5(mascon_files[k],date=False)
-        #-- Calculating the total mass of each mascon (1 cmH2O uniform)
-        area_tot[k] = 4.0*np.pi*(rad_e**3)*rho_e*Ylms.clm[0,0]/3.0
-        #-- distribute MASCON mass uniformly over the ocean
-        if MASCON_OCEAN:
-            #-- calculate ratio between total mascon mass and
-            #-- a uniformly distributed cm of water over the ocean
-            ratio = Ylms.clm[0,0]/ocean_Ylms.clm[0,0]
-            #-- for each spherical harmonic
-            for m in range(0,MMAX+1):#-- MMAX+1 to include MMAX
-                for l in range(m,LMAX+1):#-- LMAX+1 to include LMAX
-                    #-- remove ratio*ocean Ylms from mascon Ylms
-                    #-- note: x -= y is equivalent to x = x - y
-                    Ylms.clm[l,m] -= ratio*ocean_Ylms.clm[l,m]
-                    Ylms.slm[l,m] -= ratio*ocean_Ylms.slm[l,m]
-        #-- truncate mascon spherical harmonics to d/o LMAX/MMAX and add to list
-        mascon_list.append(Ylms.truncate(lmax=LMAX, mmax=MMAX))
-        #-- mascon base is the file without directory or suffix
-        mascon_base = os.path.basename(mascon_files[k])
-        mascon_base = os.path.splitext(mascon_base)[0]
-        #-- if lower case, will capitalize
-        mascon_base = mascon_base.upper()
-        #-- if mascon name contains degree and order info, remove
-        mascon_name.append(mascon_base.replace('_L{0:d}'.format(LMAX),''))
-    #-- create single harmonics object from list
-    mascon_Ylms = harmonics().from_list(mascon_list, date=False)
+    mascon_name = mascons['name']
 
     #-- Calculating the number of cos and sin harmonics between LMIN and LMAX
     #-- taking into account MMAX (if MMAX == LMAX then LMAX-MMAX=0)
     n_harm=np.int(LMAX**2 - LMIN**2 + 2*LMAX + 1 - (LMAX-MMAX)**2 - (LMAX-MMAX))
 
     #-- Initialing harmonics for least squares fitting
-    #-- mascon kernel
-    M_lm = np.zeros((n_harm,n_mas))
-    #-- mascon kernel converted to output unit
-    MA_lm = np.zeros((n_harm,n_mas))
+    #-- mascon kernel from the rows of the mascon store between LMIN and LMAX
+    M_lm = mascons['harmonics'][mascons['l'] >= LMIN,:]
     #-- corrected clm and slm
     Y_lm = np.zeros((n_harm,n_files))
-    #-- sensitivity kernel
-    A_lm = np.zeros((n_harm,n_mas))
-    #-- Initializing output Mascon time-series
-    mascon = np.zeros((n_mas,n_files))
     #-- Initializing conversion factors
     #-- factor for converting to coefficients of mass
     fact = np.zeros((n_harm))
@@ -412,7 +338,6 @@ def least_squares_mascons(parameters, LOVE_NUMBERS=0, REFERENCE=None,
     #-- Switching between Cosine and Sine Stokes
     for cs,csharm in enumerate(['clm','slm']):
         #-- copy cosine and sin harmonics
-        mascon_harm = getattr(mascon_Ylms, csharm)
         data_harm = getattr(data_Ylms, csharm)
         #-- for each spherical harmonic degree
         #-- +1 to include LMAX
@@ -422,8 +347,6 @@ def least_squares_mascons(parameters, LOVE_NUMBERS=0, REFERENCE=None,
             mm = np.min([MMAX,l])
             #-- +1 to include l or MMAX (whichever is smaller)
             for m in range(cs,mm+1):
-                #-- Mascon Spherical Harmonics
-                M_lm[ii,:] = np.copy(mascon_harm[l,m,:])
                 #-- Data Spherical Harmonics
                 Y_lm[ii,:] = np.copy(data_harm[l,m,:])
                 #-- degree dependent factor to convert to mass
@@ -440,32 +363,30 @@ def least_squares_mascons(parameters, LOVE_NUMBERS=0, REFERENCE=None,
     if (FIT_METHOD == 1):
         #-- Fitting Sensitivity Kernel as mass coefficients
         #-- converting M_lm to mass coefficients of the kernel
-        for i in range(n_harm):
-            MA_lm[i,:] = wt_lm[i]*M_lm[i,:]*fact[i]
         fit_factor = wt_lm*fact
+        MA_lm = M_lm*fit_factor[:,None]
     else:
         #-- Fitting Sensitivity Kernel as geoid coefficients
-        MA_lm[:,:] = np.copy(M_lm)
         fit_factor = wt_lm*np.ones((n_harm))
-
+        MA_lm = np.copy(M_lm)
+
+    #-- cache file for the pseudo-inverse of the mascon harmonics
+    if (KERNEL_CACHE.title() != 'None'):
+        CACHE = kernel_cache_file(KERNEL_CACHE, MASCON_INDEX, LMIN=LMIN,
+            LMAX=LMAX, MMAX=MMAX, RAD=RAD, LOVE_NUMBERS=LOVE_NUMBERS,
+            REFERENCE='CF', FIT_METHOD=FIT_METHOD,
+            MASCON_OCEAN=MASCON_OCEAN)
+    else:
+        CACHE = None
     #-- Fitting the sensitivity kernel from the input kernel
-    for i in range(n_harm):
-        #-- setting kern_i equal to 1 for d/o
-        kern_i = np.zeros((n_harm))
-        #-- converting to mass coefficients if specified
-        kern_i[i] = 1.0*fit_factor[i]
-        #-- spherical harmonics solution for the
-        #-- mascon sensitivity kernels
-        #-- Least Squares Solutions: Inv(X'.X).(X'.Y)
-        kern_lm = np.linalg.lstsq(MA_lm,kern_i,rcond=-1)[0]
-        for k in range(n_mas):
-            A_lm[i,k] = kern_lm[k]*area_tot[k]
+    #-- using a single pseudo-inverse of the mascon kernel
+    #-- spherical harmonics solution for the mascon sensitivity kernels
+    A_lm = mascon_kernel(MA_lm, fit_factor, AREA=area_tot, CACHE=CACHE)
 
-    #-- output formatting string if containing date variables
-    if DATE:
-        formatting_string = '{0:03d} {1:12.4f} {2:16.10f} {3:16.5f} {4:16.10f}'
-    else:
-        formatting_string = '{0:16.10f} {1:16.5f} {2:16.10f}'
+    #-- calculate the time series of all mascons with a single product of
+    #-- the sensitivity kernels and the data harmonics
+    mascon = mascon_timeseries(A_lm, Y_lm, AREA=area_tot,
+        DATA_ERROR=DATA_ERROR)
 
     #-- for each mascon
     for k in range(n_mas):
@@ -473,48 +394,64 @@ def least_squares_mascons(parameters, LOVE_NUMBERS=0, REFERENCE=None,
         #-- mascon name, LMAX, Gaussian smoothing radii, filter flag
         file_out='{0}{1}_L{2:d}{3}{4}{5}{6}.txt'.format(parameters['FILENAME'],
             mascon_name[k], LMAX, order_str, gw_str, ds_str, ocean_str)
-        #-- add output files to list object
-        output_files.append(os.path.join(DIRECTORY,file_out))
-
         #-- Output mascon datafiles
         #-- Will output each mascon mass series
         #-- if with dates:
         #-- month, date, mascon mass, mascon area
         #-- else:
         #-- mascon mass, mascon area
-        #-- open output mascon time-series file
-        fid = open(os.path.join(DIRECTORY,file_out),'w')
-        #-- for each date
-        for f in range(n_files):
-            #-- Summing over all spherical harmonics for mascon k, and time t
-            #-- multiplies by the degree dependent factor to convert
-            #-- the harmonics into mass coefficients
-            #-- Converting mascon mass time-series from g to gigatonnes
-            if DATA_ERROR:
-                #-- if input data are errors (i.e. estimated dealiasing errors)
-                mascon[k,f] = np.sqrt(np.sum((A_lm[:,k]*Y_lm[:,f])**2))/1e15
-            else:
-                mascon[k,f] = np.sum(A_lm[:,k]*Y_lm[:,f])/1e15
-            #-- output to file
-            if DATE:
-                #-- if files contain date information
-                args = (data_Ylms.month[f], data_Ylms.time[f],
-                    mascon[k,f], area_tot[k]/1e10, rmass[f])
-                print(formatting_string.format(*args), file=fid)
-            else:
-                #-- just print the time-series and mascon areas
-                args = (mascon[k,f], area_tot[k]/1e10, rmass[f])
-                print(formatting_string.format(*args), file=fid)
-        #-- close the output file
-        fid.close()
-        #-- change the permissions mode of the output file
-        os.chmod(os.path.join(DIRECTORY,file_out), MODE)
+        output_mascon_file(os.path.join(DIRECTORY,file_out),
+            mascon['mass'][k,:], mascon['area'][k], rmass,
+            month=data_Ylms.month if DATE else None,
+            tdec=data_Ylms.time if DATE else None, MODE=MODE)
         #-- add output files to list object
         output_files.append(os.path.join(DIRECTORY,file_out))
 
     #-- return the list of output files
     return output_files
 
+#-- PURPOSE: write the mass series of a mascon to file
+def output_mascon_file(output_file, mass, area, rmass, month=None, tdec=None,
+    MODE=0o775):
+    """
+    Writes the mass series of a mascon to an ascii file
+
+    Arguments
+    ---------
+    output_file: output mascon mass series file
+    mass: mascon mass series in gigatonnes
+    area: total area of the mascon in km^2
+    rmass: total mass of the input data in gigatonnes
+
+    Keyword arguments
+    -----------------
+    month: GRACE/GRACE-FO months if containing date variables
+    tdec: dates in year-decimal if containing date variables
+    MODE: permissions mode of the output file
+    """
+    #-- output formatting string if containing date variables
+    if month is not None:
+        formatting_string = '{0:03d} {1:12.4f} {2:16.10f} {3:16.5f} {4:16.10f}'
+    else:
+        formatting_string = '{0:16.10f} {1:16.5f} {2:16.10f}'
+    #-- open output mascon time-series file
+    fid = open(output_file,'w')
+    #-- for each date
+    for f in range(len(mass)):
+        #-- output to file
+        if month is not None:
+            #-- if files contain date information
+            args = (month[f], tdec[f], mass[f], area, rmass[f])
+            print(formatting_string.format(*args), file=fid)
+        else:
+            #-- just print the time-series and mascon areas
+            args = (mass[f], area, rmass[f])
+            print(formatting_string.format(*args), file=fid)
+    #-- close the output file
+    fid.close()
+    #-- change the permissions mode of the output file
+    os.chmod(output_file, MODE)
+
 #-- PURPOSE: print a file log for the mascon analysis
 #-- lists: the parameter file, the parameters and the output files
 def output_log_file(parameters,output_files):
@@ -1,7 +1,7 @@
 #!/usr/bin/env python
 u"""
 mascon_reconstruct.py
-Written by Tyler Sutterley (01/2021)
+Written by Tyler Sutterley (03/2021)
 
 Calculates the equivalent spherical harmonics from a mascon time series
 
@@ -19,6 +19,8 @@ COMMAND LINE OPTIONS:
         CF: Center of Surface Figure (default)
         CM: Center of Mass of Earth System
         CE: Center of Mass of Solid Earth
+    -C, --cube: Reconstruct all mascons with a single matrix product
+        and output the summed harmonics to a single file
     -M X, --mode X: permissions mode of the files created
 
 PYTHON DEPENDENCIES:
@@ -39,6 +41,7 @@ PROGRAM DEPENDENCIES:
     read_love_numbers.py: reads Load Love Numbers from Han and Wahr (1995)
     ocean_stokes.py: reads a land-sea mask and converts to spherical harmonics
     gen_stokes.py: converts a spatial field into spherical harmonic coefficients
+    mascon_store.py: reads and writes consolidated mascon harmonic stores
     harmonics.py: spherical harmonic data class for processing GRACE/GRACE-FO
         destripe_harmonics.py: calculates the decorrelation (destriping) filter
             and filters the GRACE/GRACE-FO coefficients for striping errors
@@ -50,6 +53,10 @@ PROGRAM DEPENDENCIES:
     utilities.py: download and management utilities for files
 
 UPDATE HISTORY:
+    Updated 03/2021: read mascon harmonics from a consolidated mascon store
+        added option to reconstruct all mascons with a single matrix product
+        use load_love_numbers from read_love_numbers
+        added option to cache parsed load Love number tables
     Updated 01/2021: harmonics object output from gen_stokes.py/ocean_stokes.py
     Updated 12/2020: added more love number options
     Updated 10/2020: use argparse to set command line parameters
@@ -84,11 +91,9 @@ import multiprocessing
 import traceback
 
 from gravity_toolkit.read_GIA_model import read_GIA_model
-from gravity_toolkit.read_love_numbers import read_love_numbers
+from gravity_toolkit.read_love_numbers import load_love_numbers
 from gravity_toolkit.ocean_stokes import ocean_stokes
-from gravity_toolkit.harmonics import harmonics
-from gravity_toolkit.units import units
-from gravity_toolkit.utilities import get_data_path
+from gravity_toolkit.mascon_store import mascon_store, mascon_harmonics
 
 #-- PURPOSE: keep track of multiprocessing threads
 def info(title):
@@ -99,65 +104,10 @@ def info(title):
         print('parent process: {0:d}'.format(os.getppid()))
     print('process id: {0:d}'.format(os.getpid()))
 
-#-- PURPOSE: read load love numbers for the range of spherical harmonic degrees
-def load_love_numbers(LMAX, LOVE_NUMBERS=0, REFERENCE='CF'):
-    """
-    Reads PREM load Love numbers for the range of spherical harmonic degrees
-    and applies isomorphic parameters
-
-    Arguments
-    ---------
-    LMAX: maximum spherical harmonic degree
-
-    Keyword arguments
-    -----------------
-    LOVE_NUMBERS: Load Love numbers dataset
-        0: Han and Wahr (1995) values from PREM
-        1: Gegout (2005) values from PREM
-        2: Wang et al. (2012) values from PREM
-    REFERENCE: Reference frame for calculating degree 1 love numbers
-        CF: Center of Surface Figure (default)
-        CM: Center of Mass of Earth System
-        CE: Center of Mass of Solid Earth
-
-    Returns
-    -------
-    kl: Love number of Gravitational Potential
-    hl: Love number of Vertical Displacement
-    ll: Love number of Horizontal Displacement
-    """
-    #-- load love numbers file
-    if (LOVE_NUMBERS == 0):
-        #-- PREM outputs from Han and Wahr (1995)
-        #-- https://doi.org/10.1111/j.1365-246X.1995.tb01819.x
-        love_numbers_file = get_data_path(['data','love_numbers'])
-        header = 2
-        columns = ['l','hl','kl','ll']
-    elif (LOVE_NUMBERS == 1):
-        #-- PREM outputs from Gegout (2005)
-        #-- http://gemini.gsfc.nasa.gov/aplo/
-        love_numbers_file = get_data_path(['data','Load_Love2_CE.dat'])
-        header = 3
-        columns = ['l','hl','ll','kl']
-    elif (LOVE_NUMBERS == 2):
-        #-- PREM outputs from Wang et al. (2012)
-        #-- https://doi.org/10.1016/j.cageo.2012.06.022
-        love_numbers_file = get_data_path(['data','PREM-LLNs-truncated.dat'])
-        header = 1
-        columns = ['l','hl','ll','kl','nl','nk']
-    #-- LMAX of load love numbers from Han and Wahr (1995) is 696.
-    #-- from Wahr (2007) linearly interpolating kl works
-    #-- however, as we are linearly extrapolating out, do not make
-    #-- LMAX too much larger than 696
-    #-- read arrays of kl, hl, and ll Love Numbers
-    hl,kl,ll = read_love_numbers(love_numbers_file, LMAX=LMAX, HEADER=header,
-        COLUMNS=columns, REFERENCE=REFERENCE, FORMAT='tuple')
-    #-- return a tuple of load love numbers
-    return (hl,kl,ll)
-
 #-- PURPOSE: Reconstruct spherical harmonic fields from the mascon
 #-- time series calculated in calc_mascon
-def mascon_reconstruct(parameters,LOVE_NUMBERS=0,REFERENCE=None,MODE=0o775):
+def mascon_reconstruct(parameters,LOVE_NUMBERS=0,REFERENCE=None,CUBE=False,
+    MODE=0o775):
     #-- convert parameters into variables
     #-- Data processing center
     PROC = parameters['PROC']
@@ -191,6 +141,10 @@ def mascon_reconstruct(parameters,LOVE_NUMBERS=0,REFERENCE=None,MODE=0o775):
     MASCON_INDEX = os.path.expanduser(parameters['MASCON_INDEX'])
     #-- mascon distribution over the ocean
     MASCON_OCEAN = parameters['MASCON_OCEAN'] in ('Y','y')
+    #-- consolidated store of the mascon spherical harmonics
+    MASCON_STORE = parameters.get('MASCON_STORE','None')
+    MASCON_STORE = None if (MASCON_STORE.title() == 'None') else \
+        os.path.expanduser(MASCON_STORE)
 
     #-- for datasets not GSM: will add a label for the dataset
     dset_str = '' if (DSET == 'GSM') else '_{0}'.format(DSET)
@@ -218,15 +172,13 @@ def mascon_reconstruct(parameters,LOVE_NUMBERS=0,REFERENCE=None,MODE=0o775):
     #-- output file format
     file_format = '{0}{1}{2}{3}{4}_L{5:d}{6}{7}{8}_{9:03d}-{10:03d}.{11}'
 
+    #-- directory for caching parsed load Love number tables
+    LOVE_CACHE = parameters.get('LOVE_CACHE','None')
+    LOVE_CACHE = None if (LOVE_CACHE.title() == 'None') else \
+        os.path.expanduser(LOVE_CACHE)
     #-- read load love numbers
     hl,kl,ll = load_love_numbers(LMAX, LOVE_NUMBERS=LOVE_NUMBERS,
-        REFERENCE=REFERENCE)
-    #-- Earth Parameters
-    factors = units(lmax=LMAX).harmonic(hl,kl,ll)
-    #-- Average Density of the Earth [g/cm^3]
-    rho_e = factors.rho_e
-    #-- Average Radius of the Earth [cm]
-    rad_e = factors.rad_e
+        REFERENCE=REFERENCE, CACHE=LOVE_CACHE)
     #-- Read Ocean function and convert to Ylms for redistribution
     if MASCON_OCEAN:
         #-- read Land-Sea Mask and convert to spherical harmonics
@@ -237,82 +189,104 @@ def mascon_reconstruct(parameters,LOVE_NUMBERS=0,REFERENCE=None,MODE=0o775):
         #-- not distributing uniformly over ocean
         ocean_str = ''
 
-    #-- input mascon spherical harmonic datafiles
-    with open(MASCON_INDEX,'r') as f:
-        mascon_files = f.read().splitlines()
-    for k,fi in enumerate(mascon_files):
-        #-- read mascon spherical harmonics
-        if (DATAFORM == 'ascii'):
-            #-- ascii (.txt)
-            Ylms=harmonics().from_ascii(os.path.expanduser(fi),date=False)
-        elif (DATAFORM == 'netCDF4'):
-            #-- netcdf (.nc)
-            Ylms=harmonics().from_netCDF4(os.path.expanduser(fi),date=False)
-        elif (DATAFORM == 'HDF5'):
-            #-- HDF5 (.H5)
-            Ylms=harmonics().from_HDF5(os.path.expanduser(fi),date=False)
-        #-- Calculating the total mass of each mascon (1 cmwe uniform)
-        total_area = 4.0*np.pi*(rad_e**3)*rho_e*Ylms.clm[0,0]/3.0
-        #-- distribute MASCON mass uniformly over the ocean
-        if MASCON_OCEAN:
-            #-- calculate ratio between total mascon mass and
-            #-- a uniformly distributed cm of water over the ocean
-            ratio = Ylms.clm[0,0]/ocean_Ylms.clm[0,0]
-            #-- for each spherical harmonic
-            for m in range(0,MMAX+1):#-- MMAX+1 to include MMAX
-                for l in range(m,LMAX+1):#-- LMAX+1 to include LMAX
-                    #-- remove ratio*ocean Ylms from mascon Ylms
-                    #-- note: x -= y is equivalent to x = x - y
-                    Ylms.clm[l,m] -= ratio*ocean_Ylms.clm[l,m]
-                    Ylms.slm[l,m] -= ratio*ocean_Ylms.slm[l,m]
-        #-- truncate mascon spherical harmonics to d/o LMAX/MMAX
-        Ylms = Ylms.truncate(lmax=LMAX, mmax=MMAX)
-        #-- mascon base is the file without directory or suffix
-        mascon_base = os.path.basename(fi)
-        mascon_base = os.path.splitext(mascon_base)[0]
-        #-- if lower case, will capitalize
-        mascon_base = mascon_base.upper()
-        #-- if mascon name contains degree and order info, remove
-        mascon_name = mascon_base.replace('_L{0:d}'.format(LMAX),'')
-
-        #-- input filename format (for both LMAX==MMAX and LMAX != MMAX cases):
-        #-- mascon name, GRACE dataset, GIA model, LMAX, (MMAX,)
-        #-- Gaussian smoothing, filter flag, remove reconstructed fields flag
-        #-- output GRACE error file
-        args = (mascon_name,dset_str,gia_str.upper(),atm_str,ocean_str,
-            LMAX,order_str,gw_str,ds_str)
-        file_input = '{0}{1}{2}{3}{4}_L{5:d}{6}{7}{8}.txt'.format(*args)
-        mascon_data_input = np.loadtxt(os.path.join(DIRECTORY,file_input))
-
-        #-- convert mascon time-series from Gt to cmwe
-        mascon_sigma = 1e15*mascon_data_input[:,2]/total_area
-        #-- mascon time-series Ylms
-        mascon_Ylms = Ylms.scale(mascon_sigma)
-        mascon_Ylms.time = mascon_data_input[:,1].copy()
-        mascon_Ylms.month = mascon_data_input[:,0].astype(np.int)
-
+    #-- read mascon spherical harmonics from the consolidated mascon store
+    #-- or from the individual files of the mascon index
+    mascons = mascon_store(MASCON_INDEX, LMAX=LMAX, MMAX=MMAX,
+        DATAFORM=DATAFORM, OCEAN=ocean_Ylms if MASCON_OCEAN else None,
+        LOVE_NUMBERS=LOVE_NUMBERS, REFERENCE=REFERENCE,
+        LANDMASK=parameters.get('LANDMASK'), STORE=MASCON_STORE, MODE=MODE)
+    #-- reconstruct the harmonics of all mascons into a single cube file
+    if CUBE:
+        #-- number of mascons
+        n_mas = len(mascons['name'])
+        #-- for each mascon: read the mascon time series
+        for k,mascon_name in enumerate(mascons['name']):
+            #-- input filename format (for both LMAX==MMAX and LMAX != MMAX)
+            args = (mascon_name,dset_str,gia_str.upper(),atm_str,ocean_str,
+                LMAX,order_str,gw_str,ds_str)
+            file_input = '{0}{1}{2}{3}{4}_L{5:d}{6}{7}{8}.txt'.format(*args)
+            mascon_data_input = np.loadtxt(os.path.join(DIRECTORY,file_input))
+            #-- allocate for the mascon time series (n_mas,nt)
+            if (k == 0):
+                month = mascon_data_input[:,0].astype(np.int)
+                tdec = mascon_data_input[:,1].copy()
+                mascon_sigma = np.zeros((n_mas,len(month)))
+            elif not np.array_equal(mascon_data_input[:,0], month):
+                raise ValueError('Months of {0} do not match'.format(
+                    file_input))
+            #-- convert mascon time-series from Gt to cmwe
+            mascon_sigma[k,:] = 1e15*mascon_data_input[:,2]/mascons['area'][k]
+        #-- reconstructed harmonics of all mascons (n_harm,nt)
+        #-- as a single product of the mascon harmonics and time series
+        Y_lm = np.dot(mascons['harmonics'], mascon_sigma)
+        construct_Ylms = mascon_harmonics(mascons, COLUMNS=Y_lm)
+        construct_Ylms.time = np.copy(tdec)
+        construct_Ylms.month = np.copy(month)
         #-- output to file: no ascii option
-        args = (mascon_name,dset_str,gia_str.upper(),atm_str,ocean_str,
+        #-- index base is the file without directory or suffix
+        index_base = os.path.splitext(os.path.basename(MASCON_INDEX))[0]
+        args = (index_base.upper(),dset_str,gia_str.upper(),atm_str,ocean_str,
             LMAX,order_str,gw_str,ds_str,START_MON,END_MON,suffix[DATAFORM])
         FILE = file_format.format(*args)
         #-- output harmonics to file
         if (DATAFORM == 'netCDF4'):
             #-- netcdf (.nc)
-            mascon_Ylms.to_netCDF4(os.path.join(DIRECTORY,FILE))
+            construct_Ylms.to_netCDF4(os.path.join(DIRECTORY,FILE))
         elif (DATAFORM == 'HDF5'):
             #-- HDF5 (.H5)
-            mascon_Ylms.to_HDF5(os.path.join(DIRECTORY,FILE))
+            construct_Ylms.to_HDF5(os.path.join(DIRECTORY,FILE))
         #-- print file name to index
         print(os.path.join(DIRECTORY,FILE).replace(HOME,'~'), file=fid)
         #-- change the permissions mode
         os.chmod(os.path.join(DIRECTORY,FILE),MODE)
+    else:
+        #-- expand the column arrays of the mascon store to harmonics
+        store_Ylms = mascon_harmonics(mascons)
+        for k,mascon_name in enumerate(mascons['name']):
+            #-- spherical harmonics and total area of the mascon
+            Ylms = store_Ylms.index(k, date=False)
+            total_area = mascons['area'][k]
+
+            #-- input filename format (for both LMAX==MMAX and LMAX != MMAX)
+            #-- mascon name, GRACE dataset, GIA model, LMAX, (MMAX,)
+            #-- Gaussian smoothing, filter flag, remove reconstructed fields flag
+            #-- output GRACE error file
+            args = (mascon_name,dset_str,gia_str.upper(),atm_str,ocean_str,
+                LMAX,order_str,gw_str,ds_str)
+            file_input = '{0}{1}{2}{3}{4}_L{5:d}{6}{7}{8}.txt'.format(*args)
+            mascon_data_input = np.loadtxt(os.path.join(DIRECTORY,file_input))
+
+            #-- convert mascon time-series from Gt to cmwe
+            mascon_sigma = 1e15*mascon_data_input[:,2]/total_area
+            #-- mascon time-series Ylms
+            mascon_Ylms = Ylms.scale(mascon_sigma)
+            mascon_Ylms.time = mascon_data_input[:,1].copy()
+            mascon_Ylms.month = mascon_data_input[:,0].astype(np.int)
+
+            #-- output to file: no ascii option
+            args = (mascon_name,dset_str,gia_str.upper(),atm_str,ocean_str,
+                LMAX,order_str,gw_str,ds_str,START_MON,END_MON,
+                suffix[DATAFORM])
+            FILE = file_format.format(*args)
+            #-- output harmonics to file
+            if (DATAFORM == 'netCDF4'):
+                #-- netcdf (.nc)
+                mascon_Ylms.to_netCDF4(os.path.join(DIRECTORY,FILE))
+            elif (DATAFORM == 'HDF5'):
+                #-- HDF5 (.H5)
+                mascon_Ylms.to_HDF5(os.path.join(DIRECTORY,FILE))
+            #-- print file name to index
+            print(os.path.join(DIRECTORY,FILE).replace(HOME,'~'), file=fid)
+            #-- change the permissions mode
+            os.chmod(os.path.join(DIRECTORY,FILE),MODE)
     #-- close the reconstruct index
     fid.close()
     #-- change the permissions mode of the index file
     os.chmod(os.path.expanduser(parameters['RECONSTRUCT_INDEX']),MODE)
 
 #-- PURPOSE: define the analysis for multiprocessing
-def define_analysis(parameter_file,LOVE_NUMBERS=0,REFERENCE=None,MODE=0o775):
+def define_analysis(parameter_file,LOVE_NUMBERS=0,REFERENCE=None,CUBE=False,
+    MODE=0o775):
     #-- keep track of multiprocessing threads
     info(os.path.basename(parameter_file))
 
@@ -333,7 +307,7 @@ def define_analysis(parameter_file,LOVE_NUMBERS=0,REFERENCE=None,MODE=0o775):
     try:
         #-- run the reconstruction function with chosen parameters
         mascon_reconstruct(parameters, LOVE_NUMBERS=LOVE_NUMBERS,
-            REFERENCE=REFERENCE, MODE=MODE)
+            REFERENCE=REFERENCE, CUBE=CUBE, MODE=MODE)
     except:
         #-- if there has been an error exception
         #-- print the type, value, and stack trace of the
@@ -365,6 +339,11 @@ def main():
     parser.add_argument('--reference','-r',
         type=str.upper, default='CF', choices=['CF','CM','CE'],
         help='Reference frame for load Love numbers')
+    #-- reconstruct all mascons with a single matrix product
+    #-- and output to a single file
+    parser.add_argument('--cube','-C',
+        default=False, action='store_true',
+        help='Output reconstructed harmonics of all mascons to a single file')
     #-- permissions mode of the local directories and files (number in octal)
     parser.add_argument('--mode','-M',
         type=lambda x: int(x,base=8), default=0o775,
@@ -377,14 +356,14 @@ def main():
         #-- for each entered parameter file
         for f in args.parameters:
             define_analysis(f,LOVE_NUMBERS=args.love,
-                REFERENCE=args.reference,MODE=args.mode)
+                REFERENCE=args.reference,CUBE=args.cube,MODE=args.mode)
     else:
         #-- run in parallel with multiprocessing Pool
         pool = multiprocessing.Pool(processes=args.np)
         #-- for each entered parameter file
         for f in args.parameters:
             kwds=dict(LOVE_NUMBERS=args.love,REFERENCE=args.reference,
-                MODE=args.mode)
+                CUBE=args.cube,MODE=args.mode)
             pool.apply_async(define_analysis,args=(f,),kwds=kwds)
         #-- start multiprocessing jobs
         #-- close the pool
@@ -1,7 +1,7 @@
 #!/usr/bin/env python
 u"""
 regress_grace_maps.py
-Written by Tyler Sutterley (10/2020)
+Written by Tyler Sutterley (03/2021)
 
 Reads in GRACE/GRACE-FO spatial files from grace_spatial_maps.py and
     fits a regression model at each grid point
@@ -15,6 +15,13 @@ COMMAND LINE OPTIONS:
     -E X, --end X: ending GRACE month for time series regression
     --order X: regression fit polynomial order
     --cycles X: regression fit cyclical terms
+    -T X, --tiles X: regress the grid in X latitude bands
+        outputs for each band are streamed to memory-mapped arrays
+        ascii files are parsed once to a temporary netCDF4 file of bands
+    --tile-processes X: regress latitude bands in parallel with X processes
+    --read-processes X: read the spatial files in parallel with X processes
+    --cache: cache the stacked spatial files as a single netCDF4 or HDF5 file
+        for subsequent regressions of the same months
     -M X, --mode X: permissions mode of the output files
     -V, --verbose: verbose output of processing run
     -l, --log: output log file for each job
@@ -48,12 +55,22 @@ PROGRAM DEPENDENCIES:
     tsregress.py: calculates trend coefficients using least-squares
     tsamplitude.py: calculates the amplitude and phase of a harmonic function
     spatial.py: spatial data class for reading, writing and processing data
+    spatial_series.py: writes a time series of spatial fields to a single file
         ncdf_read.py: reads input spatial data from netCDF4 files
         hdf5_read.py: reads input spatial data from HDF5 files
         ncdf_write.py: writes output spatial data to netCDF4
         hdf5_write.py: writes output spatial data to HDF5
 
 UPDATE HISTORY:
+    Updated 03/2021: regress all grid points in a single call to tsregress
+        can regress latitude bands separately with bounded memory
+        can regress latitude bands in parallel with multiprocessing
+        read spatial files into a preallocated grid in parallel
+        can cache the stacked spatial files as a single chunked file
+        remove temporary directories of latitude bands if regressions fail
+        terminate processes of latitude bands if regressions fail
+        write outputs of latitude bands from memory-mapped arrays
+        parse ascii files once for regressions of latitude bands
     Updated 10/2020: use argparse to set command line parameters
     Updated 06/2020: using spatial data class for input and output operations
     Updated 01/2020: output seasonal amplitude and phase
@@ -77,7 +94,9 @@ from __future__ import print_function, division
 import sys
 import os
 import time
+import shutil
 import argparse
+import tempfile
 import traceback
 import numpy as np
 import multiprocessing
@@ -85,6 +104,7 @@ import multiprocessing
 from gravity_toolkit.tsregress import tsregress
 from gravity_toolkit.tsamplitude import tsamplitude
 from gravity_toolkit.spatial import spatial
+from gravity_toolkit.spatial_series import spatial_series
 
 #-- PURPOSE: keep track of multiprocessing threads
 def info(title):
@@ -96,8 +116,8 @@ def info(title):
     print('process id: {0:d}'.format(os.getpid()))
 
 #-- program module to run with specified parameters
-def regress_grace_maps(parameters, ORDER=None, CYCLES=None,
-    VERBOSE=False, MODE=0o775):
+def regress_grace_maps(parameters, ORDER=None, CYCLES=None, TILES=0,
+    PROCESSES=0, READ_PROCESSES=0, CACHE=False, VERBOSE=False, MODE=0o775):
     #-- convert parameters into variables
     #-- Data processing center
     PROC = parameters['PROC']
@@ -159,6 +179,9 @@ def regress_grace_maps(parameters, ORDER=None, CYCLES=None,
     input_format = '{0}{1}_L{2:d}{3}{4}{5}_{6:03d}.{7}'
     #-- output file format
     output_format = '{0}{1}_L{2:d}{3}{4}{5}_{6}{7}_{8:03d}-{9:03d}.{10}'
+    #-- cache file format (netCDF4 for ascii input files)
+    cache_format = '{0}{1}_L{2:d}{3}{4}{5}_STACK_{6:03d}-{7:03d}.{8}'
+    CACHEFORM = 'HDF5' if (DATAFORM == 'HDF5') else 'netCDF4'
 
     #-- Output Degree Spacing
     dlon,dlat = (DDEG,DDEG) if (np.ndim(DDEG) == 0) else (DDEG[0],DDEG[1])
@@ -204,182 +227,336 @@ def regress_grace_maps(parameters, ORDER=None, CYCLES=None,
         unit_suffix.extend(['',''])
         amp_str.append(flag)
 
-    #-- input data spatial object
-    spatial_list = []
+    #-- input GRACE/GRACE-FO spatial files
+    input_files = []
     for t,grace_month in enumerate(months):
-        #-- input GRACE/GRACE-FO spatial file
         fi = input_format.format(FILENAME,unit_list[UNITS-1],LMAX,
             order_str,gw_str,ds_str,grace_month,suffix)
-        #-- read GRACE/GRACE-FO spatial file
-        if (DATAFORM == 'ascii'):
-            dinput = spatial(spacing=[dlon,dlat],nlon=nlon,
-                nlat=nlat).from_ascii(os.path.join(DIRECTORY,fi))
-        elif (DATAFORM == 'netCDF4'):
-            #-- netcdf (.nc)
-            dinput = spatial().from_netCDF4(os.path.join(DIRECTORY,fi))
-        elif (DATAFORM == 'HDF5'):
-            #-- HDF5 (.H5)
-            dinput = spatial().from_HDF5(os.path.join(DIRECTORY,fi))
-        #-- append to spatial list
-        dinput.month[:] = grace_month
-        nlat,nlon = dinput.shape
-        spatial_list.append(dinput)
-
-    #-- concatenate list to single spatial object
-    grid = spatial().from_list(spatial_list)
-    spatial_list = None
+        input_files.append(os.path.join(DIRECTORY,fi))
+    #-- cache file for the stacked GRACE/GRACE-FO spatial files
+    if CACHE:
+        fc = cache_format.format(FILENAME,unit_list[UNITS-1],LMAX,order_str,
+            gw_str,ds_str,START_MON,END_MON,dict(netCDF4='nc',HDF5='H5')[CACHEFORM])
+        cache_file = os.path.join(DIRECTORY,fc)
+    else:
+        cache_file = None
+    #-- read the first GRACE/GRACE-FO spatial file for the output grid
+    dinput = read_spatial_file(input_files[0], DATAFORM=DATAFORM,
+        SPACING=[dlon,dlat], SHAPE=[nlat,nlon])
+    nlat,nlon = dinput.shape
 
     #-- Fitting seasonal components
     ncomp = len(coef_str)
     ncycles = 2*len(CYCLES)
 
-    #-- Allocating memory for output variables
-    out = dinput.zeros_like()
-    out.data = np.zeros((nlat,nlon,ncomp))
-    out.error = np.zeros((nlat,nlon,ncomp))
-    out.mask = np.ones((nlat,nlon,ncomp),dtype=np.bool)
-    #-- Fit Significance
-    FS = {}
+    #-- dimensions of the output regression coefficients and errors,
+    #-- seasonal amplitudes and phases and fit significance terms
     #-- SSE: Sum of Squares Error
     #-- AIC: Akaike information criterion
     #-- BIC: Bayesian information criterion
     #-- R2Adj: Adjusted Coefficient of Determination
+    dimensions = {}
+    for key in ['beta','error']:
+        dimensions[key] = (nlat,nlon,ncomp)
+    for key in ['amplitude','phase','amplitude_error','phase_error']:
+        dimensions[key] = (nlat,nlon,len(CYCLES))
     for key in ['SSE','AIC','BIC','R2Adj']:
-        FS[key] = dinput.zeros_like()
+        dimensions[key] = (nlat,nlon)
 
-    #-- calculate the regression coefficients and fit significance
-    for i in range(nlat):
-        for j in range(nlon):
-            #-- Calculating the regression coefficients
-            tsbeta = tsregress(grid.time, grid.data[i,j,:],
-                ORDER=ORDER, CYCLES=CYCLES, CONF=0.95)
-            #-- save regression components
-            for k in range(0, ncomp):
-                out.data[i,j,k] = tsbeta['beta'][k]
-                out.error[i,j,k] = tsbeta['error'][k]
-                out.mask[i,j,k] = False
-            #-- Fit significance terms
-            #-- Degrees of Freedom
-            nu = tsbeta['DOF']
-            #-- Converting Mean Square Error to Sum of Squares Error
-            FS['SSE'].data[i,j] = tsbeta['MSE']*nu
-            FS['AIC'].data[i,j] = tsbeta['AIC']
-            FS['BIC'].data[i,j] = tsbeta['BIC']
-            FS['R2Adj'].data[i,j] = tsbeta['R2Adj']
-
-    #-- list of output files
-    output_files = []
-    #-- Output spatial files
-    for i in range(0,ncomp):
-        #-- output spatial file name
-        f1 = output_format.format(FILENAME,unit_list[UNITS-1],LMAX,order_str,
-            gw_str,ds_str,coef_str[i],'',START_MON,END_MON,suffix)
-        f2 = output_format.format(FILENAME,unit_list[UNITS-1],LMAX,order_str,
-            gw_str,ds_str,coef_str[i],'_ERROR',START_MON,END_MON,suffix)
-        #-- full attributes
-        UNITS_TITLE = '{0}{1}'.format(unit_list[UNITS-1],unit_suffix[i])
-        LONGNAME = unit_name[UNITS-1]
-        FILE_TITLE = 'GRACE/GRACE-FO_Spatial_Data_{0}'.format(unit_longname[i])
-        #-- output regression fit to file
-        output = out.index(i, date=False)
-        output_data(output, FILENAME=os.path.join(DIRECTORY,f1),
-            DATAFORM=DATAFORM, UNITS=UNITS_TITLE, LONGNAME=LONGNAME,
-            TITLE=FILE_TITLE, VERBOSE=VERBOSE, MODE=MODE)
-        output_data(output, FILENAME=os.path.join(DIRECTORY,f2),
-            DATAFORM=DATAFORM, UNITS=UNITS_TITLE, LONGNAME=LONGNAME,
-            TITLE=FILE_TITLE, KEY='error', VERBOSE=VERBOSE, MODE=MODE)
-        #-- add output files to list object
-        output_files.append(os.path.join(DIRECTORY,f1))
-        output_files.append(os.path.join(DIRECTORY,f2))
-
-    #-- if fitting coefficients with cyclical components
-    if (ncycles > 0):
-        #-- output spatial titles for amplitudes
-        amp_title = {'ANN':'Annual Amplitude','SEMI':'Semi-Annual Amplitude',
-            'S2':'S2 Tidal Alias Amplitude'}
-        ph_title = {'ANN':'Annual Phase','SEMI':'Semi-Annual Phase',
-            'S2':'S2 Tidal Alias Phase'}
-
-        #-- output amplitude and phase of cyclical components
-        for i,flag in enumerate(amp_str):
-            #-- Indice pointing to the cyclical components
-            j = 1 + ORDER + 2*i
-            #-- Allocating memory for output amplitude and phase
-            amp = dinput.zeros_like()
-            ph = dinput.zeros_like()
-            #-- calculating amplitude and phase of spatial field
-            amp.data,ph.data = tsamplitude(out.data[:,:,j],out.data[:,:,j+1])
-            #-- convert phase from -180:180 to 0:360
-            ii,jj = np.nonzero(ph.data < 0)
-            ph.data[ii,jj] += 360.0
-            #-- Amplitude Error
-            comp1 = out.error[:,:,j]*out.data[:,:,j]/amp.data
-            comp2 = out.error[:,:,j+1]*out.data[:,:,j+1]/amp.data
-            amp.error = np.sqrt(comp1**2 + comp2**2)
-            #-- Phase Error (degrees)
-            comp1 = out.error[:,:,j]*out.data[:,:,j+1]/(amp.data**2)
-            comp2 = out.error[:,:,j+1]*out.data[:,:,j]/(amp.data**2)
-            ph.error = (180.0/np.pi)*np.sqrt(comp1**2 + comp2**2)
-
-            #-- output file names for amplitude, phase and errors
-            f3 = output_format.format(FILENAME,unit_list[UNITS-1],LMAX,order_str,
-                gw_str,ds_str,flag,'',START_MON,END_MON,suffix)
-            f4 = output_format.format(FILENAME,unit_list[UNITS-1],LMAX,order_str,
-                gw_str,ds_str,flag,'_PHASE',START_MON,END_MON,suffix)
-            #-- output spatial error file name
-            f5 = output_format.format(FILENAME,unit_list[UNITS-1],LMAX,order_str,
-                gw_str,ds_str,flag,'_ERROR',START_MON,END_MON,suffix)
-            f6 = output_format.format(FILENAME,unit_list[UNITS-1],LMAX,order_str,
-                gw_str,ds_str,flag,'_PHASE_ERROR',START_MON,END_MON,suffix)
+    #-- temporary directory for the memory-mapped outputs of latitude bands
+    #-- the temporary directory is removed after writing the outputs
+    #-- or if the regression fails
+    temp_dir = tempfile.mkdtemp(dir=DIRECTORY) if TILES else None
+    try:
+        #-- calculate the regression coefficients and fit significance
+        if TILES:
+            #-- create the cache file of stacked spatial files if not valid
+            #-- latitude bands are then read from the single cache file
+            if CACHE and not spatial().valid_cache(cache_file, input_files):
+                spatial(spacing=[dlon,dlat],nlat=nlat,nlon=nlon).from_file_list(
+                    input_files, format=DATAFORM, processes=READ_PROCESSES,
+                    cache=cache_file)
+                os.chmod(cache_file, MODE)
+            #-- split the grid into latitude bands and stream the outputs
+            #-- for each band to memory-mapped arrays in a temporary directory
+            output = {}
+            for key,val in dimensions.items():
+                output[key] = os.path.join(temp_dir,'{0}.npy'.format(key))
+                np.lib.format.open_memmap(output[key], mode='w+', shape=val)
+            #-- latitude indices of each band
+            bands = [slice(b[0],b[-1]+1) for b in
+                np.array_split(np.arange(nlat),np.min([TILES,nlat]))]
+            kwds = dict(ORDER=ORDER, CYCLES=CYCLES, DATAFORM=DATAFORM,
+                SPACING=[dlon,dlat], SHAPE=[nlat,nlon], OUTPUT=output)
+            #-- read latitude bands from the cache file or each spatial file
+            if CACHE:
+                band_input = cache_file
+                kwds['DATAFORM'] = CACHEFORM
+            elif (DATAFORM == 'ascii'):
+                #-- parse each ascii file once and stream the spatial fields
+                #-- to a temporary netCDF4 file chunked as latitude bands
+                band_input = os.path.join(temp_dir,'stack.nc')
+                nband = np.max([b.stop - b.start for b in bands])
+                with spatial_series(band_input, dinput.lon, dinput.lat,
+                    format='netCDF4', chunks=(nband,nlon,1)) as fid:
+                    for fi in input_files:
+                        d = read_spatial_file(fi, DATAFORM=DATAFORM,
+                            SPACING=[dlon,dlat], SHAPE=[nlat,nlon])
+                        fid.append(d.data, d.time)
+                kwds['DATAFORM'] = 'netCDF4'
+            else:
+                band_input = input_files
+            if PROCESSES:
+                #-- regress latitude bands in parallel with multiprocessing Pool
+                pool = multiprocessing.Pool(processes=PROCESSES)
+                try:
+                    results = [pool.apply_async(regress_band,
+                        args=(band_input,BAND), kwds=kwds) for BAND in bands]
+                    #-- get degrees of freedom from each band
+                    nu, = set([r.get() for r in results])
+                    pool.close()
+                except:
+                    #-- stop all workers before removing the temporary files
+                    pool.terminate()
+                    raise
+                finally:
+                    pool.join()
+            else:
+                #-- regress each latitude band in series
+                nu, = set([regress_band(band_input,BAND,**kwds)
+                    for BAND in bands])
+            #-- read outputs from the memory-mapped arrays
+            output = {k:np.load(v, mmap_mode='r') for k,v in output.items()}
+        else:
+            #-- read all spatial files into a preallocated grid
+            #-- or read the stacked spatial files from a valid cache file
+            stack = spatial(spacing=[dlon,dlat],nlat=nlat,nlon=nlon).from_file_list(
+                input_files, format=DATAFORM, processes=READ_PROCESSES,
+                cache=cache_file)
+            if CACHE:
+                os.chmod(cache_file, MODE)
+            #-- regress all grid points in memory
+            output = {key:np.zeros(val) for key,val in dimensions.items()}
+            nu = regress_band(stack, slice(None), ORDER=ORDER,
+                CYCLES=CYCLES, OUTPUT=output)
+            stack = None
+
+        #-- list of output files
+        output_files = []
+        #-- Output spatial files
+        for i in range(0,ncomp):
+            #-- output spatial file name
+            f1 = output_format.format(FILENAME,unit_list[UNITS-1],LMAX,order_str,
+                gw_str,ds_str,coef_str[i],'',START_MON,END_MON,suffix)
+            f2 = output_format.format(FILENAME,unit_list[UNITS-1],LMAX,order_str,
+                gw_str,ds_str,coef_str[i],'_ERROR',START_MON,END_MON,suffix)
             #-- full attributes
-            AMP_UNITS = unit_list[UNITS-1]
-            PH_UNITS = 'degrees'
+            UNITS_TITLE = '{0}{1}'.format(unit_list[UNITS-1],unit_suffix[i])
             LONGNAME = unit_name[UNITS-1]
-            AMP_TITLE = 'GRACE/GRACE-FO_Spatial_Data_{0}'.format(amp_title[flag])
-            PH_TITLE = 'GRACE/GRACE-FO_Spatial_Data_{0}'.format(ph_title[flag])
-            #-- Output seasonal amplitude and phase to files
-            output_data(amp, FILENAME=os.path.join(DIRECTORY,f3),
-                DATAFORM=DATAFORM, UNITS=AMP_UNITS, LONGNAME=LONGNAME,
-                TITLE=AMP_TITLE, VERBOSE=VERBOSE, MODE=MODE)
-            output_data(ph, FILENAME=os.path.join(DIRECTORY,f4),
-                DATAFORM=DATAFORM, UNITS=PH_UNITS, LONGNAME='Phase',
-                TITLE=PH_TITLE, VERBOSE=VERBOSE, MODE=MODE)
-            #-- Output seasonal amplitude and phase error to files
-            output_data(amp, FILENAME=os.path.join(DIRECTORY,f5),
-                DATAFORM=DATAFORM, UNITS=AMP_UNITS, LONGNAME=LONGNAME,
-                TITLE=AMP_TITLE, KEY='error', VERBOSE=VERBOSE, MODE=MODE)
-            output_data(ph, FILENAME=os.path.join(DIRECTORY,f6),
-                DATAFORM=DATAFORM, UNITS=PH_UNITS, LONGNAME='Phase',
-                TITLE=PH_TITLE, KEY='error', VERBOSE=VERBOSE, MODE=MODE)
+            FILE_TITLE = 'GRACE/GRACE-FO_Spatial_Data_{0}'.format(unit_longname[i])
+            #-- output regression fit to file
+            out = dinput.zeros_like()
+            out.data = np.array(output['beta'][:,:,i])
+            out.error = np.array(output['error'][:,:,i])
+            output_data(out, FILENAME=os.path.join(DIRECTORY,f1),
+                DATAFORM=DATAFORM, UNITS=UNITS_TITLE, LONGNAME=LONGNAME,
+                TITLE=FILE_TITLE, VERBOSE=VERBOSE, MODE=MODE)
+            output_data(out, FILENAME=os.path.join(DIRECTORY,f2),
+                DATAFORM=DATAFORM, UNITS=UNITS_TITLE, LONGNAME=LONGNAME,
+                TITLE=FILE_TITLE, KEY='error', VERBOSE=VERBOSE, MODE=MODE)
+            #-- add output files to list object
+            output_files.append(os.path.join(DIRECTORY,f1))
+            output_files.append(os.path.join(DIRECTORY,f2))
+
+        #-- if fitting coefficients with cyclical components
+        if (ncycles > 0):
+            #-- output spatial titles for amplitudes
+            amp_title = {'ANN':'Annual Amplitude','SEMI':'Semi-Annual Amplitude',
+                'S2':'S2 Tidal Alias Amplitude'}
+            ph_title = {'ANN':'Annual Phase','SEMI':'Semi-Annual Phase',
+                'S2':'S2 Tidal Alias Phase'}
+
+            #-- output amplitude and phase of cyclical components
+            for i,flag in enumerate(amp_str):
+                #-- output amplitude and phase with errors
+                amp = dinput.zeros_like()
+                ph = dinput.zeros_like()
+                amp.data = np.array(output['amplitude'][:,:,i])
+                amp.error = np.array(output['amplitude_error'][:,:,i])
+                ph.data = np.array(output['phase'][:,:,i])
+                ph.error = np.array(output['phase_error'][:,:,i])
+
+                #-- output file names for amplitude, phase and errors
+                f3 = output_format.format(FILENAME,unit_list[UNITS-1],LMAX,
+                    order_str,gw_str,ds_str,flag,'',START_MON,END_MON,
+                    suffix)
+                f4 = output_format.format(FILENAME,unit_list[UNITS-1],LMAX,
+                    order_str,gw_str,ds_str,flag,'_PHASE',START_MON,END_MON,
+                    suffix)
+                #-- output spatial error file name
+                f5 = output_format.format(FILENAME,unit_list[UNITS-1],LMAX,
+                    order_str,gw_str,ds_str,flag,'_ERROR',START_MON,END_MON,
+                    suffix)
+                f6 = output_format.format(FILENAME,unit_list[UNITS-1],LMAX,
+                    order_str,gw_str,ds_str,flag,'_PHASE_ERROR',START_MON,END_MON,
+                    suffix)
+                #-- full attributes
+                AMP_UNITS = unit_list[UNITS-1]
+                PH_UNITS = 'degrees'
+                LONGNAME = unit_name[UNITS-1]
+                AMP_TITLE = 'GRACE/GRACE-FO_Spatial_Data_{0}'.format(
+                    amp_title[flag])
+                PH_TITLE = 'GRACE/GRACE-FO_Spatial_Data_{0}'.format(ph_title[flag])
+                #-- Output seasonal amplitude and phase to files
+                output_data(amp, FILENAME=os.path.join(DIRECTORY,f3),
+                    DATAFORM=DATAFORM, UNITS=AMP_UNITS, LONGNAME=LONGNAME,
+                    TITLE=AMP_TITLE, VERBOSE=VERBOSE, MODE=MODE)
+                output_data(ph, FILENAME=os.path.join(DIRECTORY,f4),
+                    DATAFORM=DATAFORM, UNITS=PH_UNITS, LONGNAME='Phase',
+                    TITLE=PH_TITLE, VERBOSE=VERBOSE, MODE=MODE)
+                #-- Output seasonal amplitude and phase error to files
+                output_data(amp, FILENAME=os.path.join(DIRECTORY,f5),
+                    DATAFORM=DATAFORM, UNITS=AMP_UNITS, LONGNAME=LONGNAME,
+                    TITLE=AMP_TITLE, KEY='error', VERBOSE=VERBOSE, MODE=MODE)
+                output_data(ph, FILENAME=os.path.join(DIRECTORY,f6),
+                    DATAFORM=DATAFORM, UNITS=PH_UNITS, LONGNAME='Phase',
+                    TITLE=PH_TITLE, KEY='error', VERBOSE=VERBOSE, MODE=MODE)
+                #-- add output files to list object
+                output_files.append(os.path.join(DIRECTORY,f3))
+                output_files.append(os.path.join(DIRECTORY,f4))
+                output_files.append(os.path.join(DIRECTORY,f5))
+                output_files.append(os.path.join(DIRECTORY,f6))
+
+        #-- Output fit significance
+        signif_longname = {'SSE':'Sum of Squares Error',
+            'AIC':'Akaike information criterion',
+            'BIC':'Bayesian information criterion',
+            'R2Adj':'Adjusted Coefficient of Determination'}
+        #-- for each fit significance term
+        for key in ['SSE','AIC','BIC','R2Adj']:
+            #-- output file names for fit significance
+            signif_str = '{0}_'.format(key)
+            f7 = output_format.format(FILENAME,unit_list[UNITS-1],LMAX,order_str,
+                gw_str,ds_str,signif_str,coef_str[ORDER],START_MON,END_MON,suffix)
+            #-- full attributes
+            LONGNAME = signif_longname[key]
+            #-- output fit significance to file
+            fs = dinput.zeros_like()
+            fs.data = np.array(output[key])
+            output_data(fs, FILENAME=os.path.join(DIRECTORY,f7),
+                DATAFORM=DATAFORM, UNITS=key, LONGNAME=LONGNAME,
+                TITLE=nu, VERBOSE=VERBOSE, MODE=MODE)
             #-- add output files to list object
-            output_files.append(os.path.join(DIRECTORY,f3))
-            output_files.append(os.path.join(DIRECTORY,f4))
-            output_files.append(os.path.join(DIRECTORY,f5))
-            output_files.append(os.path.join(DIRECTORY,f6))
-
-    #-- Output fit significance
-    signif_longname = {'SSE':'Sum of Squares Error',
-        'AIC':'Akaike information criterion',
-        'BIC':'Bayesian information criterion',
-        'R2Adj':'Adjusted Coefficient of Determination'}
-    #-- for each fit significance term
-    for key,fs in FS.items():
-        #-- output file names for fit significance
-        signif_str = '{0}_'.format(key)
-        f7 = output_format.format(FILENAME,unit_list[UNITS-1],LMAX,order_str,
-            gw_str,ds_str,signif_str,coef_str[ORDER],START_MON,END_MON,suffix)
-        #-- full attributes
-        LONGNAME = signif_longname[key]
-        #-- output fit significance to file
-        output_data(fs, FILENAME=os.path.join(DIRECTORY,f7),
-            DATAFORM=DATAFORM, UNITS=key, LONGNAME=LONGNAME,
-            TITLE=nu, VERBOSE=VERBOSE, MODE=MODE)
-        #-- add output files to list object
-        output_files.append(os.path.join(DIRECTORY,f7))
+            output_files.append(os.path.join(DIRECTORY,f7))
+    finally:
+        #-- remove the temporary memory-mapped arrays
+        if temp_dir is not None:
+            output = None
+            shutil.rmtree(temp_dir)
 
     #-- return the list of output files
     return output_files
 
+#-- PURPOSE: read a GRACE/GRACE-FO spatial file or a latitude band of the file
+def read_spatial_file(input_file, DATAFORM=None, SPACING=None, SHAPE=None,
+    BAND=None):
+    if (DATAFORM == 'ascii'):
+        #-- ascii (.txt)
+        dinput = spatial(spacing=SPACING,nlat=SHAPE[0],
+            nlon=SHAPE[1]).from_ascii(input_file)
+        #-- subset ascii data to latitude band
+        if BAND is not None:
+            dinput.data = dinput.data[BAND,:]
+            dinput.mask = dinput.mask[BAND,:]
+            dinput.lat = dinput.lat[BAND]
+            dinput.update_dimensions()
+    elif (DATAFORM == 'netCDF4'):
+        #-- netcdf (.nc)
+        dinput = spatial().from_netCDF4(input_file, band=BAND)
+    elif (DATAFORM == 'HDF5'):
+        #-- HDF5 (.H5)
+        dinput = spatial().from_HDF5(input_file, band=BAND)
+    return dinput
+
+#-- PURPOSE: regress a latitude band of the GRACE/GRACE-FO spatial files
+#-- outputs are written to arrays or memory-mapped array files
+def regress_band(input_files, BAND, ORDER=None, CYCLES=None, DATAFORM=None,
+    SPACING=None, SHAPE=None, OUTPUT=None):
+    #-- output dictionary of arrays or memory-mapped array files
+    OUTPUT = {} if (OUTPUT is None) else OUTPUT
+    if isinstance(input_files, spatial):
+        #-- latitude band of stacked GRACE/GRACE-FO spatial data
+        data = input_files.data[BAND,:,:]
+        tdec = input_files.time
+        nband,nlon,nmon = np.shape(data)
+    elif isinstance(input_files, str):
+        #-- read the latitude band from the cache of stacked spatial files
+        dinput = read_spatial_file(input_files, DATAFORM=DATAFORM, BAND=BAND)
+        data = dinput.data
+        tdec = dinput.time
+        nband,nlon,nmon = np.shape(data)
+    else:
+        #-- read the latitude band from each GRACE/GRACE-FO spatial file
+        nmon = len(input_files)
+        for t,fi in enumerate(input_files):
+            dinput = read_spatial_file(fi, DATAFORM=DATAFORM, SPACING=SPACING,
+                SHAPE=SHAPE, BAND=BAND)
+            #-- allocate for band data and dates
+            if (t == 0):
+                nband,nlon = np.shape(dinput.data)
+                data = np.zeros((nband,nlon,nmon))
+                tdec = np.zeros((nmon))
+            data[:,:,t] = dinput.data[:,:]
+            tdec[t] = dinput.time
+
+    #-- calculate the regression coefficients and fit significance
+    #-- for all grid points with a single factorization of the design matrix
+    tsbeta = tsregress(tdec, data.reshape(nband*nlon,nmon),
+        ORDER=ORDER, CYCLES=CYCLES, CONF=0.95)
+    data = None
+    #-- regression components
+    ncomp = tsbeta['N']
+    var = {}
+    var['beta'] = tsbeta['beta'].reshape(nband,nlon,ncomp)
+    var['error'] = tsbeta['error'].reshape(nband,nlon,ncomp)
+    #-- Indices pointing to the sine and cosine of cyclical components
+    j = 1 + ORDER + 2*np.arange(len(CYCLES))
+    #-- calculating amplitude and phase of spatial field
+    bsin,bcos = (var['beta'][:,:,j],var['beta'][:,:,j+1])
+    esin,ecos = (var['error'][:,:,j],var['error'][:,:,j+1])
+    var['amplitude'],var['phase'] = tsamplitude(bsin,bcos)
+    #-- convert phase from -180:180 to 0:360
+    var['phase'][var['phase'] < 0] += 360.0
+    #-- Amplitude Error
+    comp1 = esin*bsin/var['amplitude']
+    comp2 = ecos*bcos/var['amplitude']
+    var['amplitude_error'] = np.sqrt(comp1**2 + comp2**2)
+    #-- Phase Error (degrees)
+    comp1 = esin*bcos/(var['amplitude']**2)
+    comp2 = ecos*bsin/(var['amplitude']**2)
+    var['phase_error'] = (180.0/np.pi)*np.sqrt(comp1**2 + comp2**2)
+    #-- Fit significance terms
+    #-- Degrees of Freedom
+    nu = tsbeta['DOF']
+    #-- Converting Mean Square Error to Sum of Squares Error
+    var['SSE'] = tsbeta['MSE'].reshape(nband,nlon)*nu
+    var['AIC'] = tsbeta['AIC'].reshape(nband,nlon)
+    var['BIC'] = tsbeta['BIC'].reshape(nband,nlon)
+    var['R2Adj'] = tsbeta['R2Adj'].reshape(nband,nlon)
+
+    #-- write latitude band to output arrays
+    for key,val in var.items():
+        if isinstance(OUTPUT[key], str):
+            #-- open memory-mapped array file and flush band to disk
+            fid = np.load(OUTPUT[key], mmap_mode='r+')
+            fid[BAND,...] = val
+            fid.flush()
+            fid = None
+        else:
+            OUTPUT[key][BAND,...] = val
+    #-- return the degrees of freedom
+    return nu
+
 #-- PURPOSE: wrapper function for outputting data to file
 def output_data(data, FILENAME=None, KEY='data', DATAFORM=None,
     UNITS=None, LONGNAME=None, TITLE=None, VERBOSE=False, MODE=0o775):
@@ -470,7 +647,8 @@ def create_unique_logfile(filename):
 
 #-- PURPOSE: define the analysis
 def define_analysis(parameter_file,START,END,ORDER=None,CYCLES=None,
-    VERBOSE=False,LOG=False,MODE=0o775):
+    TILES=0,PROCESSES=0,READ_PROCESSES=0,CACHE=False,VERBOSE=False,
+    LOG=False,MODE=0o775):
     #-- keep track of progress
     info(os.path.basename(parameter_file))
 
@@ -498,7 +676,9 @@ def define_analysis(parameter_file,START,END,ORDER=None,CYCLES=None,
     try:
         #-- run GRACE/GRACE-FO spatial regression program with parameters
         output_files = regress_grace_maps(parameters,ORDER=ORDER,
-            CYCLES=CYCLES,VERBOSE=VERBOSE,MODE=MODE)
+            CYCLES=CYCLES,TILES=TILES,PROCESSES=PROCESSES,
+            READ_PROCESSES=READ_PROCESSES,CACHE=CACHE,
+            VERBOSE=VERBOSE,MODE=MODE)
     except:
         #-- if there has been an error exception
         #-- print the type, value, and stack trace of the
@@ -546,6 +726,22 @@ def main():
     parser.add_argument('--cycle','-c',
         type=float, default=[0.5,1.0,161.0/365.25], nargs='+',
         help='Regression fit cyclical terms')
+    #-- split the grid into latitude bands for regression
+    parser.add_argument('--tiles','-T',
+        type=int, default=0,
+        help='Number of latitude bands to regress separately')
+    #-- number of processes for regressing latitude bands in parallel
+    parser.add_argument('--tile-processes',
+        type=int, default=0,
+        help='Number of processes for regressing latitude bands in parallel')
+    #-- number of processes for reading spatial files in parallel
+    parser.add_argument('--read-processes',
+        type=int, default=0,
+        help='Number of processes for reading spatial files in parallel')
+    #-- cache the stacked spatial files for subsequent regressions
+    parser.add_argument('--cache',
+        default=False, action='store_true',
+        help='Cache the stacked spatial files as a single file')
     #-- verbose output
     parser.add_argument('--verbose','-V',
         default=False, action='store_true',
@@ -567,15 +763,19 @@ def main():
         #-- run directly as series if PROCESSES = 0
         for f in args.parameters:
             define_analysis(f,args.start,args.end,
-                ORDER=args.order,CYCLES=args.cycle,VERBOSE=args.verbose,
-                LOG=args.log,MODE=args.mode)
+                ORDER=args.order,CYCLES=args.cycle,TILES=args.tiles,
+                PROCESSES=args.tile_processes,
+                READ_PROCESSES=args.read_processes,CACHE=args.cache,
+                VERBOSE=args.verbose,LOG=args.log,MODE=args.mode)
     else:
         #-- run in parallel with multiprocessing Pool
         pool = multiprocessing.Pool(processes=args.np)
         #-- for each parameter file
+        #-- latitude bands are regressed in series within pool processes
         for f in args.parameters:
-            kwds=dict(ORDER=args.order,CYCLES=args.cycle,
-                VERBOSE=args.verbose,LOG=args.log,MODE=args.mode)
+            kwds=dict(ORDER=args.order,CYCLES=args.cycle,TILES=args.tiles,
+                CACHE=args.cache,VERBOSE=args.verbose,LOG=args.log,
+                MODE=args.mode)
             pool.apply_async(define_analysis,args=(f,args.start,args.end),
                 kwds=kwds)
         #-- start multiprocessing jobs
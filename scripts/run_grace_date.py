@@ -1,7 +1,7 @@
 #!/usr/bin/env python
 u"""
 run_grace_date.py
-Written by Tyler Sutterley (10/2020)
+Written by Tyler Sutterley (03/2021)
 
 Wrapper program for running GRACE date and months programs
 
@@ -11,7 +11,7 @@ Data Products: [GAA, GAB, GAC, GAD, GSM]
     CSR: (GAC, GAD, GSM) only
 
 CALLING SEQUENCE:
-    run_grace_date(base_dir, PROC, DREL, VERBOSE=False)
+    run_grace_date(base_dir, PROC, DREL, UPDATE=False, VERBOSE=False)
 
 INPUTS:
     base_dir: working GRACE/GRACE-FO data directory
@@ -19,6 +19,7 @@ INPUTS:
     DREL: GRACE/GRACE-FO Data Releases to run
 
 OPTIONS:
+    UPDATE: only calculate dates for new files in each index
     VERBOSE: Track program progress
     MODE: permissions mode of output date files
 
@@ -26,6 +27,7 @@ COMMAND LINE OPTIONS:
     -D X, --directory X: GRACE/GRACE-FO working data directory
     -C X, --center X: GRACE/GRACE-FO Processing Center (CSR,GFZ,JPL)
     -R X, --release X: GRACE/GRACE-FO data releases (RL04,RL05,RL06)
+    -U, --update: Only calculate dates for new files in each index
     -V, --verbose: Track program progress
     -M X, --mode X: Permissions mode of output date files
 
@@ -44,6 +46,7 @@ PROGRAM DEPENDENCIES:
     grace_months_index.py: creates a single file showing the GRACE dates
 
 UPDATE HISTORY:
+    Updated 03/2021: added option to only calculate dates for new files
     Updated 10/2020: use argparse to set command line parameters
     Updated 05/2020: updated for public release
     Updated 10/2019: changing Y/N flags to True/False
@@ -66,7 +69,8 @@ import argparse
 from gravity_toolkit.grace_date import grace_date
 from gravity_toolkit.grace_months_index import grace_months_index
 
-def run_grace_date(base_dir, PROC, DREL, VERBOSE=False, MODE=0o775):
+def run_grace_date(base_dir, PROC, DREL, UPDATE=False, VERBOSE=False,
+    MODE=0o775):
     #-- allocate python dictionaries for each processing center
     DSET = {}
     VALID = {}
@@ -95,7 +99,8 @@ def run_grace_date(base_dir, PROC, DREL, VERBOSE=False, MODE=0o775):
             for d in DSET[p][r]:
                 print('GRACE Date Program: {0} {1} {2}'.format(p,r,d))
                 #-- run program for processing center, data release and product
-                grace_date(base_dir,PROC=p,DREL=r,DSET=d,OUTPUT=True,MODE=MODE)
+                grace_date(base_dir,PROC=p,DREL=r,DSET=d,OUTPUT=True,
+                    UPDATE=UPDATE,MODE=MODE)
 
     #-- run grace months program for data releases
     print('GRACE Months Program')
@@ -127,6 +132,10 @@ def main():
         metavar='DREL', type=str, nargs='+',
         default=['RL06','v02.4'],
         help='GRACE/GRACE-FO Data Release')
+    #-- only calculate dates for new files in each index
+    parser.add_argument('--update','-U',
+        default=False, action='store_true',
+        help='Only calculate dates for new files in each index')
     #-- print information about each input and output file
     parser.add_argument('--verbose','-V',
         default=False, action='store_true',
@@ -139,7 +148,7 @@ def main():
 
     #-- run GRACE preliminary date program
     run_grace_date(args.directory, args.center, args.release,
-        VERBOSE=args.verbose, MODE=args.mode)
+        UPDATE=args.update, VERBOSE=args.verbose, MODE=args.mode)
 
 #-- run main program
 if __name__ == '__main__':
@@ -1,16 +1,21 @@
 #!/usr/bin/env python
 u"""
-test_harmonics.py (08/2020)
+test_harmonics.py (03/2021)
 Tests harmonic programs using the Velicogna and Wahr (2013) Greenland synthetic
     1. Converts synthetic spatial distribution to spherical harmonics
     2. Compares output spherical harmonics with validation dataset
     3. Combines harmonics to calculate a truncated and smoothed spatial dataset
     4. Compares output smoothed spatial distribution with validation dataset
+Tests harmonics views and math functions with output harmonics objects
+Tests operator overloading and lazily evaluated harmonics expressions
+Tests replacing low-degree coefficients with sparse harmonics series
+Tests summing stacked harmonics to spatial fields in a single call
 """
 import os
 import warnings
 import pytest
 import inspect
+import multiprocessing.pool
 import numpy as np
 import gravity_toolkit.read_love_numbers
 import gravity_toolkit.plm_mohlenkamp
@@ -83,3 +88,238 @@ def test_harmonics():
     difference_distribution = test_distribution - output_distribution.data
     distribution_eps = np.finfo(np.float16).eps
     assert np.all(np.abs(difference_distribution) < distribution_eps)
+
+# PURPOSE: check that views and output objects match copied operations
+def test_harmonics_views():
+    # create random temporal harmonics
+    LMAX,nt = (30,12)
+    valid = gravity_toolkit.harmonics(lmax=LMAX, mmax=LMAX)
+    valid.clm = np.tril(np.random.randn(LMAX+1,LMAX+1,nt).T).T
+    valid.slm = np.tril(np.random.randn(LMAX+1,LMAX+1,nt).T,k=-1).T
+    valid.time = 2002.0 + np.arange(nt)/12.0
+    valid.month = 1 + np.arange(nt)
+    # create random static harmonics
+    static = gravity_toolkit.harmonics(lmax=LMAX, mmax=LMAX)
+    static.clm = np.random.randn(LMAX+1,LMAX+1)
+    static.slm = np.random.randn(LMAX+1,LMAX+1)
+    # degree dependent weights
+    wt = np.random.rand(LMAX+1)
+    # calculate with copies of each month
+    # and with views into an allocated output object
+    Ylms = valid.index(0)
+    for i in range(nt):
+        test = valid.index(i).subtract(static).convolve(wt)
+        valid.index(i,copy=False).subtract(static,out=Ylms).convolve(wt)
+        assert np.all(test.clm == Ylms.clm)
+        assert np.all(test.slm == Ylms.slm)
+        assert (test.month == Ylms.month)
+    # verify that views share memory and original is unmodified
+    view = valid.index(nt-1,copy=False)
+    assert np.shares_memory(view.clm, valid.clm)
+    assert not np.shares_memory(Ylms.clm, valid.clm)
+    # broadcast the static field to all temporal fields
+    test = valid.copy().subtract(static)
+    for i in range(nt):
+        assert np.all(test.clm[:,:,i] == (valid.clm[:,:,i] - static.clm))
+    # truncate in place with copies or views of the original harmonics
+    for copy in (True, False):
+        original = valid.copy()
+        clm = original.clm
+        test = original.truncate(LMAX//2, mmax=LMAX//4, copy=copy)
+        # both return the harmonics object truncated in place
+        assert test is original
+        assert (test.lmax == LMAX//2) and (test.mmax == LMAX//4)
+        assert (test.clm.shape == (LMAX//2+1,LMAX//4+1,nt))
+        assert (test.shape == test.clm.shape)
+        assert np.all(test.clm == valid.clm[:LMAX//2+1,:LMAX//4+1,:])
+        assert np.all(test.slm == valid.slm[:LMAX//2+1,:LMAX//4+1,:])
+        assert np.shares_memory(test.clm, clm) == (not copy)
+
+# PURPOSE: check that fused expressions match eager math operations
+def test_harmonics_expression():
+    # create random temporal and static harmonics
+    LMAX,nt = (30,24)
+    valid = gravity_toolkit.harmonics(lmax=LMAX, mmax=LMAX)
+    valid.clm = np.random.randn(LMAX+1,LMAX+1,nt)
+    valid.slm = np.random.randn(LMAX+1,LMAX+1,nt)
+    valid.time = 2002.0 + np.arange(nt)/12.0
+    valid.month = 1 + np.arange(nt)
+    remove = valid.scale(np.random.rand(nt))
+    static = gravity_toolkit.harmonics(lmax=LMAX, mmax=LMAX)
+    static.clm = np.random.randn(LMAX+1,LMAX+1)
+    static.slm = np.random.randn(LMAX+1,LMAX+1)
+    # degree dependent weights and time-variable scalars
+    wt = np.random.rand(LMAX+1)
+    dt = valid.time - 2003.3
+    # calculate with overloaded operators
+    test = (valid - static.scale(dt) - remove)*2.0
+    test.convolve(wt)
+    # calculate with a lazy expression
+    expr = (valid.lazy() - static.lazy().scale(dt) - remove)*2.0
+    Ylms = expr.convolve(wt).evaluate(chunksize=5)
+    eps = np.finfo(np.float64).eps
+    assert np.all(np.abs(Ylms.clm - test.clm) < eps*np.abs(test.clm).max())
+    assert np.all(np.abs(Ylms.slm - test.slm) < eps*np.abs(test.slm).max())
+    assert np.all(Ylms.month == valid.month)
+    # evaluate a single month into an output harmonics object
+    single = valid.index(0)
+    expr.convolve(wt).evaluate(nt-1, out=single)
+    assert np.allclose(single.clm, test.clm[:,:,nt-1])
+    assert (single.month == valid.month[nt-1])
+    # convolve with degree and order dependent anisotropic weights
+    wlm = 2.0*np.pi*gravity_toolkit.han_weights(250.0, 500.0, 15, LMAX)
+    test = valid.copy().convolve(wlm)
+    Ylms = valid.lazy().convolve(wlm).evaluate(chunksize=5)
+    assert np.allclose(Ylms.clm, test.clm)
+    assert np.allclose(test.slm[:,20,:], valid.slm[:,20,:]*wlm[:,20,None])
+
+# PURPOSE: check gaussian weights for a list of smoothing radii
+def test_gauss_weights():
+    LMAX = 60
+    radii = [0.0, 150.0, 300.0, 500.0]
+    wl = gravity_toolkit.gauss_weights(radii, LMAX)
+    assert (wl.shape == (len(radii),LMAX+1))
+    for i,r in enumerate(radii):
+        assert np.all(wl[i,:] == gravity_toolkit.gauss_weights(r, LMAX))
+
+# PURPOSE: check that sparse series replace coefficients at matching months
+def test_sparse_harmonics():
+    # create random temporal harmonics
+    LMAX = 30
+    months = np.array([4,5,7,8,9,10,12,13])
+    valid = gravity_toolkit.harmonics(lmax=LMAX, mmax=LMAX)
+    valid.clm = np.random.randn(LMAX+1,LMAX+1,len(months))
+    valid.slm = np.random.randn(LMAX+1,LMAX+1,len(months))
+    valid.time = 2002.0 + (months - 0.5)/12.0
+    valid.month = np.copy(months)
+    # create sparse C20 and degree 1 series for a longer set of months
+    series_months = np.arange(1,20)
+    C20 = np.random.randn(len(series_months))
+    DEG1 = dict(month=series_months, C10=np.random.randn(len(series_months)),
+        C11=np.random.randn(len(series_months)),
+        S11=np.random.randn(len(series_months)))
+    sparse = gravity_toolkit.sparse_harmonics()
+    sparse.add_series(2, 0, series_months, C20)
+    sparse.from_geocenter(DEG1)
+    # replace coefficients in a copy of the harmonics
+    test = sparse.replace(valid.copy())
+    indices = months - 1
+    assert np.all(test.clm[2,0,:] == C20[indices])
+    assert np.all(test.clm[1,0,:] == DEG1['C10'][indices])
+    assert np.all(test.clm[1,1,:] == DEG1['C11'][indices])
+    assert np.all(test.slm[1,1,:] == DEG1['S11'][indices])
+    assert np.all(test.clm[3:,:,:] == valid.clm[3:,:,:])
+    # add sparse series to harmonics with the overloaded operator
+    test = valid + sparse
+    assert np.all(test.clm[2,0,:] == (valid.clm[2,0,:] + C20[indices]))
+    # find months not available in every series
+    assert sparse.unmatched([4,5,19,20,25]) == [20,25]
+    assert np.all(sparse.gather((2,0,'clm'), [4,20]) == [3,-1])
+
+# PURPOSE: check that stacked harmonics are summed as separate fields
+def test_stacked_summation():
+    # create random stacked harmonics
+    LMAX,n = (30,4)
+    clm = np.tril(np.random.randn(LMAX+1,LMAX+1,n).T).T
+    slm = np.tril(np.random.randn(LMAX+1,LMAX+1,n).T,k=-1).T
+    lon = np.arange(0,360,5.0)
+    lat = np.arange(90,-91,-5.0)
+    # sum all fields with a single batched call
+    test = gravity_toolkit.harmonic_summation(clm, slm, lon, lat,
+        LMIN=1, LMAX=LMAX, MMAX=20)
+    assert (test.shape == (len(lon),len(lat),n))
+    # sum each field separately
+    for i in range(n):
+        valid = gravity_toolkit.harmonic_summation(clm[:,:,i], slm[:,:,i],
+            lon, lat, LMIN=1, LMAX=LMAX, MMAX=20)
+        assert np.allclose(test[:,:,i], valid)
+    # sum latitude bands in parallel
+    bands = gravity_toolkit.harmonic_summation(clm, slm, lon, lat,
+        LMIN=1, LMAX=LMAX, MMAX=20, BANDS=5, THREADS=2)
+    assert np.allclose(test, bands)
+    # sum latitude bands of each field with a reused pool of threads
+    with multiprocessing.pool.ThreadPool(processes=2) as pool:
+        for i in range(n):
+            bands = gravity_toolkit.harmonic_summation(clm[:,:,i],
+                slm[:,:,i], lon, lat, LMIN=1, LMAX=LMAX, MMAX=20,
+                THREADS=2, POOL=pool)
+            assert np.allclose(test[:,:,i], bands)
+
+# PURPOSE: check propagation of harmonic variances and covariances
+def test_variance_summation():
+    # create random harmonic residuals
+    LMIN,LMAX,MMAX,nt = (1,20,15,12)
+    l,m,cs = gravity_toolkit.harmonic_indices(LMIN, LMAX, MMAX=MMAX)
+    R = np.random.randn(len(l),nt)
+    lon = np.arange(0,360,10.0)
+    lat = np.arange(90,-91,-10.0)
+    # propagate full covariance and square-root factor
+    test = gravity_toolkit.covariance_summation(np.dot(R,R.T), lon, lat,
+        LMIN=LMIN, LMAX=LMAX, MMAX=MMAX)
+    valid = gravity_toolkit.covariance_summation(R, lon, lat,
+        LMIN=LMIN, LMAX=LMAX, MMAX=MMAX, SQRT=True, CHUNKSIZE=5)
+    assert np.allclose(test, valid)
+    # default truncation is calculated from the size of the covariance
+    default = gravity_toolkit.covariance_summation(R, lon, lat,
+        LMIN=LMIN, MMAX=MMAX, SQRT=True)
+    assert np.allclose(default, valid)
+    # variance of the summed residual fields
+    clm = np.zeros((LMAX+1,MMAX+1,nt))
+    slm = np.zeros((LMAX+1,MMAX+1,nt))
+    clm[l[cs==0],m[cs==0],:] = R[cs==0,:]
+    slm[l[cs==1],m[cs==1],:] = R[cs==1,:]
+    fields = gravity_toolkit.harmonic_summation(clm, slm, lon, lat,
+        LMAX=LMAX, MMAX=MMAX)
+    assert np.allclose(np.sum(fields**2,axis=2), valid)
+    # propagate diagonal covariance as independent variances
+    var = np.sum(R**2, axis=1)
+    var_clm = np.zeros((LMAX+1,MMAX+1))
+    var_slm = np.zeros((LMAX+1,MMAX+1))
+    var_clm[l[cs==0],m[cs==0]] = var[cs==0]
+    var_slm[l[cs==1],m[cs==1]] = var[cs==1]
+    test = gravity_toolkit.variance_summation(var_clm, var_slm, lon, lat,
+        LMIN=LMIN, LMAX=LMAX, MMAX=MMAX)
+    valid = gravity_toolkit.covariance_summation(np.diag(var), lon, lat,
+        LMIN=LMIN, LMAX=LMAX, MMAX=MMAX)
+    assert np.allclose(test, valid)
+
+# PURPOSE: check rotation of harmonics with Wigner-d matrices
+def test_harmonics_rotation():
+    # create random harmonics
+    LMAX = 30
+    Ylms = gravity_toolkit.harmonics(lmax=LMAX, mmax=LMAX)
+    Ylms.clm = np.tril(np.random.randn(LMAX+1,LMAX+1))
+    Ylms.slm = np.tril(np.random.randn(LMAX+1,LMAX+1))
+    Ylms.slm[:,0] = 0.0
+    # rotation about the z-axis is a shift in longitude
+    lon = np.arange(0,360,5.0)
+    lat = np.arange(90,-91,-5.0)
+    rot = Ylms.rotate(alpha=30.0)
+    test = gravity_toolkit.harmonic_summation(rot.clm, rot.slm,
+        lon, lat, LMAX=LMAX)
+    valid = gravity_toolkit.harmonic_summation(Ylms.clm, Ylms.slm,
+        lon - 30.0, lat, LMAX=LMAX)
+    assert np.allclose(test, valid)
+    # inverse rotation recovers the original harmonics
+    rot = Ylms.rotate(alpha=10.0, beta=70.0, gamma=-40.0)
+    inv = rot.rotate(alpha=40.0, beta=-70.0, gamma=-10.0)
+    assert np.allclose(inv.clm, Ylms.clm)
+    assert np.allclose(inv.slm, Ylms.slm)
+    # rotated zonal harmonics match the fast zonal rotation
+    zonal = Ylms.copy()
+    zonal.clm[:,1:] = 0.0
+    zonal.slm[:,:] = 0.0
+    rot = zonal.rotate(alpha=45.0, beta=90.0-25.0)
+    valid = gravity_toolkit.rotate_zonal(zonal.clm[:,0], 45.0, 25.0, LMAX=LMAX)
+    assert np.allclose(rot.clm, valid['clm'][:,:,0])
+    assert np.allclose(rot.slm, valid['slm'][:,:,0])
+    # rotations about the y-axis warn when truncating to orders below lmax
+    trunc = Ylms.truncate(LMAX, mmax=20)
+    with pytest.warns(UserWarning, match='MMAX=20'):
+        trunc.rotate(alpha=10.0, beta=70.0)
+    with warnings.catch_warnings():
+        warnings.simplefilter('error', UserWarning)
+        trunc.rotate(alpha=10.0, gamma=30.0)
+    # eigendecompositions of Jy are kept in a bounded cache
+    from gravity_toolkit.harmonic_rotation import _jy_eigen
+    assert (_jy_eigen.cache_info().maxsize == 128)
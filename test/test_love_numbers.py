@@ -1,7 +1,8 @@
 #!/usr/bin/env python
 u"""
-test_love_numbers.py (12/2020)
+test_love_numbers.py (03/2021)
 UPDATE HISTORY:
+    Updated 03/2021: add tests for cached load Love number tables
     Updated 12/2020: add linear interpolation to degree 1000
         add tests for Gegout and Wang load Love number sets
     Written 08/2020
@@ -9,7 +10,9 @@ UPDATE HISTORY:
 import os
 import warnings
 import pytest
+import numpy as np
 import gravity_toolkit.read_love_numbers
+from gravity_toolkit.read_love_numbers import load_love_numbers
 from gravity_toolkit.utilities import get_data_path
 
 #-- PURPOSE: Define Load Love Numbers for lower degree harmonics
@@ -54,3 +57,49 @@ def test_Wang_love_numbers():
     TEST = gravity_toolkit.read_love_numbers(love_numbers_file,
         HEADER=1, COLUMNS=COLUMNS, FORMAT='dict', REFERENCE='CE')
     assert (TEST['l'].max() == 5000)
+
+#-- PURPOSE: Check that cached Load Love Numbers match the parsed values
+def test_cached_love_numbers(tmpdir):
+    # path to load Love numbers file
+    love_numbers_file = get_data_path(['data','love_numbers'])
+    # read load Love numbers and convert to reference frame CF
+    VALID = gravity_toolkit.read_love_numbers(love_numbers_file,
+        LMAX=60, HEADER=2, FORMAT='dict', REFERENCE='CF')
+    # read load Love numbers using a binary cache of the parsed table
+    for i in range(2):
+        TEST = load_love_numbers(60, LOVE_NUMBERS=0, REFERENCE='CF',
+            FORMAT='dict', CACHE=str(tmpdir))
+        assert all(np.all(VALID[key] == TEST[key]) for key in ['hl','kl','ll'])
+        # verify that values in memory are not modified by the output
+        TEST['kl'][:] = 0.0
+    assert os.access(os.path.join(str(tmpdir),'love_numbers.npz'), os.F_OK)
+
+#-- PURPOSE: Check that cached tables are validated with the parsing options
+def test_love_number_table_cache(tmpdir):
+    from gravity_toolkit.read_love_numbers import love_number_table, \
+        _love_tables
+    # path to load Love numbers file
+    love_numbers_file = get_data_path(['data','love_numbers'])
+    # cache file within a directory that does not currently exist
+    CACHE = os.path.join(str(tmpdir),'cache','love_numbers.npz')
+    VALID = love_number_table(love_numbers_file, HEADER=2,
+        COLUMNS=['l','hl','kl','ll'], CACHE=CACHE)
+    assert os.access(CACHE, os.F_OK)
+    # no temporary files are left in the cache directory
+    assert (os.listdir(os.path.dirname(CACHE)) == ['love_numbers.npz'])
+    # read with different columns from the same cache file
+    _love_tables.clear()
+    TEST = love_number_table(love_numbers_file, HEADER=2,
+        COLUMNS=['l','kl','hl','ll'], CACHE=CACHE)
+    assert np.all(TEST['hl'] == VALID['kl'])
+    assert np.all(TEST['kl'] == VALID['hl'])
+    # read with different header lines from the same cache file
+    _love_tables.clear()
+    TEST = love_number_table(love_numbers_file, HEADER=3,
+        COLUMNS=['l','hl','kl','ll'], CACHE=CACHE)
+    assert np.all(TEST['l'] == VALID['l'][1:])
+    # read the original table from memory and the rewritten cache file
+    _love_tables.clear()
+    TEST = love_number_table(love_numbers_file, HEADER=2,
+        COLUMNS=['l','hl','kl','ll'], CACHE=CACHE)
+    assert all(np.all(VALID[key] == TEST[key]) for key in VALID.keys())
@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+u"""
+test_mascons.py (03/2021)
+Verify mascon sensitivity kernels and time series
+"""
+import os
+import pytest
+import numpy as np
+from gravity_toolkit.mascon_kernel import mascon_kernel, mascon_timeseries, \
+    pseudo_inverse, kernel_cache_file
+from gravity_toolkit.harmonics import harmonics
+from gravity_toolkit.mascon_store import mascon_store, read_mascon_index, \
+    mascon_harmonics
+
+#-- PURPOSE: check sensitivity kernels and mascon time series against
+#-- separate least-squares solutions for each harmonic and mascon
+def test_mascon_kernel(tmpdir):
+    n_harm,n_mas,nt = (250,30,12)
+    #-- mascon harmonics, fit factors and total area of each mascon
+    M_lm = np.random.randn(n_harm,n_mas)
+    fit_factor = 0.5 + np.random.rand(n_harm)
+    MA_lm = M_lm*fit_factor[:,None]
+    total_area = 1e15*(0.5 + np.random.rand(n_mas))
+    #-- harmonics for each date and satellite error harmonics
+    Y_lm = np.random.randn(n_harm,nt)
+    delta_lm = np.random.rand(n_harm)
+    #-- least-squares solutions for each unit harmonic
+    valid = np.zeros((n_harm,n_mas))
+    for i in range(n_harm):
+        kern_i = np.zeros((n_harm))
+        kern_i[i] = 1.0*fit_factor[i]
+        kern_lm = np.linalg.lstsq(MA_lm,kern_i,rcond=-1)[0]
+        for k in range(n_mas):
+            valid[i,k] = kern_lm[k]*total_area[k]
+    #-- mascon time series and errors for each mascon and date
+    mass = np.zeros((n_mas,nt))
+    error = np.zeros((n_mas))
+    for k in range(n_mas):
+        error[k] = np.sqrt(np.sum((delta_lm*valid[:,k])**2))/1e15
+        for t in range(nt):
+            mass[k,t] = np.sum(valid[:,k]*Y_lm[:,t])/1e15
+
+    #-- cache file within a directory that does not exist
+    CACHE = kernel_cache_file(str(tmpdir.join('kernels')),
+        'GREENLAND_MASCONS.txt', LMAX=60, RAD=250)
+    A_lm = mascon_kernel(MA_lm, fit_factor, AREA=total_area)
+    A_cached = mascon_kernel(MA_lm, fit_factor, AREA=total_area, CACHE=CACHE)
+    assert os.access(CACHE, os.F_OK)
+    assert (os.listdir(os.path.dirname(CACHE)) == [os.path.basename(CACHE)])
+    #-- read the pseudo-inverse from the cache file
+    A_read = mascon_kernel(MA_lm, fit_factor, AREA=total_area, CACHE=CACHE)
+    eps = 1e-10*np.max(np.abs(valid))
+    for test in (A_lm, A_cached, A_read):
+        assert np.all(np.abs(test - valid) < eps)
+    assert np.all(A_read == A_cached)
+    #-- cached pseudo-inverses are recalculated for different harmonics
+    MA_lm[0,0] += 1.0
+    assert np.all(pseudo_inverse(MA_lm, CACHE=CACHE) ==
+        pseudo_inverse(MA_lm))
+
+    #-- calculate all mascon time series with a single product
+    mascon = mascon_timeseries(A_lm, Y_lm, DELTA=delta_lm, AREA=total_area)
+    assert np.allclose(mascon['mass'], mass, rtol=1e-10)
+    assert np.allclose(mascon['error'], error, rtol=1e-10)
+    assert np.all(mascon['area'] == total_area/1e10)
+
+#-- PURPOSE: check truncated mascon stores against the mascon index
+@pytest.mark.parametrize("DATAFORM", ['netCDF4','HDF5'])
+def test_mascon_store(tmpdir, DATAFORM):
+    LMAX,n_mas = (30,6)
+    suffix = dict(netCDF4='nc', HDF5='H5')[DATAFORM]
+    #-- write random mascon harmonics to files and create an index
+    MASCON_INDEX = str(tmpdir.join('mascons_index.txt'))
+    with open(MASCON_INDEX, 'w') as fid:
+        for k in range(n_mas):
+            Ylms = harmonics(lmax=LMAX, mmax=LMAX)
+            Ylms.clm = np.tril(np.random.randn(LMAX+1,LMAX+1))
+            Ylms.slm = np.tril(np.random.randn(LMAX+1,LMAX+1))
+            Ylms.slm[:,0] = 0.0
+            Ylms.clm[0,0] = np.abs(Ylms.clm[0,0])
+            FILE = str(tmpdir.join('MASCON_{0:d}.{1}'.format(k,suffix)))
+            getattr(Ylms, 'to_{0}'.format(DATAFORM))(FILE, date=False)
+            print(FILE, file=fid)
+    #-- write the consolidated store and read back at a lower truncation
+    STORE = str(tmpdir.join('mascons_store.H5'))
+    mascon_store(MASCON_INDEX, LMAX=LMAX, DATAFORM=DATAFORM, STORE=STORE)
+    assert os.access(STORE, os.F_OK)
+    mascons = mascon_store(MASCON_INDEX, LMAX=20, MMAX=15,
+        DATAFORM=DATAFORM, STORE=STORE)
+    valid = read_mascon_index(MASCON_INDEX, LMAX=20, MMAX=15,
+        DATAFORM=DATAFORM)
+    for key in ('harmonics','l','m','cs','area'):
+        assert np.all(mascons[key] == valid[key])
+    for key in ('name','files'):
+        assert (mascons[key] == valid[key])
+    #-- expanded harmonics of each mascon do not contain the areas
+    Ylms = mascon_harmonics(mascons)
+    assert (Ylms.clm.shape == (21,16,n_mas))
+    assert (Ylms.time is None) and (Ylms.month is None)
+    for k in range(n_mas):
+        Ylm = getattr(harmonics(), 'from_{0}'.format(DATAFORM))(
+            valid['files'][k], date=False).truncate(20, mmax=15)
+        assert np.all(Ylms.clm[:,:,k] == Ylm.clm)
+        assert np.all(Ylms.slm[:,:,k] == Ylm.slm)
+    #-- stores that do not match the data format are rejected
+    with pytest.raises(ValueError, match='dataform'):
+        mascon_store(MASCON_INDEX, LMAX=20, DATAFORM='ascii', STORE=STORE)
+    #-- stores that do not match the contents of a mascon file are rejected
+    Ylm = getattr(harmonics(), 'from_{0}'.format(DATAFORM))(
+        valid['files'][0], date=False)
+    Ylm.clm[2,0] += 1.0
+    getattr(Ylm, 'to_{0}'.format(DATAFORM))(valid['files'][0], date=False)
+    with pytest.raises(ValueError, match='mascon_files_checksum'):
+        mascon_store(MASCON_INDEX, LMAX=20, DATAFORM=DATAFORM, STORE=STORE)
+    #-- stores that do not match the contents of the index are rejected
+    with open(MASCON_INDEX, 'a') as fid:
+        print(valid['files'][0], file=fid)
+    with pytest.raises(ValueError):
+        mascon_store(MASCON_INDEX, LMAX=20, DATAFORM=DATAFORM, STORE=STORE)
@@ -1,6 +1,6 @@
 #!/usr/bin/env python
 u"""
-test_point_masses.py (02/2021)
+test_point_masses.py (03/2021)
 """
 import pytest
 import numpy as np
@@ -8,6 +8,10 @@ from gravity_toolkit.utilities import get_data_path
 from gravity_toolkit.read_love_numbers import read_love_numbers
 from gravity_toolkit.gen_point_load import gen_point_load
 from gravity_toolkit.gen_stokes import gen_stokes
+from gravity_toolkit.gen_spherical_cap import gen_spherical_cap, \
+    gen_spherical_caps
+from gravity_toolkit.gen_disc_load import gen_disc_load, gen_disc_loads
+from gravity_toolkit.units import units
 
 # parameterize the number of point masses
 @pytest.mark.parametrize("NPTS", np.random.randint(2,2000,size=1))
@@ -47,3 +51,64 @@ def test_point_masses(NPTS):
     assert np.all(np.abs(difference_Ylms.clm) < harmonic_eps)
     # verify that the degree amplitudes are within tolerance
     assert np.all(np.abs(grid_Ylms.amp - point_Ylms.amp) < harmonic_eps)
+
+# parameterize the number of point masses
+@pytest.mark.parametrize("NPTS", np.random.randint(2000,5000,size=1))
+def test_point_blocks(NPTS):
+    # parameterize point masses
+    LAT = 90.0 - 180.0*np.random.rand(NPTS)
+    LON = 360.0*np.random.rand(NPTS)
+    MASS = 100.0 - 200.0*np.random.randn(NPTS)
+    # path to load Love numbers file
+    love_numbers_file = get_data_path(['data','love_numbers'])
+    # read load Love numbers
+    hl,kl,ll = read_love_numbers(love_numbers_file)
+    # calculate harmonics for all points and for threaded blocks of points
+    Ylms = gen_point_load(MASS, LON, LAT, LMAX=60, UNITS=2, LOVE=(hl,kl,ll))
+    block_Ylms = gen_point_load(MASS, LON, LAT, LMAX=60, UNITS=2,
+        LOVE=(hl,kl,ll), CHUNKSIZE=500, THREADS=4)
+    # check that harmonic data is equal to machine precision
+    harmonic_eps = np.finfo(np.float32).eps
+    assert np.all(np.abs(Ylms.clm - block_Ylms.clm) < harmonic_eps)
+    assert np.all(np.abs(Ylms.slm - block_Ylms.slm) < harmonic_eps)
+
+# check batched spherical caps and disc loads against single loads
+@pytest.mark.parametrize("UNITS", [1,2,3])
+def test_batched_loads(UNITS):
+    LMAX,MMAX,NPTS = (60,30,8)
+    # parameterize loads with mixed radii
+    LAT = 90.0 - 180.0*np.random.rand(NPTS)
+    LON = 360.0*np.random.rand(NPTS)
+    MASS = 100.0 - 200.0*np.random.randn(NPTS)
+    RAD = np.random.choice([1.0,1.5,2.0], size=NPTS)
+    # disc areas in km^2 with repeated values
+    AREA = np.pi*(111.0*RAD)**2
+    # path to load Love numbers file
+    love_numbers_file = get_data_path(['data','love_numbers'])
+    # read load Love numbers
+    hl,kl,ll = read_love_numbers(love_numbers_file)
+    # calculate harmonics for all spherical caps and disc loads
+    cap_Ylms,cap_area = gen_spherical_caps(MASS, LON, LAT, LMAX=LMAX,
+        MMAX=MMAX, RAD_CAP=RAD, UNITS=UNITS, LOVE=(hl,kl,ll))
+    disc_Ylms,disc_area = gen_disc_loads(MASS, LON, LAT, AREA, LMAX=LMAX,
+        MMAX=MMAX, LOVE=(hl,kl,ll))
+    assert (cap_Ylms.clm.shape == (LMAX+1,MMAX+1,NPTS))
+    assert (disc_Ylms.clm.shape == (LMAX+1,MMAX+1,NPTS))
+    # areas are not output as the dates of the harmonics
+    assert (cap_Ylms.time is None) and (disc_Ylms.time is None)
+    rad_e = units(lmax=LMAX).rad_e
+    assert np.allclose(cap_area, np.pi*(rad_e*RAD*np.pi/180.0)**2, rtol=1e-15)
+    assert np.allclose(disc_area, 1e10*AREA, rtol=1e-15)
+    # check each load against the single load functions
+    harmonic_eps = np.finfo(np.float64).eps
+    for i in range(NPTS):
+        Ylms = gen_spherical_cap(MASS[i], LON[i], LAT[i], LMAX=LMAX,
+            MMAX=MMAX, RAD_CAP=RAD[i], UNITS=UNITS, LOVE=(hl,kl,ll))
+        eps = harmonic_eps*np.max(np.abs(Ylms.clm))
+        assert np.all(np.abs(cap_Ylms.clm[:,:,i] - Ylms.clm) < 10.0*eps)
+        assert np.all(np.abs(cap_Ylms.slm[:,:,i] - Ylms.slm) < 10.0*eps)
+        Ylms = gen_disc_load(MASS[i], LON[i], LAT[i], AREA[i], LMAX=LMAX,
+            MMAX=MMAX, LOVE=(hl,kl,ll))
+        eps = harmonic_eps*np.max(np.abs(Ylms.clm))
+        assert np.all(np.abs(disc_Ylms.clm[:,:,i] - Ylms.clm) < 10.0*eps)
+        assert np.all(np.abs(disc_Ylms.slm[:,:,i] - Ylms.slm) < 10.0*eps)
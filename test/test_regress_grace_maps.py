@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+u"""
+test_regress_grace_maps.py (03/2021)
+Verify regressions of spatial files in latitude bands
+"""
+import os
+import sys
+import pytest
+import importlib.util
+import numpy as np
+from gravity_toolkit.spatial import spatial
+from gravity_toolkit.tsregress import tsregress
+
+#-- import regression program from the scripts directory
+filename = os.path.join(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))), 'scripts', 'regress_grace_maps.py')
+spec = importlib.util.spec_from_file_location('regress_grace_maps', filename)
+regress_grace_maps = importlib.util.module_from_spec(spec)
+#-- add to modules for pickling the latitude band function for processes
+sys.modules['regress_grace_maps'] = regress_grace_maps
+spec.loader.exec_module(regress_grace_maps)
+
+#-- PURPOSE: write monthly spatial files for a small grid
+def write_spatial_files(directory, DATAFORM, months, DDEG=10.0):
+    suffix = dict(ascii='txt', netCDF4='nc', HDF5='H5')[DATAFORM]
+    nlat,nlon = (np.int(180.0/DDEG),np.int(360.0/DDEG))
+    for m in months:
+        grid = spatial(spacing=[DDEG,DDEG], nlat=nlat, nlon=nlon)
+        grid.lon = np.arange(DDEG/2.0, 360.0, DDEG)
+        grid.lat = np.arange(90.0 - DDEG/2.0, -90.0, -DDEG)
+        #-- round to the precision of the ascii format
+        grid.data = np.round(np.random.randn(nlat,nlon) + 0.1*m, 4)
+        grid.mask = np.zeros((nlat,nlon), dtype=np.bool)
+        grid.time = 2002.0 + (m - 0.5)/12.0
+        FILE = os.path.join(directory,
+            'TEST_cmwe_L60_r300km_{0:03d}.{1}'.format(m,suffix))
+        if (DATAFORM == 'ascii'):
+            grid.to_ascii(FILE)
+        else:
+            getattr(grid, 'to_{0}'.format(DATAFORM))(FILE,
+                units='cmwe', longname='Equivalent_Water_Thickness')
+
+#-- PURPOSE: read an output file of the regression program
+def read_output_file(FILE, DATAFORM, DDEG=10.0):
+    if (DATAFORM == 'ascii'):
+        nlat,nlon = (np.int(180.0/DDEG),np.int(360.0/DDEG))
+        return spatial(spacing=[DDEG,DDEG], nlat=nlat,
+            nlon=nlon).from_ascii(FILE, date=False).data
+    else:
+        return getattr(spatial(), 'from_{0}'.format(DATAFORM))(FILE,
+            date=False).data
+
+#-- PURPOSE: check regressions of latitude bands against the full grid
+@pytest.mark.parametrize("DATAFORM", ['ascii','netCDF4','HDF5'])
+def test_regress_tiles(tmpdir, DATAFORM):
+    months = np.arange(4,40)
+    write_spatial_files(str(tmpdir), DATAFORM, months)
+    parameters = dict(PROC='CSR', DREL='RL06', DSET='GSM', START='4',
+        END='39', MISSING='0', LMAX='60', MMAX='None', GIA='None',
+        GIA_FILE='', REDISTRIBUTE_REMOVED='N', RAD='300', DESTRIPE='N',
+        UNITS='1', DDEG='10', INTERVAL='2', DATAFORM=DATAFORM,
+        DIRECTORY=str(tmpdir), FILENAME='TEST_')
+    kwargs = dict(ORDER=1, CYCLES=[0.5,1.0])
+    #-- regression of the full grid in memory
+    output_files = regress_grace_maps.regress_grace_maps(parameters, **kwargs)
+    valid = {f:read_output_file(f, DATAFORM) for f in output_files}
+    #-- regressions of latitude bands in series and in parallel
+    for TILES,PROCESSES,CACHE in [(3,0,False),(4,2,False),(5,0,True)]:
+        output_files = regress_grace_maps.regress_grace_maps(parameters,
+            TILES=TILES, PROCESSES=PROCESSES, CACHE=CACHE, **kwargs)
+        assert (sorted(output_files) == sorted(valid.keys()))
+        for f in output_files:
+            test = read_output_file(f, DATAFORM)
+            assert np.allclose(test, valid[f], equal_nan=True)
+        #-- temporary directories of latitude bands are removed
+        assert not any(os.path.isdir(os.path.join(str(tmpdir),d))
+            for d in os.listdir(str(tmpdir)))
+
+#-- PURPOSE: check regressions of a latitude band against each grid point
+def test_regress_band():
+    nlat,nlon,nmon = (6,8,48)
+    stack = spatial(spacing=[45.0,30.0], nlat=nlat, nlon=nlon)
+    stack.time = 2002.0 + (np.arange(nmon) + 0.5)/12.0
+    stack.data = np.random.randn(nlat,nlon,nmon)
+    BAND = slice(2,5)
+    output = {}
+    for key in ['beta','error']:
+        output[key] = np.zeros((nlat,nlon,6))
+    for key in ['amplitude','phase','amplitude_error','phase_error']:
+        output[key] = np.zeros((nlat,nlon,2))
+    for key in ['SSE','AIC','BIC','R2Adj']:
+        output[key] = np.zeros((nlat,nlon))
+    nu = regress_grace_maps.regress_band(stack, BAND, ORDER=1,
+        CYCLES=[0.5,1.0], OUTPUT=output)
+    #-- outputs are only written within the latitude band
+    for key,val in output.items():
+        assert not np.any(val[:BAND.start,...])
+        assert not np.any(val[BAND.stop:,...])
+    #-- check each grid point against a single regression
+    for i in range(BAND.start,BAND.stop):
+        for j in range(nlon):
+            tsbeta = tsregress(stack.time, stack.data[i,j,:], ORDER=1,
+                CYCLES=[0.5,1.0], CONF=0.95)
+            assert (nu == tsbeta['DOF'])
+            assert np.allclose(output['beta'][i,j,:], tsbeta['beta'])
+            assert np.allclose(output['error'][i,j,:], tsbeta['error'])
+            assert np.isclose(output['SSE'][i,j], tsbeta['MSE']*nu)
+            for key in ['AIC','BIC','R2Adj']:
+                assert np.isclose(output[key][i,j], tsbeta[key])
+
+#-- PURPOSE: raise an exception when regressing a latitude band
+def failed_band(input_files, BAND, **kwargs):
+    raise RuntimeError('Latitude band {0} failed'.format(BAND))
+
+#-- PURPOSE: check that temporary directories are removed for failed bands
+@pytest.mark.parametrize("PROCESSES", [0, 2])
+def test_regress_failed_tiles(tmpdir, monkeypatch, PROCESSES):
+    write_spatial_files(str(tmpdir), 'netCDF4', np.arange(4,16))
+    parameters = dict(PROC='CSR', DREL='RL06', DSET='GSM', START='4',
+        END='15', MISSING='0', LMAX='60', MMAX='None', GIA='None',
+        GIA_FILE='', REDISTRIBUTE_REMOVED='N', RAD='300', DESTRIPE='N',
+        UNITS='1', DDEG='10', INTERVAL='2', DATAFORM='netCDF4',
+        DIRECTORY=str(tmpdir), FILENAME='TEST_')
+    monkeypatch.setattr(regress_grace_maps, 'regress_band', failed_band)
+    with pytest.raises(RuntimeError):
+        regress_grace_maps.regress_grace_maps(parameters, ORDER=1,
+            CYCLES=[1.0], TILES=4, PROCESSES=PROCESSES)
+    assert not any(os.path.isdir(os.path.join(str(tmpdir),d))
+        for d in os.listdir(str(tmpdir)))
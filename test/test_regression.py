@@ -0,0 +1,206 @@
+#!/usr/bin/env python
+u"""
+test_regression.py (03/2021)
+Verify batched and weighted time series regression and smoothing
+"""
+import pytest
+import numpy as np
+import scipy.stats
+from gravity_toolkit.tsregress import tsregress
+from gravity_toolkit.tssmooth import tssmooth
+from gravity_toolkit.piecewise_regress import piecewise_regress, piecewise_scan
+
+#-- PURPOSE: create random time series with a trend and seasonal terms
+def random_series(nseries, nmax):
+    t_in = 2002.0 + (np.arange(nmax) + 0.5)/12.0
+    d_in = np.random.randn(nseries, nmax)
+    d_in += np.random.randn(nseries, 1)*(t_in - 2010.0)
+    d_in += np.random.randn(nseries, 1)*np.sin(2.0*np.pi*t_in)
+    return (t_in, d_in)
+
+#-- PURPOSE: check that batched regressions match regressions of each series
+@pytest.mark.parametrize("WEIGHT", [False, True])
+def test_batched_regression(WEIGHT):
+    nseries,nmax = (8,150)
+    t_in,d_in = random_series(nseries, nmax)
+    #-- unequal data errors for weighted least-squares
+    DATA_ERR = 0.5 + np.random.rand(nmax) if WEIGHT else 0
+    kwargs = dict(ORDER=2, CYCLES=[0.5,1.0], WEIGHT=WEIGHT, CONF=0.95)
+    batch = tsregress(t_in, d_in, DATA_ERR=np.copy(DATA_ERR), **kwargs)
+    #-- outputs are the same for every time series
+    for key in ('N','DOF'):
+        assert (batch[key] == tsregress(t_in, d_in[0,:],
+            DATA_ERR=np.copy(DATA_ERR), **kwargs)[key])
+    #-- check each time series against a single regression
+    for i in range(nseries):
+        single = tsregress(t_in, d_in[i,:], DATA_ERR=np.copy(DATA_ERR),
+            **kwargs)
+        assert (sorted(single.keys()) == sorted(batch.keys()))
+        for key,val in single.items():
+            if key in ('N','DOF'):
+                continue
+            elif (key == 'cov_mat'):
+                assert np.allclose(batch[key], val, rtol=1e-10, atol=0)
+            else:
+                assert np.shape(batch[key][i]) == np.shape(val)
+                assert np.allclose(batch[key][i], val, rtol=1e-10, atol=1e-12)
+
+#-- PURPOSE: check weighted regressions against the normal equations
+#-- and that invalid values are confined to their time series
+def test_weighted_regression():
+    nseries,nmax = (5,120)
+    t_in,d_in = random_series(nseries, nmax)
+    DATA_ERR = 0.5 + np.random.rand(nmax)
+    #-- replace a value in one time series with NaN
+    d_in[2,nmax//3] = np.nan
+    tsbeta = tsregress(t_in, d_in, ORDER=1, CYCLES=[0.5,1.0],
+        DATA_ERR=np.copy(DATA_ERR), WEIGHT=True)
+    #-- design matrix and weight matrix
+    t_rel = t_in.mean()
+    DMAT = np.transpose([np.ones((nmax)), t_in - t_rel,
+        np.sin(4.0*np.pi*t_in), np.cos(4.0*np.pi*t_in),
+        np.sin(2.0*np.pi*t_in), np.cos(2.0*np.pi*t_in)])
+    W = np.diag(DATA_ERR**(-2))
+    #-- covariance matrix: Inv(X'.W.X)
+    Hinv = np.linalg.inv(np.dot(np.transpose(DMAT),np.dot(W,DMAT)))
+    assert np.allclose(tsbeta['cov_mat'], Hinv, rtol=1e-10, atol=0)
+    assert np.allclose(tsbeta['error'][0,:], np.sqrt(np.diag(Hinv)))
+    #-- coefficients from the weighted normal equations
+    valid = [i for i in range(nseries) if (i != 2)]
+    NORMEQ = np.dot(Hinv,np.dot(np.transpose(DMAT),W))
+    beta = np.dot(NORMEQ,np.transpose(d_in[valid,:]))
+    assert np.allclose(tsbeta['beta'][valid,:], np.transpose(beta))
+    #-- outputs for the invalid time series are not finite
+    for key in ('beta','model','AIC','BIC','WSSE'):
+        assert np.all(np.isfinite(tsbeta[key][valid,...]))
+        assert not np.all(np.isfinite(tsbeta[key][2,...]))
+
+#-- PURPOSE: smooth a single time series by fitting each window separately
+def smooth_windows(t_in, d_in, HFWTH=6, MOVING=False, DATA_ERR=0, WEIGHT=0):
+    nmax = len(t_in)
+    nwin = nmax - 2*HFWTH
+    output = {}
+    #-- centered moving average
+    if MOVING:
+        output['data'] = np.zeros((nwin))
+        for i in range(nwin):
+            output['data'][i] = (np.sum(d_in[i+1:i+2*HFWTH]) +
+                0.5*(d_in[i] + d_in[i+2*HFWTH]))/(2.0*HFWTH)
+        output['time'] = t_in[HFWTH:nmax-HFWTH]
+        return output
+    #-- weights for each position within the window
+    if (WEIGHT == 1):
+        wi = np.concatenate((np.arange(1,HFWTH+2), np.arange(HFWTH,0,-1)))
+    elif (WEIGHT == 2):
+        xi = np.arange(0, 2*HFWTH+1)
+        wi = np.exp(-(xi-HFWTH)**2/8.0)/(2.0*np.sqrt(2.0*np.pi))
+    #-- output components at each date or at each window center
+    n = nmax if WEIGHT else nwin
+    keys = ['data','seasonal','annual','semiann','annamp','annphase',
+        'semiamp','semiphase','trend','error','noise','reduce']
+    output = {key:np.zeros((n)) for key in keys}
+    weight = np.zeros((n))
+    for i in range(nwin):
+        ran = i + np.arange(0, 2*HFWTH+1)
+        t = t_in[ran]
+        TMAT = np.transpose([np.ones((2*HFWTH+1)), t,
+            np.sin(2*np.pi*t), np.cos(2*np.pi*t),
+            np.sin(4*np.pi*t), np.cos(4*np.pi*t)])
+        beta = np.linalg.lstsq(TMAT, d_in[ran], rcond=-1)[0]
+        AS,AC,SS,SC = beta[2:]
+        comp = {}
+        comp['data'] = np.dot(TMAT[:,:2], beta[:2])
+        comp['seasonal'] = np.dot(TMAT[:,2:], beta[2:])
+        comp['annual'] = np.dot(TMAT[:,2:4], beta[2:4])
+        comp['semiann'] = np.dot(TMAT[:,4:], beta[4:])
+        comp['annamp'] = np.sqrt(AS**2 + AC**2)
+        comp['annphase'] = np.arctan2(AC,AS)*180.0/np.pi
+        comp['semiamp'] = np.sqrt(SS**2 + SC**2)
+        comp['semiphase'] = np.arctan2(SC,SS)*180.0/np.pi
+        if WEIGHT:
+            #-- add weighted components to each date in the window
+            for key,val in comp.items():
+                output[key][ran] += wi*val
+            weight[ran] += wi
+            continue
+        #-- components at the center of the window
+        for key,val in comp.items():
+            output[key][i] = val[HFWTH] if np.ndim(val) else val
+        #-- error of the instantaneous trend
+        Hinv = np.linalg.inv(np.dot(np.transpose(TMAT),TMAT))
+        if (DATA_ERR != 0):
+            NORMEQ = np.dot(Hinv, np.transpose(TMAT))
+            output['error'][i] = DATA_ERR*np.sqrt(np.sum(NORMEQ[1,:]**2))
+        else:
+            nu = 2*HFWTH + 1 - 6
+            MSE = np.sum((d_in[ran] - np.dot(TMAT,beta))**2)/nu
+            tstar = scipy.stats.t.ppf(0.975, nu)
+            output['error'][i] = tstar*np.sqrt(MSE*Hinv[1,1])
+        output['trend'][i] = beta[1]
+        output['reduce'][i] = d_in[i+HFWTH]
+    if WEIGHT:
+        for key in ['data','seasonal','annual','semiann','annamp','annphase',
+            'semiamp','semiphase']:
+            output[key] /= weight
+        output['noise'] = d_in - output['data'] - output['seasonal']
+        output['time'] = np.copy(t_in)
+        output['weight'] = weight
+        for key in ('trend','error','reduce'):
+            output.pop(key)
+    else:
+        output['noise'] = output['reduce'] - output['data'] - output['seasonal']
+        output['time'] = t_in[HFWTH:nmax-HFWTH]
+    return output
+
+#-- PURPOSE: check smoothed time series against fits of each window
+@pytest.mark.parametrize("kwargs", [dict(), dict(DATA_ERR=0.3),
+    dict(WEIGHT=1), dict(WEIGHT=2), dict(MOVING=True)])
+def test_smoothing(kwargs):
+    nseries,nmax = (4,80)
+    t_in,d_in = random_series(nseries, nmax)
+    batch = tssmooth(t_in, d_in, HFWTH=6, **kwargs)
+    for i in range(nseries):
+        valid = smooth_windows(t_in, d_in[i,:], HFWTH=6, **kwargs)
+        single = tssmooth(t_in, d_in[i,:], HFWTH=6, **kwargs)
+        assert (sorted(single.keys()) == sorted(valid.keys()))
+        #-- linear terms use absolute times so the stacked pseudo-inverse
+        #-- and lstsq solutions agree to the conditioning of each window
+        for key,val in valid.items():
+            assert (np.shape(single[key]) == np.shape(val))
+            assert np.allclose(single[key], val, rtol=1e-6, atol=1e-6)
+            #-- time and weights are the same for every time series
+            test = batch[key] if key in ('time','weight') else batch[key][i]
+            assert np.allclose(test, val, rtol=1e-6, atol=1e-6)
+
+#-- PURPOSE: check breakpoint scans against piecewise regressions
+@pytest.mark.parametrize("WEIGHT", [False, True])
+def test_piecewise_scan(WEIGHT):
+    nseries,nmax = (3,120)
+    t_in,d_in = random_series(nseries, nmax)
+    d_in += np.where(t_in > 2008.0, 2.0*(t_in - 2008.0), 0.0)
+    #-- unequal data errors for weighted least-squares
+    DATA_ERR = 0.5 + np.random.rand(nmax) if WEIGHT else 0
+    kwargs = dict(CYCLES=[0.5,1.0], WEIGHT=WEIGHT, AICc=True)
+    candidates = np.arange(2005.0, 2010.0, 0.5)
+    scan = piecewise_scan(t_in, d_in, BREAK_TIME=candidates,
+        DATA_ERR=np.copy(DATA_ERR), **kwargs)
+    assert np.all(scan['candidates'] == candidates)
+    for i in range(nseries):
+        for j,tco in enumerate(candidates):
+            pcw = piecewise_regress(t_in, d_in[i,:], BREAK_TIME=tco,
+                DATA_ERR=np.copy(DATA_ERR), **kwargs)
+            assert np.isclose(scan['AIC_scan'][i,j], pcw['AIC'])
+            assert np.isclose(scan['BIC_scan'][i,j], pcw['BIC'])
+            #-- coefficients from a scan of the single candidate
+            single = piecewise_scan(t_in, d_in[i,:], BREAK_TIME=tco,
+                DATA_ERR=np.copy(DATA_ERR), **kwargs)
+            assert np.allclose(single['beta'], pcw['beta'])
+            assert np.isclose(single['LOGLIK'], pcw['LOGLIK'])
+            assert (single['N'] == pcw['N']) and (single['DOF'] == pcw['DOF'])
+        #-- selected breakpoint has the minimum information criteria
+        j = np.argmin(scan['AIC_scan'][i,:])
+        assert (scan['break_time'][i] == candidates[j])
+        pcw = piecewise_regress(t_in, d_in[i,:], BREAK_TIME=candidates[j],
+            DATA_ERR=np.copy(DATA_ERR), **kwargs)
+        assert np.allclose(scan['beta'][i,:], pcw['beta'])
+        assert np.isclose(scan['AIC'][i], pcw['AIC'])
@@ -0,0 +1,184 @@
+#!/usr/bin/env python
+u"""
+test_spatial.py (03/2021)
+Verify reading and writing spatial data
+"""
+import pytest
+import multiprocessing
+import numpy as np
+from gravity_toolkit.spatial import spatial
+from gravity_toolkit.spatial_series import spatial_series
+
+#-- PURPOSE: create a random global spatial field
+def random_grid(dlon=2.0, dlat=2.0, time=2010.0417):
+    grid = spatial(spacing=[dlon,dlat], nlat=np.int(180.0/dlat),
+        nlon=np.int(360.0/dlon), fill_value=-9999.0)
+    grid.lon = np.arange(dlon/2.0, 360.0, dlon)
+    grid.lat = np.arange(90.0 - dlat/2.0, -90.0, -dlat)
+    #-- round to the precision of the ascii format
+    grid.data = np.round(100.0*np.random.randn(*grid.shape[:2]), 4)
+    grid.mask = np.zeros(grid.shape[:2], dtype=np.bool)
+    grid.time = np.copy(time)
+    grid.month = np.array(12.0*(grid.time-2002.0)+1,dtype='i')
+    grid.update_spacing()
+    grid.update_extents()
+    grid.update_dimensions()
+    return grid
+
+#-- PURPOSE: check ascii files written and read back with and without dates
+@pytest.mark.parametrize("date", [True, False])
+def test_ascii_round_trip(tmpdir, date):
+    grid = random_grid()
+    FILE = str(tmpdir.join('grid.txt'))
+    grid.to_ascii(FILE, date=date)
+    nlat,nlon = grid.shape[:2]
+    test = spatial(spacing=grid.spacing, nlat=nlat, nlon=nlon,
+        extent=grid.extent).from_ascii(FILE, date=date)
+    assert np.all(test.data == grid.data)
+    assert np.all(test.lon == grid.lon)
+    assert np.all(test.lat == grid.lat)
+    assert not np.any(test.mask)
+    if date:
+        assert np.isclose(test.time, grid.time)
+        assert (test.month == grid.month)
+    else:
+        assert (test.time is None) and (test.month is None)
+    #-- reading dates from files without a time column raises an error
+    if not date:
+        with pytest.raises(ValueError, match='time column'):
+            spatial(spacing=grid.spacing, nlat=nlat, nlon=nlon,
+                extent=grid.extent).from_ascii(FILE)
+
+#-- PURPOSE: check that lines with missing columns raise an error
+def test_ascii_missing_columns(tmpdir):
+    grid = random_grid()
+    FILE = str(tmpdir.join('grid.txt'))
+    grid.to_ascii(FILE, date=True)
+    #-- remove the data and time columns from a single line
+    with open(FILE, 'r') as f:
+        file_contents = f.read().splitlines()
+    file_contents[10] = ' '.join(file_contents[10].split()[:2])
+    with open(FILE, 'w') as f:
+        f.write('\n'.join(file_contents))
+    nlat,nlon = grid.shape[:2]
+    with pytest.raises(ValueError, match='Line 11'):
+        spatial(spacing=grid.spacing, nlat=nlat, nlon=nlon,
+            extent=grid.extent).from_ascii(FILE, date=True)
+
+#-- PURPOSE: check that lines with additional values are read in alignment
+def test_ascii_ragged_lines(tmpdir):
+    grid = random_grid()
+    FILE = str(tmpdir.join('grid.txt'))
+    grid.to_ascii(FILE, date=True)
+    #-- add extra values to a line and remove the time of another line
+    #-- keeping the same total number of values in the file
+    with open(FILE, 'r') as f:
+        file_contents = f.read().splitlines()
+    file_contents[10] += ' 1.0'
+    file_contents[20] = ' '.join(file_contents[20].split()[:3])
+    with open(FILE, 'w') as f:
+        f.write('\n'.join(file_contents))
+    nlat,nlon = grid.shape[:2]
+    test = spatial(spacing=grid.spacing, nlat=nlat, nlon=nlon,
+        extent=grid.extent).from_ascii(FILE, date=False)
+    assert np.all(test.data == grid.data)
+    #-- lines with missing values raise an error when reading dates
+    with pytest.raises(ValueError, match='Line 21'):
+        spatial(spacing=grid.spacing, nlat=nlat, nlon=nlon,
+            extent=grid.extent).from_ascii(FILE, date=True)
+
+#-- PURPOSE: check stacked spatial data read from lists of files and caches
+@pytest.mark.parametrize("format", ['netCDF4','HDF5'])
+@pytest.mark.parametrize("processes", [0, 2])
+def test_cache_round_trip(tmpdir, format, processes):
+    suffix = dict(netCDF4='nc', HDF5='H5')[format]
+    #-- write spatial fields for each date (out of order)
+    grids,file_list = ([],[])
+    for t in [2,0,3,1]:
+        grid = random_grid(time=2010.0417 + t/12.0)
+        FILE = str(tmpdir.join('grid_{0:d}.{1}'.format(t,suffix)))
+        getattr(grid, 'to_{0}'.format(format))(FILE, date=True,
+            units='cmwe', longname='Equivalent_Water_Thickness')
+        grids.append(grid)
+        file_list.append(FILE)
+    isort = np.argsort([grid.time for grid in grids])
+    CACHE = str(tmpdir.join('cache.{0}'.format(suffix)))
+    #-- read from the files and then from the cache file
+    #-- cache files are only valid for the same list of files
+    for n,valid in [(4,False),(4,True),(1,False),(1,True),(3,False)]:
+        assert (spatial().valid_cache(CACHE, file_list[:n]) == valid)
+        test = spatial().from_file_list(file_list[:n], format=format,
+            processes=processes, cache=CACHE)
+        test.expand_dims()
+        assert spatial().valid_cache(CACHE, file_list[:n])
+        ii = [i for i in isort if (i < n)]
+        assert (test.shape[2] == n)
+        assert (test.fill_value == grids[0].fill_value)
+        assert np.all(test.lon == grids[0].lon)
+        assert np.all(test.lat == grids[0].lat)
+        for t,i in enumerate(ii):
+            assert np.all(test.data[:,:,t] == grids[i].data)
+            assert np.isclose(test.time[t], grids[i].time)
+            assert (test.month[t] == grids[i].month)
+
+#-- PURPOSE: check that reading processes are stopped for invalid files
+@pytest.mark.parametrize("processes", [0, 2])
+def test_file_list_error(tmpdir, processes):
+    file_list = []
+    for t in range(4):
+        grid = random_grid(time=2010.0417 + t/12.0)
+        FILE = str(tmpdir.join('grid_{0:d}.nc'.format(t)))
+        grid.to_netCDF4(FILE, date=True, units='cmwe',
+            longname='Equivalent_Water_Thickness')
+        file_list.append(FILE)
+    #-- replace a file in the list with an invalid file
+    with open(file_list[2], 'w') as f:
+        f.write('invalid')
+    with pytest.raises(Exception):
+        spatial().from_file_list(file_list, format='netCDF4',
+            processes=processes)
+    assert not multiprocessing.active_children()
+
+#-- PURPOSE: check spatial fields streamed to a single time series file
+@pytest.mark.parametrize("format", ['netCDF4','HDF5'])
+def test_spatial_series(tmpdir, format):
+    grids = [random_grid(time=2010.0417 + t/12.0) for t in range(5)]
+    FILE = str(tmpdir.join('series.{0}'.format(format)))
+    with spatial_series(FILE, grids[0].lon, grids[0].lat, format=format,
+        units='cmwe', longname='Equivalent_Water_Thickness',
+        fill_value=grids[0].fill_value) as fid:
+        #-- append single fields and then a block of stacked fields
+        for grid in grids[:3]:
+            fid.append(grid.data, grid.time)
+        fid.append(np.dstack([grid.data for grid in grids[3:]]),
+            [grid.time for grid in grids[3:]])
+    assert (fid.shape[2] == len(grids))
+    #-- read the time series file as a stacked spatial object
+    test = getattr(spatial(), 'from_{0}'.format(format))(FILE, date=True)
+    assert (test.shape == (*grids[0].shape[:2],len(grids)))
+    assert (test.fill_value == grids[0].fill_value)
+    assert np.all(test.lon == grids[0].lon)
+    assert np.all(test.lat == grids[0].lat)
+    for t,grid in enumerate(grids):
+        assert np.all(test.data[:,:,t] == grid.data)
+        assert (test.time[t] == grid.time)
+        assert (test.month[t] == grid.month)
+
+#-- PURPOSE: check latitude bands read from netCDF4 and HDF5 files
+@pytest.mark.parametrize("format", ['netCDF4','HDF5'])
+def test_band_read(tmpdir, format):
+    grids = [random_grid(time=2010.0417 + t/12.0) for t in range(3)]
+    FILE = str(tmpdir.join('series.{0}'.format(format)))
+    with spatial_series(FILE, grids[0].lon, grids[0].lat, format=format,
+        units='cmwe', longname='Equivalent_Water_Thickness',
+        fill_value=grids[0].fill_value) as fid:
+        for grid in grids:
+            fid.append(grid.data, grid.time)
+    full = getattr(spatial(), 'from_{0}'.format(format))(FILE)
+    for BAND in [slice(0,10), slice(37,52), slice(80,90)]:
+        test = getattr(spatial(), 'from_{0}'.format(format))(FILE, band=BAND)
+        assert (test.shape == (BAND.stop-BAND.start,*full.shape[1:]))
+        assert np.all(test.data == full.data[BAND,:,:])
+        assert np.all(test.lat == full.lat[BAND])
+        assert np.all(test.lon == full.lon)
+        assert np.all(test.time == full.time)
@@ -1,11 +1,13 @@
 #!/usr/bin/env python
 u"""
-test_time.py (09/2020)
+test_time.py (03/2021)
 Verify time conversion functions
 """
+import os
 import pytest
 import warnings
 import numpy as np
+import gravity_toolkit
 import gravity_toolkit.time
 import gravity_toolkit.utilities
 
@@ -110,3 +112,53 @@ def test_parse_date_string():
     #-- check the epoch and the time unit conversion factors
     assert np.all(epoch == [2000,1,1,12,0,0])
     assert (to_secs == 0.0)
+
+#-- PURPOSE: test calculating days per month for arrays of years
+def test_calendar_days():
+    YEARS = np.array([1900,2000,2001,2004])
+    DPM = gravity_toolkit.time.calendar_days(YEARS)
+    assert (DPM.shape == (4,12))
+    assert np.all(DPM.sum(axis=-1) == [365,366,365,366])
+    #-- check that arrays match the calculation for single years
+    for i,YEAR in enumerate(YEARS):
+        assert np.all(DPM[i,:] == gravity_toolkit.time.calendar_days(YEAR))
+
+#-- PURPOSE: test updating the GRACE/GRACE-FO month table with new files
+def test_grace_date_update(tmpdir):
+    #-- create a CSR RL06 GSM index with monthly files from 2010 to 2012
+    #-- including the special month 119 centered in October 2011
+    input_files = []
+    for YEAR in range(2010,2013):
+        DPM = gravity_toolkit.time.calendar_days(YEAR).astype(np.int)
+        start = 1 + np.cumsum(np.concatenate(([0],DPM[:-1])))
+        end = np.cumsum(DPM)
+        for s,e in zip(start,end):
+            if (YEAR == 2011) and (s == 305):
+                s,e = (289,319)
+            input_files.append('GSM-2_{0:4d}{1:03d}-{0:4d}{2:03d}_GRAC_'
+                'UTCSR_BA01_0600.gz'.format(YEAR,s,e))
+    #-- directories for the incrementally updated and rebuilt indices
+    grace_dir = {}
+    for key in ('update','rebuild'):
+        grace_dir[key] = tmpdir.mkdir(key).mkdir('CSR').mkdir('RL06').mkdir('GSM')
+    #-- calculate dates for the files before the special months
+    grace_dir['update'].join('index.txt').write('\n'.join(input_files[:20]))
+    gravity_toolkit.grace_date(str(tmpdir.join('update')), PROC='CSR',
+        DREL='RL06', DSET='GSM', OUTPUT=True)
+    #-- add new files to the index and update the month table
+    grace_dir['update'].join('index.txt').write('\n'.join(input_files))
+    update = gravity_toolkit.grace_date(str(tmpdir.join('update')),
+        PROC='CSR', DREL='RL06', DSET='GSM', OUTPUT=True, UPDATE=True)
+    #-- calculate dates for all files
+    grace_dir['rebuild'].join('index.txt').write('\n'.join(input_files))
+    rebuild = gravity_toolkit.grace_date(str(tmpdir.join('rebuild')),
+        PROC='CSR', DREL='RL06', DSET='GSM', OUTPUT=True)
+    #-- check that the months and output files match
+    assert (sorted(update.keys()) == sorted(rebuild.keys()))
+    assert (len(update.keys()) == len(input_files))
+    assert (119 in update.keys()) and (118 in update.keys())
+    for m in rebuild.keys():
+        assert (os.path.basename(update[m]) == os.path.basename(rebuild[m]))
+    for f in ('CSR_RL06_DATES.txt','CSR_RL06_MONTHS.txt'):
+        assert (grace_dir['update'].join(f).read() ==
+            grace_dir['rebuild'].join(f).read())